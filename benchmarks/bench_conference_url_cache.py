@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compare extracting the conference URL of every event from scratch against
+reusing the URLs cached by a previous run, when none (or only some) of the
+events have changed.
+
+Usage: python -m benchmarks.bench_conference_url_cache [--events N]
+           [--notes-size N] [--changed N]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Optional
+
+from benchmarks.corpus import generate_event_dicts
+from benchmarks.utils import apply_benchmark_prefs, summarize_timings
+from ocu.conference_url_cache import ConferenceUrlCache
+from ocu.event import Event
+from ocu.event_dict import EventDict
+from ocu.prefs import prefs
+
+
+def time_resolve_conference_urls(
+    event_dicts: list[EventDict], use_cache: bool
+) -> float:
+    """Time resolving the conference URL of every given event, loading and
+    writing the cache (if enabled) as a new invocation of the workflow
+    would."""
+    start_time = time.perf_counter()
+    cache: Optional[ConferenceUrlCache] = None
+    if use_cache:
+        cache = ConferenceUrlCache(prefs.snapshot)
+    for event_dict in event_dicts:
+        Event(event_dict, conference_url_cache=cache)
+    if cache is not None:
+        cache.write()
+    return time.perf_counter() - start_time
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--notes-size", type=int, default=2000)
+    parser.add_argument("--changed", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    cli_args = parser.parse_args()
+
+    event_dicts = generate_event_dicts(
+        cli_args.events, notes_size=cli_args.notes_size, seed=cli_args.seed
+    )
+    changed_event_dicts = [
+        {**event_dict, "title": event_dict["title"] + " (Moved)"}
+        for event_dict in event_dicts[: cli_args.changed]
+    ] + event_dicts[cli_args.changed :]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        apply_benchmark_prefs(alfred_workflow_cache=temp_dir)
+        prefs.refresh()
+        results["no_cache"] = summarize_timings(
+            time_resolve_conference_urls(event_dicts, use_cache=False)
+            for _ in range(cli_args.repeat)
+        )
+        cache_path = os.path.join(temp_dir, ConferenceUrlCache.cache_file_name)
+
+        def remove_cache() -> None:
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+
+        def keep_cache() -> None:
+            pass
+
+        def cache_unchanged_events() -> None:
+            remove_cache()
+            time_resolve_conference_urls(event_dicts, use_cache=True)
+
+        scenarios: dict[str, tuple[Callable[[], None], list[EventDict]]] = {
+            "cache_cold": (remove_cache, event_dicts),
+            "cache_warm_unchanged": (keep_cache, event_dicts),
+            "cache_warm_changed": (cache_unchanged_events, changed_event_dicts),
+        }
+        for scenario_name, (prepare, scenario_event_dicts) in scenarios.items():
+            timings = []
+            for _ in range(cli_args.repeat):
+                prepare()
+                timings.append(
+                    time_resolve_conference_urls(scenario_event_dicts, use_cache=True)
+                )
+            results[scenario_name] = summarize_timings(timings)
+        results["cache_file_bytes"] = os.path.getsize(cache_path)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Compare the compiled conference domain matcher against the previous approach
+of building one regular expression per pattern for every URL.
+
+Usage: python -m benchmarks.bench_domain_matcher [--urls N] [--patterns N]
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Optional
+from urllib.parse import urlparse
+
+from ocu.domain_matcher import DomainMatcher
+
+
+def generate_patterns(rng: random.Random, pattern_count: int) -> list[str]:
+    """Generate a list of mostly-wildcard conference domain patterns."""
+    patterns = []
+    for i in range(pattern_count):
+        domain = f"conf{i}.example{rng.randint(0, 9)}.com"
+        patterns.append(f"*.{domain}" if rng.random() < 0.8 else domain)
+    return patterns
+
+
+def generate_urls(rng: random.Random, patterns: list[str], url_count: int) -> list[str]:
+    """Generate URLs, roughly half of which match one of the given patterns."""
+    urls = []
+    for i in range(url_count):
+        if rng.random() < 0.5:
+            hostname = rng.choice(patterns).replace("*", f"us{rng.randint(1, 99)}web")
+        else:
+            hostname = f"www.unrelated{i}.org"
+        urls.append(f"https://{hostname}/j/{rng.randint(100000, 999999)}")
+    return urls
+
+
+def get_legacy_score(patterns: list[str], url: str) -> int:
+    """Score the given URL using one freshly-built regex per pattern."""
+    hostname: Optional[str] = urlparse(url).hostname
+    for i, pattern in enumerate(patterns):
+        domain_patt = re.sub(r"\\\*", r"([a-z0-9\-]+)", re.escape(pattern))
+        if hostname and re.match(domain_patt, hostname):
+            return 10 * (len(patterns) - i)
+    return -1
+
+
+def get_matcher_score(matcher: DomainMatcher, url: str) -> int:
+    """Score the given URL using the compiled domain matcher."""
+    hostname = urlparse(url).hostname
+    return matcher.get_score(hostname) if hostname else -1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--urls", type=int, default=10_000)
+    parser.add_argument("--patterns", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    cli_args = parser.parse_args()
+
+    rng = random.Random(cli_args.seed)
+    patterns = generate_patterns(rng, cli_args.patterns)
+    urls = generate_urls(rng, patterns, cli_args.urls)
+
+    start_time = time.perf_counter()
+    matcher = DomainMatcher(patterns)
+    compile_secs = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    matcher_scores = [get_matcher_score(matcher, url) for url in urls]
+    matcher_secs = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    legacy_scores = [get_legacy_score(patterns, url) for url in urls]
+    legacy_secs = time.perf_counter() - start_time
+
+    assert matcher_scores == legacy_scores, "matcher results differ from regexes"
+    print(
+        json.dumps(
+            {
+                "urls": cli_args.urls,
+                "patterns": cli_args.patterns,
+                "matcher_compile_ms": round(compile_secs * 1000, 3),
+                "matcher_ms": round(matcher_secs * 1000, 3),
+                "legacy_regex_ms": round(legacy_secs * 1000, 3),
+                "speedup": round(legacy_secs / matcher_secs, 1),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Measure the memory used by a large number of events (with and without
+__slots__), and the time to classify them in a single pass over the columns of
+an EventBatch; every run is measured as of the same (fixed) time.
+
+Usage: python -m benchmarks.bench_event_batch [--events N] [--days N]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable
+
+from benchmarks.corpus import generate_event_dicts
+from benchmarks.utils import apply_benchmark_prefs, summarize_timings
+from ocu import list_events
+from ocu.event import Event
+from ocu.event_batch import EventBatch
+from ocu.event_dict import EventDict
+from ocu.event_timeline import EventTimeline
+from ocu.prefs import prefs
+
+# The time at which every run of the benchmark is measured, so that the same
+# events are upcoming or past regardless of when the benchmark is run
+CURRENT_DATETIME = datetime(2022, 10, 16, 12, 0)
+
+
+def get_dict_event_class() -> type:
+    """Build a copy of the Event class which stores its attributes in a
+    per-instance __dict__ (as Event did before it used __slots__)."""
+    namespace = {
+        name: value
+        for name, value in vars(Event).items()
+        if name not in (*Event.__slots__, "__slots__")
+    }
+    return type("DictEvent", (object,), namespace)
+
+
+def measure_memory(build: Callable[[], Any]) -> int:
+    """Measure the memory retained by the value built by the given function."""
+    tracemalloc.start()
+    try:
+        value = build()
+        retained_memory_bytes, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del value
+    return retained_memory_bytes
+
+
+def time_stage(stage: Callable[[], Any], repeat: int) -> dict[str, float]:
+    """Time the given stage the given number of times."""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start_time)
+    return summarize_timings(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    cli_args = parser.parse_args()
+
+    apply_benchmark_prefs()
+    prefs.refresh()
+    event_dicts = generate_event_dicts(
+        cli_args.events,
+        seed=cli_args.seed,
+        base_date=CURRENT_DATETIME.date(),
+        day_count=cli_args.days,
+    )
+    dict_event_class = get_dict_event_class()
+
+    def build_events(event_class: type) -> Callable[[], list]:
+        # Events are built eagerly, so that they no longer reference their
+        # event dictionaries and only the events themselves are measured
+        def build() -> list:
+            return [
+                event_class(event_dict, current_datetime=CURRENT_DATETIME)
+                for event_dict in event_dicts
+            ]
+
+        return build
+
+    events: list[Event] = build_events(Event)()
+    time_threshold_mins = prefs.snapshot.event_time_threshold_mins
+    current_timestamp = CURRENT_DATETIME.timestamp()
+
+    def filter_and_sort_batched() -> None:
+        EventBatch(events).classify(current_timestamp, time_threshold_mins)
+
+    def build_timeline() -> None:
+        EventTimeline(events)
+
+    timeline = EventTimeline(events)
+
+    def query_timeline() -> None:
+        timeline.get_upcoming_indices(current_timestamp, time_threshold_mins)
+        timeline.count_past(current_timestamp)
+        next(
+            timeline.iter_nearest_past_indices(current_timestamp, time_threshold_mins),
+            None,
+        )
+        timeline.get_in_progress_indices(current_timestamp)
+
+    # Lazy events are consumed by resolving their conference URLs, so each run
+    # of list_events (as measured here) must parse its own events
+    def parse_events_and_get_feedback(event_dicts: list[EventDict]) -> None:
+        list_events.get_feedback(
+            [
+                Event(event_dict, lazy=True, current_datetime=CURRENT_DATETIME)
+                for event_dict in event_dicts
+            ],
+            current_datetime=CURRENT_DATETIME,
+        )
+
+    results = {
+        "event_count": cli_args.events,
+        "memory_bytes": {
+            "dict_events": measure_memory(build_events(dict_event_class)),
+            "slotted_events": measure_memory(build_events(Event)),
+            "event_batch": measure_memory(lambda: EventBatch(events)),
+        },
+        "filter_and_sort_batched": time_stage(filter_and_sort_batched, cli_args.repeat),
+        "build_timeline": time_stage(build_timeline, cli_args.repeat),
+        "query_timeline": time_stage(query_timeline, cli_args.repeat),
+        "parse_events_and_get_feedback": time_stage(
+            lambda: parse_events_and_get_feedback(event_dicts), cli_args.repeat
+        ),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Compare parsing icalBuddy output from scratch against reusing the events
+memoized by a previous run, when none (or only some) of the events have changed.
+
+Usage: python -m benchmarks.bench_icalbuddy_memo [--events N] [--notes-size N]
+           [--changed N]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Callable
+from unittest.mock import patch
+
+from benchmarks.corpus import generate_event_dicts, generate_icalbuddy_output
+from benchmarks.utils import apply_benchmark_prefs, summarize_timings
+from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+from ocu.prefs import prefs
+
+
+def time_get_event_dicts(raw_output: str, repeat: int) -> list[float]:
+    """Time parsing the given icalBuddy output with a fresh calendar (i.e. as a
+    new invocation of the workflow would) the given number of times."""
+    timings = []
+    with patch("subprocess.check_output", return_value=raw_output.encode("utf-8")):
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            IcalBuddyCalendar().get_event_dicts()
+            timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--notes-size", type=int, default=2000)
+    parser.add_argument("--changed", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    cli_args = parser.parse_args()
+
+    event_dicts = generate_event_dicts(
+        cli_args.events, notes_size=cli_args.notes_size, seed=cli_args.seed
+    )
+    raw_output = generate_icalbuddy_output(event_dicts)
+    for event_dict in event_dicts[: cli_args.changed]:
+        event_dict["title"] += " (Moved)"
+    changed_raw_output = generate_icalbuddy_output(event_dicts)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        apply_benchmark_prefs(alfred_workflow_cache=temp_dir, use_icalbuddy_memo="")
+        prefs.refresh()
+        results["no_memo"] = summarize_timings(
+            time_get_event_dicts(raw_output, cli_args.repeat)
+        )
+        os.environ["use_icalbuddy_memo"] = "true"
+        prefs.refresh()
+        memo_path = os.path.join(temp_dir, "icalbuddy-memo.json")
+
+        def remove_memo() -> None:
+            if os.path.exists(memo_path):
+                os.remove(memo_path)
+
+        def keep_memo() -> None:
+            pass
+
+        def memoize_unchanged_output() -> None:
+            time_get_event_dicts(raw_output, 1)
+
+        scenarios: dict[str, tuple[Callable[[], None], str]] = {
+            "memo_cold": (remove_memo, raw_output),
+            "memo_warm_unchanged": (keep_memo, raw_output),
+            "memo_warm_changed": (memoize_unchanged_output, changed_raw_output),
+        }
+        for scenario_name, (prepare, scenario_output) in scenarios.items():
+            timings = []
+            for _ in range(cli_args.repeat):
+                prepare()
+                timings.extend(time_get_event_dicts(scenario_output, 1))
+            results[scenario_name] = summarize_timings(timings)
+        results["memo_file_bytes"] = os.path.getsize(memo_path)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Compare reading today's events from a large .ics file via the persisted
+byte-offset index against parsing every VEVENT in the file.
+
+Usage: python -m benchmarks.bench_ics_calendar [--events N] [--days N]
+           [--notes-size N]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import os.path
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.corpus import generate_event_dicts, generate_ics_output
+from benchmarks.utils import apply_benchmark_prefs, summarize_timings
+from ocu.calendars.ics_calendar import (
+    IcsCalendar,
+    convert_vevent_props_to_dict,
+    get_dates_spanned,
+    get_vevent_time_range,
+    parse_vevent_props,
+)
+from ocu.prefs import prefs
+
+
+def get_event_dicts_by_full_parse(ics_file_path: str, target_date: date) -> list:
+    """Read today's events by parsing every VEVENT in the given file."""
+    calendar = IcsCalendar([ics_file_path])
+    event_dicts = []
+    with open(ics_file_path, "rb") as ics_file:
+        with mmap.mmap(ics_file.fileno(), 0, access=mmap.ACCESS_READ) as ics_map:
+            for start, end in calendar.iter_vevent_offsets(ics_map):
+                props = parse_vevent_props(
+                    calendar.read_vevent_text(ics_map, start, end)
+                )
+                time_range = get_vevent_time_range(props)
+                if time_range and target_date.isoformat() in get_dates_spanned(
+                    time_range[0], time_range[1]
+                ):
+                    event_dict = convert_vevent_props_to_dict(props)
+                    if event_dict:
+                        event_dicts.append(event_dict)
+    return event_dicts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=40_000)
+    parser.add_argument("--days", type=int, default=3650)
+    parser.add_argument("--notes-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    cli_args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        apply_benchmark_prefs(alfred_workflow_cache=temp_dir)
+        prefs.refresh()
+        # Spread events over the past and future, so that today falls in the
+        # middle of the file
+        event_dicts = generate_event_dicts(
+            cli_args.events,
+            notes_size=cli_args.notes_size,
+            seed=cli_args.seed,
+            base_date=date.today() - timedelta(days=cli_args.days // 2),
+            day_count=cli_args.days,
+        )
+        ics_file_path = os.path.join(temp_dir, "calendar.ics")
+        with open(ics_file_path, "w", encoding="utf-8", newline="") as ics_file:
+            ics_file.write(generate_ics_output(event_dicts, calendar_name="Work"))
+        calendar = IcsCalendar([ics_file_path])
+
+        start_time = time.perf_counter()
+        indexed_event_dicts = calendar.get_event_dicts()
+        cold_secs = time.perf_counter() - start_time
+
+        warm_timings = []
+        for _ in range(cli_args.repeat):
+            start_time = time.perf_counter()
+            calendar.get_event_dicts()
+            warm_timings.append(time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        full_parse_event_dicts = get_event_dicts_by_full_parse(
+            ics_file_path, date.today()
+        )
+        full_parse_secs = time.perf_counter() - start_time
+
+        assert (
+            sorted(
+                full_parse_event_dicts, key=lambda event_dict: event_dict["startDate"]
+            )
+            == indexed_event_dicts
+        ), "indexed results differ from a full parse"
+        print(
+            json.dumps(
+                {
+                    "events": cli_args.events,
+                    "file_size_mb": round(os.path.getsize(ics_file_path) / 2**20, 1),
+                    "events_today": len(indexed_event_dicts),
+                    "cold_index_build_ms": round(cold_secs * 1000, 3),
+                    "warm_indexed_query": summarize_timings(warm_timings),
+                    "full_parse_ms": round(full_parse_secs * 1000, 3),
+                },
+                indent=2,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
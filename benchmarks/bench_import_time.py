@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Measure the time to import each of the workflow's entry points in a fresh
+interpreter (as reported by python -X importtime), and compare the fastest of
+several runs against the recorded budget for each entry point.
+
+Usage: python -m benchmarks.bench_import_time [--repeat N]
+"""
+
+import argparse
+import json
+import sys
+
+from benchmarks.utils import measure_import, summarize_timings
+
+# The maximum number of milliseconds it may take to import each entry point;
+# when an entry point legitimately needs longer, raise its budget here (and say
+# why in the commit)
+MAX_CUMULATIVE_MS = {
+    "ocu.list_events": 100,
+    "ocu.open_event": 60,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    cli_args = parser.parse_args()
+
+    results = {}
+    for module_name, max_cumulative_ms in MAX_CUMULATIVE_MS.items():
+        timings = summarize_timings(
+            measure_import(module_name).cumulative_ms / 1000
+            for _ in range(cli_args.repeat)
+        )
+        timings["budget_ms"] = max_cumulative_ms
+        results[module_name] = timings
+    print(json.dumps(results, indent=2))
+    # The fastest run is compared against the budget, to filter out noise from
+    # the rest of the system
+    if any(timings["min_ms"] > timings["budget_ms"] for timings in results.values()):
+        sys.exit("An entry point exceeded its import time budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Measure the time to scan pathological event notes for a conference URL at a
+range of sizes, so that the scan can be checked to grow linearly with the size
+of the notes.
+
+Usage: python -m benchmarks.bench_matching_stress [--sizes MB ...] [--repeat N]
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.corpus import MEGABYTE, PATHOLOGICAL_NOTES, build_notes_event
+from benchmarks.utils import apply_benchmark_prefs, summarize_timings
+from ocu.prefs import prefs
+
+
+def time_scan(notes: str, repeat: int) -> dict[str, float]:
+    """Time scanning the given notes for a conference URL."""
+    timings_secs = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        event = build_notes_event(notes)
+        timings_secs.append(time.perf_counter() - start_time)
+        assert event.conference_url is None, "pathological notes matched a URL"
+    return summarize_timings(timings_secs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--repeat", type=int, default=3)
+    cli_args = parser.parse_args()
+
+    apply_benchmark_prefs()
+    prefs.refresh()
+    results = {}
+    for notes_name, generate_notes in PATHOLOGICAL_NOTES.items():
+        results[notes_name] = {}
+        for size_mb in cli_args.sizes:
+            timings = time_scan(generate_notes(size_mb * MEGABYTE), cli_args.repeat)
+            timings["ms_per_mb"] = round(timings["median_ms"] / size_mb, 3)
+            results[notes_name][f"{size_mb}mb"] = timings
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Measure the time for open_event to return (in a fresh interpreter, as Alfred
+runs it) when the open command takes a while to open the URL, both with the
+default handler and with a missing Google Meet app.
+
+Usage: python -m benchmarks.bench_open_event [--open-delay SECS] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import os.path
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import get_benchmark_env, summarize_timings
+
+# A stub open command which takes the given number of seconds to open a URL,
+# and fails to open any application named "Missing App"
+OPEN_STUB = """
+import sys, time
+time.sleep({delay_secs!r})
+if sys.argv[1:3] == ["-a", "Missing App"]:
+    sys.exit(1)
+"""
+
+
+def time_open_event(url: str, env: dict[str, str], repeat: int) -> dict[str, float]:
+    """Time open_event returning for the given URL."""
+    timings_secs = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "ocu.open_event", url],
+            check=True,
+            capture_output=True,
+            env=env,
+        )
+        timings_secs.append(time.perf_counter() - start_time)
+    return summarize_timings(timings_secs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--open-delay", type=float, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    cli_args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        stub_path = os.path.join(temp_dir, "open")
+        with open(stub_path, "w") as stub_file:
+            stub_file.write(
+                f"#!{sys.executable}\n"
+                + OPEN_STUB.format(delay_secs=cli_args.open_delay)
+            )
+        os.chmod(stub_path, os.stat(stub_path).st_mode | stat.S_IEXEC)
+        env = get_benchmark_env(
+            PATH=f"{temp_dir}{os.pathsep}{os.environ['PATH']}",
+            alfred_workflow_cache=temp_dir,
+        )
+        results = {
+            "open_delay_secs": cli_args.open_delay,
+            "default_handler": time_open_event(
+                "https://zoom.us/j/123456789", env, cli_args.repeat
+            ),
+            "missing_gmeet_app": time_open_event(
+                "https://meet.google.com/abc-def-ghi",
+                {**env, "use_direct_gmeet": "true", "gmeet_app_name": "Missing App"},
+                cli_args.repeat,
+            ),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
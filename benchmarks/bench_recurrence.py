@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Compare expanding 10k recurring events into today's occurrences via the
+memoized recurrence engine against walking each series from its start (as
+dateutil does), both in isolation and end-to-end via the .ics backend.
+
+Usage: python -m benchmarks.bench_recurrence [--masters N] [--seed N]
+"""
+
+import argparse
+import json
+import os.path
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from dateutil.rrule import rrulestr
+
+from benchmarks.utils import apply_benchmark_prefs, summarize_timings
+from ocu import recurrence
+from ocu.calendars.ics_calendar import IcsCalendar
+from ocu.prefs import prefs
+from ocu.recurrence import RecurrenceIndex, RecurrenceMaster, RecurrenceRule
+
+# Recurrence rules in roughly the proportions they appear in real calendars
+RRULES = (
+    *("FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR",) * 3,
+    *("FREQ=WEEKLY",) * 6,
+    "FREQ=WEEKLY;INTERVAL=2",
+    "FREQ=WEEKLY;BYDAY=MO,WE,FR",
+    "FREQ=DAILY",
+    "FREQ=MONTHLY;BYDAY=2TU",
+    "FREQ=MONTHLY;BYDAY=-1FR",
+    "FREQ=MONTHLY;BYMONTHDAY=15",
+    "FREQ=YEARLY",
+    "FREQ=WEEKLY;COUNT=52",
+)
+
+
+def generate_masters(
+    rng: random.Random, master_count: int, today: date
+) -> list[tuple[str, datetime]]:
+    """Generate the rules and starts of recurring events over the past years."""
+    return [
+        (
+            rng.choice(RRULES),
+            datetime.combine(
+                today - timedelta(days=rng.randrange(0, 5 * 365)),
+                datetime.min.time(),
+            )
+            + timedelta(minutes=rng.randrange(7 * 60, 19 * 60, 15)),
+        )
+        for _ in range(master_count)
+    ]
+
+
+def expand_with_dateutil(masters: list[tuple[str, datetime]], today: date) -> int:
+    """Count today's occurrences by walking each series from its start."""
+    day_start = datetime.combine(today, datetime.min.time())
+    day_end = day_start + timedelta(days=1) - timedelta(microseconds=1)
+    occurrence_count = 0
+    for rrule, start in masters:
+        rule_set = rrulestr(f"RRULE:{rrule}", dtstart=start, forceset=True)
+        # RFC 5545 always counts DTSTART as the first occurrence, even when it
+        # does not match the rule, but dateutil does not
+        rule_set.rdate(start)
+        occurrence_count += len(rule_set.between(day_start, day_end, inc=True))
+    return occurrence_count
+
+
+def expand_with_engine(masters: list[tuple[str, datetime]], today: date) -> int:
+    """Count today's occurrences via the memoized recurrence engine."""
+    index = RecurrenceIndex(
+        (
+            RecurrenceMaster(
+                rule=RecurrenceRule.parse(rrule),
+                start=start,
+                duration=timedelta(minutes=30),
+            ),
+            i,
+        )
+        for i, (rrule, start) in enumerate(masters)
+    )
+    return sum(1 for _ in index.iter_occurrences(today))
+
+
+def clear_memoized_expansions() -> None:
+    """Clear every memoized expansion, as in a freshly-started process."""
+    recurrence.expand_rule_on_date.cache_clear()
+    recurrence.does_rule_occur_on_date.cache_clear()
+    recurrence.get_rule_dates_in_period.cache_clear()
+    recurrence.get_final_counted_date.cache_clear()
+    recurrence.may_rule_occur_on_date.cache_clear()
+
+
+def generate_ics_text(masters: list[tuple[str, datetime]]) -> str:
+    """Render the given recurring events as an .ics file."""
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0"]
+    for i, (rrule, start) in enumerate(masters):
+        lines.extend(
+            (
+                "BEGIN:VEVENT",
+                f"UID:{i}@example.com",
+                f"SUMMARY:Recurring Meeting #{i}",
+                f"DTSTART:{start:%Y%m%dT%H%M%S}",
+                f"DTEND:{start + timedelta(minutes=30):%Y%m%dT%H%M%S}",
+                f"RRULE:{rrule}",
+                f"LOCATION:https://zoom.us/j/{1000000 + i}",
+                "END:VEVENT",
+            )
+        )
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines)
+
+
+def time_call(func, *args: object) -> tuple[float, object]:  # noqa: ANN001
+    """Time a single call to the given function."""
+    start_time = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start_time, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--masters", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    cli_args = parser.parse_args()
+
+    today = date.today()
+    masters = generate_masters(random.Random(cli_args.seed), cli_args.masters, today)
+
+    dateutil_secs, dateutil_count = time_call(expand_with_dateutil, masters, today)
+    clear_memoized_expansions()
+    cold_secs, engine_count = time_call(expand_with_engine, masters, today)
+    warm_timings = [
+        time_call(expand_with_engine, masters, today)[0] for _ in range(cli_args.repeat)
+    ]
+    assert engine_count == dateutil_count, "engine results differ from dateutil"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        apply_benchmark_prefs(alfred_workflow_cache=temp_dir)
+        prefs.refresh()
+        ics_file_path = os.path.join(temp_dir, "recurring.ics")
+        with open(ics_file_path, "w", newline="") as ics_file:
+            ics_file.write(generate_ics_text(masters))
+        clear_memoized_expansions()
+        calendar = IcsCalendar([ics_file_path])
+        ics_cold_secs, ics_event_dicts = time_call(calendar.get_event_dicts)
+        ics_warm_timings = [
+            time_call(calendar.get_event_dicts)[0] for _ in range(cli_args.repeat)
+        ]
+        assert len(ics_event_dicts) == engine_count  # type: ignore
+
+    print(
+        json.dumps(
+            {
+                "masters": cli_args.masters,
+                "occurrences_today": engine_count,
+                "dateutil_walk_ms": round(dateutil_secs * 1000, 3),
+                "engine_cold_ms": round(cold_secs * 1000, 3),
+                "engine_warm": summarize_timings(warm_timings),
+                "ics_cold_with_index_build_ms": round(ics_cold_secs * 1000, 3),
+                "ics_warm": summarize_timings(ics_warm_timings),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
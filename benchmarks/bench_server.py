@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Compare the latency of cold, in-process list_events runs against round-trips
+to a resident ocu server over its Unix domain socket.
+
+Because osascript/icalBuddy are unavailable outside of macOS (and vary wildly
+between machines), the calendar subprocess is simulated with a fixed delay.
+
+Usage: python -m benchmarks.bench_server [--runs N] [--backend-latency-ms MS]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import get_benchmark_env, summarize_timings
+
+# A bootstrap script which simulates the calendar subprocess before running the
+# given module's main() function
+BOOTSTRAP_SCRIPT = """
+import importlib, json, os, time
+from datetime import datetime
+from unittest.mock import patch
+
+def check_output(*args, **kwargs):
+    time.sleep(float(os.environ["OCU_BENCH_BACKEND_LATENCY_MS"]) / 1000)
+    today = datetime.now().strftime("%Y-%m-%d")
+    return json.dumps([
+        {
+            "title": f"Meeting {hour}",
+            "startDate": f"{today}T{hour:02}:00",
+            "endDate": f"{today}T{hour:02}:30",
+            "location": f"https://zoom.us/j/{hour}",
+        }
+        for hour in range(8, 18)
+    ]).encode("utf-8")
+
+with patch("subprocess.check_output", side_effect=check_output):
+    importlib.import_module("{module}").main()
+"""
+
+# A script which performs a single request to the resident server from a fresh
+# interpreter, exactly as Alfred would
+CLIENT_SCRIPT = """
+import json
+from ocu.server_client import request_feedback_from_server
+feedback = request_feedback_from_server()
+assert feedback is not None, "server did not respond"
+print(json.dumps(feedback, indent=2))
+"""
+
+
+def get_bootstrap_script(module_name: str) -> str:
+    """Return the bootstrap script for running the given module."""
+    return BOOTSTRAP_SCRIPT.replace("{module}", module_name)
+
+
+def time_command(command: list[str], env: dict[str, str], runs: int) -> list[float]:
+    """Run the given command repeatedly, returning the wall time of each run."""
+    timings = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start_time)
+    return timings
+
+
+def wait_for_socket(socket_path: str, timeout_secs: float = 10) -> None:
+    """Wait until the server has started listening on the given socket."""
+    deadline = time.monotonic() + timeout_secs
+    while not os.path.exists(socket_path):
+        if time.monotonic() > deadline:
+            raise TimeoutError("ocu server did not start in time")
+        time.sleep(0.01)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--backend-latency-ms", type=float, default=300)
+    cli_args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Isolate the server's socket (which lives in the temporary directory)
+        # from any server that may already be running on this machine
+        env = get_benchmark_env(
+            TMPDIR=temp_dir,
+            use_server="true",
+            OCU_BENCH_BACKEND_LATENCY_MS=str(cli_args.backend_latency_ms),
+        )
+        in_process_timings = time_command(
+            [sys.executable, "-c", get_bootstrap_script("ocu.list_events")],
+            env={**env, "use_server": "false"},
+            runs=cli_args.runs,
+        )
+        server_process = subprocess.Popen(
+            [sys.executable, "-c", get_bootstrap_script("ocu.server")],
+            env=env,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_socket(os.path.join(temp_dir, f"ocu-{os.getuid()}.sock"))
+            # Warm the server up with the client's environment before timing
+            time_command([sys.executable, "-c", CLIENT_SCRIPT], env=env, runs=1)
+            client_timings = time_command(
+                [sys.executable, "-c", CLIENT_SCRIPT], env=env, runs=cli_args.runs
+            )
+            # Time raw socket round-trips from this (already-warm) process;
+            # the cached temporary directory must be reset so that the client
+            # resolves the same socket path as the server
+            os.environ.update(env)
+            tempfile.tempdir = None
+            from ocu.server_client import request_feedback_from_server
+
+            round_trip_timings = []
+            for _ in range(cli_args.runs):
+                start_time = time.perf_counter()
+                request_feedback_from_server()
+                round_trip_timings.append(time.perf_counter() - start_time)
+        finally:
+            server_process.terminate()
+            server_process.wait()
+
+    print(
+        json.dumps(
+            {
+                "backend_latency_ms": cli_args.backend_latency_ms,
+                "cold_in_process": summarize_timings(in_process_timings),
+                "cold_server_client": summarize_timings(client_timings),
+                "socket_round_trip": summarize_timings(round_trip_timings),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Measure the time and peak memory of each stage of the workflow's pipeline
+across a range of synthetic calendar corpora, writing the results to a JSON
+file so that runs can be compared over time.
+
+Usage: python -m benchmarks.bench_suite [--quick] [--scenario NAME ...]
+           [--repeat N] [--seed N] [--output PATH]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, NamedTuple
+from unittest.mock import patch
+
+from benchmarks.corpus import (
+    generate_conference_domains,
+    generate_event_dicts,
+    generate_icalbuddy_output,
+)
+from benchmarks.utils import apply_benchmark_prefs, summarize_timings
+from ocu import list_events
+from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+from ocu.event import Event
+from ocu.event_batch import EventBatch
+from ocu.prefs import prefs
+
+MEGABYTE = 1024 * 1024
+
+
+class Scenario(NamedTuple):
+    """The parameters of a single synthetic corpus to benchmark against."""
+
+    name: str
+    event_count: int
+    notes_size: int
+    domain_count: int
+
+
+SCENARIOS = (
+    Scenario("10_events", 10, 0, 12),
+    Scenario("100_events_1kb_notes", 100, 1024, 12),
+    Scenario("1k_events_4kb_notes", 1_000, 4096, 12),
+    Scenario("1k_events_200_domains", 1_000, 1024, 200),
+    Scenario("10k_events", 10_000, 256, 12),
+    Scenario("100k_events", 100_000, 0, 12),
+    Scenario("10_events_2mb_notes", 10, 2 * MEGABYTE, 12),
+)
+# The scenarios which are run when the --quick flag is given
+QUICK_SCENARIO_NAMES = ("10_events", "100_events_1kb_notes", "1k_events_4kb_notes")
+
+
+def build_stages(scenario: Scenario, seed: int) -> dict[str, Callable[[], Any]]:
+    """Generate the corpus for the given scenario, and return a function for
+    each pipeline stage that exercises that stage against the corpus."""
+    apply_benchmark_prefs(
+        conference_domains=", ".join(generate_conference_domains(scenario.domain_count))
+    )
+    prefs.refresh()
+    event_dicts = generate_event_dicts(
+        scenario.event_count, notes_size=scenario.notes_size, seed=seed
+    )
+    icalbuddy_output = generate_icalbuddy_output(event_dicts)
+    raw_event_strs = re.split(r"(?:^|\n)• ", icalbuddy_output)[1:]
+    calendar = IcalBuddyCalendar()
+    events = [Event(event_dict) for event_dict in event_dicts]
+    urls = [
+        url
+        for event, event_dict in zip(events, event_dicts)
+        for url in event.iter_url_candidates(event_dict)
+    ]
+    applescript_output = json.dumps(event_dicts).encode("utf-8")
+
+    def run_list_events_main() -> None:
+        with patch("subprocess.check_output", return_value=applescript_output):
+            with contextlib.redirect_stdout(io.StringIO()):
+                list_events.main()
+
+    return {
+        "icalbuddy_convert_raw_event_str_to_dict": lambda: [
+            calendar.convert_raw_event_str_to_dict(raw_event_str)
+            for raw_event_str in raw_event_strs
+        ],
+        "event_init": lambda: [Event(event_dict) for event_dict in event_dicts],
+        "get_url_score": lambda: [events[0].get_url_score(url) for url in urls],
+        "classify_events": lambda: EventBatch(events).classify(
+            datetime.now().timestamp(), prefs.snapshot.event_time_threshold_mins
+        ),
+        "list_events_main": run_list_events_main,
+    }
+
+
+def measure_stage(stage: Callable[[], Any], repeat: int) -> dict[str, Any]:
+    """Measure the wall time of the given stage over several runs, and its
+    peak memory usage over a separate (traced) run."""
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - start_time)
+    tracemalloc.start()
+    try:
+        stage()
+        _, peak_memory_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time": summarize_timings(timings), "peak_memory_bytes": peak_memory_bytes}
+
+
+def get_git_commit() -> str:
+    """Retrieve the current git commit, if any, so that runs can be compared."""
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode("utf-8")
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true")
+    parser.add_argument("--scenario", action="append", dest="scenario_names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    cli_args = parser.parse_args()
+
+    scenario_names = cli_args.scenario_names or (
+        QUICK_SCENARIO_NAMES if cli_args.quick else [s.name for s in SCENARIOS]
+    )
+    results: dict[str, Any] = {
+        "metadata": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": get_git_commit(),
+            "python_version": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": cli_args.seed,
+            "repeat": cli_args.repeat,
+        },
+        "scenarios": [],
+    }
+    for scenario in SCENARIOS:
+        if scenario.name not in scenario_names:
+            continue
+        print(f"Running {scenario.name}...", file=sys.stderr)
+        stages = build_stages(scenario, seed=cli_args.seed)
+        results["scenarios"].append(
+            {
+                **scenario._asdict(),
+                "stages": {
+                    stage_name: measure_stage(stage, repeat=cli_args.repeat)
+                    for stage_name, stage in stages.items()
+                },
+            }
+        )
+    with open(cli_args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Wrote results to {cli_args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+A seeded generator of realistic calendar data for benchmarking, producing both
+raw event dictionaries (as output by the AppleScript) and the equivalent
+icalBuddy text output or .ics file, along with pathological event notes for
+stress-testing the conference URL scan.
+"""
+
+import random
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+
+from ocu.event import Event
+from ocu.event_dict import EventDict
+
+# Real-world conference services whose URLs are embedded in generated events,
+# along with a URL template for each
+CONFERENCE_URL_TEMPLATES = (
+    ("*.zoom.us", "https://us02web.zoom.us/j/{id}?pwd=AbCdEf{id}"),
+    ("zoom.us", "https://zoom.us/j/{id}"),
+    ("meet.google.com", "https://meet.google.com/abc-{id}-xyz"),
+    (
+        "*.microsoft.com",
+        "https://teams.microsoft.com/l/meetup-join/19%3ameeting_{id}%40thread.v2/0",
+    ),
+    ("*.webex.com", "https://mycompany.webex.com/meet/{id}"),
+    ("app.slack.com", "https://app.slack.com/huddle/T{id}/C{id}"),
+)
+# Non-conference URLs which commonly appear in invites alongside the conference
+# URL
+NOISE_URLS = (
+    "https://www.google.com/url?q=https://applications.zoom.us/lti/rich",
+    "https://nam02.safelinks.protection.outlook.com/?url=https%3A%2F%2Fexample.com"
+    "%2Fagenda&data=05%7C01%7C{id}%7Cabcdef0123456789&reserved=0",
+    "https://aka.ms/JoinTeamsMeeting",
+    "https://support.zoom.us/hc/en-us",
+    "https://example.com/logo.png",
+    "https://docs.example.com/d/{id}/edit",
+)
+TITLE_WORDS = (
+    "Standup",
+    "Sync",
+    "Planning",
+    "Retro",
+    "1:1",
+    "Design Review",
+    "All-Hands",
+    "Interview",
+    "Demo",
+    "Roadmap",
+)
+LOCATIONS = ("", "", "Room 101", "HQ - Boardroom", "Café ☕")
+NOTES_FILLER = (
+    "Please join the meeting a few minutes early. ",
+    "Agenda:\n- Updates\n- Blockers\n- Next steps\n",
+    "<p>Join from a PC, Mac, iPad, or Android</p>",
+    '<a href="mailto:someone@example.com">Contact</a> ',
+    "────────────────────────────\n",
+    "Réunion d’équipe • 会议 ",
+)
+
+# The number of characters in a megabyte of ASCII event notes
+MEGABYTE = 1024 * 1024
+# Pathological event notes, keyed by name, each generated to the given size (in
+# characters)
+PATHOLOGICAL_NOTES: dict[str, Callable[[int], str]] = {
+    # A single, enormous candidate URL with no delimiters
+    "unterminated_prefixes": lambda size: "https://" * (size // 8),
+    # Text which almost (but never quite) contains a candidate URL
+    "near_miss_prefixes": lambda size: "https:/" * (size // 7),
+    # The same tiny candidate URL repeated over and over
+    "repeated_candidates": lambda size: "https://x " * (size // 10),
+    # An Outlook SafeLinks URL with an enormous query string
+    "long_safelinks_url": lambda size: (
+        "https://nam.safelinks.protection.outlook.com/?url=" + "a" * size
+    ),
+    # An HTML invite body consisting entirely of non-conference links
+    "html_links": lambda size: (
+        '<a href="https://example.com/unsubscribe">Unsubscribe</a> ' * (size // 58)
+    ),
+    # Many distinct candidate URLs, each of which must be scored
+    "unique_candidates": lambda size: " ".join(
+        f"https://host{i}.example.com/p" for i in range(size // 30)
+    ),
+}
+
+
+def build_notes_event(notes: str, location: str = "") -> Event:
+    """Build an (eager) Event with the given notes, scanning them for a
+    conference URL."""
+    return Event(
+        {
+            "title": "Meeting",
+            "startDate": "2011-10-16T08:00",
+            "endDate": "2011-10-16T09:00",
+            "location": location,
+            "notes": notes,
+        }
+    )
+
+
+def generate_conference_domains(domain_count: int) -> list[str]:
+    """Generate the given number of conference domain patterns, led by the
+    patterns of the real-world services used in generated events."""
+    domains = [domain for domain, _ in CONFERENCE_URL_TEMPLATES]
+    domains.extend(
+        f"*.conf{i}.example.com" if i % 4 else f"conf{i}.example.com"
+        for i in range(len(domains), domain_count)
+    )
+    return domains[:domain_count]
+
+
+def generate_notes(rng: random.Random, notes_size: int, urls: list[str]) -> str:
+    """Generate invite notes of roughly the given size, with the given URLs
+    scattered throughout."""
+    if notes_size <= 0:
+        return ""
+    parts = []
+    size = 0
+    while size < notes_size:
+        part = rng.choice(NOTES_FILLER)
+        if urls and rng.random() < 0.1:
+            part = f"<{rng.choice(urls)}> "
+        parts.append(part)
+        size += len(part)
+    # Guarantee that every URL appears at least once
+    for url in urls:
+        parts.insert(rng.randrange(len(parts) + 1), f"\n{url}\n")
+    return "".join(parts)
+
+
+def generate_event_dicts(
+    event_count: int,
+    notes_size: int = 0,
+    seed: int = 0,
+    base_date: Optional[date] = None,
+    day_count: int = 1,
+) -> list[EventDict]:
+    """Generate the given number of realistic event dictionaries, spread
+    across the given number of days starting from the base date (today by
+    default), and sorted by start time."""
+    rng = random.Random(seed)
+    if base_date is None:
+        base_date = date.today()
+    base_datetime = datetime.combine(base_date, datetime.min.time())
+    datetime_format = f"{Event.date_format}T{Event.time_format}"
+    event_dicts: list[EventDict] = []
+    for i in range(event_count):
+        day_offset = rng.randrange(day_count)
+        is_all_day = rng.random() < 0.05
+        if is_all_day:
+            start_datetime = base_datetime + timedelta(days=day_offset)
+            end_datetime = start_datetime + timedelta(hours=23, minutes=59)
+        else:
+            start_datetime = base_datetime + timedelta(
+                days=day_offset, minutes=rng.randrange(6 * 60, 21 * 60, 5)
+            )
+            end_datetime = start_datetime + timedelta(
+                minutes=rng.choice((15, 25, 30, 45, 50, 60, 90))
+            )
+        urls = [
+            template.format(id=rng.randrange(10**9, 10**10))
+            for template in rng.sample(NOISE_URLS, rng.randint(0, 3))
+        ]
+        conference_url = None
+        if rng.random() < 0.8:
+            _, template = rng.choice(CONFERENCE_URL_TEMPLATES)
+            conference_url = template.format(id=rng.randrange(10**9, 10**10))
+        location = rng.choice(LOCATIONS)
+        if conference_url and rng.random() < 0.4:
+            location = conference_url
+        elif conference_url:
+            urls.append(conference_url)
+        event_dicts.append(
+            {
+                "title": f"{rng.choice(TITLE_WORDS)} #{i}",
+                "startDate": start_datetime.strftime(datetime_format),
+                "endDate": end_datetime.strftime(datetime_format),
+                "isAllDay": "true" if is_all_day else "false",
+                "location": location,
+                "notes": generate_notes(rng, notes_size, urls),
+            }
+        )
+    event_dicts.sort(key=lambda event_dict: event_dict["startDate"])
+    return event_dicts
+
+
+def convert_event_dict_to_icalbuddy(event_dict: EventDict) -> str:
+    """Render the given event dictionary as it would be output by icalBuddy."""
+    start_date, start_time = event_dict["startDate"].split("T")
+    end_date, end_time = event_dict["endDate"].split("T")
+    if event_dict.get("isAllDay") == "true":
+        date_line = (
+            start_date if start_date == end_date else f"{start_date} - {end_date}"
+        )
+    elif start_date == end_date:
+        date_line = f"{start_date} at {start_time} - {end_time}"
+    else:
+        date_line = f"{start_date} at {start_time} - {end_date} at {end_time}"
+    lines = [f"• {event_dict['title']}", f"    {date_line}"]
+    if event_dict.get("location"):
+        lines.append(f"    location: {event_dict['location']}")
+    if event_dict.get("notes"):
+        lines.append(f"    notes: {event_dict['notes']}")
+    return "\n".join(lines)
+
+
+def generate_icalbuddy_output(event_dicts: list[EventDict]) -> str:
+    """Render the given event dictionaries as the full icalBuddy output."""
+    return "\n".join(
+        convert_event_dict_to_icalbuddy(event_dict) for event_dict in event_dicts
+    )
+
+
+def escape_ics_text(text: str) -> str:
+    """Escape the given text for use as an .ics property value."""
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_ics_line(line: str) -> str:
+    """Fold the given .ics content line onto 75-character lines."""
+    return "\r\n ".join(line[i : i + 74] for i in range(0, max(len(line), 1), 74))
+
+
+def convert_event_dict_to_ics(event_dict: EventDict, uid: int) -> str:
+    """Render the given event dictionary as an .ics VEVENT block."""
+    start_datetime = datetime.strptime(event_dict["startDate"], "%Y-%m-%dT%H:%M")
+    end_datetime = datetime.strptime(event_dict["endDate"], "%Y-%m-%dT%H:%M")
+    if event_dict.get("isAllDay") == "true":
+        date_lines = [
+            f"DTSTART;VALUE=DATE:{start_datetime:%Y%m%d}",
+            f"DTEND;VALUE=DATE:{end_datetime + timedelta(days=1):%Y%m%d}",
+        ]
+    else:
+        date_lines = [
+            f"DTSTART:{start_datetime:%Y%m%dT%H%M%S}",
+            f"DTEND:{end_datetime:%Y%m%dT%H%M%S}",
+        ]
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}@example.com",
+        f"SUMMARY:{escape_ics_text(event_dict['title'])}",
+        *date_lines,
+    ]
+    if event_dict.get("location"):
+        lines.append(f"LOCATION:{escape_ics_text(event_dict['location'])}")
+    if event_dict.get("notes"):
+        lines.append(f"DESCRIPTION:{escape_ics_text(event_dict['notes'])}")
+    lines.append("END:VEVENT")
+    return "\r\n".join(fold_ics_line(line) for line in lines)
+
+
+def generate_ics_output(event_dicts: list[EventDict], calendar_name: str) -> str:
+    """Render the given event dictionaries as a complete .ics file."""
+    return "\r\n".join(
+        [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"X-WR-CALNAME:{calendar_name}",
+            *(
+                convert_event_dict_to_ics(event_dict, uid)
+                for uid, event_dict in enumerate(event_dicts)
+            ),
+            "END:VCALENDAR",
+            "",
+        ]
+    )
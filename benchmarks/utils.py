@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Iterable, NamedTuple
+
+# The workflow preferences used for all benchmarks (mirroring the defaults that
+# ship with the workflow)
+BENCHMARK_PREFS = {
+    "conference_domains": (
+        "*.zoom.us, zoom.us, meet.google.com, duo.google.com, duo.app.goo.gl,"
+        " hangouts.google.com, *.microsoft.com, app.slack.com, meet.goto.com,"
+        " *.webex.com, webex.com, meetings.dialpad.com"
+    ),
+    "calendar_names": "",
+    "event_time_threshold_mins": "20",
+    "use_direct_zoom": "false",
+    "use_direct_msteams": "false",
+    "use_direct_gmeet": "false",
+    "gmeet_app_name": "Google Meet",
+    "use_icalbuddy": "false",
+    "time_system": "12-hour",
+}
+# The pattern of a single line of -X importtime output
+IMPORT_TIME_LINE_PATT = re.compile(
+    r"^import time:\s*(\d+) \|\s*(\d+) \| (?P<indent>\s*)(?P<module_name>\S+)$"
+)
+
+
+class ImportMeasurement(NamedTuple):
+    """The measured cost of importing an entry point in a fresh interpreter"""
+
+    module_names: list[str]
+    cumulative_ms: float
+
+
+def get_benchmark_env(**overrides: str) -> dict[str, str]:
+    """Return a copy of the current environment with the benchmark prefs set."""
+    env = dict(os.environ)
+    env.update(BENCHMARK_PREFS)
+    env.update(overrides)
+    return env
+
+
+def apply_benchmark_prefs(**overrides: str) -> None:
+    """Set the benchmark prefs on the current process's environment."""
+    os.environ.update(BENCHMARK_PREFS)
+    os.environ.update(overrides)
+
+
+def summarize_timings(timings_secs: Iterable[float]) -> dict[str, float]:
+    """Summarize the given timings (in seconds) as milliseconds."""
+    timings_ms = sorted(timing * 1000 for timing in timings_secs)
+    return {
+        "runs": len(timings_ms),
+        "min_ms": round(timings_ms[0], 3),
+        "median_ms": round(statistics.median(timings_ms), 3),
+        "p90_ms": round(timings_ms[int(0.9 * (len(timings_ms) - 1))], 3),
+        "max_ms": round(timings_ms[-1], 3),
+    }
+
+
+def run_python(code: str, *python_args: str) -> subprocess.CompletedProcess:
+    """Run the given code in a fresh interpreter, returning its output."""
+    return subprocess.run(
+        [sys.executable, *python_args, "-c", code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+
+def measure_import(module_name: str) -> ImportMeasurement:
+    """Measure the modules imported by (and the cumulative time to import) the
+    given module, as reported by python -X importtime"""
+    stderr = run_python(f"import {module_name}", "-X", "importtime").stderr
+    module_names = []
+    for line in stderr.splitlines():
+        line_matches = IMPORT_TIME_LINE_PATT.search(line)
+        if not line_matches:
+            continue
+        module_names.append(line_matches.group("module_name"))
+        # Modules are reported after their own imports, so the entry point is
+        # the last top-level module reported; anything before it at the top
+        # level was imported during interpreter startup
+        if not line_matches.group("indent"):
+            if line_matches.group("module_name") == module_name:
+                return ImportMeasurement(
+                    module_names=module_names,
+                    cumulative_ms=int(line_matches.group(2)) / 1000,
+                )
+            module_names = []
+    raise AssertionError(f"{module_name} not found in -X importtime output")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import json
+import os
+import os.path
+import tempfile
+from typing import Any
+
+# The name of the directory (within the system's temporary directory) used to
+# store cached data when the workflow is run outside of Alfred
+FALLBACK_CACHE_DIR_NAME = "open-conference-url"
+
+
+# Retrieve the path to the directory where the workflow may store cached data,
+# creating it if it does not yet exist; Alfred exposes a dedicated per-workflow
+# cache directory via the alfred_workflow_cache environment variable
+def get_cache_dir() -> str:
+    cache_dir = os.environ.get("alfred_workflow_cache") or os.path.join(
+        tempfile.gettempdir(), FALLBACK_CACHE_DIR_NAME
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+# Compute a stable hexadecimal fingerprint for the given JSON-serializable
+# value, suitable for use as a cache key
+def get_fingerprint(value: Any) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# Read and return the JSON contents of the given file, or None if the file
+# does not exist or is not valid JSON
+def read_json_file(file_path: str) -> Any:
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+# Write the given value to the given file as JSON, such that concurrent readers
+# will only ever see either the old contents or the new contents of the file
+# (never a partially-written file)
+def write_json_file_atomically(file_path: str, value: Any) -> None:
+    file_dir = os.path.dirname(file_path)
+    fd, temp_path = tempfile.mkstemp(dir=file_dir, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+            json.dump(value, temp_file)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -1,14 +1,109 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from ocu.calendars.applescript_calendar import AppleScriptCalendar
+from typing import TYPE_CHECKING, Optional, Union
+
 from ocu.calendars.base_calendar import BaseCalendar
-from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+from ocu.prefs import prefs
+
+# Each calendar backend is only imported once it has been selected, so that a
+# run of the workflow never pays to import the backends it doesn't use
+if TYPE_CHECKING:
+    from ocu.calendars.adaptive_calendar import AdaptiveCalendar
+    from ocu.calendars.applescript_calendar import AppleScriptCalendar
+    from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+
+
+# Instantiate the given subprocess-based calendar class for the user's Calendar
+# Names; if concurrent fetching is enabled and several calendar names are
+# configured, one instance (i.e. one subprocess) is created per calendar name,
+# each with its own timeout, so that the calendars can be fetched in parallel
+def get_subprocess_calendar(
+    calendar_class: "type[Union[AppleScriptCalendar, IcalBuddyCalendar]]",
+) -> BaseCalendar:
+    snapshot = prefs.snapshot
+    if snapshot.calendar_fetch_concurrency <= 0 or len(snapshot.calendar_names) < 2:
+        return calendar_class()
+    from ocu.calendars.concurrent_calendar import ConcurrentCalendar
+
+    timeout_secs = snapshot.calendar_fetch_timeout_secs or None
+    return ConcurrentCalendar(
+        {
+            calendar_name: calendar_class(
+                calendar_names=[calendar_name], timeout_secs=timeout_secs
+            )
+            for calendar_name in snapshot.calendar_names
+        },
+        max_workers=snapshot.calendar_fetch_concurrency,
+    )
+
+
+# Choose between the icalBuddy and AppleScript backends based on which has
+# been faster and more reliable on this machine; the use_icalbuddy preference
+# now only decides which backend is preferred before either has been measured
+def get_adaptive_calendar() -> "AdaptiveCalendar":
+    from ocu.calendars.adaptive_calendar import AdaptiveCalendar
+    from ocu.calendars.applescript_calendar import AppleScriptCalendar
+    from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+
+    backend_classes = [IcalBuddyCalendar, AppleScriptCalendar]
+    if not prefs.snapshot.use_icalbuddy:
+        backend_classes.reverse()
+    return AdaptiveCalendar(
+        {
+            backend_class.__name__: get_subprocess_calendar(backend_class)
+            for backend_class in backend_classes
+        },
+        hedged=prefs.snapshot.use_hedged_fetch,
+    )
+
+
+# Retrieve the icalBuddy calendar class if the user's preferences could select
+# icalBuddy and it is installed; otherwise, return None without importing it
+def get_installed_icalbuddy_class() -> "Optional[type[IcalBuddyCalendar]]":
+    if not (prefs.snapshot.use_icalbuddy or prefs.snapshot.use_adaptive_backend):
+        return None
+    from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+
+    if not IcalBuddyCalendar.get_binary_path():
+        return None
+    return IcalBuddyCalendar
 
 
 # Retrieve the correct calendar to use
 def get_calendar() -> BaseCalendar:
-    if IcalBuddyCalendar.is_icalbuddy_installed():
-        return IcalBuddyCalendar()
+    calendar: BaseCalendar
+    # Read events directly from local .ics files if the user has provided any
+    if prefs.snapshot.ics_file_paths:
+        from ocu.calendars.ics_calendar import IcsCalendar
+
+        calendar = IcsCalendar(prefs.snapshot.ics_file_paths)
+    else:
+        icalbuddy_class = get_installed_icalbuddy_class()
+        if icalbuddy_class is None:
+            from ocu.calendars.applescript_calendar import AppleScriptCalendar
+
+            calendar = get_subprocess_calendar(AppleScriptCalendar)
+        elif prefs.snapshot.use_adaptive_backend:
+            calendar = get_adaptive_calendar()
+        else:
+            calendar = get_subprocess_calendar(icalbuddy_class)
+    # Give up on the calendar once the user's deadline has passed, if they
+    # have set one
+    calendar_deadline_secs = prefs.snapshot.calendar_deadline_secs
+    if calendar_deadline_secs > 0:
+        from ocu.calendars.deadline_calendar import DeadlineCalendar
+
+        calendar = DeadlineCalendar(calendar, deadline_secs=calendar_deadline_secs)
+    # Wrap the calendar with an on-disk cache if the user has enabled it
+    event_cache_ttl_secs = prefs.snapshot.event_cache_ttl_secs
+    if event_cache_ttl_secs > 0:
+        from ocu.calendars.cached_calendar import CachedCalendar
+
+        return CachedCalendar(
+            calendar,
+            ttl_secs=event_cache_ttl_secs,
+            stale_while_revalidate=prefs.snapshot.use_stale_while_revalidate,
+        )
     else:
-        return AppleScriptCalendar()
+        return calendar
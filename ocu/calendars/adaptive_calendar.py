@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+import os.path
+import statistics
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Optional, Sequence
+
+from ocu.cache_utils import get_cache_dir, read_json_file, write_json_file_atomically
+from ocu.calendars.base_calendar import BaseCalendar
+from ocu.event_dict import EventDict
+
+# The number of most recent latencies remembered for each backend
+MAX_LATENCY_SAMPLES = 20
+# The number of latencies which must be observed for a backend before it is
+# ranked by its speed; until then, backends are tried in order of preference so
+# that each of them is measured
+MIN_LATENCY_SAMPLES = 3
+# The number of consecutive failures after which a backend is put on cooldown
+FAILURE_THRESHOLD = 3
+# The number of seconds for which a failing backend is skipped
+COOLDOWN_SECS = 300
+
+
+# The observed health of a single calendar backend
+@dataclass
+class BackendStats(object):
+    latencies_ms: list[float] = field(default_factory=list)
+    consecutive_failures: int = 0
+    cooldown_until: float = 0
+
+    # Parse the given value (as read from the stats file), falling back to
+    # empty stats if the value is malformed
+    @classmethod
+    def from_json(cls, value: object) -> "BackendStats":
+        if not isinstance(value, dict):
+            return cls()
+        try:
+            return cls(
+                latencies_ms=[float(latency) for latency in value["latencies_ms"]],
+                consecutive_failures=int(value["consecutive_failures"]),
+                cooldown_until=float(value["cooldown_until"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            return cls()
+
+    def record_success(self, latency_ms: float) -> None:
+        self.latencies_ms = [*self.latencies_ms, latency_ms][-MAX_LATENCY_SAMPLES:]
+        self.consecutive_failures = 0
+        self.cooldown_until = 0
+
+    # Record the time for which a backend ran before its fetch was abandoned
+    # (e.g. because another backend answered first); its true latency is at
+    # least this long, and leaving it out would bias the p90 latency low, but
+    # the backend has neither succeeded nor failed
+    def record_censored_latency(self, latency_ms: float) -> None:
+        self.latencies_ms = [*self.latencies_ms, latency_ms][-MAX_LATENCY_SAMPLES:]
+
+    def record_failure(self, current_time: float) -> None:
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= FAILURE_THRESHOLD:
+            self.cooldown_until = current_time + COOLDOWN_SECS
+
+    def is_cooling_down(self, current_time: float) -> bool:
+        return current_time < self.cooldown_until
+
+    def has_enough_samples(self) -> bool:
+        return len(self.latencies_ms) >= MIN_LATENCY_SAMPLES
+
+    def get_median_latency_ms(self) -> float:
+        return statistics.median(self.latencies_ms)
+
+    # Compute the 90th-percentile latency (using the nearest-rank method)
+    def get_p90_latency_ms(self) -> float:
+        sorted_latencies = sorted(self.latencies_ms)
+        return sorted_latencies[math.ceil(0.9 * len(sorted_latencies)) - 1]
+
+
+# A Calendar class which chooses among several interchangeable backends (like
+# icalBuddy and AppleScript) based on how quickly and reliably each has
+# answered on this machine, as persisted in a small state file; in hedged mode,
+# if the fastest backend hasn't answered within its usual (p90) latency, the
+# next backend is started as well, and whichever answers first wins
+class AdaptiveCalendar(BaseCalendar):
+    # The name of the file (within the workflow's cache directory) where the
+    # observed latencies and failures of each backend are stored
+    stats_file_name = "backend-stats.json"
+
+    backends: dict[str, BaseCalendar]
+    hedged: bool
+    stats: dict[str, BackendStats]
+    stats_lock: threading.Lock
+    last_backend: Optional[BaseCalendar]
+    last_error: Optional[Exception]
+
+    # The given backends must be ordered by preference, which decides between
+    # backends that have not yet been measured
+    def __init__(self, backends: dict[str, BaseCalendar], hedged: bool = False) -> None:
+        self.backends = backends
+        self.hedged = hedged
+        self.stats_lock = threading.Lock()
+        self.last_backend = None
+        self.last_error = None
+        self.stats = self.read_stats()
+
+    # Retrieve the path to the file where the backend stats are stored
+    def get_stats_path(self) -> str:
+        return os.path.join(get_cache_dir(), self.stats_file_name)
+
+    # Read the persisted stats for each backend
+    def read_stats(self) -> dict[str, BackendStats]:
+        stats_by_name = read_json_file(self.get_stats_path())
+        if not isinstance(stats_by_name, dict):
+            stats_by_name = {}
+        return {
+            backend_name: BackendStats.from_json(stats_by_name.get(backend_name))
+            for backend_name in self.backends
+        }
+
+    # Persist the stats for each backend; stats for backends which are not
+    # currently configured are left intact
+    def write_stats(self) -> None:
+        with self.stats_lock:
+            stats_by_name = read_json_file(self.get_stats_path())
+            if not isinstance(stats_by_name, dict):
+                stats_by_name = {}
+            stats_by_name.update(
+                (backend_name, asdict(stats))
+                for backend_name, stats in self.stats.items()
+            )
+        write_json_file_atomically(self.get_stats_path(), stats_by_name)
+
+    # Order the backends from most to least promising: backends which have yet
+    # to be measured come first (so that they get measured), followed by the
+    # remaining backends from fastest to slowest; backends on cooldown are only
+    # tried as a last resort
+    def get_ranked_backend_names(self) -> list[str]:
+        current_time = time.time()
+        preference_order = list(self.backends)
+
+        def get_rank(backend_name: str) -> tuple[bool, bool, float]:
+            stats = self.stats[backend_name]
+            if stats.has_enough_samples():
+                speed = stats.get_median_latency_ms()
+            else:
+                speed = preference_order.index(backend_name)
+            return (
+                stats.is_cooling_down(current_time),
+                stats.has_enough_samples(),
+                speed,
+            )
+
+        return sorted(preference_order, key=get_rank)
+
+    # Fetch the events within the given range of time from the given backend,
+    # recording its latency (or its failure); None is returned if the backend
+    # failed
+    def fetch_from_backend(
+        self,
+        backend_name: str,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> Optional[list[EventDict]]:
+        backend = self.backends[backend_name]
+        start_time = time.perf_counter()
+        try:
+            event_dicts = backend.get_event_dicts(
+                start_datetime, end_datetime, calendar_names, include_notes
+            )
+        except Exception as error:
+            self.record_backend_failure(backend_name, error)
+            return None
+        self.record_backend_success(backend_name, start_time)
+        return event_dicts
+
+    # Record that the given backend answered, having started at the given
+    # time (as measured by time.perf_counter())
+    def record_backend_success(self, backend_name: str, start_time: float) -> None:
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        with self.stats_lock:
+            self.stats[backend_name].record_success(latency_ms)
+
+    # Record that the fetch from the given backend, having started at the given
+    # time, was cancelled before the backend answered
+    def record_backend_cancellation(self, backend_name: str, start_time: float) -> None:
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        with self.stats_lock:
+            self.stats[backend_name].record_censored_latency(latency_ms)
+
+    # Record that the given backend failed with the given error
+    def record_backend_failure(self, backend_name: str, error: Exception) -> None:
+        print(f"Calendar backend {backend_name} failed: {error}", file=sys.stderr)
+        with self.stats_lock:
+            self.stats[backend_name].record_failure(time.time())
+            self.last_error = error
+
+    # Fetch the events from the given backends one after another, stopping at
+    # the first which succeeds
+    def fetch_sequentially(
+        self,
+        backend_names: list[str],
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> Optional[list[EventDict]]:
+        for backend_name in backend_names:
+            event_dicts = self.fetch_from_backend(
+                backend_name,
+                start_datetime,
+                end_datetime,
+                calendar_names,
+                include_notes,
+            )
+            if event_dicts is not None:
+                self.last_backend = self.backends[backend_name]
+                return event_dicts
+        return None
+
+    # Fetch the events from the primary backend, also starting the secondary
+    # backend if the primary hasn't answered within its p90 latency; the first
+    # successful result is used, and the slower backend is cancelled (see
+    # afetch_hedged()), running a new event loop for the duration of the fetch
+    def fetch_hedged(
+        self,
+        primary_name: str,
+        secondary_name: str,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> Optional[list[EventDict]]:
+        import asyncio
+
+        return asyncio.run(
+            self.afetch_hedged(
+                primary_name,
+                secondary_name,
+                start_datetime,
+                end_datetime,
+                calendar_names,
+                include_notes,
+            )
+        )
+
+    # Retrieve the names of the calendars which timed out in the backend that
+    # last answered
+    def get_timed_out_calendar_names(self) -> list[str]:
+        if self.last_backend is None:
+            return []
+        return self.last_backend.get_timed_out_calendar_names()
+
+    # Return True if the given backends (ranked from most to least promising)
+    # should be fetched in hedged mode; otherwise, return False
+    def should_hedge(self, backend_names: list[str]) -> bool:
+        # Hedging requires the p90 latency of the primary backend, which is
+        # only meaningful once enough latencies have been observed
+        return (
+            self.hedged
+            and len(backend_names) >= 2
+            and self.stats[backend_names[0]].has_enough_samples()
+        )
+
+    # Persist the stats of every backend once a fetch has finished, returning
+    # the fetched events; the error of the last backend to fail is raised if
+    # none of them succeeded
+    def finish_fetch(self, event_dicts: Optional[list[EventDict]]) -> list[EventDict]:
+        self.write_stats()
+        if event_dicts is None:
+            if self.last_error is not None:
+                raise self.last_error
+            raise RuntimeError("No calendar backends are available")
+        return event_dicts
+
+    # Retrieve the event dictionaries for the given range of time from the
+    # most promising backend, falling back to the others if it fails; the error
+    # of the last backend to fail is raised if none of them succeed
+    def get_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        self.last_backend = None
+        self.last_error = None
+        backend_names = self.get_ranked_backend_names()
+        event_dicts = None
+        if self.should_hedge(backend_names):
+            event_dicts = self.fetch_hedged(
+                backend_names[0],
+                backend_names[1],
+                start_datetime,
+                end_datetime,
+                calendar_names,
+                include_notes,
+            )
+            backend_names = backend_names[2:]
+        if event_dicts is None:
+            event_dicts = self.fetch_sequentially(
+                backend_names,
+                start_datetime,
+                end_datetime,
+                calendar_names,
+                include_notes,
+            )
+        return self.finish_fetch(event_dicts)
+
+    # The asyncio counterpart to get_event_dicts(); if the fetch is cancelled,
+    # the subprocess of every backend still running is killed
+    async def aget_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        self.last_backend = None
+        self.last_error = None
+        backend_names = self.get_ranked_backend_names()
+        event_dicts = None
+        if self.should_hedge(backend_names):
+            event_dicts = await self.afetch_hedged(
+                backend_names[0],
+                backend_names[1],
+                start_datetime,
+                end_datetime,
+                calendar_names,
+                include_notes,
+            )
+            backend_names = backend_names[2:]
+        if event_dicts is None:
+            event_dicts = await self.afetch_sequentially(
+                backend_names,
+                start_datetime,
+                end_datetime,
+                calendar_names,
+                include_notes,
+            )
+        return self.finish_fetch(event_dicts)
+
+    # The asyncio counterpart to fetch_from_backend(); a backend whose fetch is
+    # cancelled is neither credited nor blamed, but the time it ran for is
+    # recorded as a censored latency
+    async def afetch_from_backend(
+        self,
+        backend_name: str,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> Optional[list[EventDict]]:
+        import asyncio
+
+        backend = self.backends[backend_name]
+        start_time = time.perf_counter()
+        try:
+            event_dicts = await backend.aget_event_dicts(
+                start_datetime, end_datetime, calendar_names, include_notes
+            )
+        except asyncio.CancelledError:
+            self.record_backend_cancellation(backend_name, start_time)
+            raise
+        except Exception as error:
+            self.record_backend_failure(backend_name, error)
+            return None
+        self.record_backend_success(backend_name, start_time)
+        return event_dicts
+
+    # The asyncio counterpart to fetch_sequentially()
+    async def afetch_sequentially(
+        self,
+        backend_names: list[str],
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> Optional[list[EventDict]]:
+        for backend_name in backend_names:
+            event_dicts = await self.afetch_from_backend(
+                backend_name,
+                start_datetime,
+                end_datetime,
+                calendar_names,
+                include_notes,
+            )
+            if event_dicts is not None:
+                self.last_backend = self.backends[backend_name]
+                return event_dicts
+        return None
+
+    # The asyncio counterpart to fetch_hedged(); rather than being left to
+    # finish in the background, the slower backend is cancelled (killing its
+    # subprocess) as soon as the other backend answers, and its censored
+    # latency recorded before the stats are persisted
+    async def afetch_hedged(
+        self,
+        primary_name: str,
+        secondary_name: str,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> Optional[list[EventDict]]:
+        import asyncio
+
+        backend_names_by_task: dict[asyncio.Future, str] = {}
+
+        def start_fetch(backend_name: str) -> asyncio.Future:
+            task = asyncio.ensure_future(
+                self.afetch_from_backend(
+                    backend_name,
+                    start_datetime,
+                    end_datetime,
+                    calendar_names,
+                    include_notes,
+                )
+            )
+            backend_names_by_task[task] = backend_name
+            return task
+
+        pending = {start_fetch(primary_name)}
+        hedge_delay_secs = self.stats[primary_name].get_p90_latency_ms() / 1000
+        backend_name, event_dicts = primary_name, None
+        is_hedging = False
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay_secs)
+            while True:
+                for task in done:
+                    if event_dicts is None and task.result() is not None:
+                        backend_name = backend_names_by_task[task]
+                        event_dicts = task.result()
+                if event_dicts is not None:
+                    break
+                # The secondary backend is started once the primary has either
+                # failed or failed to answer within its p90 latency
+                if not is_hedging:
+                    pending.add(start_fetch(secondary_name))
+                    is_hedging = True
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        if event_dicts is not None:
+            self.last_backend = self.backends[backend_name]
+        return event_dicts
@@ -5,8 +5,10 @@
 import os
 import os.path
 import subprocess
+from datetime import datetime
+from typing import Optional, Sequence
 
-from ocu.calendars.base_calendar import BaseCalendar
+from ocu.calendars.base_calendar import BaseCalendar, get_time_range
 from ocu.event_dict import EventDict
 from ocu.prefs import prefs
 
@@ -18,10 +20,77 @@ class AppleScriptCalendar(BaseCalendar):
         os.path.dirname(os.path.realpath(__file__)), "get-calendar-events.applescript"
     )
 
+    calendar_names: tuple[str, ...]
+    timeout_secs: Optional[float]
+
+    # If no calendar names are given, the user's Calendar Names preference is
+    # used; if a timeout is given, the osascript process is killed (and
+    # subprocess.TimeoutExpired raised) once it runs for that long
+    def __init__(
+        self,
+        calendar_names: Optional[Sequence[str]] = None,
+        timeout_secs: Optional[float] = None,
+    ) -> None:
+        if calendar_names is None:
+            calendar_names = prefs.snapshot.calendar_names
+        self.calendar_names = tuple(calendar_names)
+        self.timeout_secs = timeout_secs
+
+    # Build the command used to run the AppleScript; the range of time is
+    # passed as whole seconds since the Unix epoch, which the AppleScript uses
+    # as the bounds of its EventKit predicate
+    def get_osascript_command(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[str]:
+        start_datetime, end_datetime = get_time_range(start_datetime, end_datetime)
+        if calendar_names is None:
+            calendar_names = self.calendar_names
+        return [
+            "osascript",
+            self.script_path,
+            str(int(start_datetime.timestamp())),
+            str(int(end_datetime.timestamp())),
+            "true" if include_notes else "false",
+            *calendar_names,
+        ]
+
     # Retrieve the raw event attribute dictionaries from the AppleScript
-    def get_event_dicts(self) -> list[EventDict]:
+    def get_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
         return json.loads(
             subprocess.check_output(
-                ["osascript", self.script_path, *prefs["calendar_names"]]
+                self.get_osascript_command(
+                    start_datetime, end_datetime, calendar_names, include_notes
+                ),
+                timeout=self.timeout_secs,
             ).decode("utf-8")
         )
+
+    # Retrieve the raw event attribute dictionaries from the AppleScript
+    # without blocking the event loop; the osascript process is killed if the
+    # fetch is cancelled
+    async def aget_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        from ocu.calendars.async_subprocess import check_output_async
+
+        output = await check_output_async(
+            self.get_osascript_command(
+                start_datetime, end_datetime, calendar_names, include_notes
+            ),
+            timeout_secs=self.timeout_secs,
+        )
+        return json.loads(output.decode("utf-8"))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import subprocess
+from typing import Callable, Optional, Sequence
+
+
+# Kill the given child process (if it is still running) and wait for it to
+# exit, so that it never outlives the fetch which started it
+async def kill_process(process: asyncio.subprocess.Process) -> None:
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    await process.wait()
+
+
+# The asyncio counterpart to subprocess.check_output(): run the given command
+# and return its output, raising subprocess.TimeoutExpired if it runs for
+# longer than the given timeout, or subprocess.CalledProcessError if it fails;
+# if the awaiting task is cancelled (e.g. because a deadline has passed), the
+# child process is killed before the cancellation propagates
+async def check_output_async(
+    command: Sequence[str], timeout_secs: Optional[float] = None
+) -> bytes:
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE
+    )
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(), timeout_secs)
+    except asyncio.TimeoutError:
+        await kill_process(process)
+        raise subprocess.TimeoutExpired(list(command), timeout_secs or 0) from None
+    except BaseException:
+        await kill_process(process)
+        raise
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode or 0, list(command), output
+        )
+    return output
+
+
+# Run the given command, passing its output to the given callback one chunk
+# (of at most the given number of bytes) at a time as it is written, rather
+# than buffering all of it; like check_output_async(), the child process is
+# killed if it times out or if the awaiting task is cancelled
+async def stream_output_async(
+    command: Sequence[str],
+    handle_chunk: Callable[[bytes], None],
+    chunk_size: int,
+    timeout_secs: Optional[float] = None,
+) -> None:
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE
+    )
+
+    async def read_output() -> int:
+        assert process.stdout is not None
+        while True:
+            chunk = await process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            handle_chunk(chunk)
+        return await process.wait()
+
+    try:
+        return_code = await asyncio.wait_for(read_output(), timeout_secs)
+    except asyncio.TimeoutError:
+        await kill_process(process)
+        raise subprocess.TimeoutExpired(list(command), timeout_secs or 0) from None
+    except BaseException:
+        await kill_process(process)
+        raise
+    if return_code != 0:
+        raise subprocess.CalledProcessError(return_code, list(command))
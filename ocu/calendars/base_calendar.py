@@ -2,13 +2,113 @@
 # -*- coding: utf-8 -*-
 
 import abc
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Sequence
 
 from ocu.event_dict import EventDict
 
 
+# Retrieve the range of time spanning the given number of whole days, starting
+# at midnight on the date of the given time (or of the current time, if none
+# is given)
+def get_day_range(
+    current_datetime: Optional[datetime] = None, day_count: int = 1
+) -> tuple[datetime, datetime]:
+    if current_datetime is None:
+        current_datetime = datetime.now()
+    start_datetime = datetime.combine(current_datetime.date(), datetime.min.time())
+    return start_datetime, start_datetime + timedelta(days=day_count)
+
+
+# Fill in the missing bounds of the given range of time; a missing start
+# defaults to midnight today, and a missing end defaults to the midnight
+# following the start
+def get_time_range(
+    start_datetime: Optional[datetime] = None,
+    end_datetime: Optional[datetime] = None,
+) -> tuple[datetime, datetime]:
+    if start_datetime is None:
+        start_datetime, _ = get_day_range()
+    if end_datetime is None:
+        _, end_datetime = get_day_range(start_datetime)
+    return start_datetime, end_datetime
+
+
 # A base calendar class which defines a standard protocol for retrieving event
 # data to feed into Open Conference URL
 class BaseCalendar(metaclass=abc.ABCMeta):
+    # Retrieve the event dictionaries for every event which overlaps the given
+    # range of time (today, by default), sorted by start date; each backend
+    # pushes the range down to its underlying query, so that only the events
+    # within the range are ever transferred and parsed; if calendar names are
+    # given, they take the place of the names the calendar was created with;
+    # if include_notes is False, the (potentially very large) notes of each
+    # event may be omitted, although backends which get them for free can
+    # still include them
     @abc.abstractmethod
-    def get_event_dicts(self) -> list[EventDict]:
+    def get_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
         raise NotImplementedError
+
+    # The asyncio counterpart to get_event_dicts(), which can be awaited
+    # alongside other calendars and cancelled (e.g. once a deadline passes);
+    # subprocess-based calendars override this to run their subprocess under
+    # asyncio (killing it on cancellation), whereas by default the blocking
+    # get_event_dicts() is run on a daemon thread; unlike asyncio.to_thread(),
+    # whose executor asyncio.run() joins before returning, a daemon thread
+    # which is still blocked once its fetch is cancelled is simply abandoned,
+    # so it can never hold up the caller past its deadline
+    async def aget_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        import asyncio
+        import functools
+        import threading
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[list[EventDict]] = loop.create_future()
+
+        # Settle the future from the event loop's thread, unless the fetch
+        # was cancelled (or its event loop closed) in the meantime
+        def settle_future(settle: Callable[[], None]) -> None:
+            def settle_if_pending() -> None:
+                if not future.done():
+                    settle()
+
+            try:
+                loop.call_soon_threadsafe(settle_if_pending)
+            except RuntimeError:
+                pass
+
+        def fetch() -> None:
+            try:
+                event_dicts = self.get_event_dicts(
+                    start_datetime, end_datetime, calendar_names, include_notes
+                )
+            except Exception as error:
+                settle_future(functools.partial(future.set_exception, error))
+            else:
+                settle_future(functools.partial(future.set_result, event_dicts))
+
+        threading.Thread(target=fetch, daemon=True).start()
+        return await future
+
+    # Retrieve the names of any calendars whose events were omitted from the
+    # last call to get_event_dicts() because they took too long to fetch
+    def get_timed_out_calendar_names(self) -> list[str]:
+        return []
+
+    # Return True if the events returned by the last call to get_event_dicts()
+    # were stale, and are being refreshed in the background; otherwise, return
+    # False
+    def is_refreshing(self) -> bool:
+        return False
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import os.path
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Optional, Sequence
+
+from ocu.cache_utils import (
+    get_cache_dir,
+    get_fingerprint,
+    read_json_file,
+    write_json_file_atomically,
+)
+from ocu.calendars.base_calendar import BaseCalendar, get_time_range
+from ocu.event_dict import EventDict
+from ocu.prefs import prefs
+
+
+# A Calendar class which wraps another calendar, persisting the event data it
+# retrieves to disk so that repeated invocations of the workflow (i.e. one per
+# keystroke) can skip the expensive osascript/icalBuddy subprocess entirely; in
+# stale-while-revalidate mode, cached event data is used no matter how old it
+# is, and stale event data is refreshed by a detached background process so
+# that no invocation ever waits on the wrapped calendar (except when nothing
+# has been cached yet, such as at the start of each day)
+class CachedCalendar(BaseCalendar):
+    # The name of the file (within the workflow's cache directory) where the
+    # cached event data is stored
+    cache_file_name = "event-cache.json"
+    # The maximum number of entries (i.e. the results of distinct queries, such
+    # as the two passes of a fetch which defers event notes) cached at once
+    max_entries = 4
+    # The number of seconds after which a background refresh which has not
+    # finished is presumed to have died, so that another may be started
+    refresh_lock_timeout_secs = 60
+
+    calendar: BaseCalendar
+    ttl_secs: int
+    stale_while_revalidate: bool
+    # Whether the event data last returned was stale, and is being refreshed
+    # in the background
+    refreshing: bool
+
+    def __init__(
+        self,
+        calendar: BaseCalendar,
+        ttl_secs: int,
+        stale_while_revalidate: bool = False,
+    ) -> None:
+        self.calendar = calendar
+        self.ttl_secs = ttl_secs
+        self.stale_while_revalidate = stale_while_revalidate
+        self.refreshing = False
+
+    # Retrieve the path to the file where the cached event data is stored
+    def get_cache_path(self) -> str:
+        return os.path.join(get_cache_dir(), self.cache_file_name)
+
+    # Compute a key which uniquely identifies the event data that would be
+    # returned by the wrapped calendar for the given range of time; the key
+    # includes the range (which, by default, starts at midnight today) so that
+    # the cache is implicitly invalidated at midnight, as well as every
+    # preference which could affect the resulting events
+    def get_cache_key(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> str:
+        snapshot = prefs.snapshot
+        start_datetime, end_datetime = get_time_range(start_datetime, end_datetime)
+        return get_fingerprint(
+            {
+                "start": start_datetime.isoformat(),
+                "end": end_datetime.isoformat(),
+                "backend": self.calendar.__class__.__name__,
+                "calendar_names": snapshot.calendar_names,
+                "requested_calendar_names": (
+                    None if calendar_names is None else list(calendar_names)
+                ),
+                "include_notes": include_notes,
+                "ics_file_paths": snapshot.ics_file_paths,
+                "conference_domains": snapshot.conference_domains,
+                "use_direct_zoom": snapshot.use_direct_zoom,
+                "use_direct_msteams": snapshot.use_direct_msteams,
+                "use_direct_gmeet": snapshot.use_direct_gmeet,
+            }
+        )
+
+    # Read every entry from the cache file, ignoring the file if it is missing
+    # or malformed
+    def read_cache_entries(self) -> list:
+        cache_data = read_json_file(self.get_cache_path())
+        if not isinstance(cache_data, dict):
+            return []
+        cache_entries = cache_data.get("entries")
+        if not isinstance(cache_entries, list):
+            return []
+        return cache_entries
+
+    # Return True if the given cache entry is still fresh enough to use;
+    # otherwise, return False
+    def is_cache_entry_fresh(self, cache_entry: object) -> bool:
+        age_secs = self.get_cache_entry_age_secs(cache_entry)
+        return age_secs is not None and age_secs < self.ttl_secs
+
+    # Compute the number of seconds since the given cache entry was created,
+    # returning None if the entry is malformed
+    def get_cache_entry_age_secs(self, cache_entry: object) -> Optional[float]:
+        if not isinstance(cache_entry, dict):
+            return None
+        created_time = cache_entry.get("created_time")
+        if not isinstance(created_time, (int, float)):
+            return None
+        age_secs = time.time() - created_time
+        # Guard against entries from the future (e.g. if the system clock was
+        # changed) by treating them as malformed
+        if age_secs < 0:
+            return None
+        return age_secs
+
+    # Return True if the given cache entry is worth keeping (i.e. it is fresh
+    # or, in stale-while-revalidate mode, it could still be served while being
+    # refreshed); otherwise, return False
+    def is_cache_entry_retained(self, cache_entry: object) -> bool:
+        if self.stale_while_revalidate:
+            return self.get_cache_entry_age_secs(cache_entry) is not None
+        return self.is_cache_entry_fresh(cache_entry)
+
+    # Return True if the given cache entry is still fresh enough to use for the
+    # given cache key; otherwise, return False
+    def is_cache_entry_valid(self, cache_entry: object, cache_key: str) -> bool:
+        return (
+            self.is_cache_entry_fresh(cache_entry)
+            and isinstance(cache_entry, dict)
+            and cache_entry.get("key") == cache_key
+        )
+
+    # Retrieve the names of any calendars which timed out when the wrapped
+    # calendar was last fetched
+    def get_timed_out_calendar_names(self) -> list[str]:
+        return self.calendar.get_timed_out_calendar_names()
+
+    # Return True if the event data last returned was stale, and is being
+    # refreshed in the background; otherwise, return False
+    def is_refreshing(self) -> bool:
+        return self.refreshing
+
+    # Retrieve the cached event dictionaries for the given query if they are
+    # still fresh; in stale-while-revalidate mode, stale event dictionaries are
+    # also returned, and a background refresh of them started; otherwise, None
+    # is returned
+    def get_cached_event_dicts(
+        self,
+        cache_entries: list,
+        cache_key: str,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> Optional[list[EventDict]]:
+        self.refreshing = False
+        for cache_entry in cache_entries:
+            if self.is_cache_entry_valid(cache_entry, cache_key):
+                return cache_entry["event_dicts"]
+        if not self.stale_while_revalidate:
+            return None
+        for cache_entry in cache_entries:
+            if (
+                self.get_cache_entry_age_secs(cache_entry) is not None
+                and cache_entry.get("key") == cache_key
+            ):
+                self.start_refresh(
+                    cache_key,
+                    start_datetime,
+                    end_datetime,
+                    calendar_names,
+                    include_notes,
+                )
+                return cache_entry["event_dicts"]
+        return None
+
+    # Retrieve the path to the lock file which is held for the duration of a
+    # background refresh of the given cache key
+    def get_refresh_lock_path(self, cache_key: str) -> str:
+        return os.path.join(get_cache_dir(), f"event-cache-refresh-{cache_key}.lock")
+
+    # Acquire the lock for a background refresh of the given cache key,
+    # returning False if another refresh of it is already running; a lock
+    # which has been held for too long is presumed to be abandoned
+    def acquire_refresh_lock(self, cache_key: str) -> bool:
+        lock_path = self.get_refresh_lock_path(cache_key)
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            pass
+        try:
+            lock_age_secs = time.time() - os.path.getmtime(lock_path)
+        except OSError:
+            return False
+        if 0 <= lock_age_secs < self.refresh_lock_timeout_secs:
+            return False
+        os.utime(lock_path)
+        return True
+
+    # Release the lock for a background refresh of the given cache key
+    def release_refresh_lock(self, cache_key: str) -> None:
+        try:
+            os.unlink(self.get_refresh_lock_path(cache_key))
+        except OSError:
+            pass
+
+    # Start a detached process which refreshes the cached event data for the
+    # given query, unless such a refresh is already running; either way, the
+    # event data is marked as being refreshed
+    def start_refresh(
+        self,
+        cache_key: str,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> None:
+        self.refreshing = True
+        if not self.acquire_refresh_lock(cache_key):
+            return
+        start_datetime, end_datetime = get_time_range(start_datetime, end_datetime)
+        query = {
+            "start": start_datetime.isoformat(),
+            "end": end_datetime.isoformat(),
+            "calendar_names": None if calendar_names is None else list(calendar_names),
+            "include_notes": include_notes,
+        }
+        # The refresh process inherits the environment (and therefore the
+        # preferences) of this process, so it computes the same cache key
+        try:
+            subprocess.Popen(
+                [sys.executable, "-m", "ocu.refresh_events", json.dumps(query)],
+                cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        except OSError:
+            self.release_refresh_lock(cache_key)
+            self.refreshing = False
+
+    # Fetch the event dictionaries for the given query from the wrapped
+    # calendar and store them in the cache, regardless of whether the cache is
+    # still fresh; this is run by the detached refresh process, which releases
+    # the refresh lock once it is done
+    def refresh_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> None:
+        cache_key = self.get_cache_key(
+            start_datetime, end_datetime, calendar_names, include_notes
+        )
+        try:
+            event_dicts = self.calendar.get_event_dicts(
+                start_datetime, end_datetime, calendar_names, include_notes
+            )
+            # The cache is read again (rather than before the fetch) so that
+            # entries written by other invocations in the meantime are kept
+            self.write_event_dicts(self.read_cache_entries(), cache_key, event_dicts)
+        finally:
+            self.release_refresh_lock(cache_key)
+
+    # Store the given event dictionaries in the cache under the given cache
+    # key, along with the most recent fresh entries for other queries; results
+    # are only cached if they are complete
+    def write_event_dicts(
+        self, cache_entries: list, cache_key: str, event_dicts: list[EventDict]
+    ) -> None:
+        # Don't cache incomplete results, so that calendars which timed out
+        # are fetched again on the next invocation
+        if self.get_timed_out_calendar_names():
+            return
+        other_cache_entries = [
+            cache_entry
+            for cache_entry in cache_entries
+            if self.is_cache_entry_retained(cache_entry)
+            and cache_entry.get("key") != cache_key
+        ]
+        cache_entries = [
+            *other_cache_entries,
+            {
+                "key": cache_key,
+                "created_time": time.time(),
+                "event_dicts": event_dicts,
+            },
+        ]
+        write_json_file_atomically(
+            self.get_cache_path(), {"entries": cache_entries[-self.max_entries :]}
+        )
+
+    # Retrieve the event dictionaries for the given query from the on-disk
+    # cache if they are still fresh (or, in stale-while-revalidate mode, if they
+    # are cached at all); otherwise, retrieve them from the wrapped calendar and
+    # store them in the cache for subsequent invocations
+    def get_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        cache_key = self.get_cache_key(
+            start_datetime, end_datetime, calendar_names, include_notes
+        )
+        cache_entries = self.read_cache_entries()
+        event_dicts = self.get_cached_event_dicts(
+            cache_entries,
+            cache_key,
+            start_datetime,
+            end_datetime,
+            calendar_names,
+            include_notes,
+        )
+        if event_dicts is None:
+            event_dicts = self.calendar.get_event_dicts(
+                start_datetime, end_datetime, calendar_names, include_notes
+            )
+            self.write_event_dicts(cache_entries, cache_key, event_dicts)
+        return event_dicts
+
+    # The asyncio counterpart to get_event_dicts(), which only awaits the
+    # wrapped calendar if the cache is missing or stale
+    async def aget_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        cache_key = self.get_cache_key(
+            start_datetime, end_datetime, calendar_names, include_notes
+        )
+        cache_entries = self.read_cache_entries()
+        event_dicts = self.get_cached_event_dicts(
+            cache_entries,
+            cache_key,
+            start_datetime,
+            end_datetime,
+            calendar_names,
+            include_notes,
+        )
+        if event_dicts is None:
+            event_dicts = await self.calendar.aget_event_dicts(
+                start_datetime, end_datetime, calendar_names, include_notes
+            )
+            self.write_event_dicts(cache_entries, cache_key, event_dicts)
+        return event_dicts
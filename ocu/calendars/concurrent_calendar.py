@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional, Sequence
+
+from ocu.calendars.base_calendar import BaseCalendar
+from ocu.event_dict import EventDict
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+# A Calendar class which fetches each of several calendars (keyed by calendar
+# name) concurrently, on a bounded pool of threads which each wait on their own
+# calendar subprocess; this way, one slow or huge calendar (like a shared room
+# calendar) only delays its own events rather than everyone else's
+class ConcurrentCalendar(BaseCalendar):
+    calendars: dict[str, BaseCalendar]
+    max_workers: int
+    timed_out_calendar_names: list[str]
+
+    def __init__(self, calendars: dict[str, BaseCalendar], max_workers: int) -> None:
+        self.calendars = calendars
+        self.max_workers = max_workers
+        self.timed_out_calendar_names = []
+
+    # Retrieve the names of the calendars whose events could not be fetched in
+    # time during the last call to get_event_dicts()
+    def get_timed_out_calendar_names(self) -> list[str]:
+        return self.timed_out_calendar_names
+
+    # Retrieve the event dictionaries of a single calendar for the given range
+    # of time, returning None if its subprocess was killed for exceeding its
+    # timeout
+    def get_calendar_event_dicts(
+        self,
+        calendar: BaseCalendar,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        include_notes: bool = True,
+    ) -> Optional[list[EventDict]]:
+        try:
+            return calendar.get_event_dicts(
+                start_datetime, end_datetime, include_notes=include_notes
+            )
+        except subprocess.TimeoutExpired:
+            return None
+
+    # Retrieve the calendars with the given names (or every calendar, if no
+    # names are given)
+    def get_selected_calendars(
+        self, calendar_names: Optional[Sequence[str]] = None
+    ) -> dict[str, BaseCalendar]:
+        return {
+            calendar_name: calendar
+            for calendar_name, calendar in self.calendars.items()
+            if calendar_names is None or calendar_name in calendar_names
+        }
+
+    # Merge the events fetched from each calendar (keyed by calendar name) into
+    # a single list sorted by start date, recording the calendars which timed
+    # out (i.e. whose events are None)
+    def merge_event_dicts(
+        self, event_dicts_by_calendar: dict[str, Optional[list[EventDict]]]
+    ) -> list[EventDict]:
+        self.timed_out_calendar_names = []
+        event_dicts: list[EventDict] = []
+        for calendar_name, calendar_event_dicts in event_dicts_by_calendar.items():
+            if calendar_event_dicts is None:
+                self.timed_out_calendar_names.append(calendar_name)
+            else:
+                event_dicts.extend(calendar_event_dicts)
+        # The sort is stable, so events with the same start date remain in the
+        # order of the configured calendar names
+        event_dicts.sort(key=lambda event_dict: event_dict["startDate"])
+        return event_dicts
+
+    # Fetch every calendar (or only those with the given names) concurrently
+    # for the given range of time, merging their events into a single list
+    # sorted by start date; calendars which time out are skipped (and recorded)
+    # so that the remaining events can still be shown
+    def get_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        calendars = self.get_selected_calendars(calendar_names)
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(self.max_workers, len(calendars)))
+        ) as executor:
+            futures = {
+                calendar_name: executor.submit(
+                    self.get_calendar_event_dicts,
+                    calendar,
+                    start_datetime,
+                    end_datetime,
+                    include_notes,
+                )
+                for calendar_name, calendar in calendars.items()
+            }
+            return self.merge_event_dicts(
+                {
+                    calendar_name: future.result()
+                    for calendar_name, future in futures.items()
+                }
+            )
+
+    # Retrieve the event dictionaries of a single calendar for the given range
+    # of time without blocking the event loop, returning None if its
+    # subprocess was killed for exceeding its timeout; at most max_workers
+    # calendars are fetched at once
+    async def aget_calendar_event_dicts(
+        self,
+        calendar: BaseCalendar,
+        semaphore: "asyncio.Semaphore",
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        include_notes: bool = True,
+    ) -> Optional[list[EventDict]]:
+        async with semaphore:
+            try:
+                return await calendar.aget_event_dicts(
+                    start_datetime, end_datetime, include_notes=include_notes
+                )
+            except subprocess.TimeoutExpired:
+                return None
+
+    # The asyncio counterpart to get_event_dicts(), which awaits every
+    # calendar's subprocess on the event loop rather than on a pool of threads;
+    # if the fetch is cancelled, every calendar subprocess still running is
+    # killed
+    async def aget_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        import asyncio
+
+        calendars = self.get_selected_calendars(calendar_names)
+        semaphore = asyncio.Semaphore(max(1, self.max_workers))
+        calendar_event_dicts = await asyncio.gather(
+            *(
+                self.aget_calendar_event_dicts(
+                    calendar, semaphore, start_datetime, end_datetime, include_notes
+                )
+                for calendar in calendars.values()
+            )
+        )
+        return self.merge_event_dicts(dict(zip(calendars, calendar_event_dicts)))
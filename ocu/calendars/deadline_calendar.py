@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+from datetime import datetime
+from typing import Optional, Sequence
+
+from ocu.calendars.base_calendar import BaseCalendar
+from ocu.event_dict import EventDict
+from ocu.prefs import prefs
+
+
+# A Calendar class which wraps another calendar, giving up on it once a global
+# deadline has passed; the wrapped calendar is fetched under asyncio, so that
+# a hung calendar subprocess (like an osascript waiting on a permissions
+# prompt) is killed at the deadline rather than hanging Alfred indefinitely;
+# the wrapped calendar's events are then omitted, and its calendars reported
+# as timed out
+class DeadlineCalendar(BaseCalendar):
+    # The name under which the calendars are reported as timed out if the
+    # user hasn't configured any calendar names
+    default_calendar_name = "your calendars"
+
+    calendar: BaseCalendar
+    deadline_secs: float
+    timed_out_calendar_names: list[str]
+
+    def __init__(self, calendar: BaseCalendar, deadline_secs: float) -> None:
+        self.calendar = calendar
+        self.deadline_secs = deadline_secs
+        self.timed_out_calendar_names = []
+
+    # Retrieve the names of the calendars which timed out during the last
+    # fetch; if the deadline passed, every requested calendar timed out
+    def get_timed_out_calendar_names(self) -> list[str]:
+        if self.timed_out_calendar_names:
+            return self.timed_out_calendar_names
+        return self.calendar.get_timed_out_calendar_names()
+
+    # Await the events of the wrapped calendar until the deadline passes, at
+    # which point the fetch is cancelled (killing any calendar subprocesses
+    # still running) and no events are returned
+    async def aget_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        self.timed_out_calendar_names = []
+        try:
+            return await asyncio.wait_for(
+                self.calendar.aget_event_dicts(
+                    start_datetime, end_datetime, calendar_names, include_notes
+                ),
+                self.deadline_secs,
+            )
+        except asyncio.TimeoutError:
+            if calendar_names is None:
+                calendar_names = prefs.snapshot.calendar_names
+            self.timed_out_calendar_names = list(calendar_names) or [
+                self.default_calendar_name
+            ]
+            return []
+
+    # Retrieve the events of the wrapped calendar, running a new event loop
+    # for the duration of the fetch
+    def get_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        return asyncio.run(
+            self.aget_event_dicts(
+                start_datetime, end_datetime, calendar_names, include_notes
+            )
+        )
@@ -1,18 +1,32 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import codecs
+import functools
 import os
 import os.path
 import re
 import subprocess
-from datetime import datetime
-from typing import TypedDict, Union
+import threading
+from datetime import datetime, timedelta
+from typing import (
+    TYPE_CHECKING,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    TypedDict,
+    Union,
+)
 
-from ocu.calendars.base_calendar import BaseCalendar
+from ocu.calendars.base_calendar import BaseCalendar, get_day_range, get_time_range
 from ocu.event import Event
 from ocu.event_dict import EventDict
 from ocu.prefs import prefs
 
+if TYPE_CHECKING:
+    from ocu.calendars.icalbuddy_memo import IcalBuddyMemo
+
 
 class DateInfo(TypedDict):
     start_date: str
@@ -22,11 +36,69 @@ class DateInfo(TypedDict):
     is_all_day: str
 
 
+# Splits raw calendar output, which is fed to it one chunk of text at a time,
+# into the raw strings for each event; each event is returned as soon as the
+# start of the next event (or the end of the output) is seen, so that the
+# output can be split whether it is pulled (from a blocking subprocess) or
+# pushed (from an asyncio subprocess)
+class RawEventStrSplitter(object):
+    event_delimiter: str
+    pending_text: str
+    search_start: int
+    has_seen_delimiter: bool
+
+    def __init__(self, event_delimiter: str) -> None:
+        self.event_delimiter = event_delimiter
+        # Prefixing the output with a newline allows a bullet point at the very
+        # start of the output to be treated like any other delimiter
+        self.pending_text = "\n"
+        self.search_start = 0
+        # Like with re.split(), anything before the first bullet point is
+        # discarded
+        self.has_seen_delimiter = False
+
+    # Add the given chunk of output, returning the raw strings of any events
+    # which it completes
+    def feed(self, text_chunk: str) -> list[str]:
+        raw_event_strs = []
+        self.pending_text += text_chunk
+        event_start = 0
+        while True:
+            delimiter_index = self.pending_text.find(
+                self.event_delimiter, max(self.search_start, event_start)
+            )
+            if delimiter_index == -1:
+                break
+            if self.has_seen_delimiter:
+                raw_event_strs.append(self.pending_text[event_start:delimiter_index])
+            self.has_seen_delimiter = True
+            event_start = delimiter_index + len(self.event_delimiter)
+        self.pending_text = self.pending_text[event_start:]
+        # The delimiter may straddle this chunk and the next, so the tail of
+        # this chunk must be searched again
+        self.search_start = max(
+            0, len(self.pending_text) - len(self.event_delimiter) + 1
+        )
+        return raw_event_strs
+
+    # Mark the end of the output, returning the raw string of the last event
+    # (if any)
+    def finish(self) -> list[str]:
+        if self.has_seen_delimiter:
+            return [self.pending_text]
+        return []
+
+
 # A Calendar class for retrieving event data via AppleScript
 class IcalBuddyCalendar(BaseCalendar):
     # The properties (in order) that icalBuddy must output; changing this order
     # will break the parsing of event data
     event_props = ("title", "datetime", "location", "url", "notes")
+    # The string which precedes each event in the icalBuddy output
+    event_delimiter = "\n• "
+    # The maximum number of bytes to read from icalBuddy at a time when
+    # streaming its output
+    stream_chunk_size = 65536
     # All possible paths to check for the icalBuddy binary that's used for
     # retrieving calendar data; the first path that exists on the user's system
     # is the one that's used
@@ -36,9 +108,24 @@ class IcalBuddyCalendar(BaseCalendar):
     ]
 
     current_datetime: datetime
+    calendar_names: tuple[str, ...]
+    timeout_secs: Optional[float]
+    memo: "Optional[IcalBuddyMemo]"
 
-    def __init__(self) -> None:
+    # If no calendar names are given, the user's Calendar Names preference is
+    # used; if a timeout is given, the icalBuddy process is killed (and
+    # subprocess.TimeoutExpired raised) once it runs for that long
+    def __init__(
+        self,
+        calendar_names: Optional[Sequence[str]] = None,
+        timeout_secs: Optional[float] = None,
+    ) -> None:
         self.current_datetime = datetime.now()
+        if calendar_names is None:
+            calendar_names = prefs.snapshot.calendar_names
+        self.calendar_names = tuple(calendar_names)
+        self.timeout_secs = timeout_secs
+        self.memo = None
 
     # Retrieve the first available path to the binary among a list of possible
     # paths (this allows us to prefer the already-signed Homebrew icalBuddy
@@ -55,40 +142,166 @@ def get_binary_path(cls) -> str:
     # the user's system
     @classmethod
     def is_icalbuddy_installed(cls) -> bool:
-        return prefs["use_icalbuddy"] and bool(cls.get_binary_path())
+        return prefs.snapshot.use_icalbuddy and bool(cls.get_binary_path())
 
-    @classmethod
-    def get_included_calendar_args(cls) -> list[str]:
-        if prefs["calendar_names"]:
-            return ["--includeCals", *prefs["calendar_names"]]
+    # Retrieve the properties (in order) that icalBuddy must output; notes are
+    # by far the largest property, so they can be left out
+    def get_event_props(self, include_notes: bool = True) -> tuple[str, ...]:
+        if include_notes:
+            return self.event_props
+        return tuple(prop for prop in self.event_props if prop != "notes")
+
+    def get_included_calendar_args(
+        self, calendar_names: Optional[Sequence[str]] = None
+    ) -> list[str]:
+        if calendar_names is None:
+            calendar_names = self.calendar_names
+        if calendar_names:
+            return ["--includeCals", *calendar_names]
         else:
             return []
 
+    # Build the icalBuddy arguments which query the events within the given
+    # range of time (today, by default); a range of whole days starting today
+    # is queried with eventsToday+N, and any other range with eventsFrom:to:
+    def get_events_query_args(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+    ) -> list[str]:
+        today_start_datetime, _ = get_day_range(self.current_datetime)
+        start_datetime, end_datetime = get_time_range(
+            start_datetime or today_start_datetime, end_datetime
+        )
+        day_count = (end_datetime - start_datetime) / timedelta(days=1)
+        if (
+            start_datetime == today_start_datetime
+            and day_count >= 1
+            and day_count.is_integer()
+        ):
+            # If we omit the '+0', the icalBuddy output does not include the
+            # current date, which our parsing logic assumes is present
+            return [f"eventsToday+{int(day_count) - 1}"]
+        # The UTC offset of the local time zone is included so that the bounds
+        # of the range are unambiguous
+        icalbuddy_datetime_format = "%Y-%m-%d %H:%M:%S %z"
+        return [
+            "eventsFrom:{}".format(
+                start_datetime.astimezone().strftime(icalbuddy_datetime_format)
+            ),
+            "to:{}".format(
+                end_datetime.astimezone().strftime(icalbuddy_datetime_format)
+            ),
+        ]
+
+    # Build the command (i.e. the binary path and its arguments) used to run
+    # icalBuddy for the given range of time and calendar names
+    def get_icalbuddy_command(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[str]:
+        return [
+            self.__class__.get_binary_path(),
+            *self.get_included_calendar_args(calendar_names),
+            # Override the default date/time formats
+            "--dateFormat",
+            Event.date_format,
+            "--noRelativeDates",
+            "--timeFormat",
+            Event.time_format,
+            # remove parenthetical calendar names from event titles
+            "--noCalendarNames",
+            # Only include the following fields and enforce their order
+            "--includeEventProps",
+            ",".join(self.get_event_props(include_notes)),
+            "--propertyOrder",
+            ",".join(self.get_event_props(include_notes)),
+            *self.get_events_query_args(start_datetime, end_datetime),
+        ]
+
     # Retrieve the raw calendar output from icalBuddy
-    def get_raw_calendar_output(self) -> str:
+    def get_raw_calendar_output(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> str:
         return subprocess.check_output(
-            [
-                self.__class__.get_binary_path(),
-                *self.__class__.get_included_calendar_args(),
-                # Override the default date/time formats
-                "--dateFormat",
-                Event.date_format,
-                "--noRelativeDates",
-                "--timeFormat",
-                Event.time_format,
-                # remove parenthetical calendar names from event titles
-                "--noCalendarNames",
-                # Only include the following fields and enforce their order
-                "--includeEventProps",
-                ",".join(self.event_props),
-                "--propertyOrder",
-                ",".join(self.event_props),
-                # If we omit the '+0', the icalBuddy output does not include the
-                # current date, which our parsing logic assumes is present
-                "eventsToday+0",
-            ]
+            self.get_icalbuddy_command(
+                start_datetime, end_datetime, calendar_names, include_notes
+            ),
+            timeout=self.timeout_secs,
         ).decode("utf-8")
 
+    # Decode the given chunks of raw UTF-8 bytes into text as they arrive; a
+    # multi-byte character may be split across two chunks
+    def iter_decoded_chunks(self, byte_chunks: Iterable[bytes]) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for byte_chunk in byte_chunks:
+            text_chunk = decoder.decode(byte_chunk)
+            if text_chunk:
+                yield text_chunk
+        text_chunk = decoder.decode(b"", final=True)
+        if text_chunk:
+            yield text_chunk
+
+    # Stream the raw calendar output from icalBuddy as chunks of text while the
+    # subprocess is still writing it
+    def iter_raw_calendar_output(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> Iterator[str]:
+        with subprocess.Popen(
+            self.get_icalbuddy_command(
+                start_datetime, end_datetime, calendar_names, include_notes
+            ),
+            stdout=subprocess.PIPE,
+        ) as process:
+            assert process.stdout is not None
+            # Because reading from icalBuddy blocks, the timeout is enforced by
+            # killing the process from another thread, which ends the output
+            timed_out = threading.Event()
+
+            def kill_process() -> None:
+                timed_out.set()
+                process.kill()
+
+            timeout_timer = None
+            if self.timeout_secs is not None:
+                timeout_timer = threading.Timer(self.timeout_secs, kill_process)
+                timeout_timer.start()
+            try:
+                yield from self.iter_decoded_chunks(
+                    iter(
+                        functools.partial(process.stdout.read1, self.stream_chunk_size),
+                        b"",
+                    )
+                )
+                return_code = process.wait()
+            finally:
+                if timeout_timer is not None:
+                    timeout_timer.cancel()
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(process.args, self.timeout_secs or 0)
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, process.args)
+
+    # Split the given chunks of raw calendar output into the raw strings for
+    # each event, yielding each event as soon as the start of the next event
+    # (or the end of the output) is seen
+    def iter_raw_event_strs(self, text_chunks: Iterable[str]) -> Iterator[str]:
+        splitter = RawEventStrSplitter(self.event_delimiter)
+        for text_chunk in text_chunks:
+            yield from splitter.feed(text_chunk)
+        yield from splitter.finish()
+
     # Because parsing date/time information from an icalBuddy event string is
     # more involved, we have a dedicated method for it
     def parse_date_info(self, raw_event_str: str) -> Union[DateInfo, None]:
@@ -183,21 +396,169 @@ def convert_raw_event_str_to_dict(self, raw_event_str: str) -> EventDict:
         else:
             return {"title": "", "startDate": "", "endDate": ""}
 
-    # Transform the raw event data into a list of dictionaries that are
-    # consumable by the Event class
-    def get_event_dicts(self) -> list[EventDict]:
+    # Load the persistent memo of previously-parsed events for the given
+    # calendar names, if the user has enabled it (it is only loaded again if
+    # different calendar names are given)
+    def get_memo(
+        self, calendar_names: Optional[Sequence[str]] = None
+    ) -> "Optional[IcalBuddyMemo]":
+        if calendar_names is None:
+            calendar_names = self.calendar_names
+        if prefs.snapshot.use_icalbuddy_memo and (
+            self.memo is None or self.memo.calendar_names != tuple(calendar_names)
+        ):
+            from ocu.calendars.icalbuddy_memo import IcalBuddyMemo
+
+            self.memo = IcalBuddyMemo(
+                self.current_datetime.strftime(Event.date_format), calendar_names
+            )
+        return self.memo
+
+    # Parse the given raw event string into an event dictionary, reusing the
+    # memoized result from a previous run if the raw string is unchanged
+    def get_event_dict(
+        self, raw_event_str: str, calendar_names: Optional[Sequence[str]] = None
+    ) -> EventDict:
+        memo = self.get_memo(calendar_names)
+        if memo is None:
+            return self.convert_raw_event_str_to_dict(raw_event_str)
+        raw_event_str_hash = memo.get_raw_event_str_hash(raw_event_str)
+        event_dict = memo.get(raw_event_str_hash)
+        if event_dict is None:
+            event_dict = self.convert_raw_event_str_to_dict(raw_event_str)
+            memo.set(raw_event_str_hash, raw_event_str, event_dict)
+        return event_dict
+
+    # Parse the given raw event strings into event dictionaries, filtering out
+    # event dictionaries with bad data (e.g. empty title, or no start/end date)
+    def iter_event_dicts(
+        self,
+        raw_event_strs: Iterable[str],
+        calendar_names: Optional[Sequence[str]] = None,
+    ) -> Iterator[EventDict]:
+        for raw_event_str in raw_event_strs:
+            event_dict = self.get_event_dict(raw_event_str, calendar_names)
+            if event_dict["title"] and event_dict["startDate"]:
+                yield event_dict
+
+    # Parse events from icalBuddy while it is still writing its output, so that
+    # parsing overlaps with the subprocess
+    def iter_streamed_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> Iterator[EventDict]:
+        return self.iter_event_dicts(
+            self.iter_raw_event_strs(
+                self.iter_raw_calendar_output(
+                    start_datetime, end_datetime, calendar_names, include_notes
+                )
+            ),
+            calendar_names,
+        )
+
+    # Parse the complete raw calendar output from icalBuddy into event
+    # dictionaries
+    def parse_raw_calendar_output(
+        self, raw_output: str, calendar_names: Optional[Sequence[str]] = None
+    ) -> list[EventDict]:
         # The [1:] is necessary because the first element will always be an
         # empty string, because the bullet point we are splitting on is not a
         # delimiter
-        raw_event_strs = re.split(r"(?:^|\n)• ", self.get_raw_calendar_output())[1:]
-        event_dicts = (
-            self.convert_raw_event_str_to_dict(raw_event_str)
-            for raw_event_str in raw_event_strs
+        raw_event_strs = re.split(r"(?:^|\n)• ", raw_output)[1:]
+        return list(self.iter_event_dicts(raw_event_strs, calendar_names))
+
+    # Transform the raw event data for the given range of time into a list of
+    # dictionaries that are consumable by the Event class; the range (and
+    # whether to include notes) is pushed down to icalBuddy, so only the events
+    # and properties asked for are ever parsed
+    def get_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        if prefs.snapshot.use_icalbuddy_streaming:
+            event_dicts = list(
+                self.iter_streamed_event_dicts(
+                    start_datetime, end_datetime, calendar_names, include_notes
+                )
+            )
+        else:
+            event_dicts = self.parse_raw_calendar_output(
+                self.get_raw_calendar_output(
+                    start_datetime, end_datetime, calendar_names, include_notes
+                ),
+                calendar_names,
+            )
+        if self.memo is not None:
+            self.memo.write()
+        return event_dicts
+
+    # The asyncio counterpart to get_event_dicts(); icalBuddy's output is read
+    # without blocking the event loop (either in full, or parsed as it arrives
+    # if streaming is enabled), and the icalBuddy process is killed if the
+    # fetch is cancelled
+    async def aget_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        if prefs.snapshot.use_icalbuddy_streaming:
+            event_dicts = await self.aget_streamed_event_dicts(
+                start_datetime, end_datetime, calendar_names, include_notes
+            )
+        else:
+            from ocu.calendars.async_subprocess import check_output_async
+
+            raw_output = await check_output_async(
+                self.get_icalbuddy_command(
+                    start_datetime, end_datetime, calendar_names, include_notes
+                ),
+                timeout_secs=self.timeout_secs,
+            )
+            event_dicts = self.parse_raw_calendar_output(
+                raw_output.decode("utf-8"), calendar_names
+            )
+        if self.memo is not None:
+            self.memo.write()
+        return event_dicts
+
+    # The asyncio counterpart to iter_streamed_event_dicts(), which parses each
+    # event as soon as icalBuddy has finished writing it
+    async def aget_streamed_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        from ocu.calendars.async_subprocess import stream_output_async
+
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        splitter = RawEventStrSplitter(self.event_delimiter)
+        event_dicts: list[EventDict] = []
+
+        def handle_chunk(byte_chunk: bytes) -> None:
+            event_dicts.extend(
+                self.iter_event_dicts(
+                    splitter.feed(decoder.decode(byte_chunk)), calendar_names
+                )
+            )
+
+        await stream_output_async(
+            self.get_icalbuddy_command(
+                start_datetime, end_datetime, calendar_names, include_notes
+            ),
+            handle_chunk,
+            self.stream_chunk_size,
+            timeout_secs=self.timeout_secs,
         )
-        # Filter out event dictionaries with bad data (e.g. empty title, or no
-        # start/end date)
-        return [
-            event_dict
-            for event_dict in event_dicts
-            if event_dict["title"] and event_dict["startDate"]
-        ]
+        splitter.feed(decoder.decode(b"", final=True))
+        event_dicts.extend(self.iter_event_dicts(splitter.finish(), calendar_names))
+        return event_dicts
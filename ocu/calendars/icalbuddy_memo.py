@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os.path
+from typing import Iterable, Optional
+
+from ocu.cache_utils import (
+    get_cache_dir,
+    get_fingerprint,
+    read_json_file,
+    write_json_file_atomically,
+)
+from ocu.event_dict import EventDict
+
+# The version of the memo file format (and of the icalBuddy parsing logic whose
+# results it stores); bumping this discards every existing memo entry
+MEMO_VERSION = 1
+# The event dictionary keys stored (in order) for each memo entry
+MEMO_EVENT_KEYS = ("title", "startDate", "endDate", "isAllDay", "location", "notes")
+
+
+# A persistent memo mapping the hash of each raw icalBuddy event string to the
+# event dictionary parsed from it, so that repeated invocations of the workflow
+# only need to parse the events that have changed; entries are stored compactly
+# (as lists of values, ordered from least to most recently used) and the least
+# recently used entries are evicted once the memo exceeds its size cap
+class IcalBuddyMemo(object):
+    # The prefix of the name of the file (within the workflow's cache
+    # directory) where the memo is stored
+    memo_file_prefix = "icalbuddy-memo"
+    # The maximum number of entries to store
+    max_entries = 2048
+    # The maximum combined length of the values stored across all entries,
+    # which bounds the size of the memo file (and the time to load it) when
+    # events have very large notes
+    max_total_size = 4 * 1024 * 1024
+
+    current_date: str
+    calendar_names: tuple[str, ...]
+    entries: dict[str, list[str]]
+    is_modified: bool
+
+    # The current date must be given because the event dictionaries of some
+    # events (namely, zero-duration events) depend on it; each distinct set of
+    # calendar names gets its own memo, so that calendars which are fetched
+    # concurrently never overwrite each other's entries
+    def __init__(self, current_date: str, calendar_names: Iterable[str]) -> None:
+        self.current_date = current_date
+        self.calendar_names = tuple(calendar_names)
+        self.entries = self.read_entries()
+        self.is_modified = False
+
+    # Compute a fast, fixed-size hash of the given raw icalBuddy event string,
+    # which serves as its key within the memo
+    @staticmethod
+    def get_raw_event_str_hash(raw_event_str: str) -> str:
+        return hashlib.blake2b(
+            raw_event_str.encode("utf-8", "surrogatepass"), digest_size=16
+        ).hexdigest()
+
+    # Retrieve the path to the file where the memo is stored
+    def get_memo_path(self) -> str:
+        if not self.calendar_names:
+            return os.path.join(get_cache_dir(), f"{self.memo_file_prefix}.json")
+        calendar_names_hash = get_fingerprint(self.calendar_names)[:12]
+        return os.path.join(
+            get_cache_dir(), f"{self.memo_file_prefix}-{calendar_names_hash}.json"
+        )
+
+    # Read the persisted memo entries, discarding the memo entirely if it is
+    # missing, malformed, or from a different version
+    def read_entries(self) -> dict[str, list[str]]:
+        memo = read_json_file(self.get_memo_path())
+        if (
+            not isinstance(memo, dict)
+            or memo.get("version") != MEMO_VERSION
+            or not isinstance(memo.get("entries"), dict)
+        ):
+            return {}
+        return {
+            raw_event_str_hash: entry
+            for raw_event_str_hash, entry in memo["entries"].items()
+            if isinstance(entry, list) and len(entry) == len(MEMO_EVENT_KEYS) + 1
+        }
+
+    # Retrieve the memoized event dictionary for the raw event string with the
+    # given hash, or None if there is no usable entry for it
+    def get(self, raw_event_str_hash: str) -> Optional[EventDict]:
+        entry = self.entries.pop(raw_event_str_hash, None)
+        if entry is None:
+            return None
+        # An entry whose dates were filled in from the current date is only
+        # valid for that date
+        entry_date, *values = entry
+        if entry_date and entry_date != self.current_date:
+            return None
+        # Re-inserting the entry marks it as the most recently used
+        self.entries[raw_event_str_hash] = entry
+        return dict(zip(MEMO_EVENT_KEYS, values))  # type: ignore
+
+    # Memoize the event dictionary parsed from the given raw event string; if
+    # the raw string has no indented line starting with the event's date, the
+    # date must have been filled in from the current date (as is the case for
+    # zero-duration events), so the entry is tied to the current date
+    def set(
+        self, raw_event_str_hash: str, raw_event_str: str, event_dict: EventDict
+    ) -> None:
+        start_date = event_dict.get("startDate", "").split("T")[0]
+        is_date_dependent = (
+            bool(start_date) and f"\n    {start_date}" not in raw_event_str
+        )
+        self.entries[raw_event_str_hash] = [
+            self.current_date if is_date_dependent else "",
+            *(event_dict.get(key, "") for key in MEMO_EVENT_KEYS),
+        ]
+        self.is_modified = True
+
+    # Persist the memo if any entries were added, evicting the least recently
+    # used entries until the memo fits within its size cap; the recency of
+    # entries which were only read is persisted the next time the memo is
+    # written, which avoids a write on every run where nothing has changed
+    def write(self) -> None:
+        if not self.is_modified:
+            return
+        kept_hashes = []
+        total_size = 0
+        for raw_event_str_hash in reversed(self.entries):
+            if len(kept_hashes) >= self.max_entries:
+                break
+            entry_size = sum(map(len, self.entries[raw_event_str_hash]))
+            # An entry which could never fit is skipped rather than evicting
+            # everything else
+            if entry_size > self.max_total_size:
+                continue
+            if total_size + entry_size > self.max_total_size:
+                break
+            kept_hashes.append(raw_event_str_hash)
+            total_size += entry_size
+        self.entries = {
+            raw_event_str_hash: self.entries[raw_event_str_hash]
+            for raw_event_str_hash in reversed(kept_hashes)
+        }
+        write_json_file_atomically(
+            self.get_memo_path(), {"version": MEMO_VERSION, "entries": self.entries}
+        )
+        self.is_modified = False
@@ -0,0 +1,585 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import mmap
+import os
+import os.path
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator, Optional, Sequence
+
+from ocu.cache_utils import (
+    get_cache_dir,
+    get_fingerprint,
+    read_json_file,
+    write_json_file_atomically,
+)
+from ocu.calendars.base_calendar import BaseCalendar, get_time_range
+from ocu.event import Event
+from ocu.event_dict import EventDict
+from ocu.prefs import prefs
+from ocu.recurrence import (
+    RecurrenceIndex,
+    RecurrenceMaster,
+    RecurrenceRule,
+    convert_to_local,
+    get_time_zone,
+)
+
+# The version of the on-disk index format; bump this whenever the format
+# changes so that existing indexes are rebuilt
+INDEX_VERSION = 2
+# The maximum number of days for which a single (multi-day) event is indexed,
+# so that a pathologically long event cannot bloat the index
+MAX_INDEXED_DAYS_PER_EVENT = 366
+# The markers which delimit each event within an .ics file; because long lines
+# are folded onto continuation lines beginning with whitespace, these markers
+# can only ever appear at the start of a line
+VEVENT_BEGIN_MARKER = b"\nBEGIN:VEVENT"
+VEVENT_END_MARKER = b"\nEND:VEVENT"
+# The pattern for a single (unfolded) content line, e.g.
+# DTSTART;TZID="America/New_York":20221016T080000
+CONTENT_LINE_PATT = re.compile(
+    r'^([A-Za-z0-9-]+)((?:;[A-Za-z0-9-]+=(?:"[^"]*"|[^";:]*)'
+    r'(?:,(?:"[^"]*"|[^";:,]*))*)*):(.*)$'
+)
+CONTENT_LINE_PARAM_PATT = re.compile(r';([A-Za-z0-9-]+)=("[^"]*"|[^;]*)')
+# The pattern for an RFC 5545 duration, e.g. PT1H30M or P1D
+DURATION_PATT = re.compile(
+    r"^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$"
+)
+# The escape sequences used within text property values
+TEXT_ESCAPE_PATT = re.compile(r"\\([\\;,nN])")
+
+# The properties of a single VEVENT, mapping each property name to its
+# parameters and (raw) value
+VeventProps = dict[str, tuple[dict[str, str], str]]
+
+
+# Join folded lines (i.e. lines continued onto the next line with leading
+# whitespace), and split the result into its individual content lines
+def unfold_lines(ics_text: str) -> list[str]:
+    return re.sub(r"\r?\n[ \t]", "", ics_text).splitlines()
+
+
+# Parse the content lines of the given raw VEVENT block, yielding the name,
+# parameters, and value of each property; properties of nested components
+# (like VALARM) are skipped
+def iter_vevent_content_lines(
+    vevent_text: str,
+) -> Iterator[tuple[str, dict[str, str], str]]:
+    nesting_depth = 0
+    for line in unfold_lines(vevent_text):
+        line_matches = CONTENT_LINE_PATT.match(line)
+        if not line_matches:
+            continue
+        name, raw_params, value = line_matches.groups()
+        name = name.upper()
+        if name == "BEGIN":
+            nesting_depth += 1
+        elif name == "END":
+            nesting_depth -= 1
+        elif nesting_depth == 1:
+            yield (
+                name,
+                {
+                    param_name.upper(): param_value.strip('"')
+                    for param_name, param_value in CONTENT_LINE_PARAM_PATT.findall(
+                        raw_params
+                    )
+                },
+                value,
+            )
+
+
+# Parse the properties of the given raw VEVENT block into a dictionary mapping
+# each property name to its parameters and value; only the first occurrence of
+# each property is kept
+def parse_vevent_props(vevent_text: str) -> VeventProps:
+    props: VeventProps = {}
+    for name, params, value in iter_vevent_content_lines(vevent_text):
+        if name not in props:
+            props[name] = (params, value)
+    return props
+
+
+# Parse every (local) date/time listed by the given property of the given raw
+# VEVENT block; properties like EXDATE may be repeated, and may each list
+# several comma-separated values
+def parse_vevent_datetime_list(vevent_text: str, prop_name: str) -> list[datetime]:
+    datetimes = []
+    for name, params, value in iter_vevent_content_lines(vevent_text):
+        if name != prop_name or params.get("VALUE", "").upper() == "PERIOD":
+            continue
+        datetimes.extend(
+            parsed_datetime
+            for parsed_datetime in (
+                parse_optional_ics_datetime(params, datetime_value)
+                for datetime_value in value.split(",")
+            )
+            if parsed_datetime
+        )
+    return datetimes
+
+
+# Unescape the given text property value (e.g. \n becomes a newline)
+def unescape_text(value: str) -> str:
+    return TEXT_ESCAPE_PATT.sub(
+        lambda matches: "\n" if matches.group(1) in "nN" else matches.group(1), value
+    )
+
+
+# Parse the given DATE or DATE-TIME property into a naive wall time, along
+# with the identifier of its time zone (or None if it is floating or its time
+# zone is unknown, in which case it is treated as local), and whether the value
+# is a DATE (i.e. the event is all-day)
+def parse_ics_wall_datetime(
+    params: dict[str, str], value: str
+) -> tuple[datetime, Optional[str], bool]:
+    value = value.strip()
+    if params.get("VALUE", "").upper() == "DATE" or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d"), None, True
+    wall_datetime = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    if value.upper().endswith("Z"):
+        return wall_datetime, "UTC", False
+    elif "TZID" in params and get_time_zone(params["TZID"]):
+        return wall_datetime, params["TZID"], False
+    else:
+        return wall_datetime, None, False
+
+
+# Parse the given DATE or DATE-TIME property into a naive datetime in the
+# system's local time zone, returning whether the value is a DATE (i.e. the
+# event is all-day)
+def parse_ics_datetime(params: dict[str, str], value: str) -> tuple[datetime, bool]:
+    wall_datetime, tz_id, is_all_day = parse_ics_wall_datetime(params, value)
+    return (
+        convert_to_local(wall_datetime, get_time_zone(tz_id) if tz_id else None),
+        is_all_day,
+    )
+
+
+# Parse the given DATE or DATE-TIME property into a naive datetime in the
+# system's local time zone, or None if it is malformed
+def parse_optional_ics_datetime(
+    params: dict[str, str], value: str
+) -> Optional[datetime]:
+    try:
+        return parse_ics_datetime(params, value)[0]
+    except ValueError:
+        return None
+
+
+# Parse the given RFC 5545 duration (e.g. PT1H30M) into a timedelta, or None
+# if it is malformed
+def parse_ics_duration(value: str) -> Optional[timedelta]:
+    duration_matches = DURATION_PATT.match(value.strip())
+    if not duration_matches:
+        return None
+    sign, weeks, days, hours, minutes, seconds = duration_matches.groups()
+    duration = timedelta(
+        weeks=int(weeks or 0),
+        days=int(days or 0),
+        hours=int(hours or 0),
+        minutes=int(minutes or 0),
+        seconds=int(seconds or 0),
+    )
+    return -duration if sign == "-" else duration
+
+
+# Compute the start and (exclusive) end of the event with the given
+# properties, along with whether the event is all-day; return None if the event
+# has no valid start
+def get_vevent_time_range(
+    props: VeventProps,
+) -> Optional[tuple[datetime, datetime, bool]]:
+    if "DTSTART" not in props:
+        return None
+    try:
+        start_datetime, is_all_day = parse_ics_datetime(*props["DTSTART"])
+        if "DTEND" in props:
+            end_datetime, _ = parse_ics_datetime(*props["DTEND"])
+        elif "DURATION" in props:
+            duration = parse_ics_duration(props["DURATION"][1])
+            end_datetime = start_datetime + (duration or timedelta())
+        elif is_all_day:
+            end_datetime = start_datetime + timedelta(days=1)
+        else:
+            end_datetime = start_datetime
+    except ValueError:
+        return None
+    return start_datetime, max(start_datetime, end_datetime), is_all_day
+
+
+# Retrieve the dates (as ISO strings) on which the event spanning the given
+# time range takes place
+def get_dates_spanned(start_datetime: datetime, end_datetime: datetime) -> list[str]:
+    start_date = start_datetime.date()
+    # The end of an event is exclusive, so an event ending at midnight does not
+    # take place on the following day
+    last_date = max(start_date, (end_datetime - timedelta(microseconds=1)).date())
+    day_count = min((last_date - start_date).days + 1, MAX_INDEXED_DAYS_PER_EVENT)
+    return [(start_date + timedelta(days=i)).isoformat() for i in range(day_count)]
+
+
+# Convert the properties of the given VEVENT into a dictionary which can be
+# consumed by the Event class, or None if the event is invalid
+def convert_vevent_props_to_dict(
+    props: VeventProps,
+    time_range: Optional[tuple[datetime, datetime, bool]] = None,
+) -> Optional[EventDict]:
+    # The time range of a recurring event's occurrence is given explicitly,
+    # since it differs from the time range of the recurrence master
+    if time_range is None:
+        time_range = get_vevent_time_range(props)
+    title = unescape_text(props["SUMMARY"][1]) if "SUMMARY" in props else ""
+    if not time_range or not title:
+        return None
+    start_datetime, end_datetime, is_all_day = time_range
+    datetime_format = f"{Event.date_format}T{Event.time_format}"
+    if is_all_day:
+        # Like icalBuddy, all-day events run from midnight to 11:59pm on their
+        # last (inclusive) day
+        end_date = max(start_datetime, end_datetime - timedelta(days=1))
+        start_date_str = start_datetime.strftime(f"{Event.date_format}T00:00")
+        end_date_str = end_date.strftime(f"{Event.date_format}T23:59")
+    else:
+        start_date_str = start_datetime.strftime(datetime_format)
+        end_date_str = end_datetime.strftime(datetime_format)
+    notes = unescape_text(props["DESCRIPTION"][1]) if "DESCRIPTION" in props else ""
+    # Conference services commonly put the join link in the URL property, so
+    # it is included with the notes to be searched for conference URLs
+    if "URL" in props:
+        notes = f"{props['URL'][1]}\n{notes}" if notes else props["URL"][1]
+    return {
+        "title": title,
+        "startDate": start_date_str,
+        "endDate": end_date_str,
+        "isAllDay": "true" if is_all_day else "false",
+        "location": unescape_text(props["LOCATION"][1]) if "LOCATION" in props else "",
+        "notes": notes,
+    }
+
+
+# A Calendar class for reading event data directly from local .ics files; each
+# file is memory-mapped, and a persisted index of the byte offsets of each
+# VEVENT (keyed by the dates on which it takes place) allows the events within
+# any range of dates to be read without parsing the rest of the file
+class IcsCalendar(BaseCalendar):
+    ics_file_paths: tuple[str, ...]
+
+    def __init__(self, ics_file_paths: Iterable[str]) -> None:
+        self.ics_file_paths = tuple(
+            os.path.abspath(os.path.expanduser(ics_file_path))
+            for ics_file_path in ics_file_paths
+        )
+
+    # Retrieve the path to the file where the index for the given .ics file is
+    # persisted
+    def get_index_path(self, ics_file_path: str) -> str:
+        return os.path.join(
+            get_cache_dir(), f"ics-index-{get_fingerprint(ics_file_path)}.json"
+        )
+
+    # Compute the values which, if changed, invalidate the index for an .ics
+    # file; the index must be rebuilt if the file is modified, or if the
+    # system's time zone changes (since dates are indexed in local time)
+    def get_index_validity(self, file_stat: os.stat_result) -> dict:
+        return {
+            "version": INDEX_VERSION,
+            "mtime_ns": file_stat.st_mtime_ns,
+            "size": file_stat.st_size,
+            "time_zone": [*time.tzname, time.timezone],
+        }
+
+    # Scan the given memory-mapped .ics file for the byte offsets of every
+    # VEVENT, yielding the start and end offsets of each
+    def iter_vevent_offsets(self, ics_map: mmap.mmap) -> Iterator[tuple[int, int]]:
+        search_start = 0
+        while True:
+            begin_index = ics_map.find(VEVENT_BEGIN_MARKER, search_start)
+            if begin_index == -1:
+                return
+            end_index = ics_map.find(VEVENT_END_MARKER, begin_index)
+            if end_index == -1:
+                return
+            # Skip the leading newline of each marker
+            vevent_start = begin_index + 1
+            vevent_end = end_index + len(VEVENT_END_MARKER)
+            yield vevent_start, vevent_end
+            search_start = vevent_end
+
+    # Decode the VEVENT at the given byte offsets within the given file
+    def read_vevent_text(self, ics_map: mmap.mmap, start: int, end: int) -> str:
+        return ics_map[start:end].decode("utf-8", errors="replace")
+
+    # Retrieve the calendar name declared in the header of the given .ics
+    # file, falling back to the file's name (sans extension)
+    def get_calendar_name(self, ics_map: mmap.mmap, ics_file_path: str) -> str:
+        header_end = ics_map.find(VEVENT_BEGIN_MARKER)
+        header_text = ics_map[: header_end if header_end != -1 else len(ics_map)]
+        name_matches = re.search(
+            r"^X-WR-CALNAME(?:;[^:\r\n]*)?:(.*?)\r?$",
+            header_text.decode("utf-8", errors="replace"),
+            flags=re.MULTILINE,
+        )
+        if name_matches:
+            return unescape_text(name_matches.group(1))
+        return os.path.splitext(os.path.basename(ics_file_path))[0]
+
+    # Extract the information needed to expand the given recurring VEVENT
+    # (which has the given properties) into its occurrences, or None if its
+    # recurrence rule is malformed or unsupported (in which case only its first
+    # occurrence is shown)
+    def get_recurrence_master_info(
+        self, vevent_text: str, props: VeventProps
+    ) -> Optional[dict]:
+        time_range = get_vevent_time_range(props)
+        if not time_range:
+            return None
+        try:
+            RecurrenceRule.parse(props["RRULE"][1])
+            wall_start, tz_id, _ = parse_ics_wall_datetime(*props["DTSTART"])
+        except ValueError:
+            return None
+        start_datetime, end_datetime, _ = time_range
+        return {
+            "uid": props["UID"][1] if "UID" in props else None,
+            "rrule": props["RRULE"][1],
+            "start": wall_start.isoformat(),
+            "tz_id": tz_id,
+            "duration_secs": (end_datetime - start_datetime).total_seconds(),
+            "excluded_starts": [
+                exdate.isoformat()
+                for exdate in parse_vevent_datetime_list(vevent_text, "EXDATE")
+            ],
+            "extra_starts": [
+                rdate.isoformat()
+                for rdate in parse_vevent_datetime_list(vevent_text, "RDATE")
+            ],
+        }
+
+    # Build the index for the given memory-mapped .ics file, mapping each date
+    # to the byte offsets of every VEVENT which takes place on that date;
+    # because recurring events can take place on any date, they are instead
+    # indexed separately, along with the information needed to expand them
+    def build_index(self, ics_map: mmap.mmap, ics_file_path: str) -> dict:
+        dates: dict[str, list[list[int]]] = {}
+        masters: list[dict] = []
+        # The (local) original start times of the occurrences overridden by
+        # separate VEVENTs, keyed by the UID of their recurring event
+        overridden_starts: dict[str, list[str]] = {}
+        for vevent_start, vevent_end in self.iter_vevent_offsets(ics_map):
+            vevent_text = self.read_vevent_text(ics_map, vevent_start, vevent_end)
+            props = parse_vevent_props(vevent_text)
+            if "RRULE" in props:
+                master_info = self.get_recurrence_master_info(vevent_text, props)
+                if master_info:
+                    masters.append(
+                        {**master_info, "offsets": [vevent_start, vevent_end]}
+                    )
+                    continue
+            if "RECURRENCE-ID" in props and "UID" in props:
+                overridden_start = parse_optional_ics_datetime(*props["RECURRENCE-ID"])
+                if overridden_start:
+                    overridden_starts.setdefault(props["UID"][1], []).append(
+                        overridden_start.isoformat()
+                    )
+            time_range = get_vevent_time_range(props)
+            if not time_range:
+                continue
+            start_datetime, end_datetime, _ = time_range
+            for date_str in get_dates_spanned(start_datetime, end_datetime):
+                dates.setdefault(date_str, []).append([vevent_start, vevent_end])
+        for master_info in masters:
+            master_info["excluded_starts"].extend(
+                overridden_starts.get(master_info["uid"], [])
+            )
+        return {
+            "calendar_name": self.get_calendar_name(ics_map, ics_file_path),
+            "dates": dates,
+            "masters": masters,
+        }
+
+    # Retrieve the index for the given memory-mapped .ics file, rebuilding
+    # (and persisting) it if the file has changed since it was last indexed
+    def get_index(
+        self, ics_map: mmap.mmap, ics_file_path: str, file_stat: os.stat_result
+    ) -> dict:
+        index_path = self.get_index_path(ics_file_path)
+        validity = self.get_index_validity(file_stat)
+        index = read_json_file(index_path)
+        if isinstance(index, dict) and index.get("validity") == validity:
+            return index
+        index = {"validity": validity, **self.build_index(ics_map, ics_file_path)}
+        write_json_file_atomically(index_path, index)
+        return index
+
+    # Retrieve the event dictionaries for the given date from the given
+    # memory-mapped .ics file, reading only the VEVENT blocks indexed under
+    # that date
+    def get_event_dicts_for_date(
+        self, ics_map: mmap.mmap, index: dict, target_date: date
+    ) -> list[EventDict]:
+        event_dicts = []
+        for vevent_start, vevent_end in index["dates"].get(target_date.isoformat(), []):
+            event_dict = convert_vevent_props_to_dict(
+                parse_vevent_props(
+                    self.read_vevent_text(ics_map, vevent_start, vevent_end)
+                )
+            )
+            if event_dict:
+                event_dicts.append(event_dict)
+        event_dicts.extend(
+            self.get_recurring_event_dicts_for_date(
+                ics_map, index["masters"], target_date
+            )
+        )
+        return event_dicts
+
+    # Retrieve the event dictionaries for every event in the given .ics file
+    # which overlaps the given range of time, reading only the VEVENT blocks
+    # indexed under the dates within the range
+    def get_event_dicts_for_range(
+        self,
+        ics_file_path: str,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        calendar_names: Sequence[str],
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        with open(ics_file_path, "rb") as ics_file:
+            file_stat = os.fstat(ics_file.fileno())
+            # An empty file cannot be memory-mapped (and has no events anyway)
+            if file_stat.st_size == 0:
+                return []
+            with mmap.mmap(ics_file.fileno(), 0, access=mmap.ACCESS_READ) as ics_map:
+                index = self.get_index(ics_map, ics_file_path, file_stat)
+                if calendar_names and index["calendar_name"] not in calendar_names:
+                    return []
+                datetime_format = f"{Event.date_format}T{Event.time_format}"
+                range_start_str = start_datetime.strftime(datetime_format)
+                range_end_str = end_datetime.strftime(datetime_format)
+                event_dicts = []
+                target_date_strs = get_dates_spanned(start_datetime, end_datetime)
+                for target_date_str in target_date_strs:
+                    for event_dict in self.get_event_dicts_for_date(
+                        ics_map, index, date.fromisoformat(target_date_str)
+                    ):
+                        # An event spanning several dates is indexed under each
+                        # of them, so it is only kept for the first date within
+                        # the range on which it takes place
+                        if (
+                            event_dict["startDate"][:10] < target_date_str
+                            and target_date_str != target_date_strs[0]
+                        ):
+                            continue
+                        # Zero-duration events overlap the range if they start
+                        # within it
+                        if event_dict["startDate"] < range_end_str and (
+                            event_dict["endDate"] > range_start_str
+                            or event_dict["startDate"] >= range_start_str
+                        ):
+                            # The notes are read from the file regardless, so
+                            # leaving them out only keeps the result consistent
+                            # with that of the other backends
+                            if not include_notes:
+                                event_dict.pop("notes", None)
+                            event_dicts.append(event_dict)
+                return event_dicts
+
+    # Build the recurrence master described by the given index entry
+    def get_recurrence_master(self, master_info: dict) -> RecurrenceMaster:
+        return RecurrenceMaster(
+            rule=RecurrenceRule.parse(master_info["rrule"]),
+            start=datetime.fromisoformat(master_info["start"]),
+            duration=timedelta(seconds=master_info["duration_secs"]),
+            tz_id=master_info["tz_id"],
+            excluded_starts=frozenset(
+                datetime.fromisoformat(excluded_start)
+                for excluded_start in master_info["excluded_starts"]
+            ),
+            extra_starts=tuple(
+                datetime.fromisoformat(extra_start)
+                for extra_start in master_info["extra_starts"]
+            ),
+        )
+
+    # Expand the recurring events described by the given index entries into
+    # event dictionaries for each of their occurrences on the given date; only
+    # the VEVENTs of recurring events which actually occur are read
+    def get_recurring_event_dicts_for_date(
+        self, ics_map: mmap.mmap, masters: list[dict], target_date: date
+    ) -> list[EventDict]:
+        recurrence_index: RecurrenceIndex[dict] = RecurrenceIndex(
+            (self.get_recurrence_master(master_info), master_info)
+            for master_info in masters
+        )
+        event_dicts = []
+        for (
+            master_info,
+            occurrence_start,
+            occurrence_end,
+        ) in recurrence_index.iter_occurrences(target_date):
+            props = parse_vevent_props(
+                self.read_vevent_text(ics_map, *master_info["offsets"])
+            )
+            _, _, is_all_day = parse_ics_wall_datetime(*props["DTSTART"])
+            event_dict = convert_vevent_props_to_dict(
+                props, time_range=(occurrence_start, occurrence_end, is_all_day)
+            )
+            if event_dict:
+                event_dicts.append(event_dict)
+        return event_dicts
+
+    # Retrieve the event dictionaries for the given range of time from the
+    # given .ics file, skipping the file (so that the other files still show)
+    # if it is missing or unreadable
+    def get_readable_event_dicts_for_range(
+        self,
+        ics_file_path: str,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        calendar_names: Sequence[str],
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        try:
+            return self.get_event_dicts_for_range(
+                ics_file_path,
+                start_datetime,
+                end_datetime,
+                calendar_names,
+                include_notes,
+            )
+        except OSError as error:
+            print(f"Failed to read {ics_file_path}: {error}", file=sys.stderr)
+            return []
+
+    # Retrieve the events within the given range of time (today, by default)
+    # from every configured .ics file, sorted chronologically (like the output
+    # of the other calendar backends); if no calendar names are given, the
+    # user's Calendar Names preference is used
+    def get_event_dicts(
+        self,
+        start_datetime: Optional[datetime] = None,
+        end_datetime: Optional[datetime] = None,
+        calendar_names: Optional[Sequence[str]] = None,
+        include_notes: bool = True,
+    ) -> list[EventDict]:
+        start_datetime, end_datetime = get_time_range(start_datetime, end_datetime)
+        if calendar_names is None:
+            calendar_names = prefs.snapshot.calendar_names
+        event_dicts: list[EventDict] = []
+        for ics_file_path in self.ics_file_paths:
+            event_dicts.extend(
+                self.get_readable_event_dicts_for_range(
+                    ics_file_path,
+                    start_datetime,
+                    end_datetime,
+                    calendar_names,
+                    include_notes,
+                )
+            )
+        return sorted(event_dicts, key=lambda event_dict: event_dict["startDate"])
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os.path
+from typing import Optional
+
+from ocu.cache_utils import (
+    get_cache_dir,
+    get_fingerprint,
+    read_json_file,
+    write_json_file_atomically,
+)
+from ocu.event_dict import EventDict
+from ocu.prefs import PrefsSnapshot
+
+# The version of the cache file format (and of the URL extraction logic whose
+# results it stores); bumping this discards every existing cache entry
+CACHE_VERSION = 1
+# The event fields from which a conference URL may be extracted
+CACHE_EVENT_KEYS = ("title", "location", "notes")
+
+
+# Compute a fingerprint of the preferences which affect the conference URL
+# extracted from an event; entries stored under any other fingerprint are
+# discarded
+def get_url_prefs_fingerprint(snapshot: PrefsSnapshot) -> str:
+    return get_fingerprint(
+        {
+            "conference_domains": snapshot.conference_domains,
+            "use_direct_zoom": snapshot.use_direct_zoom,
+            "use_direct_msteams": snapshot.use_direct_msteams,
+        }
+    )
+
+
+# A persistent cache mapping the hash of each event's content to the
+# conference URL extracted from it (or to an empty string if the event has no
+# conference URL), so that repeated invocations of the workflow only need to
+# scan the events which have changed; entries are ordered from least to most
+# recently used, and the least recently used entries are evicted once the
+# cache exceeds its size cap
+class ConferenceUrlCache(object):
+    # The name of the file (within the workflow's cache directory) where the
+    # cache is stored
+    cache_file_name = "conference-urls.json"
+    # The maximum number of entries to store
+    max_entries = 4096
+    # URLs longer than this are never cached, which bounds the size of the
+    # cache file (and the time to load it)
+    max_url_length = 2048
+
+    prefs_fingerprint: str
+    entries: dict[str, str]
+    is_modified: bool
+
+    def __init__(self, snapshot: PrefsSnapshot) -> None:
+        self.prefs_fingerprint = get_url_prefs_fingerprint(snapshot)
+        self.entries = self.read_entries()
+        self.is_modified = False
+
+    # Compute a fast, fixed-size hash of the fields of the given event which
+    # may contain a conference URL, which serves as its key within the cache
+    @staticmethod
+    def get_event_hash(event_dict: EventDict) -> str:
+        event_hash = hashlib.blake2b(digest_size=16)
+        for key in CACHE_EVENT_KEYS:
+            event_hash.update(
+                str(event_dict.get(key) or "").encode("utf-8", "surrogatepass")
+            )
+            # Separate each field so that moving text from one field to the
+            # next yields a different hash
+            event_hash.update(b"\0")
+        return event_hash.hexdigest()
+
+    # Retrieve the path to the file where the cache is stored
+    def get_cache_path(self) -> str:
+        return os.path.join(get_cache_dir(), self.cache_file_name)
+
+    # Read the persisted cache entries, discarding the cache entirely if it is
+    # missing, malformed, from a different version, or was populated under
+    # different preferences
+    def read_entries(self) -> dict[str, str]:
+        cache = read_json_file(self.get_cache_path())
+        if (
+            not isinstance(cache, dict)
+            or cache.get("version") != CACHE_VERSION
+            or cache.get("prefs_fingerprint") != self.prefs_fingerprint
+            or not isinstance(cache.get("entries"), dict)
+        ):
+            return {}
+        return {
+            event_hash: conference_url
+            for event_hash, conference_url in cache["entries"].items()
+            if isinstance(conference_url, str)
+        }
+
+    # Retrieve the cached result for the event with the given hash: the
+    # conference URL, an empty string if the event is known to have no
+    # conference URL, or None if the event has not been cached
+    def get(self, event_hash: str) -> Optional[str]:
+        conference_url = self.entries.pop(event_hash, None)
+        if conference_url is not None:
+            # Re-inserting the entry marks it as the most recently used
+            self.entries[event_hash] = conference_url
+        return conference_url
+
+    # Cache the conference URL extracted from the event with the given hash
+    # (where None means the event has no conference URL)
+    def set(self, event_hash: str, conference_url: Optional[str]) -> None:
+        if conference_url and len(conference_url) > self.max_url_length:
+            return
+        self.entries[event_hash] = conference_url or ""
+        self.is_modified = True
+
+    # Persist the cache if any entries were added, evicting the least recently
+    # used entries beyond the entry cap; the recency of entries which were only
+    # read is persisted the next time the cache is written, which avoids a
+    # write on every run where nothing has changed
+    def write(self) -> None:
+        if not self.is_modified:
+            return
+        if len(self.entries) > self.max_entries:
+            event_hashes = list(self.entries)[-self.max_entries :]
+            self.entries = {
+                event_hash: self.entries[event_hash] for event_hash in event_hashes
+            }
+        write_json_file_atomically(
+            self.get_cache_path(),
+            {
+                "version": CACHE_VERSION,
+                "prefs_fingerprint": self.prefs_fingerprint,
+                "entries": self.entries,
+            },
+        )
+        self.is_modified = False
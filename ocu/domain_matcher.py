@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import functools
+from typing import Iterable, Optional
+
+# The characters which a wildcard (*) within a conference domain pattern can
+# match; a wildcard matches one or more of these characters
+WILDCARD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789-")
+# The maximum number of hostnames whose match results are remembered by each
+# matcher
+MAX_CACHED_HOSTNAMES = 4096
+
+
+# A single node in the character trie built from the conference domain
+# patterns; a node which was reached via a wildcard can continue to consume
+# wildcard characters indefinitely
+class DomainTrieNode(object):
+    __slots__ = ("children", "wildcard_child", "is_wildcard", "pattern_index")
+
+    children: dict[str, "DomainTrieNode"]
+    wildcard_child: Optional["DomainTrieNode"]
+    is_wildcard: bool
+    # The index of the highest-priority pattern which ends at this node
+    pattern_index: Optional[int]
+
+    def __init__(self, is_wildcard: bool = False) -> None:
+        self.children = {}
+        self.wildcard_child = None
+        self.is_wildcard = is_wildcard
+        self.pattern_index = None
+
+
+# A matcher compiled once from the user's list of conference domain patterns
+# (e.g. "*.zoom.us"), which determines the highest-priority pattern matching a
+# given hostname in a single pass over that hostname; the matching semantics
+# are identical to those of the regular expressions previously built for each
+# pattern (i.e. a pattern matches if it matches the start of the hostname)
+class DomainMatcher(object):
+    pattern_count: int
+    root: DomainTrieNode
+    cached_pattern_indices: dict[str, Optional[int]]
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.pattern_count = 0
+        self.root = DomainTrieNode()
+        self.cached_pattern_indices = {}
+        for pattern in patterns:
+            self.add_pattern(pattern)
+
+    # Add the given pattern to the trie, with a lower priority than all of the
+    # patterns added before it
+    def add_pattern(self, pattern: str) -> None:
+        node = self.root
+        for char in pattern:
+            if char == "*":
+                if node.wildcard_child is None:
+                    node.wildcard_child = DomainTrieNode(is_wildcard=True)
+                node = node.wildcard_child
+            else:
+                node = node.children.setdefault(char, DomainTrieNode())
+        # If the same pattern is listed more than once, its first occurrence
+        # takes precedence
+        if node.pattern_index is None:
+            node.pattern_index = self.pattern_count
+        self.pattern_count += 1
+
+    # Compute the index of the highest-priority pattern which matches the given
+    # hostname, by simulating every possible path through the trie at once;
+    # return None if no pattern matches
+    def compute_pattern_index(self, hostname: str) -> Optional[int]:
+        best_index = self.root.pattern_index
+        nodes = {self.root}
+        for char in hostname:
+            # Nothing can take precedence over the very first pattern
+            if best_index == 0:
+                break
+            is_wildcard_char = char in WILDCARD_CHARS
+            next_nodes = set()
+            for node in nodes:
+                child = node.children.get(char)
+                if child is not None:
+                    next_nodes.add(child)
+                if is_wildcard_char:
+                    if node.wildcard_child is not None:
+                        next_nodes.add(node.wildcard_child)
+                    if node.is_wildcard:
+                        next_nodes.add(node)
+            if not next_nodes:
+                break
+            nodes = next_nodes
+            for node in nodes:
+                if node.pattern_index is not None and (
+                    best_index is None or node.pattern_index < best_index
+                ):
+                    best_index = node.pattern_index
+        return best_index
+
+    # Retrieve the index of the highest-priority pattern which matches the
+    # given hostname (or None if no pattern matches)
+    def get_pattern_index(self, hostname: str) -> Optional[int]:
+        if hostname in self.cached_pattern_indices:
+            return self.cached_pattern_indices[hostname]
+        if len(self.cached_pattern_indices) >= MAX_CACHED_HOSTNAMES:
+            self.cached_pattern_indices.clear()
+        pattern_index = self.compute_pattern_index(hostname)
+        self.cached_pattern_indices[hostname] = pattern_index
+        return pattern_index
+
+    # The highest score that any hostname can receive (i.e. the score of a
+    # hostname matching the very first pattern)
+    @property
+    def max_score(self) -> int:
+        return 10 * self.pattern_count
+
+    # Compute a numeric score to represent the likelihood that the given
+    # hostname belongs to the conference service we want, where patterns listed
+    # earlier receive higher scores; return -1 if no pattern matches
+    def get_score(self, hostname: str) -> int:
+        pattern_index = self.get_pattern_index(hostname)
+        if pattern_index is None:
+            return -1
+        return 10 * (self.pattern_count - pattern_index)
+
+
+# Retrieve the matcher for the given list of conference domain patterns,
+# compiling it only the first time that list is seen by this process
+@functools.lru_cache(maxsize=8)
+def get_domain_matcher(patterns: tuple[str, ...]) -> DomainMatcher:
+    return DomainMatcher(patterns)
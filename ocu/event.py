@@ -3,12 +3,22 @@
 
 import re
 from datetime import datetime
-from operator import itemgetter
-from typing import Optional
+from typing import TYPE_CHECKING, Iterator, Optional
 from urllib.parse import urlparse
 
+from ocu.domain_matcher import get_domain_matcher
 from ocu.event_dict import EventDict
 from ocu.prefs import prefs
+from ocu.profiling import profile_stage
+
+if TYPE_CHECKING:
+    from ocu.conference_url_cache import ConferenceUrlCache
+    from ocu.notes_loader import NotesLoader
+
+# The pattern used to find candidate conference URLs within an event; it has no
+# lazy quantifiers or lookaheads, so the time to scan an event is guaranteed to
+# be linear in the size of the event's fields
+URL_CANDIDATE_PATT = re.compile(r"https://[^\s><\"']*")
 
 
 # The object representation of a calendar event, with all of its fields
@@ -19,47 +29,121 @@ class Event(object):
     date_format = "%Y-%m-%d"
     time_format = "%H:%M"
 
+    # Events are created in bulk (potentially tens of thousands at a time for
+    # multi-day or multi-calendar loads), so each instance omits a __dict__
+    __slots__ = (
+        "title",
+        "start_datetime",
+        "end_datetime",
+        "is_all_day",
+        "event_dict",
+        "resolved_conference_url",
+        "conference_url_cache",
+        "notes_loader",
+    )
+
     title: str
     start_datetime: datetime
     end_datetime: datetime
     is_all_day: bool
-    conference_url: Optional[str]
+    # The raw event properties, which are only retained until the conference
+    # URL has been resolved
+    event_dict: Optional[EventDict]
+    resolved_conference_url: Optional[str]
+    # The persistent cache consulted (and populated) when resolving the
+    # conference URL, if any
+    conference_url_cache: Optional["ConferenceUrlCache"]
+    # The loader which fetches the event's notes on demand, if the event was
+    # fetched without them
+    notes_loader: Optional["NotesLoader"]
 
     # Initialize an Event object by parsing a dictionary of raw event
     # properties as input; this dictionary is constructed and outputted by the
-    # get-calendar-events AppleScript
-    def __init__(self, event_dict: EventDict) -> None:
+    # get-calendar-events AppleScript; if lazy is True, the (comparatively
+    # expensive) conference URL is not resolved until it is first accessed; the
+    # current time may be given so that every event in a batch shares it
+    def __init__(
+        self,
+        event_dict: EventDict,
+        lazy: bool = False,
+        conference_url_cache: Optional["ConferenceUrlCache"] = None,
+        current_datetime: Optional[datetime] = None,
+    ) -> None:
         self.title = event_dict.get("title", "")
         self.start_datetime = self.parse_datetime(event_dict["startDate"])
         self.end_datetime = self.parse_datetime(event_dict["endDate"])
         if self.start_datetime.hour == 0 and self.start_datetime.minute == 0:
             self.is_all_day = True
-            # Set the time of all-day events to the system's current time, to
-            # ensure that those events always show
-            self.start_datetime = datetime.now()
+            # Set the time of all-day events to the current time, to ensure
+            # that those events always show
+            if current_datetime is None:
+                current_datetime = datetime.now()
+            self.start_datetime = current_datetime
         else:
             self.is_all_day = False
-        self.conference_url = self.parse_conference_url(event_dict)
+        self.event_dict = event_dict
+        self.resolved_conference_url = None
+        self.conference_url_cache = conference_url_cache
+        self.notes_loader = None
+        if not lazy:
+            self.resolve_conference_url()
+
+    # The conference URL for this event (or None if the event has none)
+    @property
+    def conference_url(self) -> Optional[str]:
+        if self.event_dict is not None:
+            with profile_stage("resolve_conference_urls"):
+                self.resolve_conference_url()
+        return self.resolved_conference_url
+
+    @conference_url.setter
+    def conference_url(self, conference_url: Optional[str]) -> None:
+        self.event_dict = None
+        self.resolved_conference_url = conference_url
+
+    # Find and normalize the conference URL from the raw event properties,
+    # after which the raw properties are no longer needed; if the event was
+    # fetched without its notes, they are fetched first if they could change
+    # the conference URL; if a conference URL cache was given, the URL is only
+    # extracted if the event's content has not been seen before
+    def resolve_conference_url(self) -> None:
+        if self.event_dict is None:
+            return
+        event_dict = self.event_dict
+        if self.notes_loader is not None:
+            event_dict = self.notes_loader.add_notes(self, event_dict)
+        if self.conference_url_cache is None:
+            self.conference_url = self.extract_conference_url(event_dict)
+            return
+        event_hash = self.conference_url_cache.get_event_hash(event_dict)
+        cached_conference_url = self.conference_url_cache.get(event_hash)
+        if cached_conference_url is not None:
+            # An empty string records that the event has no conference URL
+            self.conference_url = cached_conference_url or None
+            return
+        conference_url = self.extract_conference_url(event_dict)
+        self.conference_url_cache.set(event_hash, conference_url)
+        self.conference_url = conference_url
+
+    # Extract the conference URL from the given raw event properties,
+    # converting it to a direct link if enabled
+    def extract_conference_url(self, event_dict: EventDict) -> Optional[str]:
+        conference_url = self.parse_conference_url(event_dict)
         # Bypass the browser when opening Zoom Join URLs, if enabled
-        if self.conference_url and self.__class__.is_convertible_zoom_url(
-            self.conference_url
-        ):
-            self.conference_url = self.__class__.convert_zoom_url_to_direct(
-                self.conference_url
-            )
+        if conference_url and self.__class__.is_convertible_zoom_url(conference_url):
+            conference_url = self.__class__.convert_zoom_url_to_direct(conference_url)
         # Bypass the browser when opening MS Teams Meeting URLs, if enabled
-        if self.conference_url and self.__class__.is_convertible_msteams_url(
-            self.conference_url
-        ):
-            self.conference_url = self.__class__.convert_msteams_url_to_direct(
-                self.conference_url
+        if conference_url and self.__class__.is_convertible_msteams_url(conference_url):
+            conference_url = self.__class__.convert_msteams_url_to_direct(
+                conference_url
             )
+        return conference_url
 
     # Return True if the given URL is a Zoom URL that can be converted to a
     # direct link (via the zoommtg:// protocol); return False otherwise
     @staticmethod
     def is_convertible_zoom_url(url: Optional[str]) -> bool:
-        if not url or not prefs["use_direct_zoom"]:
+        if not url or not prefs.snapshot.use_direct_zoom:
             return False
         matches = re.search(r"https://([\w\-]+\.)?(zoom.us)/j/", url)
         return bool(matches)
@@ -69,7 +153,7 @@ def is_convertible_zoom_url(url: Optional[str]) -> bool:
     # otherwise
     @staticmethod
     def is_convertible_msteams_url(url: Optional[str]) -> bool:
-        if not url or not prefs["use_direct_msteams"]:
+        if not url or not prefs.snapshot.use_direct_msteams:
             return False
         matches = re.search(r"https://([\w\-]+\.)?(teams.microsoft.com)/l/", url)
         return bool(matches)
@@ -97,15 +181,16 @@ def parse_datetime(self, raw_datetime: str) -> datetime:
             raw_datetime, "{}T{}".format(self.date_format, self.time_format)
         )
 
-    # Return true if the given domain (e.g. "us02web.zoom.us") matches the given
-    # pattern (e.g. "*.zoom.us")
-    def does_domain_match_pattern(self, domain: str, pattern: str) -> bool:
-        domain_patt = re.sub(r"\\\*", r"([a-z0-9\-]+)", re.escape(pattern))
-        matches = re.match(domain_patt, domain)
-        if matches:
-            return True
-        else:
-            return False
+    # Return True if the given raw event properties already contain a URL for
+    # the highest-priority conference domain, in which case no other property
+    # (like the event's notes) could change the event's conference URL
+    def has_top_priority_conference_url(self, event_dict: EventDict) -> bool:
+        conference_url = self.parse_conference_url(event_dict)
+        return (
+            conference_url is not None
+            and self.get_url_score(conference_url)
+            >= get_domain_matcher(prefs.snapshot.conference_domains).max_score
+        )
 
     # Clean up the conference URL by removing extraneous characters
     def normalize_url(self, url: str) -> str:
@@ -117,24 +202,45 @@ def get_url_score(self, url: str) -> int:
         if re.search(r"\.[a-z]{3}$", url):
             return -1
         url_parts = urlparse(url)
-        for i, domain_patt in enumerate(prefs["conference_domains"]):
-            if url_parts.hostname and self.does_domain_match_pattern(
-                url_parts.hostname, domain_patt
-            ):
-                return 10 * (len(prefs["conference_domains"]) - i)
-        return -1
+        if not url_parts.hostname:
+            return -1
+        return get_domain_matcher(prefs.snapshot.conference_domains).get_score(
+            url_parts.hostname
+        )
+
+    # Yield every candidate conference URL within the given event's fields, in
+    # the order they appear; each candidate extends from https:// up to (but not
+    # including) the next whitespace, angle bracket, or quote character
+    def iter_url_candidates(self, event_dict: EventDict) -> Iterator[str]:
+        # Because newlines always terminate a candidate, scanning each field
+        # separately is equivalent to scanning all fields joined by newlines
+        for value in event_dict.values():
+            for url_match in URL_CANDIDATE_PATT.finditer(str(value)):
+                yield url_match.group()
 
     # Return the conference URL for the given event, whereby some services have
     # higher precedence than others (e.g. always prefer Zoom URLs over Google
     # Meet URLs if both are present)
     def parse_conference_url(self, event_dict: EventDict) -> Optional[str]:
-        event_search_str = "\n".join(str(value) for value in event_dict.values())
-        urls = re.findall(r'https://(?:.*?)(?=[\s><"\']|$)', event_search_str)
-        if not urls:
-            return None
-        normalized_urls = [self.normalize_url(url) for url in urls]
-        url_pairs = [(url, self.get_url_score(url)) for url in normalized_urls]
-        filtered_url_pairs = [(url, score) for url, score in url_pairs if score >= 0]
-        if not filtered_url_pairs:
-            return None
-        return max(filtered_url_pairs, key=itemgetter(1))[0]
+        max_score = get_domain_matcher(prefs.snapshot.conference_domains).max_score
+        best_url = None
+        best_score = -1
+        seen_urls = set()
+        for url in self.iter_url_candidates(event_dict):
+            # A repeated URL can never take precedence over its first
+            # occurrence, so there's no need to score it again
+            if url in seen_urls:
+                continue
+            seen_urls.add(url)
+            normalized_url = self.normalize_url(url)
+            score = self.get_url_score(normalized_url)
+            # If multiple URLs share the same score, the first one wins
+            if score > best_score:
+                best_url = normalized_url
+                best_score = score
+                # Stop scanning as soon as we find a URL for the
+                # highest-priority conference domain, since no other URL can
+                # take precedence over it
+                if best_score >= max_score:
+                    break
+        return best_url
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import heapq
+import sys
+from array import array
+from typing import Iterable, Iterator, Optional
+
+from ocu.event import Event
+
+# The number of seconds in a minute
+SECONDS_IN_MINUTE = 60
+
+
+# A columnar view of a list of events, where the fields needed to filter and
+# sort events by time are stored in compact, array-backed columns (as POSIX
+# timestamps and flags); this allows the time window and sort key of every
+# event to be computed in a single pass over the columns, without looking up
+# (or doing datetime arithmetic on) the attributes of each Event object; events
+# are referred to by their index within the batch
+class EventBatch(object):
+    __slots__ = ("events", "start_timestamps", "end_timestamps", "all_day_flags")
+
+    events: list[Event]
+    start_timestamps: array
+    end_timestamps: array
+    all_day_flags: array
+
+    def __init__(self, events: Iterable[Event]) -> None:
+        self.events = list(events)
+        self.start_timestamps = array(
+            "d", [event.start_datetime.timestamp() for event in self.events]
+        )
+        self.end_timestamps = array(
+            "d", [event.end_datetime.timestamp() for event in self.events]
+        )
+        self.all_day_flags = array("b", [event.is_all_day for event in self.events])
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    # Retrieve the events at the given indices, in the given order
+    def get_events(self, indices: Iterable[int]) -> list[Event]:
+        events = self.events
+        return [events[index] for index in indices]
+
+    # Yield the indices (among the given indices) of the events for which a
+    # conference URL has been found, resolving the conference URLs of any lazy
+    # events as they are reached; because the indices are yielded lazily, a
+    # caller which only needs the first few never resolves the rest
+    def iter_conference_url_indices(self, indices: Iterable[int]) -> Iterator[int]:
+        events = self.events
+        return (index for index in indices if events[index].conference_url)
+
+    # Classify every event as of the given time, in a single pass over the
+    # columns (see EventClassification); an event is upcoming if it starts
+    # within the given number of minutes (before or after) of the given time,
+    # and past if it ended before the given time; upcoming events sort
+    # chronologically, past events sort reverse-chronologically, and all-day
+    # events sort last; like the per-event functions in the list_events
+    # module, an all-day event is treated as starting at the time it was
+    # created (or last reset), so it is upcoming as of that time unless the
+    # time threshold is zero
+    def classify(
+        self, current_timestamp: float, time_threshold_mins: int
+    ) -> "EventClassification":
+        threshold_secs = time_threshold_mins * SECONDS_IN_MINUTE
+        min_start_timestamp = current_timestamp - threshold_secs
+        max_start_timestamp = current_timestamp + threshold_secs
+        upcoming_indices: list[int] = []
+        past_indices: list[int] = []
+        sort_keys: list[float] = []
+        for index, (start_timestamp, end_timestamp, is_all_day) in enumerate(
+            zip(self.start_timestamps, self.end_timestamps, self.all_day_flags)
+        ):
+            if end_timestamp < current_timestamp:
+                past_indices.append(index)
+            is_upcoming = min_start_timestamp <= start_timestamp < max_start_timestamp
+            if is_upcoming:
+                upcoming_indices.append(index)
+            if is_all_day:
+                # All-day events are listed last
+                sort_keys.append(sys.maxsize)
+            elif is_upcoming:
+                # e.g. 8:00am, 8:30am, 9:00am
+                sort_keys.append(start_timestamp)
+            elif start_timestamp < current_timestamp:
+                # e.g. 7:30am, 7:00am, 6:30am
+                sort_keys.append(sys.maxsize - end_timestamp)
+            else:
+                sort_keys.append(0)
+        return EventClassification(upcoming_indices, past_indices, sort_keys)
+
+    # Compute the earliest time after the given time at which the
+    # classification of any event will change, or None if no event's
+    # classification will ever change; this is whenever an event enters or
+    # leaves the time threshold of its start, or an event ends
+    def get_next_change_timestamp(
+        self, current_timestamp: float, time_threshold_mins: int
+    ) -> Optional[float]:
+        threshold_secs = time_threshold_mins * SECONDS_IN_MINUTE
+        next_change_timestamp = None
+        for start_timestamp, end_timestamp, is_all_day in zip(
+            self.start_timestamps, self.end_timestamps, self.all_day_flags
+        ):
+            # An all-day event starts whenever the events are next classified,
+            # so only its end can change its classification
+            if is_all_day:
+                boundary_timestamps: tuple[float, ...] = (end_timestamp,)
+            else:
+                boundary_timestamps = (
+                    start_timestamp - threshold_secs,
+                    start_timestamp + threshold_secs,
+                    end_timestamp,
+                )
+            for boundary_timestamp in boundary_timestamps:
+                if boundary_timestamp >= current_timestamp and (
+                    next_change_timestamp is None
+                    or boundary_timestamp < next_change_timestamp
+                ):
+                    next_change_timestamp = boundary_timestamp
+        return next_change_timestamp
+
+
+# The classification of every event in a batch as of a single point in time:
+# which events are upcoming (i.e. start within the time threshold of that
+# time), which events are past (i.e. have ended), and the sort key of every
+# event, which is computed once and then reused for every comparison; events
+# are referred to by their index within the batch, and each list of indices is
+# in the order of the batch
+class EventClassification(object):
+    __slots__ = ("upcoming_indices", "past_indices", "sort_keys")
+
+    upcoming_indices: list[int]
+    past_indices: list[int]
+    sort_keys: list[float]
+
+    def __init__(
+        self,
+        upcoming_indices: list[int],
+        past_indices: list[int],
+        sort_keys: list[float],
+    ) -> None:
+        self.upcoming_indices = upcoming_indices
+        self.past_indices = past_indices
+        self.sort_keys = sort_keys
+
+    # Yield the indices of the past events in order of their sort keys (i.e.
+    # from the nearest past event to the furthest); the events are ordered
+    # lazily via a heap, so a caller which only needs the nearest few never
+    # pays to sort the rest
+    def iter_nearest_past_indices(self) -> Iterator[int]:
+        sort_keys = self.sort_keys
+        # Ties are broken by index, matching a stable sort of the past events
+        heap = [(sort_keys[index], index) for index in self.past_indices]
+        heapq.heapify(heap)
+        while heap:
+            yield heapq.heappop(heap)[1]
+
+    # Order the given indices by their sort keys
+    def sort_indices(self, indices: Iterable[int]) -> list[int]:
+        return sorted(indices, key=self.sort_keys.__getitem__)
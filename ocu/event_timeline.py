@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator
+
+from ocu.event import Event
+from ocu.event_batch import SECONDS_IN_MINUTE, EventBatch
+
+
+# A time index over a list of events, which holds the events ordered both by
+# start time and by end time; this allows the events within any window of time
+# to be found by bisection, in O(log n + k) time for k matching events, rather
+# than by scanning every event; because the start of an all-day event is the
+# current time as of which the event was created (or last reset), the index
+# must be built after every all-day event has been given the time at which it
+# is queried; events are referred to by their index within the underlying batch
+class EventTimeline(object):
+    __slots__ = (
+        "batch",
+        "start_order",
+        "sorted_start_timestamps",
+        "end_order",
+        "sorted_end_timestamps",
+        "max_duration_secs",
+    )
+
+    batch: EventBatch
+    # The indices of the events, ordered by start time
+    start_order: list[int]
+    sorted_start_timestamps: array
+    # The indices of the events, ordered by end time
+    end_order: list[int]
+    sorted_end_timestamps: array
+    # The duration of the longest event, which bounds how long before the
+    # current time an in-progress event could have started
+    max_duration_secs: float
+
+    def __init__(self, events: Iterable[Event]) -> None:
+        self.batch = EventBatch(events)
+        start_timestamps = self.batch.start_timestamps
+        end_timestamps = self.batch.end_timestamps
+        # Calendars generally return events in chronological order already,
+        # in which case sorting by start time takes only linear time
+        self.start_order = sorted(
+            range(len(self.batch)), key=start_timestamps.__getitem__
+        )
+        self.sorted_start_timestamps = array(
+            "d", [start_timestamps[index] for index in self.start_order]
+        )
+        self.end_order = sorted(range(len(self.batch)), key=end_timestamps.__getitem__)
+        self.sorted_end_timestamps = array(
+            "d", [end_timestamps[index] for index in self.end_order]
+        )
+        self.max_duration_secs = max(
+            (
+                end_timestamp - start_timestamp
+                for start_timestamp, end_timestamp in zip(
+                    start_timestamps, end_timestamps
+                )
+            ),
+            default=0,
+        )
+
+    # Retrieve the indices of the events which start within the given number of
+    # minutes (before or after) of the given time, in order of start time; an
+    # all-day event starts at the time it is queried, so it is upcoming unless
+    # the time threshold is zero
+    def get_upcoming_indices(
+        self, current_timestamp: float, time_threshold_mins: int
+    ) -> list[int]:
+        threshold_secs = time_threshold_mins * SECONDS_IN_MINUTE
+        return self.start_order[
+            bisect_left(
+                self.sorted_start_timestamps, current_timestamp - threshold_secs
+            ) : bisect_left(
+                self.sorted_start_timestamps, current_timestamp + threshold_secs
+            )
+        ]
+
+    # Count the events which ended before the given time
+    def count_past(self, current_timestamp: float) -> int:
+        return bisect_left(self.sorted_end_timestamps, current_timestamp)
+
+    # Retrieve the indices of the events which ended before the given time, in
+    # order of end time
+    def get_past_indices(self, current_timestamp: float) -> list[int]:
+        return self.end_order[: self.count_past(current_timestamp)]
+
+    # Compute the sort key of the event at the given index as of the given
+    # time: upcoming events sort chronologically, past events sort
+    # reverse-chronologically, and all-day events sort last
+    def get_sort_key(
+        self, index: int, current_timestamp: float, time_threshold_mins: int
+    ) -> float:
+        threshold_secs = time_threshold_mins * SECONDS_IN_MINUTE
+        start_timestamp = self.batch.start_timestamps[index]
+        if self.batch.all_day_flags[index]:
+            return sys.maxsize
+        elif (
+            current_timestamp - threshold_secs
+            <= start_timestamp
+            < current_timestamp + threshold_secs
+        ):
+            # e.g. 8:00am, 8:30am, 9:00am
+            return start_timestamp
+        elif start_timestamp < current_timestamp:
+            # e.g. 7:30am, 7:00am, 6:30am
+            return sys.maxsize - self.batch.end_timestamps[index]
+        else:
+            return 0
+
+    # Order the given indices by their sort keys as of the given time, so that
+    # only the events which are actually displayed need a sort key
+    def sort_indices(
+        self,
+        indices: Iterable[int],
+        current_timestamp: float,
+        time_threshold_mins: int,
+    ) -> list[int]:
+        return sorted(
+            indices,
+            key=lambda index: self.get_sort_key(
+                index, current_timestamp, time_threshold_mins
+            ),
+        )
+
+    # Yield the indices of the events which ended before the given time, from
+    # the nearest past event to the furthest, in the same order as their sort
+    # keys (ties being broken by index, like a stable sort); past events which
+    # started within the time threshold are still treated as upcoming, and so
+    # come first (in order of start time), followed by the rest from most to
+    # least recently ended, and finally any all-day events; because the
+    # indices are yielded lazily, only the past events which are actually
+    # consumed are visited
+    def iter_nearest_past_indices(
+        self, current_timestamp: float, time_threshold_mins: int
+    ) -> Iterator[int]:
+        min_start_timestamp = (
+            current_timestamp - time_threshold_mins * SECONDS_IN_MINUTE
+        )
+        start_timestamps = self.batch.start_timestamps
+        end_timestamps = self.batch.end_timestamps
+        all_day_flags = self.batch.all_day_flags
+        sorted_end_timestamps = self.sorted_end_timestamps
+        # A past event must have started before the current time
+        for index in self.start_order[
+            bisect_left(
+                self.sorted_start_timestamps, min_start_timestamp
+            ) : bisect_left(self.sorted_start_timestamps, current_timestamp)
+        ]:
+            if end_timestamps[index] < current_timestamp and not all_day_flags[index]:
+                yield index
+        past_all_day_indices = []
+        group_end = self.count_past(current_timestamp)
+        while group_end > 0:
+            # Events which ended at the same time are visited in order of
+            # index, since end_order is a stable sort
+            group_start = bisect_left(
+                sorted_end_timestamps,
+                sorted_end_timestamps[group_end - 1],
+                0,
+                group_end,
+            )
+            for index in self.end_order[group_start:group_end]:
+                if all_day_flags[index]:
+                    past_all_day_indices.append(index)
+                elif start_timestamps[index] < min_start_timestamp:
+                    yield index
+            group_end = group_start
+        yield from sorted(past_all_day_indices)
+
+    # Retrieve the indices of the events which are in progress at the given
+    # time (i.e. which have started but not yet ended), in order of start time;
+    # only the events which started within the longest event duration of the
+    # given time need to be checked
+    def get_in_progress_indices(self, current_timestamp: float) -> list[int]:
+        end_timestamps = self.batch.end_timestamps
+        return [
+            index
+            for index in self.start_order[
+                bisect_left(
+                    self.sorted_start_timestamps,
+                    current_timestamp - self.max_duration_secs,
+                ) : bisect_right(self.sorted_start_timestamps, current_timestamp)
+            ]
+            if current_timestamp < end_timestamps[index]
+        ]
@@ -1,35 +1,129 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from __future__ import unicode_literals
+from __future__ import annotations, unicode_literals
 
 import functools
 import itertools
 import json
 import sys
 from datetime import datetime, timedelta
-from typing import Callable, Iterable, Optional, Union
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, Sequence, Union
 
-from ocu.calendar import get_calendar
-from ocu.event import Event
 from ocu.prefs import prefs
+from ocu.profiling import profile_entry_point, profile_stage
+
+# Because this module runs on every keystroke, the calendar machinery (and the
+# server client) are only imported once they are actually needed; for instance,
+# none of it is needed when the resident server answers the request
+if TYPE_CHECKING:
+    from ocu.calendars.base_calendar import BaseCalendar
+    from ocu.conference_url_cache import ConferenceUrlCache
+    from ocu.event import Event
+    from ocu.event_timeline import EventTimeline
 
 # The number of hours in a day
 HOURS_IN_DAY = 24
 # The number of minutes in an hour
 MINUTES_IN_HOUR = 60
+# The bounds which Alfred places on the number of seconds for which it may
+# cache the results of a script filter
+ALFRED_MIN_CACHE_SECS = 5
+ALFRED_MAX_CACHE_SECS = 24 * 60 * 60
+# The bounds which Alfred places on the number of seconds after which it may
+# re-run a script filter
+ALFRED_MIN_RERUN_SECS = 0.1
+ALFRED_MAX_RERUN_SECS = 5.0
+# The number of seconds after which Alfred re-runs the script filter while
+# stale results are being refreshed in the background
+STALE_RERUN_SECS = 1.0
+
+
+# Load the persistent conference URL cache, if the user has enabled it
+def get_conference_url_cache() -> Optional[ConferenceUrlCache]:
+    if not prefs.snapshot.use_conference_url_cache:
+        return None
+    from ocu.conference_url_cache import ConferenceUrlCache
+
+    return ConferenceUrlCache(prefs.snapshot)
 
 
 # Fetch all of today's events, regardless of proximity to the system's current
-# time
-def get_events_today() -> list[Event]:
-    event_dicts = get_calendar().get_event_dicts()
-    return [Event(event_dict) for event_dict in event_dicts]
+# time; if lazy is True, the conference URL of each event is only resolved when
+# it is first accessed (and, if the user has enabled it, the notes of each event
+# are only fetched once they are needed to resolve its conference URL); if no
+# calendar is given, the calendar is chosen based on the user's preferences; if
+# a conference URL cache is given, it is consulted (and populated) whenever a
+# conference URL is resolved; every event shares the given current time, or the
+# system's current time if none is given
+def get_events_today(
+    lazy: bool = False,
+    calendar: Optional[BaseCalendar] = None,
+    conference_url_cache: Optional[ConferenceUrlCache] = None,
+    current_datetime: Optional[datetime] = None,
+) -> list[Event]:
+    from ocu.event import Event
+
+    if calendar is None:
+        from ocu.calendar import get_calendar
+
+        calendar = get_calendar()
+    from ocu.calendars.base_calendar import get_day_range
+
+    if current_datetime is None:
+        current_datetime = datetime.now()
+    # Deferring the notes only pays off if some events are never resolved
+    defer_notes = lazy and prefs.snapshot.use_deferred_notes
+    # Only the events within today are requested from the calendar, as of the
+    # same current time which every event shares
+    with profile_stage("fetch_event_dicts"):
+        event_dicts = calendar.get_event_dicts(
+            *get_day_range(current_datetime), include_notes=not defer_notes
+        )
+    with profile_stage("parse_events"):
+        events = [
+            Event(
+                event_dict,
+                lazy=lazy,
+                conference_url_cache=conference_url_cache,
+                current_datetime=current_datetime,
+            )
+            for event_dict in event_dicts
+        ]
+    if defer_notes:
+        from ocu.notes_loader import NotesLoader
+
+        # Only the events which start before the end of the time threshold
+        # (i.e. upcoming and past events) are ordinarily displayed
+        NotesLoader(
+            calendar,
+            events,
+            window_end_datetime=current_datetime
+            + timedelta(minutes=prefs.snapshot.event_time_threshold_mins),
+        )
+    return events
 
 
 # Retrieve only events from today for which a conference URL has been found
-def get_events_today_with_conference_urls() -> list[Event]:
-    return [event for event in get_events_today() if event.conference_url]
+def get_events_today_with_conference_urls(
+    calendar: Optional[BaseCalendar] = None,
+) -> list[Event]:
+    conference_url_cache = get_conference_url_cache()
+    events = [
+        event
+        for event in get_events_today(
+            calendar=calendar, conference_url_cache=conference_url_cache
+        )
+        if event.conference_url
+    ]
+    if conference_url_cache is not None:
+        conference_url_cache.write()
+    return events
+
+
+# The functions below define, one event at a time, which events are upcoming
+# or past and how events are sorted; get_feedback() answers the same questions
+# for every event at once (see EventTimeline), and must always agree with them
 
 
 # Return True if the given date/time is sometime within the past; otherwise,
@@ -60,26 +154,42 @@ def is_time_upcoming(
     return min_datetime < current_datetime <= max_datetime
 
 
-# Get those events from today which are in the past
-def filter_to_past_events(events: Iterable[Event]) -> list[Event]:
+# Get those events from today which are in the past (as of the given time, or
+# the system's current time if none is given)
+def filter_to_past_events(
+    events: Iterable[Event], current_datetime: Optional[datetime] = None
+) -> list[Event]:
+    if current_datetime is None:
+        current_datetime = datetime.now()
+    time_threshold = prefs.snapshot.event_time_threshold_mins
     return [
         event
         for event in events
         if is_time_in_past(
-            event.end_datetime, time_threshold=prefs["event_time_threshold_mins"]
+            event.end_datetime,
+            time_threshold=time_threshold,
+            current_datetime=current_datetime,
         )
     ]
 
 
 # Get those events from today which are either in the past or upcoming (but not
-# any further into the future)
-def filter_to_upcoming_events(events: Iterable[Event]) -> list[Event]:
+# any further into the future), as of the given time (or the system's current
+# time if none is given)
+def filter_to_upcoming_events(
+    events: Iterable[Event], current_datetime: Optional[datetime] = None
+) -> list[Event]:
+    if current_datetime is None:
+        current_datetime = datetime.now()
+    time_threshold = prefs.snapshot.event_time_threshold_mins
     # Filter those events to only those which are nearest to the current time
     return [
         event
         for event in events
         if is_time_upcoming(
-            event.start_datetime, time_threshold=prefs["event_time_threshold_mins"]
+            event.start_datetime,
+            time_threshold=time_threshold,
+            current_datetime=current_datetime,
         )
     ]
 
@@ -93,14 +203,14 @@ def get_event_sort_key(current_datetime: datetime, event: Event) -> Union[int, f
         return sys.maxsize
     elif is_time_upcoming(
         event.start_datetime,
-        time_threshold=prefs["event_time_threshold_mins"],
+        time_threshold=prefs.snapshot.event_time_threshold_mins,
         current_datetime=current_datetime,
     ):
         # e.g. 8:00am, 8:30am, 9:00am
         return event.start_datetime.timestamp()
     elif is_time_in_past(
         event.start_datetime,
-        time_threshold=prefs["event_time_threshold_mins"],
+        time_threshold=prefs.snapshot.event_time_threshold_mins,
         current_datetime=current_datetime,
     ):
         # e.g. 7:30am, 7:00am, 6:30am
@@ -115,9 +225,13 @@ def get_event_sort_key(current_datetime: datetime, event: Event) -> Union[int, f
 # When we are using the get_event_sort_key() key function above, it is crucial
 # that use the same current datetime for all iterated events; otherwise, it
 # leaves open the possibility that some events could have a slightly different
-# datetime than others
-def get_event_sort_key_fn_for_current_datetime() -> Callable:
-    current_datetime = datetime.now()
+# datetime than others; if no datetime is given, the system's current time is
+# used
+def get_event_sort_key_fn_for_current_datetime(
+    current_datetime: Optional[datetime] = None,
+) -> Callable:
+    if current_datetime is None:
+        current_datetime = datetime.now()
     return functools.partial(get_event_sort_key, current_datetime)
 
 
@@ -126,15 +240,19 @@ def get_event_sort_key_fn_for_current_datetime() -> Callable:
 # in the past are listed reverse-chronologically (i.e. backward in time); this
 # ensures that the nearest upcoming event is listed first, whereas the oldest
 # past event is listed last
-def sort_events_by_time(events: Iterable[Event]) -> list[Event]:
-    return sorted(events, key=get_event_sort_key_fn_for_current_datetime())
+def sort_events_by_time(
+    events: Iterable[Event], current_datetime: Optional[datetime] = None
+) -> list[Event]:
+    return sorted(
+        events, key=get_event_sort_key_fn_for_current_datetime(current_datetime)
+    )
 
 
 # Get the event time (or 'All-Day' if the event is all-day)
 def get_event_time(event: Event) -> str:
     if event.is_all_day:
         return "All-Day"
-    elif prefs["time_system"] == "24-hour":
+    elif prefs.snapshot.time_system == "24-hour":
         return event.start_datetime.strftime("%H:%M").lower()
     else:
         return event.start_datetime.strftime("%-I:%M%p").lower()
@@ -160,21 +278,143 @@ def get_event_feedback_item(event: Event) -> dict:
     }
 
 
-def main() -> None:
-    all_events = get_events_today_with_conference_urls()
-    upcoming_events = filter_to_upcoming_events(all_events)
-    past_events = filter_to_past_events(all_events)
-    # If both upcoming events and past events should be listed, only list the
-    # most recent past event
-    if upcoming_events and len(past_events) > 1:
-        past_events[:] = [
-            min(past_events, key=get_event_sort_key_fn_for_current_datetime())
-        ]
+# Return an Alfred feedback item noting that the given calendars took too long
+# to respond, and so their events are missing from the results
+def get_timed_out_feedback_item(timed_out_calendar_names: Sequence[str]) -> dict:
+    if len(timed_out_calendar_names) == 1:
+        title = "Calendar Timed Out"
+    else:
+        title = "Calendars Timed Out"
+    return {
+        "title": title,
+        "subtitle": "Events from {} could not be loaded in time".format(
+            ", ".join(timed_out_calendar_names)
+        ),
+        "valid": "no",
+    }
+
 
-    events_to_display = sort_events_by_time(
-        set(itertools.chain(past_events, upcoming_events))
+# Retrieve the first midnight after the given time, when today's events give
+# way to tomorrow's
+def get_next_midnight(current_datetime: datetime) -> datetime:
+    return datetime.combine(
+        current_datetime.date() + timedelta(days=1), datetime.min.time()
     )
 
+
+# Compute the directives telling Alfred how long the feedback for the given
+# events remains accurate; the feedback can only change when an event crosses
+# the time threshold of its start, when an event ends, or at midnight, so Alfred
+# may serve its own cached results until then (up to the user's configured
+# maximum); if that is too soon to be worth caching, Alfred is instead asked to
+# re-run the script filter just after the feedback changes
+def get_alfred_reload_directives(
+    timeline: EventTimeline, current_datetime: datetime
+) -> dict:
+    current_timestamp = current_datetime.timestamp()
+    next_change_timestamp = get_next_midnight(current_datetime).timestamp()
+    next_event_change_timestamp = timeline.batch.get_next_change_timestamp(
+        current_timestamp, prefs.snapshot.event_time_threshold_mins
+    )
+    if next_event_change_timestamp is not None:
+        next_change_timestamp = min(next_change_timestamp, next_event_change_timestamp)
+    secs_until_change = next_change_timestamp - current_timestamp
+    if secs_until_change < ALFRED_MIN_CACHE_SECS:
+        return {
+            "rerun": round(
+                min(secs_until_change + ALFRED_MIN_RERUN_SECS, ALFRED_MAX_RERUN_SECS),
+                1,
+            )
+        }
+    return {
+        "cache": {
+            "seconds": min(
+                int(secs_until_change),
+                prefs.snapshot.alfred_cache_max_secs,
+                ALFRED_MAX_CACHE_SECS,
+            ),
+            # Once the cache expires, the cached results are no longer
+            # accurate, so Alfred must not show them while re-running
+            "loosereload": False,
+        }
+    }
+
+
+# Build the Alfred feedback object for the given list of today's events; to
+# avoid needlessly resolving conference URLs for lazy events, events are
+# filtered by time first, and only the events which may actually be displayed
+# have their conference URLs resolved; any calendars which timed out are noted
+# at the bottom of the results; the events are indexed by time once (see
+# EventTimeline), and every query is answered as of the given time, or the
+# system's current time if none is given; if the events are stale and being
+# refreshed, Alfred is asked to re-run the script filter to pick up the fresh
+# events
+def get_feedback(
+    events: list[Event],
+    timed_out_calendar_names: Sequence[str] = (),
+    current_datetime: Optional[datetime] = None,
+    is_refreshing: bool = False,
+) -> dict:
+    from ocu.event_timeline import EventTimeline
+
+    if current_datetime is None:
+        current_datetime = datetime.now()
+    current_timestamp = current_datetime.timestamp()
+    time_threshold_mins = prefs.snapshot.event_time_threshold_mins
+    with profile_stage("filter_events"):
+        # The start of every all-day event has already been set to the current
+        # time (when the events were created, or by the caller), so the index
+        # is built as of that same time
+        timeline = EventTimeline(events)
+        batch = timeline.batch
+        upcoming_indices = list(
+            batch.iter_conference_url_indices(
+                timeline.get_upcoming_indices(current_timestamp, time_threshold_mins)
+            )
+        )
+        # If both upcoming events and past events should be listed, only list
+        # the most recent past event (that has a conference URL)
+        if upcoming_indices and timeline.count_past(current_timestamp) > 1:
+            past_indices = list(
+                itertools.islice(
+                    batch.iter_conference_url_indices(
+                        timeline.iter_nearest_past_indices(
+                            current_timestamp, time_threshold_mins
+                        )
+                    ),
+                    1,
+                )
+            )
+        else:
+            past_indices = list(
+                batch.iter_conference_url_indices(
+                    timeline.get_past_indices(current_timestamp)
+                )
+            )
+    upcoming_events = batch.get_events(upcoming_indices)
+    past_events = batch.get_events(past_indices)
+    # Only if there are neither upcoming nor past events do we need to resolve
+    # the conference URLs of the remaining events (since they will all be
+    # displayed); otherwise, we already know there is at least one event with a
+    # conference URL
+    if upcoming_events or past_events:
+        all_events = upcoming_events + past_events
+    else:
+        all_events = batch.get_events(
+            batch.iter_conference_url_indices(range(len(batch)))
+        )
+
+    with profile_stage("sort_events"):
+        # An event may be both upcoming and past (e.g. if it has just ended),
+        # but must only be displayed once
+        events_to_display = batch.get_events(
+            timeline.sort_indices(
+                dict.fromkeys(itertools.chain(past_indices, upcoming_indices)),
+                current_timestamp,
+                time_threshold_mins,
+            )
+        )
+
     # The feedback object which will be fed to Alfred to display the results
     feedback: dict = {"items": []}
     # For convenience, display all events for today if there are no upcoming
@@ -208,10 +448,65 @@ def main() -> None:
         feedback["items"].extend(
             get_event_feedback_item(event) for event in events_to_display
         )
+    # The results are incomplete if any calendar timed out, so they must not
+    # be cached
+    if timed_out_calendar_names:
+        feedback["items"].append(get_timed_out_feedback_item(timed_out_calendar_names))
+    # Stale results must not be cached either; instead, Alfred re-runs the
+    # script filter until the refreshed events are available
+    elif is_refreshing:
+        feedback["rerun"] = STALE_RERUN_SECS
+    # Otherwise, let Alfred cache the results (if the user has allowed it)
+    # until the displayed events next change
+    elif prefs.snapshot.alfred_cache_max_secs > 0:
+        feedback.update(get_alfred_reload_directives(timeline, current_datetime))
+
+    return feedback
+
 
-    # Alfred doesn't appear to care about whitespace in the resulting JSON, so
-    # we are prettifying the JSON output here for easier debugging
-    print(json.dumps(feedback, indent=2))
+def main() -> None:
+    with profile_entry_point("list_events"):
+        feedback: Optional[dict] = None
+        # Ask the resident ocu server for the feedback if the user has enabled
+        # it; if the server isn't running, fall back to fetching events
+        # in-process
+        if prefs.snapshot.use_server:
+            from ocu.server_client import request_feedback_from_server
+
+            with profile_stage("server_request"):
+                feedback = request_feedback_from_server()
+        if feedback is None:
+            from ocu.calendar import get_calendar
+
+            calendar = get_calendar()
+            conference_url_cache = get_conference_url_cache()
+            # Read the clock once, so that every event is parsed and classified
+            # as of the same moment
+            current_datetime = datetime.now()
+            events = get_events_today(
+                lazy=True,
+                calendar=calendar,
+                conference_url_cache=conference_url_cache,
+                current_datetime=current_datetime,
+            )
+            with profile_stage("build_feedback"):
+                feedback = get_feedback(
+                    events,
+                    calendar.get_timed_out_calendar_names(),
+                    current_datetime=current_datetime,
+                    is_refreshing=calendar.is_refreshing(),
+                )
+            # Only the conference URLs which were actually resolved while
+            # building the feedback are cached
+            if conference_url_cache is not None:
+                conference_url_cache.write()
+
+        # Alfred doesn't appear to care about whitespace in the resulting JSON,
+        # so we are prettifying the JSON output here for easier debugging
+        with profile_stage("serialize_json"):
+            feedback_json = json.dumps(feedback, indent=2)
+        with profile_stage("write_output"):
+            print(feedback_json)
 
 
 if __name__ == "__main__":
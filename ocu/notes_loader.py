@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence
+
+from ocu.calendars.base_calendar import BaseCalendar
+from ocu.event import Event
+from ocu.event_dict import EventDict
+from ocu.profiling import profile_stage
+
+# The key which identifies an event across separate fetches of the same
+# calendar
+EventKey = tuple[str, str, str, str]
+
+
+# Retrieve the key which identifies the event with the given raw properties
+# across separate fetches of the same calendar
+def get_event_key(event_dict: EventDict) -> EventKey:
+    return (
+        event_dict.get("title", ""),
+        event_dict["startDate"],
+        event_dict["endDate"],
+        event_dict.get("location", ""),
+    )
+
+
+# The second pass of a two-phase fetch, which fetches the notes of events that
+# were first fetched without them; an event only needs its notes if its other
+# fields lack a URL for the highest-priority conference domain (since no URL in
+# the notes could take precedence over one), and so the notes are fetched on
+# demand, when the first such event has its conference URL resolved; the notes
+# of every such event within the display window (i.e. starting before the end
+# of the time threshold) are fetched together, in a single query spanning only
+# those events, while the notes of any later events are fetched only if those
+# events are ever resolved
+class NotesLoader(object):
+    calendar: BaseCalendar
+    events: list[Event]
+    window_end_datetime: datetime
+    calendar_names: Optional[Sequence[str]]
+    # The notes of each event whose notes have been fetched
+    notes_by_event: dict[Event, str]
+    # The number of fetches made for notes so far
+    fetch_count: int
+
+    # The given events must have been fetched (without their notes) from the
+    # given calendar, to which each event is then attached
+    def __init__(
+        self,
+        calendar: BaseCalendar,
+        events: Iterable[Event],
+        window_end_datetime: datetime,
+        calendar_names: Optional[Sequence[str]] = None,
+    ) -> None:
+        self.calendar = calendar
+        self.events = list(events)
+        self.window_end_datetime = window_end_datetime
+        self.calendar_names = calendar_names
+        self.notes_by_event = {}
+        self.fetch_count = 0
+        for event in self.events:
+            event.notes_loader = self
+
+    # Return True if the given event is in the display window; otherwise,
+    # return False
+    def is_in_window(self, event: Event) -> bool:
+        return event.start_datetime < self.window_end_datetime
+
+    # Retrieve the unresolved events whose notes are needed but have not yet
+    # been fetched, optionally only those within the display window
+    def get_events_needing_notes(self, in_window_only: bool) -> list[Event]:
+        return [
+            event
+            for event in self.events
+            if event.event_dict is not None
+            and event not in self.notes_by_event
+            and (not in_window_only or self.is_in_window(event))
+            and not event.has_top_priority_conference_url(event.event_dict)
+        ]
+
+    # Fetch the notes of the given events, in a single query spanning the range
+    # of time between them; an event missing from the results (e.g. because it
+    # was deleted in the meantime) is given empty notes
+    def fetch_notes(self, events: list[Event]) -> None:
+        # The range is computed from the raw event properties, since the start
+        # of an all-day event is overwritten with the current time (which
+        # would otherwise shift the range, and miss the event cache, on every
+        # run); the end is extended by a minute so that zero-duration events
+        # still overlap the range
+        start_datetime = min(
+            event.parse_datetime(event.event_dict["startDate"])
+            for event in events
+            if event.event_dict is not None
+        )
+        end_datetime = max(
+            event.parse_datetime(event.event_dict["endDate"])
+            for event in events
+            if event.event_dict is not None
+        ) + timedelta(minutes=1)
+        with profile_stage("fetch_event_notes"):
+            event_dicts = self.calendar.get_event_dicts(
+                start_datetime, end_datetime, self.calendar_names
+            )
+        self.fetch_count += 1
+        notes_by_key: dict[EventKey, str] = {}
+        for event_dict in event_dicts:
+            notes_by_key.setdefault(
+                get_event_key(event_dict), event_dict.get("notes", "")
+            )
+        for event in events:
+            if event.event_dict is not None:
+                self.notes_by_event[event] = notes_by_key.get(
+                    get_event_key(event.event_dict), ""
+                )
+
+    # Retrieve the given raw properties of the given event, adding the event's
+    # notes (which are fetched first, if need be) if they could change its
+    # conference URL
+    def add_notes(self, event: Event, event_dict: EventDict) -> EventDict:
+        if event not in self.notes_by_event:
+            if event.has_top_priority_conference_url(event_dict):
+                return event_dict
+            self.fetch_notes(
+                self.get_events_needing_notes(in_window_only=self.is_in_window(event))
+            )
+        return {**event_dict, "notes": self.notes_by_event[event]}
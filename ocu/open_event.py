@@ -1,12 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import re
+import os
+import os.path
 import subprocess
 import sys
+import time
 from typing import Optional
 
-from ocu.prefs import prefs
+from ocu.profiling import profile_entry_point, profile_stage
 
 
 def should_open_google_meet_app(url: Optional[str]) -> bool:
@@ -18,45 +20,117 @@ def should_open_google_meet_app(url: Optional[str]) -> bool:
     if not url:
         return False
 
-    is_google_url = bool(re.search(r"https://(meet\.google\.com)", url))
+    is_google_url = "https://meet.google.com" in url
     if not is_google_url:
         return False
 
-    # Check if the user prefers to open Google Meet URLs in the native app
+    # Check if the user prefers to open Google Meet URLs in the native app; the
+    # preferences are only imported when actually needed, since most URLs can
+    # be opened without them
+    from ocu.prefs import prefs
+
     return prefs["use_direct_gmeet"]
 
 
-def open_url_with_native_app(url: str, app_name: str) -> None:
+# The number of seconds for which an application that could not be opened is
+# remembered as missing (so that it is not tried again), in case the user
+# installs it later
+APP_UNAVAILABLE_TTL_SECS = 24 * 60 * 60
+# The shell command which reports (via a notification) that the conference URL
+# could not be opened
+NOTIFY_FAILURE_SCRIPT = (
+    "osascript -e 'display notification \"The conference URL could not be"
+    ' opened" with title "Open Conference URL"\''
+)
+# The shell script which opens the URL given as its first argument with the
+# default handler
+OPEN_URL_SCRIPT = f'open "$1" || {NOTIFY_FAILURE_SCRIPT}'
+# The shell script which opens the URL given as its second argument with the
+# application named by its first argument; if the application cannot be opened,
+# the file given as its third argument is created (so that the application is
+# not tried again), and the URL is opened with the default handler instead
+OPEN_URL_WITH_APP_SCRIPT = (
+    'open -a "$1" "$2" || { : > "$3"; open "$2" || ' + NOTIFY_FAILURE_SCRIPT + "; }"
+)
+
+
+def spawn_detached(script: str, *args: str) -> None:
+    """
+    Run the given shell script (with the given arguments) in a new session,
+    without waiting for it to finish; since the workflow has exited by then,
+    the script must report any failures itself
+    """
+    subprocess.Popen(
+        ["/bin/sh", "-c", script, "sh", *args],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def get_app_unavailable_marker_path(app_name: str) -> str:
+    """
+    Return the path to the file which marks the given application as missing
     """
-    Open the given URL with the specified native application using macOS open command
+    from ocu.cache_utils import get_cache_dir, get_fingerprint
+
+    return os.path.join(get_cache_dir(), f"app-unavailable-{get_fingerprint(app_name)}")
+
+
+def is_app_known_unavailable(marker_path: str) -> bool:
+    """
+    Return True if the application with the given marker file recently failed
+    to open; return False otherwise
     """
     try:
-        subprocess.run(["open", "-a", app_name, url], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Failed to open URL with {app_name}: {e}", file=sys.stderr)
-        # Fallback to default browser
-        open_url_no_app(url)
-    except FileNotFoundError:
+        marker_age_secs = time.time() - os.path.getmtime(marker_path)
+    except OSError:
+        return False
+    return 0 <= marker_age_secs < APP_UNAVAILABLE_TTL_SECS
+
+
+def open_url_with_native_app(url: str, app_name: str) -> None:
+    """
+    Open the given URL with the specified native application using macOS open
+    command, without waiting for it to open; if the application is known to be
+    missing, the URL is opened with the default browser instead
+    """
+    marker_path = get_app_unavailable_marker_path(app_name)
+    if is_app_known_unavailable(marker_path):
         print(
             f"Application {app_name} not found, opening with default browser",
             file=sys.stderr,
         )
+        open_url_no_app(url)
+        return
+    try:
+        spawn_detached(OPEN_URL_WITH_APP_SCRIPT, app_name, url, marker_path)
+    except OSError as e:
+        print(f"Failed to open URL with {app_name}: {e}", file=sys.stderr)
         # Fallback to default browser
         open_url_no_app(url)
 
 
 def open_url_no_app(url: str) -> None:
     """
-    Open the given URL with the default browser/application
+    Open the given URL with the default browser/application, without waiting
+    for it to open
     """
     try:
-        subprocess.run(["open", url], check=True)
-    except subprocess.CalledProcessError as e:
+        spawn_detached(OPEN_URL_SCRIPT, url)
+    except OSError as e:
         print(f"Failed to open URL: {e}", file=sys.stderr)
         sys.exit(1)
 
 
 def main() -> None:
+    with profile_entry_point("open_event"):
+        open_conference_url()
+
+
+# Open the conference URL given on the command line
+def open_conference_url() -> None:
     # Get the conference URL from command line arguments
     if len(sys.argv) < 2:
         print("Usage: open-event.py <conference_url>", file=sys.stderr)
@@ -71,7 +145,8 @@ def main() -> None:
         # so they automatically open in native apps. Google Meet doesn't have a
         # custom protocol, so we need special handling with the -a flag.
 
-        open_google_meet = should_open_google_meet_app(conference_url)
+        with profile_stage("check_google_meet"):
+            open_google_meet = should_open_google_meet_app(conference_url)
         if open_google_meet:
             print(
                 f"Opening Google Meet URL in Desktop app: {conference_url}",
@@ -79,8 +154,11 @@ def main() -> None:
             )
 
             # Get the configured Google Meet app name (default: "Google Meet")
+            from ocu.prefs import prefs
+
             gmeet_app_name = prefs["gmeet_app_name"] or "Google Meet"
-            open_url_with_native_app(conference_url, gmeet_app_name)
+            with profile_stage("open_url"):
+                open_url_with_native_app(conference_url, gmeet_app_name)
         else:
             print(
                 f"Opening conference URL: {conference_url}",
@@ -88,12 +166,14 @@ def main() -> None:
             )
             # For all other URLs (including Zoom/Teams with native protocols,
             # or when native app preference is disabled), open with default handler
-            open_url_no_app(conference_url)
+            with profile_stage("open_url"):
+                open_url_no_app(conference_url)
 
     except Exception as error:
         print(f"Error processing conference URL: {error}", file=sys.stderr)
         # Fallback to default browser
-        open_url_no_app(conference_url)
+        with profile_stage("open_url_fallback"):
+            open_url_no_app(conference_url)
 
 
 if __name__ == "__main__":
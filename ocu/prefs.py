@@ -3,7 +3,8 @@
 
 import os
 import re
-from typing import Any, Callable, Literal, Union
+from dataclasses import dataclass
+from typing import Any, Callable, Literal, Optional, Union
 
 # The available preference names for this workflow; if you wish to access a
 # preference's value using subscripting (i.e. via square brackets), you must use
@@ -18,16 +19,74 @@
     Literal["gmeet_app_name"],
     Literal["use_icalbuddy"],
     Literal["time_system"],
+    Literal["event_cache_ttl_secs"],
+    Literal["use_server"],
+    Literal["use_icalbuddy_streaming"],
+    Literal["ics_file_paths"],
+    Literal["calendar_fetch_concurrency"],
+    Literal["calendar_fetch_timeout_secs"],
+    Literal["use_adaptive_backend"],
+    Literal["use_hedged_fetch"],
+    Literal["use_icalbuddy_memo"],
+    Literal["use_conference_url_cache"],
+    Literal["alfred_cache_max_secs"],
+    Literal["use_deferred_notes"],
+    Literal["calendar_deadline_secs"],
+    Literal["use_stale_while_revalidate"],
 ]
 
 
+# An immutable snapshot of every workflow preference, parsed from the
+# environment exactly once; list-based preferences are stored as tuples so that
+# the snapshot (and its fields) can be hashed
+@dataclass(frozen=True)
+class PrefsSnapshot(object):
+    conference_domains: tuple[str, ...]
+    calendar_names: tuple[str, ...]
+    event_time_threshold_mins: int
+    use_direct_zoom: bool
+    use_direct_msteams: bool
+    use_direct_gmeet: bool
+    gmeet_app_name: str
+    use_icalbuddy: bool
+    time_system: str
+    event_cache_ttl_secs: int
+    use_server: bool
+    use_icalbuddy_streaming: bool
+    ics_file_paths: tuple[str, ...]
+    calendar_fetch_concurrency: int
+    calendar_fetch_timeout_secs: float
+    use_adaptive_backend: bool
+    use_hedged_fetch: bool
+    use_icalbuddy_memo: bool
+    use_conference_url_cache: bool
+    alfred_cache_max_secs: int
+    use_deferred_notes: bool
+    calendar_deadline_secs: float
+    use_stale_while_revalidate: bool
+    # The raw (unparsed) preference values, as sorted (name, value) pairs
+    raw_values: tuple[tuple[str, str], ...]
+
+    # A fingerprint of the raw preference values which, unlike hash(), is
+    # stable across processes and can therefore be used in persistent cache
+    # keys; it is computed on demand so that hashing (and its imports) stays
+    # off the startup path
+    @property
+    def fingerprint(self) -> str:
+        from ocu.cache_utils import get_fingerprint
+
+        return get_fingerprint(dict(self.raw_values))
+
+
 # A utility class for retrieving user preferences for this workflow; all
 # preferences are stored as Alfred Workflow variables, and are exposed to the
 # scripting runtime as environment variables
 class Prefs(object):
     pref_field_types: dict[PrefName, Callable]
+    cached_snapshot: Optional[PrefsSnapshot]
 
     def __init__(self) -> None:
+        self.cached_snapshot = None
         self.pref_field_types = {
             "conference_domains": self.convert_str_to_list,
             "calendar_names": self.convert_str_to_list,
@@ -38,6 +97,20 @@ def __init__(self) -> None:
             "gmeet_app_name": str,
             "use_icalbuddy": self.convert_str_to_bool,
             "time_system": str,
+            "event_cache_ttl_secs": self.convert_str_to_int,
+            "use_server": self.convert_str_to_bool,
+            "use_icalbuddy_streaming": self.convert_str_to_bool,
+            "ics_file_paths": self.convert_str_to_list,
+            "calendar_fetch_concurrency": self.convert_str_to_int,
+            "calendar_fetch_timeout_secs": self.convert_str_to_float,
+            "use_adaptive_backend": self.convert_str_to_bool,
+            "use_hedged_fetch": self.convert_str_to_bool,
+            "use_icalbuddy_memo": self.convert_str_to_bool,
+            "use_conference_url_cache": self.convert_str_to_bool,
+            "alfred_cache_max_secs": self.convert_str_to_int,
+            "use_deferred_notes": self.convert_str_to_bool,
+            "calendar_deadline_secs": self.convert_str_to_float,
+            "use_stale_while_revalidate": self.convert_str_to_bool,
         }
 
     # Convert a comma-separated string of values to a proper list type
@@ -53,9 +126,58 @@ def convert_str_to_list(self, value: str) -> list:
     def convert_str_to_bool(self, value: str) -> bool:
         return value.lower().strip() in ("1", "y", "yes", "true", "t")
 
+    # Convert an integer-like string value to a proper integer, treating a blank
+    # (or malformed) value as zero, which is how optional numeric preferences
+    # are disabled; a typo in a preference must not stop the workflow from
+    # running at all
+    def convert_str_to_int(self, value: str) -> int:
+        try:
+            return int(value.strip() or 0)
+        except ValueError:
+            return 0
+
+    # Convert a number-like string value to a proper float, treating a blank
+    # (or malformed) value as zero, just like convert_str_to_int()
+    def convert_str_to_float(self, value: str) -> float:
+        try:
+            return float(value.strip() or 0)
+        except ValueError:
+            return 0.0
+
     def __getitem__(self, pref_name: PrefName) -> Any:
         converter = self.pref_field_types[pref_name]
         return converter(os.environ.get(pref_name, ""))
 
+    # Parse every preference from the environment into a new snapshot
+    def parse_snapshot(self) -> PrefsSnapshot:
+        raw_values = {
+            pref_name: os.environ.get(pref_name, "")
+            for pref_name in self.pref_field_types
+        }
+        parsed_values = {}
+        for pref_name, converter in self.pref_field_types.items():
+            value = converter(raw_values[pref_name])
+            parsed_values[pref_name] = (
+                tuple(value) if isinstance(value, list) else value
+            )
+        return PrefsSnapshot(
+            **parsed_values, raw_values=tuple(sorted(raw_values.items()))
+        )
+
+    # The snapshot of all preferences, which is parsed on first access and then
+    # reused for the lifetime of the process (or until refreshed); hot code
+    # paths should read preferences from here rather than via subscripting
+    @property
+    def snapshot(self) -> PrefsSnapshot:
+        if self.cached_snapshot is None:
+            self.cached_snapshot = self.parse_snapshot()
+        return self.cached_snapshot
+
+    # Discard the current snapshot so that preferences are re-parsed from the
+    # environment on next access; long-running embedders (like the ocu server)
+    # must call this whenever the environment changes
+    def refresh(self) -> None:
+        self.cached_snapshot = None
+
 
 prefs = Prefs()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import contextlib
+import os
+import sys
+import time
+from datetime import datetime
+from typing import ContextManager, Iterator, Optional
+
+# The environment variable which enables profiling; if it is set to "1",
+# "true", or "stderr", the timing report is written to stderr, and otherwise,
+# its value is treated as the path of the file to write the report to
+PROFILE_ENV_VAR_NAME = "ocu_profile"
+# The environment variable which, if set to a file path, additionally dumps the
+# cProfile statistics for the entire run to that path (as a .pstats file)
+PSTATS_ENV_VAR_NAME = "ocu_profile_pstats"
+# The values of the profiling environment variable which write the report to
+# stderr rather than to a file
+STDERR_DESTINATIONS = ("1", "true", "stderr")
+
+
+# The timings collected while profiling a single run of an entry point; stages
+# may be nested, and a stage entered multiple times accumulates its total time
+class Profile(object):
+    entry_point: str
+    created: datetime
+    start_time: float
+    stage_timings: dict[str, dict]
+
+    def __init__(self, entry_point: str) -> None:
+        self.entry_point = entry_point
+        self.created = datetime.now()
+        self.start_time = time.perf_counter()
+        self.stage_timings = {}
+
+    # Time the code within the context as the given named stage
+    @contextlib.contextmanager
+    def stage(self, stage_name: str) -> Iterator[None]:
+        stage_start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_secs = time.perf_counter() - stage_start_time
+            stage_timing = self.stage_timings.setdefault(
+                stage_name, {"calls": 0, "total_ms": 0.0}
+            )
+            stage_timing["calls"] += 1
+            stage_timing["total_ms"] += elapsed_secs * 1000
+
+    # Build the structured timing report for this run
+    def get_report(self) -> dict:
+        import platform
+
+        return {
+            "entry_point": self.entry_point,
+            "created": self.created.isoformat(timespec="seconds"),
+            "python_version": platform.python_version(),
+            "platform": sys.platform,
+            "total_ms": round((time.perf_counter() - self.start_time) * 1000, 3),
+            "stages": {
+                stage_name: {
+                    "calls": stage_timing["calls"],
+                    "total_ms": round(stage_timing["total_ms"], 3),
+                }
+                for stage_name, stage_timing in self.stage_timings.items()
+            },
+        }
+
+
+# The profile for the entry point currently being run, if profiling is enabled
+active_profile: Optional[Profile] = None
+
+
+# Time the code within the context as the given named stage, if profiling is
+# enabled; otherwise, this is a no-op
+def profile_stage(stage_name: str) -> ContextManager[None]:
+    if active_profile is None:
+        return contextlib.nullcontext()
+    return active_profile.stage(stage_name)
+
+
+# Write the given timing report to stderr or to the file at the given path; a
+# failure to write the report must never prevent the workflow from working
+def write_profile_report(report: dict, report_dest: str) -> None:
+    import json
+
+    report_json = json.dumps(report, indent=2)
+    if report_dest.lower() in STDERR_DESTINATIONS:
+        print(report_json, file=sys.stderr)
+        return
+    try:
+        with open(report_dest, "w") as report_file:
+            report_file.write(report_json)
+    except OSError as error:
+        print(f"Failed to write profile report: {error}", file=sys.stderr)
+
+
+# Profile the code within the context as a run of the given entry point, if
+# profiling has been enabled via the environment; the report is written when
+# the context exits, even if it exits via an exception (including SystemExit);
+# the modules needed for profiling are only imported once it is enabled, so that
+# they stay off the startup path of every other run
+@contextlib.contextmanager
+def profile_entry_point(entry_point: str) -> Iterator[None]:
+    global active_profile
+    report_dest = os.environ.get(PROFILE_ENV_VAR_NAME, "")
+    pstats_path = os.environ.get(PSTATS_ENV_VAR_NAME, "")
+    if not report_dest and not pstats_path:
+        yield
+        return
+    import cProfile
+
+    active_profile = Profile(entry_point)
+    profiler = cProfile.Profile() if pstats_path else None
+    try:
+        if profiler:
+            profiler.enable()
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            try:
+                profiler.dump_stats(pstats_path)
+            except OSError as error:
+                print(f"Failed to write profile stats: {error}", file=sys.stderr)
+        report = active_profile.get_report()
+        active_profile = None
+        if report_dest:
+            write_profile_report(report, report_dest)
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import functools
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Generic, Iterable, Iterator, Optional, TypeVar
+from zoneinfo import ZoneInfo
+
+# The two-letter weekday codes used by RRULE, in the same order as the values
+# returned by date.weekday()
+WEEKDAY_CODES = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+# The recurrence frequencies which can be expanded
+SUPPORTED_FREQS = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+# The RRULE parts which can be expanded; a rule with any other part (e.g.
+# BYSETPOS or BYHOUR) is rejected rather than expanded incorrectly
+SUPPORTED_RULE_PARTS = (
+    "FREQ",
+    "INTERVAL",
+    "COUNT",
+    "UNTIL",
+    "BYDAY",
+    "BYMONTHDAY",
+    "BYMONTH",
+    "WKST",
+)
+# The maximum number of periods (e.g. weeks for a weekly rule) to walk when
+# locating the final occurrence of a rule with a COUNT
+MAX_COUNTED_PERIODS = 100_000
+
+# The type of the arbitrary value associated with each recurrence master in a
+# RecurrenceIndex (e.g. the location of the master within a file)
+T = TypeVar("T")
+
+
+# Retrieve the time zone with the given IANA identifier, or None if the
+# identifier is unknown (e.g. a Windows time zone name)
+@functools.lru_cache(maxsize=32)
+def get_time_zone(tz_id: str) -> Optional[tzinfo]:
+    if tz_id.upper() in ("UTC", "Z"):
+        return timezone.utc
+    try:
+        return ZoneInfo(tz_id)
+    except (ValueError, OSError, LookupError):
+        return None
+
+
+# Convert the given wall time in the given time zone to a naive datetime in the
+# system's local time zone; a wall time with no time zone (i.e. a floating
+# time) is already local
+def convert_to_local(wall_datetime: datetime, tz: Optional[tzinfo]) -> datetime:
+    if tz is None:
+        return wall_datetime
+    return wall_datetime.replace(tzinfo=tz).astimezone().replace(tzinfo=None)
+
+
+# Retrieve the number of days in the given month
+def get_days_in_month(year: int, month: int) -> int:
+    if month == 12:
+        return 31
+    return (date(year, month + 1, 1) - date(year, month, 1)).days
+
+
+# A parsed RRULE; rules are immutable and hashable so that they can be used to
+# group recurrence masters, and as keys for memoized expansions
+@dataclass(frozen=True)
+class RecurrenceRule(object):
+    freq: str
+    interval: int = 1
+    count: Optional[int] = None
+    # The (inclusive) end of the recurrence, and whether it is in UTC (rather
+    # than in the wall time of the recurrence master)
+    until: Optional[datetime] = None
+    until_is_utc: bool = False
+    # Each weekday (as an index into WEEKDAY_CODES) on which the rule recurs,
+    # paired with its ordinal within the month or year (e.g. 2 for the second
+    # Tuesday, or -1 for the last Friday), or 0 for every such weekday
+    by_day: tuple[tuple[int, int], ...] = ()
+    by_month_day: tuple[int, ...] = ()
+    by_month: tuple[int, ...] = ()
+    week_start: int = 0
+
+    # Parse the given RRULE value (e.g. FREQ=WEEKLY;BYDAY=MO,WE), raising a
+    # ValueError if it is malformed or uses unsupported parts
+    @classmethod
+    @functools.lru_cache(maxsize=1024)
+    def parse(cls, rrule: str) -> "RecurrenceRule":
+        rule_parts = {}
+        for rule_part in rrule.strip().upper().split(";"):
+            if not rule_part:
+                continue
+            name, _, value = rule_part.partition("=")
+            if name not in SUPPORTED_RULE_PARTS:
+                raise ValueError(f"Unsupported RRULE part: {name}")
+            rule_parts[name] = value
+        freq = rule_parts.get("FREQ", "")
+        if freq not in SUPPORTED_FREQS:
+            raise ValueError(f"Unsupported RRULE frequency: {freq}")
+        until = None
+        until_value = rule_parts.get("UNTIL", "")
+        if len(until_value) == 8:
+            # An UNTIL date includes the entirety of that date
+            until = datetime.combine(
+                datetime.strptime(until_value, "%Y%m%d").date(), time.max
+            )
+        elif until_value:
+            until = datetime.strptime(until_value[:15], "%Y%m%dT%H%M%S")
+        interval = int(rule_parts.get("INTERVAL") or 1)
+        if interval < 1:
+            raise ValueError(f"Invalid RRULE interval: {interval}")
+        return cls(
+            freq=freq,
+            interval=interval,
+            count=int(rule_parts["COUNT"]) if rule_parts.get("COUNT") else None,
+            until=until,
+            until_is_utc=until_value.endswith("Z"),
+            by_day=tuple(
+                (int(day_value[:-2] or 0), WEEKDAY_CODES.index(day_value[-2:]))
+                for day_value in rule_parts.get("BYDAY", "").split(",")
+                if day_value
+            ),
+            by_month_day=tuple(
+                int(month_day)
+                for month_day in rule_parts.get("BYMONTHDAY", "").split(",")
+                if month_day
+            ),
+            by_month=tuple(
+                int(month)
+                for month in rule_parts.get("BYMONTH", "").split(",")
+                if month
+            ),
+            week_start=WEEKDAY_CODES.index(rule_parts.get("WKST") or "MO"),
+        )
+
+    # The weekdays (ignoring ordinals) on which this rule recurs, if restricted
+    @property
+    def weekdays(self) -> frozenset[int]:
+        return frozenset(weekday for _, weekday in self.by_day)
+
+    # Retrieve the first date of the period (e.g. the week, for a weekly rule)
+    # which contains the given date
+    def get_period_start(self, day: date) -> date:
+        if self.freq == "WEEKLY":
+            return day - timedelta(days=(day.weekday() - self.week_start) % 7)
+        elif self.freq == "MONTHLY":
+            return day.replace(day=1)
+        elif self.freq == "YEARLY":
+            return day.replace(month=1, day=1)
+        else:
+            return day
+
+    # Retrieve the number of periods between the periods containing the two
+    # given dates
+    def get_period_index(self, start_date: date, day: date) -> int:
+        if self.freq == "WEEKLY":
+            return (
+                self.get_period_start(day) - self.get_period_start(start_date)
+            ).days // 7
+        elif self.freq == "MONTHLY":
+            return (day.year - start_date.year) * 12 + day.month - start_date.month
+        elif self.freq == "YEARLY":
+            return day.year - start_date.year
+        else:
+            return (day - start_date).days
+
+    # Retrieve the first date of the period at the given index, relative to the
+    # period containing the given start date
+    def get_nth_period_start(self, start_date: date, period_index: int) -> date:
+        if self.freq == "WEEKLY":
+            return self.get_period_start(start_date) + timedelta(weeks=period_index)
+        elif self.freq == "MONTHLY":
+            month_index = start_date.month - 1 + period_index
+            return date(start_date.year + month_index // 12, month_index % 12 + 1, 1)
+        elif self.freq == "YEARLY":
+            return date(start_date.year + period_index, 1, 1)
+        else:
+            return start_date + timedelta(days=period_index)
+
+    # Resolve the BYMONTHDAY values (which may count back from the end of the
+    # month) to days of the given month
+    def get_month_days(self, year: int, month: int) -> set[int]:
+        days_in_month = get_days_in_month(year, month)
+        return {
+            month_day if month_day > 0 else days_in_month + month_day + 1
+            for month_day in self.by_month_day
+            if 1 <= abs(month_day) <= days_in_month
+        }
+
+    # Retrieve the dates within the given span of dates which match the BYDAY
+    # values, with any ordinals counted relative to that span
+    def get_weekday_dates(self, first_date: date, last_date: date) -> set[date]:
+        weekday_dates: set[date] = set()
+        for ordinal, weekday in self.by_day:
+            first_match = first_date + timedelta(
+                days=(weekday - first_date.weekday()) % 7
+            )
+            match_count = (last_date - first_match).days // 7 + 1
+            if ordinal == 0:
+                weekday_dates.update(
+                    first_match + timedelta(weeks=i) for i in range(match_count)
+                )
+            elif 1 <= ordinal <= match_count:
+                weekday_dates.add(first_match + timedelta(weeks=ordinal - 1))
+            elif 1 <= -ordinal <= match_count:
+                weekday_dates.add(first_match + timedelta(weeks=match_count + ordinal))
+        return weekday_dates
+
+    # Retrieve the dates within the given month on which this rule recurs
+    def get_dates_in_month(self, start_date: date, year: int, month: int) -> set[date]:
+        month_dates: Optional[set[date]] = None
+        if self.by_month_day:
+            month_dates = {
+                date(year, month, month_day)
+                for month_day in self.get_month_days(year, month)
+            }
+        if self.by_day:
+            weekday_dates = self.get_weekday_dates(
+                date(year, month, 1),
+                date(year, month, get_days_in_month(year, month)),
+            )
+            month_dates = (
+                weekday_dates if month_dates is None else month_dates & weekday_dates
+            )
+        if month_dates is None:
+            if start_date.day > get_days_in_month(year, month):
+                return set()
+            return {date(year, month, start_date.day)}
+        return month_dates
+
+    # Retrieve the dates within the period starting on the given date on which
+    # this rule recurs (ignoring the interval, COUNT, and UNTIL)
+    def get_dates_in_period(self, start_date: date, period_start: date) -> set[date]:
+        if self.freq == "DAILY":
+            if self.by_month and period_start.month not in self.by_month:
+                return set()
+            if self.by_day and period_start.weekday() not in self.weekdays:
+                return set()
+            if self.by_month_day and period_start.day not in self.get_month_days(
+                period_start.year, period_start.month
+            ):
+                return set()
+            return {period_start}
+        elif self.freq == "WEEKLY":
+            weekdays = self.weekdays or {start_date.weekday()}
+            return {
+                period_start + timedelta(days=i)
+                for i in range(7)
+                if (period_start + timedelta(days=i)).weekday() in weekdays
+                and (
+                    not self.by_month
+                    or (period_start + timedelta(days=i)).month in self.by_month
+                )
+            }
+        elif self.freq == "MONTHLY":
+            if self.by_month and period_start.month not in self.by_month:
+                return set()
+            return self.get_dates_in_month(
+                start_date, period_start.year, period_start.month
+            )
+        year = period_start.year
+        if self.by_month:
+            if not self.by_day and not self.by_month_day:
+                return {
+                    date(year, month, start_date.day)
+                    for month in self.by_month
+                    if start_date.day <= get_days_in_month(year, month)
+                }
+            return set().union(
+                *(
+                    self.get_dates_in_month(start_date, year, month)
+                    for month in self.by_month
+                )
+            )
+        elif self.by_day and not self.by_month_day:
+            # Ordinals of a yearly rule (e.g. 20MO) count within the year
+            return self.get_weekday_dates(date(year, 1, 1), date(year, 12, 31))
+        elif self.by_month_day:
+            return set().union(
+                *(
+                    self.get_dates_in_month(start_date, year, month)
+                    for month in range(1, 13)
+                )
+            )
+        elif start_date.day <= get_days_in_month(year, start_date.month):
+            return {date(year, start_date.month, start_date.day)}
+        return set()
+
+
+# Retrieve the dates within the period starting on the given date on which the
+# given rule recurs; the result is shared by every master with the same rule
+# and start date
+@functools.lru_cache(maxsize=4096)
+def get_rule_dates_in_period(
+    rule: RecurrenceRule, start_date: date, period_start: date
+) -> frozenset[date]:
+    return frozenset(rule.get_dates_in_period(start_date, period_start))
+
+
+# Retrieve the date of the final occurrence of the given rule (which must have
+# a COUNT) when starting on the given date; this is the only computation which
+# must walk the recurrence from its start, and it is only ever done once per
+# rule and start date
+@functools.lru_cache(maxsize=4096)
+def get_final_counted_date(rule: RecurrenceRule, start_date: date) -> Optional[date]:
+    remaining_count = rule.count or 0
+    final_date = None
+    for period_index in range(0, MAX_COUNTED_PERIODS, rule.interval):
+        period_dates = sorted(
+            day
+            for day in get_rule_dates_in_period(
+                rule, start_date, rule.get_nth_period_start(start_date, period_index)
+            )
+            if day >= start_date
+        )
+        # The start of a recurrence is always its first occurrence
+        if period_index == 0 and start_date not in period_dates:
+            period_dates.insert(0, start_date)
+        if len(period_dates) >= remaining_count:
+            return period_dates[remaining_count - 1] if remaining_count else final_date
+        remaining_count -= len(period_dates)
+        if period_dates:
+            final_date = period_dates[-1]
+    return final_date
+
+
+# Return True if the given rule, starting on the given date, recurs on the
+# given date (ignoring UNTIL, which depends on the time of day); this is
+# computed directly from the date, without walking the recurrence
+@functools.lru_cache(maxsize=65536)
+def does_rule_occur_on_date(rule: RecurrenceRule, start_date: date, day: date) -> bool:
+    if day < start_date:
+        return False
+    if day == start_date:
+        return True
+    if rule.get_period_index(start_date, day) % rule.interval != 0:
+        return False
+    if day not in get_rule_dates_in_period(
+        rule, start_date, rule.get_period_start(day)
+    ):
+        return False
+    if rule.count is not None:
+        final_date = get_final_counted_date(rule, start_date)
+        return final_date is not None and day <= final_date
+    return True
+
+
+# Return True if the given rule could recur on the given date regardless of
+# when it starts; this allows a whole group of masters sharing a rule to be
+# skipped at once
+@functools.lru_cache(maxsize=4096)
+def may_rule_occur_on_date(rule: RecurrenceRule, day: date) -> bool:
+    if rule.by_month and day.month not in rule.by_month:
+        return False
+    if rule.freq in ("DAILY", "WEEKLY") and rule.by_day:
+        return day.weekday() in rule.weekdays
+    return True
+
+
+# Expand the given rule into the (local) start times of its occurrences which
+# begin on the given date or within the given number of days before it; the
+# expansion is memoized by rule, start, time zone, and date, so repeated
+# queries for the same day never expand a series more than once
+@functools.lru_cache(maxsize=65536)
+def expand_rule_on_date(
+    rule: RecurrenceRule,
+    start: datetime,
+    tz_id: Optional[str],
+    day: date,
+    lookback_days: int,
+) -> tuple[datetime, ...]:
+    tz = get_time_zone(tz_id) if tz_id else None
+    until = rule.until
+    if until is not None and rule.until_is_utc:
+        until = convert_to_local(until, timezone.utc)
+        # The local UNTIL must be compared against the local occurrence times
+        check_until_locally = True
+    else:
+        check_until_locally = False
+    occurrence_starts = []
+    # Converting an occurrence from its own time zone to local time may move
+    # it onto an adjacent date, so the dates either side are also checked
+    for day_offset in range(-lookback_days - 1, 2):
+        candidate_date = day + timedelta(days=day_offset)
+        if not does_rule_occur_on_date(rule, start.date(), candidate_date):
+            continue
+        wall_start = datetime.combine(candidate_date, start.time())
+        if until is not None and not check_until_locally and wall_start > until:
+            continue
+        local_start = convert_to_local(wall_start, tz)
+        if until is not None and check_until_locally and local_start > until:
+            continue
+        occurrence_starts.append(local_start)
+    return tuple(occurrence_starts)
+
+
+# A recurring event (i.e. the VEVENT with an RRULE), which can be expanded into
+# its concrete occurrences on any given day
+@dataclass(frozen=True)
+class RecurrenceMaster(object):
+    rule: RecurrenceRule
+    # The start of the first occurrence, as a wall time in the master's time
+    # zone (or in local time if tz_id is None)
+    start: datetime
+    duration: timedelta
+    tz_id: Optional[str] = None
+    # The local start times of occurrences which have been deleted (EXDATE) or
+    # overridden by a separate event (RECURRENCE-ID)
+    excluded_starts: frozenset[datetime] = frozenset()
+    # The local start times of any additional occurrences (RDATE)
+    extra_starts: tuple[datetime, ...] = ()
+
+    # The number of days before a given day on which an occurrence could start
+    # and still be ongoing on that day
+    @property
+    def lookback_days(self) -> int:
+        return max(0, (self.duration - timedelta(microseconds=1)).days) + 1
+
+    # Return True if an occurrence starting at the given (local) time takes
+    # place on the given day
+    def does_occurrence_span_date(self, occurrence_start: datetime, day: date) -> bool:
+        occurrence_end = occurrence_start + self.duration
+        last_date = max(
+            occurrence_start.date(),
+            (occurrence_end - timedelta(microseconds=1)).date(),
+        )
+        return occurrence_start.date() <= day <= last_date
+
+    # Retrieve the (local) start times of every occurrence of this master which
+    # takes place on the given day, in chronological order
+    def get_occurrence_starts(self, day: date) -> list[datetime]:
+        candidate_starts = expand_rule_on_date(
+            self.rule, self.start, self.tz_id, day, self.lookback_days
+        )
+        return sorted(
+            occurrence_start
+            for occurrence_start in (*candidate_starts, *self.extra_starts)
+            if occurrence_start not in self.excluded_starts
+            and self.does_occurrence_span_date(occurrence_start, day)
+        )
+
+
+# An index of recurrence masters grouped by their rule, so that every master
+# sharing a rule which cannot recur on a given day is skipped at once; each
+# master is associated with an arbitrary value identifying it (e.g. its
+# location within a file)
+class RecurrenceIndex(Generic[T]):
+    masters_by_rule: dict[RecurrenceRule, list[tuple[RecurrenceMaster, T]]]
+
+    def __init__(self, masters: Iterable[tuple[RecurrenceMaster, T]] = ()) -> None:
+        self.masters_by_rule = {}
+        for master, value in masters:
+            self.add_master(master, value)
+
+    # Add the given master (and its associated value) to the index
+    def add_master(self, master: RecurrenceMaster, value: T) -> None:
+        self.masters_by_rule.setdefault(master.rule, []).append((master, value))
+
+    # Yield each occurrence which takes place on the given day, as its master's
+    # associated value and the occurrence's (local) start and end times
+    def iter_occurrences(self, day: date) -> Iterator[tuple[T, datetime, datetime]]:
+        for rule, rule_masters in self.masters_by_rule.items():
+            lookback_days = max(master.lookback_days for master, _ in rule_masters)
+            if not any(
+                may_rule_occur_on_date(rule, day + timedelta(days=day_offset))
+                for day_offset in range(-lookback_days - 1, 2)
+            ):
+                continue
+            for master, value in rule_masters:
+                for occurrence_start in master.get_occurrence_starts(day):
+                    yield value, occurrence_start, occurrence_start + master.duration
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import sys
+from datetime import datetime
+
+from ocu.calendar import get_calendar
+from ocu.calendars.cached_calendar import CachedCalendar
+from ocu.profiling import profile_entry_point
+
+
+# Refresh the cached event data for the query given (as JSON) on the command
+# line; this is run as a detached process by CachedCalendar whenever it serves
+# stale event data in stale-while-revalidate mode
+def main() -> None:
+    with profile_entry_point("refresh_events"):
+        query = json.loads(sys.argv[1])
+        calendar = get_calendar()
+        # The event cache may have been disabled since the refresh was started
+        if not isinstance(calendar, CachedCalendar):
+            return
+        calendar.refresh_event_dicts(
+            datetime.fromisoformat(query["start"]),
+            datetime.fromisoformat(query["end"]),
+            query["calendar_names"],
+            query["include_notes"],
+        )
+
+
+if __name__ == "__main__":
+    main()
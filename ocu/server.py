@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import json
+import os
+import os.path
+import socket
+import socketserver
+import sys
+import threading
+from datetime import datetime
+from typing import Optional
+
+from ocu.cache_utils import get_fingerprint
+from ocu.calendar import get_calendar
+from ocu.event import Event
+from ocu.list_events import get_events_today_with_conference_urls, get_feedback
+from ocu.prefs import prefs
+from ocu.server_client import get_server_socket_path
+
+# The default number of seconds between each scheduled refresh of today's
+# events
+DEFAULT_REFRESH_INTERVAL_SECS = 60
+
+
+# The long-lived state of the resident ocu server, which keeps today's events
+# warm so that each request can be answered without spawning the calendar
+# subprocess
+class EventStore(object):
+    events: Optional[list[Event]]
+    events_date: Optional[str]
+    timed_out_calendar_names: list[str]
+    env_fingerprint: Optional[str]
+    lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.events = None
+        self.events_date = None
+        self.timed_out_calendar_names = []
+        self.env_fingerprint = None
+        self.lock = threading.Lock()
+
+    # Re-fetch today's events from the calendar; the lock must already be held
+    # by the caller
+    def refresh_events(self) -> None:
+        calendar = get_calendar()
+        self.events = get_events_today_with_conference_urls(calendar=calendar)
+        self.timed_out_calendar_names = calendar.get_timed_out_calendar_names()
+        self.events_date = datetime.now().strftime(Event.date_format)
+
+    # Re-fetch today's events on behalf of the scheduled refresh loop; if the
+    # fetch fails, the previously-fetched events continue to be served
+    def refresh(self) -> None:
+        with self.lock:
+            try:
+                self.refresh_events()
+            except Exception as error:
+                print(f"Failed to refresh events: {error}", file=sys.stderr)
+
+    # Apply the given environment (i.e. the workflow preferences of the client
+    # making the request) to this process, returning True if the environment
+    # has changed since the last request; the lock must already be held by the
+    # caller
+    def apply_env(self, env: dict[str, str]) -> bool:
+        env_fingerprint = get_fingerprint(env)
+        if env_fingerprint == self.env_fingerprint:
+            return False
+        os.environ.update(env)
+        prefs.refresh()
+        self.env_fingerprint = env_fingerprint
+        return True
+
+    # Compute the Alfred feedback for today's events, as seen by a client with
+    # the given environment
+    def get_feedback(self, env: dict[str, str]) -> dict:
+        with self.lock:
+            env_changed = self.apply_env(env)
+            today = datetime.now().strftime(Event.date_format)
+            if env_changed or self.events is None or self.events_date != today:
+                self.refresh_events()
+            events = self.events or []
+            # The Event class sets the start time of all-day events to the
+            # time at which the event was parsed, so that they always show;
+            # because these events may have been parsed a while ago, we must
+            # bring them up-to-date with the current time (before
+            # get_feedback() indexes them by time)
+            current_datetime = datetime.now()
+            for event in events:
+                if event.is_all_day:
+                    event.start_datetime = current_datetime
+            return get_feedback(
+                events,
+                self.timed_out_calendar_names,
+                current_datetime=current_datetime,
+            )
+
+
+# The handler for a single client connection; each connection carries exactly
+# one JSON request and receives exactly one JSON response
+class RequestHandler(socketserver.StreamRequestHandler):
+    server: "OcuServer"
+
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline().decode("utf-8"))
+            if request.get("command") == "list_events":
+                response = {
+                    "feedback": self.server.event_store.get_feedback(
+                        request.get("env", {})
+                    )
+                }
+            else:
+                response = {"error": f"Unknown command: {request.get('command')}"}
+        except Exception as error:
+            response = {"error": str(error)}
+        self.wfile.write(json.dumps(response).encode("utf-8"))
+
+
+# A Unix domain socket server which answers requests from the list_events
+# module using the events held by the given event store
+class OcuServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    event_store: EventStore
+
+    def __init__(self, socket_path: str, event_store: EventStore) -> None:
+        self.event_store = event_store
+        super().__init__(socket_path, RequestHandler)
+
+
+# Remove the socket file at the given path if it was left behind by a server
+# which is no longer running; raise an error if another server is still
+# listening on it
+def remove_stale_socket(socket_path: str) -> None:
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+            return
+    raise RuntimeError(f"An ocu server is already listening on {socket_path}")
+
+
+# Periodically refresh the events in the given event store until the given
+# stop event is set
+def run_refresh_loop(
+    event_store: EventStore, refresh_interval_secs: float, stop_event: threading.Event
+) -> None:
+    while not stop_event.wait(refresh_interval_secs):
+        event_store.refresh()
+
+
+def parse_cli_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Keep today's events warm for the Open Conference URL workflow"
+    )
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=DEFAULT_REFRESH_INTERVAL_SECS,
+        help="the number of seconds between each refresh of today's events",
+    )
+    parser.add_argument(
+        "--socket-path",
+        default=get_server_socket_path(),
+        help="the path to the Unix domain socket to listen on",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    cli_args = parse_cli_args()
+    remove_stale_socket(cli_args.socket_path)
+    event_store = EventStore()
+    stop_event = threading.Event()
+    refresh_thread = threading.Thread(
+        target=run_refresh_loop,
+        args=(event_store, cli_args.refresh_interval, stop_event),
+        daemon=True,
+    )
+    with OcuServer(cli_args.socket_path, event_store) as server:
+        refresh_thread.start()
+        print(f"Listening on {cli_args.socket_path}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop_event.set()
+            os.unlink(cli_args.socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import os.path
+import socket
+import tempfile
+from typing import Any, Optional
+
+from ocu.prefs import prefs
+
+# The maximum number of seconds to wait for the resident ocu server to respond
+# before falling back to fetching events in-process
+SERVER_TIMEOUT_SECS = 5
+# Any environment variables (besides the workflow preferences) which affect the
+# server's output and must therefore be forwarded with every request
+FORWARDED_ENV_VAR_NAMES = ("alfred_workflow_cache",)
+
+
+# Retrieve the path to the Unix domain socket which the resident ocu server
+# listens on; the system's temporary directory is used (rather than Alfred's
+# workflow cache directory) because socket paths are limited to ~100 characters
+# on macOS
+def get_server_socket_path() -> str:
+    return os.path.join(tempfile.gettempdir(), f"ocu-{os.getuid()}.sock")
+
+
+# Retrieve the environment variables which the server needs in order to produce
+# the same results as this process would
+def get_server_env() -> dict[str, str]:
+    return {
+        env_var_name: os.environ.get(env_var_name, "")
+        for env_var_name in (*prefs.pref_field_types.keys(), *FORWARDED_ENV_VAR_NAMES)
+    }
+
+
+# Send a single JSON request to the resident ocu server and return its decoded
+# JSON response
+def send_server_request(request: dict, timeout: float = SERVER_TIMEOUT_SECS) -> Any:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(get_server_socket_path())
+        client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        client.shutdown(socket.SHUT_WR)
+        response_chunks = []
+        while True:
+            response_chunk = client.recv(65536)
+            if not response_chunk:
+                break
+            response_chunks.append(response_chunk)
+    return json.loads(b"".join(response_chunks).decode("utf-8"))
+
+
+# Ask the resident ocu server for the Alfred feedback for today's events; if
+# the server is not running (or fails to respond), return None
+def request_feedback_from_server() -> Optional[dict]:
+    try:
+        response = send_server_request(
+            {"command": "list_events", "env": get_server_env()}
+        )
+    except (OSError, ValueError):
+        return None
+    if isinstance(response, dict) and isinstance(response.get("feedback"), dict):
+        return response["feedback"]
+    else:
+        return None
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os.path
+import subprocess
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from ocu.calendar import get_calendar
+from ocu.calendars.adaptive_calendar import (
+    COOLDOWN_SECS,
+    FAILURE_THRESHOLD,
+    AdaptiveCalendar,
+    BackendStats,
+)
+from ocu.calendars.applescript_calendar import AppleScriptCalendar
+from ocu.calendars.base_calendar import BaseCalendar
+from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+from tests.utils import use_env
+
+
+class StubCalendar(BaseCalendar):
+    """A calendar backend which answers after the given delay (or fails)."""
+
+    def __init__(self, name, delay_secs=0.0, fails=False):
+        self.name = name
+        self.delay_secs = delay_secs
+        self.fails = fails
+        self.call_count = 0
+        self.last_query = None
+
+    def get_event_dicts(
+        self,
+        start_datetime=None,
+        end_datetime=None,
+        calendar_names=None,
+        include_notes=True,
+    ):
+        self.call_count += 1
+        self.last_query = (start_datetime, end_datetime, calendar_names, include_notes)
+        time.sleep(self.delay_secs)
+        if self.fails:
+            raise subprocess.CalledProcessError(1, [self.name])
+        return [{"title": self.name, "startDate": "2022-10-16T08:00"}]
+
+
+class AsyncStubCalendar(StubCalendar):
+    """A calendar backend which answers asynchronously after the given delay
+    (or fails), recording whether its fetch was cancelled."""
+
+    def __init__(self, name, delay_secs=0.0, fails=False):
+        super().__init__(name, delay_secs, fails)
+        self.was_cancelled = False
+
+    async def aget_event_dicts(
+        self,
+        start_datetime=None,
+        end_datetime=None,
+        calendar_names=None,
+        include_notes=True,
+    ):
+        self.call_count += 1
+        try:
+            await asyncio.sleep(self.delay_secs)
+        except asyncio.CancelledError:
+            self.was_cancelled = True
+            raise
+        if self.fails:
+            raise subprocess.CalledProcessError(1, [self.name])
+        return [{"title": self.name, "startDate": "2022-10-16T08:00"}]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory for each test."""
+    with use_env("alfred_workflow_cache", str(tmp_path)):
+        yield tmp_path
+
+
+def write_stats(cache_dir, stats_by_name):
+    """Persist the given backend stats, as if from earlier invocations."""
+    with open(os.path.join(cache_dir, AdaptiveCalendar.stats_file_name), "w") as file:
+        json.dump(stats_by_name, file)
+
+
+def get_latency_stats(latency_ms):
+    """Build the persisted stats of a healthy backend with the given latency."""
+    return {
+        "latencies_ms": [latency_ms] * 5,
+        "consecutive_failures": 0,
+        "cooldown_until": 0,
+    }
+
+
+def get_titles(event_dicts):
+    """Retrieve the titles of the given event dictionaries."""
+    return [event_dict["title"] for event_dict in event_dicts]
+
+
+def test_unmeasured_backends_in_preference_order(cache_dir):
+    """Should measure each backend, in order of preference, before ranking"""
+    backends = {"first": StubCalendar("first"), "second": StubCalendar("second")}
+    titles = [
+        get_titles(AdaptiveCalendar(backends).get_event_dicts())[0] for _ in range(6)
+    ]
+    # The first backend is used until it has been measured enough, then the
+    # second backend is measured, and only then are they ranked by speed
+    assert titles[:3] == ["first"] * 3
+    assert titles[3:] == ["second"] * 3
+    stats = AdaptiveCalendar(backends).stats
+    assert len(stats["first"].latencies_ms) == 3
+    assert len(stats["second"].latencies_ms) == 3
+
+
+def test_fastest_backend_chosen(cache_dir):
+    """Should choose the backend with the lowest observed latency"""
+    write_stats(
+        cache_dir, {"first": get_latency_stats(500), "second": get_latency_stats(100)}
+    )
+    backends = {"first": StubCalendar("first"), "second": StubCalendar("second")}
+    assert get_titles(AdaptiveCalendar(backends).get_event_dicts()) == ["second"]
+    assert backends["first"].call_count == 0
+
+
+def test_failure_falls_back(cache_dir):
+    """Should fall back to the next backend when one fails"""
+    backends = {
+        "first": StubCalendar("first", fails=True),
+        "second": StubCalendar("second"),
+    }
+    calendar = AdaptiveCalendar(backends)
+    assert get_titles(calendar.get_event_dicts()) == ["second"]
+    assert calendar.stats["first"].consecutive_failures == 1
+
+
+def test_cooldown_after_repeated_failures(cache_dir):
+    """Should skip a backend for a while after repeated failures"""
+    backends = {
+        "first": StubCalendar("first", fails=True),
+        "second": StubCalendar("second"),
+    }
+    for _ in range(FAILURE_THRESHOLD):
+        AdaptiveCalendar(backends).get_event_dicts()
+    assert backends["first"].call_count == FAILURE_THRESHOLD
+    AdaptiveCalendar(backends).get_event_dicts()
+    assert backends["first"].call_count == FAILURE_THRESHOLD
+    # Once the cooldown has elapsed, the backend is given another chance
+    with patch("time.time", return_value=time.time() + COOLDOWN_SECS + 1):
+        AdaptiveCalendar(backends).get_event_dicts()
+    assert backends["first"].call_count == FAILURE_THRESHOLD + 1
+
+
+def test_success_resets_failures():
+    """Should forget past failures once a backend succeeds"""
+    stats = BackendStats()
+    for _ in range(FAILURE_THRESHOLD):
+        stats.record_failure(1000)
+    assert stats.is_cooling_down(1001)
+    stats.record_success(50)
+    assert not stats.is_cooling_down(1001)
+    assert stats.consecutive_failures == 0
+
+
+def test_all_backends_failing(cache_dir):
+    """Should raise the last error if every backend fails"""
+    backends = {
+        "first": StubCalendar("first", fails=True),
+        "second": StubCalendar("second", fails=True),
+    }
+    with pytest.raises(subprocess.CalledProcessError) as error_info:
+        AdaptiveCalendar(backends).get_event_dicts()
+    assert error_info.value.cmd == ["second"]
+
+
+@pytest.mark.parametrize("stats_json", ["[]", "{", '{"first": {"latencies_ms": 3}}'])
+def test_malformed_stats(cache_dir, stats_json):
+    """Should ignore a malformed stats file"""
+    with open(os.path.join(cache_dir, AdaptiveCalendar.stats_file_name), "w") as file:
+        file.write(stats_json)
+    backends = {"first": StubCalendar("first"), "second": StubCalendar("second")}
+    assert get_titles(AdaptiveCalendar(backends).get_event_dicts()) == ["first"]
+
+
+def test_p90_latency():
+    """Should compute the 90th-percentile latency by nearest rank"""
+    stats = BackendStats(latencies_ms=[float(n) for n in range(1, 21)])
+    assert stats.get_p90_latency_ms() == 18
+    assert stats.get_median_latency_ms() == 10.5
+
+
+def test_hedged_fetch(cache_dir):
+    """Should start the next backend if the first is slower than its p90"""
+    write_stats(
+        cache_dir, {"first": get_latency_stats(50), "second": get_latency_stats(100)}
+    )
+    backends = {
+        "first": StubCalendar("first", delay_secs=2),
+        "second": StubCalendar("second", delay_secs=0.05),
+    }
+    start_time = time.perf_counter()
+    event_dicts = AdaptiveCalendar(backends, hedged=True).get_event_dicts()
+    assert time.perf_counter() - start_time < 1
+    assert get_titles(event_dicts) == ["second"]
+
+
+def test_hedged_fetch_not_needed(cache_dir):
+    """Should not start the next backend if the first answers in time"""
+    write_stats(
+        cache_dir, {"first": get_latency_stats(500), "second": get_latency_stats(600)}
+    )
+    backends = {"first": StubCalendar("first"), "second": StubCalendar("second")}
+    event_dicts = AdaptiveCalendar(backends, hedged=True).get_event_dicts()
+    assert get_titles(event_dicts) == ["first"]
+    assert backends["second"].call_count == 0
+
+
+def test_hedged_fetch_failure(cache_dir):
+    """Should start the next backend right away if the first fails"""
+    write_stats(
+        cache_dir, {"first": get_latency_stats(500), "second": get_latency_stats(600)}
+    )
+    backends = {
+        "first": StubCalendar("first", fails=True),
+        "second": StubCalendar("second"),
+    }
+    start_time = time.perf_counter()
+    event_dicts = AdaptiveCalendar(backends, hedged=True).get_event_dicts()
+    assert time.perf_counter() - start_time < 0.4
+    assert get_titles(event_dicts) == ["second"]
+
+
+def test_hedged_fetch_cancels_loser(cache_dir):
+    """Should cancel the slower backend once the hedged backend answers,
+    persisting how long it ran for as a censored latency"""
+    write_stats(
+        cache_dir, {"first": get_latency_stats(50), "second": get_latency_stats(100)}
+    )
+    backends = {
+        "first": AsyncStubCalendar("first", delay_secs=30),
+        "second": AsyncStubCalendar("second", delay_secs=0.05),
+    }
+    event_dicts = AdaptiveCalendar(backends, hedged=True).get_event_dicts()
+    assert get_titles(event_dicts) == ["second"]
+    assert backends["first"].was_cancelled
+    with open(os.path.join(cache_dir, AdaptiveCalendar.stats_file_name)) as file:
+        first_stats = BackendStats.from_json(json.load(file)["first"])
+    # The first backend ran for at least its p90 latency before the second
+    # backend was started
+    assert len(first_stats.latencies_ms) == 6
+    assert first_stats.latencies_ms[-1] >= 50
+    assert first_stats.consecutive_failures == 0
+
+
+def test_censored_latency():
+    """Should remember a censored latency without resetting the failures"""
+    stats = BackendStats(latencies_ms=[10.0], consecutive_failures=2)
+    stats.record_censored_latency(500.0)
+    assert stats.latencies_ms == [10.0, 500.0]
+    assert stats.consecutive_failures == 2
+
+
+def test_async_hedged_fetch(cache_dir):
+    """Should cancel the slower backend once the hedged backend answers"""
+    write_stats(
+        cache_dir, {"first": get_latency_stats(50), "second": get_latency_stats(100)}
+    )
+    backends = {
+        "first": AsyncStubCalendar("first", delay_secs=2),
+        "second": AsyncStubCalendar("second", delay_secs=0.05),
+    }
+    calendar = AdaptiveCalendar(backends, hedged=True)
+    start_time = time.perf_counter()
+    event_dicts = asyncio.run(calendar.aget_event_dicts())
+    assert time.perf_counter() - start_time < 1
+    assert get_titles(event_dicts) == ["second"]
+    assert backends["first"].was_cancelled
+    assert calendar.last_backend is backends["second"]
+
+
+def test_async_hedged_fetch_not_needed(cache_dir):
+    """Should not start the next backend if the first answers in time"""
+    write_stats(
+        cache_dir, {"first": get_latency_stats(500), "second": get_latency_stats(600)}
+    )
+    backends = {
+        "first": AsyncStubCalendar("first"),
+        "second": AsyncStubCalendar("second"),
+    }
+    event_dicts = asyncio.run(
+        AdaptiveCalendar(backends, hedged=True).aget_event_dicts()
+    )
+    assert get_titles(event_dicts) == ["first"]
+    assert backends["second"].call_count == 0
+
+
+@pytest.mark.parametrize("hedged", [False, True])
+def test_async_fetch_failure(cache_dir, hedged):
+    """Should fall back to the next backend if the first fails"""
+    write_stats(
+        cache_dir, {"first": get_latency_stats(500), "second": get_latency_stats(600)}
+    )
+    backends = {
+        "first": AsyncStubCalendar("first", fails=True),
+        "second": AsyncStubCalendar("second"),
+    }
+    calendar = AdaptiveCalendar(backends, hedged=hedged)
+    event_dicts = asyncio.run(calendar.aget_event_dicts())
+    assert get_titles(event_dicts) == ["second"]
+    assert calendar.stats["first"].consecutive_failures == 1
+
+
+def test_async_fetch_all_failed(cache_dir):
+    """Should raise the last error if every backend fails"""
+    backends = {
+        "first": AsyncStubCalendar("first", fails=True),
+        "second": AsyncStubCalendar("second", fails=True),
+    }
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(AdaptiveCalendar(backends).aget_event_dicts())
+
+
+@use_env("use_adaptive_backend", "true")
+@use_env("use_hedged_fetch", "true")
+@pytest.mark.parametrize(
+    ("use_icalbuddy", "expected_backend_names"),
+    [
+        ("true", ["IcalBuddyCalendar", "AppleScriptCalendar"]),
+        ("false", ["AppleScriptCalendar", "IcalBuddyCalendar"]),
+    ],
+)
+def test_get_calendar(use_icalbuddy, expected_backend_names):
+    """Should choose between both backends when icalBuddy is installed"""
+    with use_env("use_icalbuddy", use_icalbuddy):
+        with patch.object(IcalBuddyCalendar, "binary_paths", [__file__]):
+            calendar = get_calendar()
+    assert isinstance(calendar, AdaptiveCalendar)
+    assert calendar.hedged
+    assert list(calendar.backends) == expected_backend_names
+
+
+@use_env("use_adaptive_backend", "true")
+def test_get_calendar_without_icalbuddy():
+    """Should only use AppleScript if icalBuddy is not installed"""
+    with patch.object(IcalBuddyCalendar, "binary_paths", []):
+        assert isinstance(get_calendar(), AppleScriptCalendar)
+
+
+def test_time_range_forwarded():
+    """Should pass the range of time and calendar names on to the backend"""
+    backends = {"first": StubCalendar("first")}
+    query = (datetime(2022, 10, 16), datetime(2022, 10, 19), ["Work"], False)
+    AdaptiveCalendar(backends).get_event_dicts(*query)
+    assert backends["first"].last_query == query
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from freezegun import freeze_time
+
+from ocu import list_events
+from ocu.event import Event
+from tests.utils import redirect_stdout, use_env, use_event_dicts
+
+EVENT_DICT = {
+    "title": "My Meeting",
+    "startDate": "2022-10-16T13:00",
+    "endDate": "2022-10-16T14:00",
+    "location": "https://zoom.us/j/123456",
+}
+ALL_DAY_EVENT_DICT = {
+    "title": "All-Day Meeting",
+    "startDate": "2022-10-16T00:00",
+    "endDate": "2022-10-16T23:59",
+    "location": "https://zoom.us/j/789012",
+}
+
+
+@pytest.fixture(autouse=True)
+def enable_alfred_cache():
+    """Allow Alfred to cache the results for up to a day."""
+    with use_env("alfred_cache_max_secs", "86400"):
+        yield
+
+
+def get_feedback(event_dicts, current_datetime):
+    """Build the feedback for the given events as of the given time."""
+    return list_events.get_feedback(
+        [
+            Event(event_dict, lazy=True, current_datetime=current_datetime)
+            for event_dict in event_dicts
+        ],
+        current_datetime=current_datetime,
+    )
+
+
+@use_event_dicts([EVENT_DICT])
+@freeze_time("2022-10-16 12:55:00")
+@redirect_stdout
+def test_cache_until_event_leaves_threshold(out, event_dicts):
+    """Should cache the results until an upcoming event is no longer upcoming"""
+    list_events.main()
+    feedback = json.loads(out.getvalue())
+    # The meeting stops being upcoming 20 minutes after it starts
+    assert feedback["cache"] == {"seconds": 25 * 60, "loosereload": False}
+    assert "rerun" not in feedback
+
+
+@use_event_dicts([EVENT_DICT])
+@freeze_time("2022-10-16 12:30:00")
+@redirect_stdout
+def test_cache_until_event_enters_threshold(out, event_dicts):
+    """Should cache the results until a future event becomes upcoming"""
+    list_events.main()
+    feedback = json.loads(out.getvalue())
+    assert feedback["items"][0]["title"] == "No Upcoming Meetings"
+    assert feedback["cache"]["seconds"] == 10 * 60
+
+
+@use_event_dicts([EVENT_DICT])
+@freeze_time("2022-10-16 13:30:00")
+@redirect_stdout
+def test_cache_until_event_ends(out, event_dicts):
+    """Should cache the results until an in-progress event ends"""
+    list_events.main()
+    feedback = json.loads(out.getvalue())
+    assert feedback["cache"]["seconds"] == 30 * 60
+
+
+@use_event_dicts([])
+@freeze_time("2022-10-16 23:00:00")
+@redirect_stdout
+def test_cache_until_midnight(out, event_dicts):
+    """Should cache the results until midnight if no events will change"""
+    list_events.main()
+    feedback = json.loads(out.getvalue())
+    assert feedback["cache"]["seconds"] == 60 * 60
+
+
+@use_event_dicts([ALL_DAY_EVENT_DICT])
+@freeze_time("2022-10-16 12:00:00")
+@redirect_stdout
+def test_all_day_event_boundary(out, event_dicts):
+    """Should only consider the end of an all-day event"""
+    list_events.main()
+    feedback = json.loads(out.getvalue())
+    assert feedback["cache"]["seconds"] == 11 * 60 * 60 + 59 * 60
+
+
+@freeze_time("2022-10-16 13:59:57")
+def test_rerun_when_change_imminent():
+    """Should ask Alfred to re-run just after an imminent change rather than
+    caching the results"""
+    feedback = get_feedback([EVENT_DICT], datetime.now())
+    assert feedback["rerun"] == 3.1
+    assert "cache" not in feedback
+
+
+def test_rerun_at_boundary():
+    """Should re-run just after an event crosses a boundary at the current
+    time, which changes the results"""
+    current_datetime = datetime(2022, 10, 16, 12, 40)
+    feedback = get_feedback([EVENT_DICT], current_datetime)
+    assert feedback["items"][0]["title"] == "No Upcoming Meetings"
+    assert feedback["rerun"] == 0.1
+    rerun_feedback = get_feedback(
+        [EVENT_DICT], current_datetime + timedelta(seconds=feedback["rerun"])
+    )
+    assert rerun_feedback["items"][0]["title"] == "My Meeting"
+
+
+@use_env("alfred_cache_max_secs", "60")
+def test_cache_capped_by_pref():
+    """Should never cache the results for longer than the user allows"""
+    feedback = get_feedback([EVENT_DICT], datetime(2022, 10, 16, 12, 55))
+    assert feedback["cache"]["seconds"] == 60
+
+
+@use_env("alfred_cache_max_secs", "1000000")
+def test_cache_capped_by_alfred():
+    """Should never cache the results for longer than Alfred allows"""
+    feedback = get_feedback([], datetime(2022, 10, 16, 0, 0))
+    assert feedback["cache"]["seconds"] == list_events.ALFRED_MAX_CACHE_SECS
+
+
+@use_env("alfred_cache_max_secs", "")
+def test_cache_disabled():
+    """Should not emit any directives unless enabled"""
+    feedback = get_feedback([EVENT_DICT], datetime(2022, 10, 16, 12, 55))
+    assert "cache" not in feedback
+    assert "rerun" not in feedback
+
+
+def test_no_cache_when_calendar_timed_out():
+    """Should not cache incomplete results"""
+    current_datetime = datetime(2022, 10, 16, 12, 55)
+    feedback = list_events.get_feedback(
+        [Event(EVENT_DICT, lazy=True)],
+        ["Work"],
+        current_datetime=current_datetime,
+    )
+    assert "cache" not in feedback
+    assert "rerun" not in feedback
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_results_unchanged_while_cached(seed):
+    """Should only cache the results for as long as they stay the same"""
+    rng = random.Random(seed)
+    event_dicts = []
+    for i in range(rng.randint(0, 8)):
+        start_min = rng.randrange(6 * 60, 22 * 60)
+        end_min = start_min + rng.choice((15, 30, 60, 90))
+        event_dicts.append(
+            {
+                "title": f"Meeting {i}",
+                "startDate": f"2022-10-16T{start_min // 60:02}:{start_min % 60:02}",
+                "endDate": f"2022-10-16T{end_min // 60:02}:{end_min % 60:02}",
+                "location": "https://zoom.us/j/123456",
+            }
+        )
+    current_datetime = datetime(2022, 10, 16, rng.randint(5, 22), rng.randint(0, 59))
+    feedback = get_feedback(event_dicts, current_datetime)
+    secs_until_change = feedback.get("cache", {}).get("seconds", 0)
+    for secs in (0, secs_until_change // 2, secs_until_change):
+        later_feedback = get_feedback(
+            event_dicts, current_datetime + timedelta(seconds=secs)
+        )
+        assert later_feedback["items"] == feedback["items"]
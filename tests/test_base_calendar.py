@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
+from datetime import datetime
 from unittest.mock import Mock
 
 import pytest
+from freezegun import freeze_time
 
-from ocu.calendars.base_calendar import BaseCalendar
+from ocu.calendars.base_calendar import BaseCalendar, get_day_range, get_time_range
 
 
 def test_base_calendar_not_instantiable():
@@ -20,3 +22,29 @@ def test_get_event_dicts_not_implemented():
     """
     with pytest.raises(NotImplementedError):
         BaseCalendar.get_event_dicts(Mock())
+
+
+def test_get_day_range():
+    """Should span whole days starting at midnight on the given date"""
+    assert get_day_range(datetime(2022, 10, 16, 12, 55)) == (
+        datetime(2022, 10, 16),
+        datetime(2022, 10, 17),
+    )
+    assert get_day_range(datetime(2022, 10, 16, 12, 55), day_count=3) == (
+        datetime(2022, 10, 16),
+        datetime(2022, 10, 19),
+    )
+
+
+@freeze_time("2022-10-16 12:55:00")
+def test_get_time_range():
+    """Should default to today, or to the rest of the day the range starts"""
+    assert get_time_range() == (datetime(2022, 10, 16), datetime(2022, 10, 17))
+    assert get_time_range(datetime(2022, 10, 18, 9, 0)) == (
+        datetime(2022, 10, 18, 9, 0),
+        datetime(2022, 10, 19),
+    )
+    assert get_time_range(end_datetime=datetime(2022, 10, 16, 13, 0)) == (
+        datetime(2022, 10, 16),
+        datetime(2022, 10, 16, 13, 0),
+    )
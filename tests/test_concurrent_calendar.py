@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import os.path
+import stat
+import sys
+import time
+from datetime import date, datetime
+from unittest.mock import patch
+
+import pytest
+
+from ocu import list_events
+from ocu.calendar import get_calendar
+from ocu.calendars.applescript_calendar import AppleScriptCalendar
+from ocu.calendars.cached_calendar import CachedCalendar
+from ocu.calendars.concurrent_calendar import ConcurrentCalendar
+from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+from tests.utils import redirect_stdout, use_env
+
+# The number of seconds each stub calendar takes to respond
+CALENDAR_DELAYS = {"Work": 0.5, "Personal": 0.5, "Team": 0.5, "Rooms": 30}
+# The output of the stub osascript for the given calendar name
+OSASCRIPT_STUB = """
+import json, sys, time
+calendar_name = sys.argv[5]
+time.sleep({delays!r}[calendar_name])
+print(json.dumps([{{
+    "title": f"{{calendar_name}} Meeting",
+    "startDate": "{today}T08:00",
+    "endDate": "{today}T09:00",
+    "isAllDay": "false",
+    "location": "https://zoom.us/j/123456",
+    "notes": "",
+}}]))
+"""
+# The output of the stub icalBuddy for the given calendar name
+ICALBUDDY_STUB = """
+import sys, time
+calendar_name = sys.argv[sys.argv.index("--includeCals") + 1]
+time.sleep({delays!r}[calendar_name])
+print(f"• {{calendar_name}} Meeting", flush=True)
+print("    {today} at 08:00 - 09:00")
+print("    location: https://zoom.us/j/123456")
+"""
+
+
+def create_stub_binary(stub_dir, binary_name, script):
+    """Create an executable Python stub with the given name."""
+    stub_path = os.path.join(stub_dir, binary_name)
+    with open(stub_path, "w") as stub_file:
+        stub_file.write(
+            f"#!{sys.executable}\n"
+            + script.format(delays=CALENDAR_DELAYS, today=date.today().isoformat())
+        )
+    os.chmod(stub_path, os.stat(stub_path).st_mode | stat.S_IEXEC)
+    return stub_path
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory for each test."""
+    with use_env("alfred_workflow_cache", os.path.join(tmp_path, "cache")):
+        yield
+
+
+@pytest.fixture
+def osascript_stub(tmp_path):
+    """Put a slow stub osascript binary on the PATH."""
+    create_stub_binary(tmp_path, "osascript", OSASCRIPT_STUB)
+    with use_env("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}"):
+        yield
+
+
+@pytest.fixture
+def icalbuddy_stub(tmp_path):
+    """Use a slow stub in place of the icalBuddy binary."""
+    stub_path = create_stub_binary(tmp_path, "icalBuddy", ICALBUDDY_STUB)
+    with patch.object(IcalBuddyCalendar, "binary_paths", [stub_path]):
+        with use_env("use_icalbuddy", "true"):
+            yield
+
+
+def get_titles(event_dicts):
+    """Retrieve the titles of the given event dictionaries."""
+    return [event_dict["title"] for event_dict in event_dicts]
+
+
+@use_env("calendar_names", "Work, Personal, Team")
+@use_env("calendar_fetch_concurrency", "3")
+def test_get_calendar():
+    """Should fetch each calendar separately when concurrency is enabled"""
+    calendar = get_calendar()
+    assert isinstance(calendar, ConcurrentCalendar)
+    assert calendar.max_workers == 3
+    assert list(calendar.calendars) == ["Work", "Personal", "Team"]
+    assert [calendar.calendar_names for calendar in calendar.calendars.values()] == [
+        ("Work",),
+        ("Personal",),
+        ("Team",),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("calendar_names", "calendar_fetch_concurrency"),
+    [("Work, Personal", ""), ("Work", "3"), ("", "3")],
+)
+def test_get_calendar_disabled(calendar_names, calendar_fetch_concurrency):
+    """Should use a single fetch unless several calendars could run at once"""
+    with use_env("calendar_names", calendar_names):
+        with use_env("calendar_fetch_concurrency", calendar_fetch_concurrency):
+            assert isinstance(get_calendar(), AppleScriptCalendar)
+
+
+@use_env("calendar_names", "Work, Personal, Team")
+@use_env("calendar_fetch_concurrency", "3")
+def test_concurrent_osascript(osascript_stub):
+    """Should run one osascript per calendar in parallel and merge the events"""
+    start_time = time.perf_counter()
+    event_dicts = get_calendar().get_event_dicts()
+    elapsed_secs = time.perf_counter() - start_time
+    assert get_titles(event_dicts) == [
+        "Work Meeting",
+        "Personal Meeting",
+        "Team Meeting",
+    ]
+    # Run serially, the three calendars would take at least 1.5 seconds
+    assert elapsed_secs < 1.2
+
+
+@use_env("calendar_names", "Work, Personal, Team")
+@use_env("calendar_fetch_concurrency", "1")
+def test_bounded_concurrency(osascript_stub):
+    """Should never run more calendar subprocesses at once than allowed"""
+    start_time = time.perf_counter()
+    event_dicts = get_calendar().get_event_dicts()
+    assert time.perf_counter() - start_time >= 1.5
+    assert len(event_dicts) == 3
+
+
+@use_env("calendar_names", "Work, Rooms, Personal")
+@use_env("calendar_fetch_concurrency", "3")
+def test_selected_calendar_names(osascript_stub):
+    """Should only fetch the calendars with the given names"""
+    calendar = get_calendar()
+    start_time = time.perf_counter()
+    event_dicts = calendar.get_event_dicts(calendar_names=["Work", "Personal"])
+    assert time.perf_counter() - start_time < 5
+    assert get_titles(event_dicts) == ["Work Meeting", "Personal Meeting"]
+    assert calendar.get_timed_out_calendar_names() == []
+
+
+def test_osascript_time_range():
+    """Should pass the range of time to the AppleScript as epoch seconds"""
+    start_datetime = datetime(2022, 10, 16, 9, 0)
+    end_datetime = datetime(2022, 10, 19)
+    command = AppleScriptCalendar(calendar_names=["Work"]).get_osascript_command(
+        start_datetime, end_datetime
+    )
+    assert command[2:] == [
+        str(int(start_datetime.timestamp())),
+        str(int(end_datetime.timestamp())),
+        "true",
+        "Work",
+    ]
+
+
+@use_env("calendar_names", "Work, Rooms, Personal")
+@use_env("calendar_fetch_concurrency", "3")
+@use_env("calendar_fetch_timeout_secs", "1.5")
+def test_timeout(osascript_stub):
+    """Should skip (and kill) a calendar which exceeds its timeout"""
+    calendar = get_calendar()
+    start_time = time.perf_counter()
+    event_dicts = calendar.get_event_dicts()
+    assert time.perf_counter() - start_time < 5
+    assert get_titles(event_dicts) == ["Work Meeting", "Personal Meeting"]
+    assert calendar.get_timed_out_calendar_names() == ["Rooms"]
+
+
+@use_env("calendar_names", "Work, Rooms, Personal")
+@use_env("calendar_fetch_concurrency", "2")
+@use_env("calendar_fetch_timeout_secs", "1.5")
+@pytest.mark.parametrize("use_icalbuddy_streaming", ["false", "true"])
+def test_icalbuddy_timeout(icalbuddy_stub, use_icalbuddy_streaming):
+    """Should fetch icalBuddy calendars concurrently, with timeouts"""
+    with use_env("use_icalbuddy_streaming", use_icalbuddy_streaming):
+        calendar = get_calendar()
+        start_time = time.perf_counter()
+        event_dicts = calendar.get_event_dicts()
+    assert time.perf_counter() - start_time < 5
+    assert isinstance(calendar, ConcurrentCalendar)
+    assert all(
+        isinstance(calendar, IcalBuddyCalendar)
+        for calendar in calendar.calendars.values()
+    )
+    assert get_titles(event_dicts) == ["Work Meeting", "Personal Meeting"]
+    assert calendar.get_timed_out_calendar_names() == ["Rooms"]
+
+
+@use_env("calendar_names", "Work, Rooms, Personal")
+@use_env("calendar_fetch_concurrency", "3")
+@use_env("calendar_fetch_timeout_secs", "1.5")
+@use_env("event_cache_ttl_secs", "60")
+def test_timeout_not_cached(osascript_stub):
+    """Should not cache the events if any calendar timed out"""
+    calendar = get_calendar()
+    assert isinstance(calendar, CachedCalendar)
+    calendar.get_event_dicts()
+    assert calendar.get_timed_out_calendar_names() == ["Rooms"]
+    assert not os.path.exists(calendar.get_cache_path())
+
+
+@use_env("calendar_names", "Work, Rooms, Personal")
+@use_env("calendar_fetch_concurrency", "3")
+@use_env("calendar_fetch_timeout_secs", "1.5")
+@redirect_stdout
+def test_list_events_timeout(out, osascript_stub):
+    """Should note the calendars which timed out at the bottom of the results"""
+    list_events.main()
+    feedback = json.loads(out.getvalue())
+    assert "Work Meeting" in get_titles(feedback["items"])
+    assert feedback["items"][-1] == {
+        "title": "Calendar Timed Out",
+        "subtitle": "Events from Rooms could not be loaded in time",
+        "valid": "no",
+    }
+
+
+def test_timed_out_feedback_item_plural():
+    """Should pluralize the item title when several calendars timed out"""
+    item = list_events.get_timed_out_feedback_item(["Rooms", "Team"])
+    assert item["title"] == "Calendars Timed Out"
+    assert item["subtitle"] == "Events from Rooms, Team could not be loaded in time"
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+import json
+import os.path
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from ocu import list_events
+from ocu.conference_url_cache import CACHE_VERSION, ConferenceUrlCache
+from ocu.event import Event
+from ocu.prefs import prefs
+from tests.utils import redirect_stdout, use_env
+
+EVENT_DICTS = [
+    {
+        "title": "Standup",
+        "startDate": "2022-10-16T08:00",
+        "endDate": "2022-10-16T08:15",
+        "location": "https://zoom.us/j/111",
+        "notes": "",
+    },
+    {
+        "title": "Planning",
+        "startDate": "2022-10-16T08:30",
+        "endDate": "2022-10-16T09:00",
+        "location": "",
+        "notes": "Join at https://meet.google.com/abc-defg-hij",
+    },
+    {
+        "title": "Lunch",
+        "startDate": "2022-10-16T12:00",
+        "endDate": "2022-10-16T13:00",
+        "location": "Cafeteria",
+        "notes": "See https://example.com/menu",
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory for each test."""
+    with use_env("alfred_workflow_cache", str(tmp_path)):
+        yield tmp_path
+
+
+def get_conference_urls(event_dicts):
+    """Resolve the conference URLs of the given events through a freshly-loaded
+    cache (as a new invocation of the workflow would), counting the events
+    whose URLs actually had to be extracted"""
+    cache = ConferenceUrlCache(prefs.snapshot)
+    with patch.object(
+        Event,
+        "extract_conference_url",
+        autospec=True,
+        side_effect=Event.extract_conference_url,
+    ) as extract_conference_url:
+        conference_urls = [
+            Event(event_dict, conference_url_cache=cache).conference_url
+            for event_dict in event_dicts
+        ]
+    cache.write()
+    return conference_urls, extract_conference_url.call_count
+
+
+def run_list_events(event_dicts):
+    """Run list_events against the given raw event dictionaries."""
+    with patch(
+        "subprocess.check_output", return_value=json.dumps(event_dicts).encode("utf-8")
+    ):
+        list_events.main()
+
+
+def get_cache_path(cache_dir):
+    """Retrieve the path to the conference URL cache file."""
+    return os.path.join(cache_dir, ConferenceUrlCache.cache_file_name)
+
+
+def test_cached_urls():
+    """Should resolve the same conference URLs with and without the cache"""
+    expected_urls = [Event(event_dict).conference_url for event_dict in EVENT_DICTS]
+    cold_urls, cold_extract_count = get_conference_urls(EVENT_DICTS)
+    warm_urls, warm_extract_count = get_conference_urls(EVENT_DICTS)
+    assert cold_urls == expected_urls
+    assert warm_urls == expected_urls
+    assert cold_extract_count == 3
+    assert warm_extract_count == 0
+
+
+def test_negative_results_cached(cache_dir):
+    """Should remember that an event has no conference URL"""
+    get_conference_urls(EVENT_DICTS[2:])
+    conference_urls, extract_count = get_conference_urls(EVENT_DICTS[2:])
+    assert conference_urls == [None]
+    assert extract_count == 0
+    with open(get_cache_path(cache_dir), "r") as cache_file:
+        assert list(json.load(cache_file)["entries"].values()) == [""]
+
+
+def test_only_changed_events_extracted():
+    """Should only extract the conference URLs of events which have changed"""
+    get_conference_urls(EVENT_DICTS)
+    changed_event_dicts = [
+        EVENT_DICTS[0],
+        {**EVENT_DICTS[1], "notes": "Join at https://zoom.us/j/222"},
+        EVENT_DICTS[2],
+    ]
+    conference_urls, extract_count = get_conference_urls(changed_event_dicts)
+    assert extract_count == 1
+    assert conference_urls[1] == "https://zoom.us/j/222"
+
+
+def test_times_not_part_of_key():
+    """Should reuse the cached URL of an event which has only been rescheduled"""
+    get_conference_urls(EVENT_DICTS)
+    rescheduled_event_dict = {**EVENT_DICTS[0], "startDate": "2022-10-17T08:00"}
+    conference_urls, extract_count = get_conference_urls([rescheduled_event_dict])
+    assert conference_urls == ["https://zoom.us/j/111"]
+    assert extract_count == 0
+
+
+def test_field_boundaries_part_of_key():
+    """Should distinguish events whose text is split differently across their
+    fields"""
+    event_dict = {**EVENT_DICTS[2], "location": "", "notes": ""}
+    assert ConferenceUrlCache.get_event_hash(
+        {**event_dict, "title": "ab"}
+    ) != ConferenceUrlCache.get_event_hash(
+        {**event_dict, "title": "a", "location": "b"}
+    )
+
+
+@pytest.mark.parametrize(
+    ("pref_name", "pref_value"),
+    [
+        ("conference_domains", "meet.google.com, zoom.us"),
+        ("use_direct_zoom", "true"),
+        ("use_direct_msteams", "true"),
+    ],
+)
+def test_invalidated_when_prefs_change(pref_name, pref_value):
+    """Should discard the cached URLs when a relevant preference changes"""
+    get_conference_urls(EVENT_DICTS)
+    with use_env(pref_name, pref_value):
+        expected_urls = [Event(event_dict).conference_url for event_dict in EVENT_DICTS]
+        conference_urls, extract_count = get_conference_urls(EVENT_DICTS)
+    assert conference_urls == expected_urls
+    assert extract_count == 3
+
+
+def test_not_invalidated_by_unrelated_prefs():
+    """Should keep the cached URLs when an unrelated preference changes"""
+    get_conference_urls(EVENT_DICTS)
+    with use_env("time_system", "24-hour"):
+        _, extract_count = get_conference_urls(EVENT_DICTS)
+    assert extract_count == 0
+
+
+def test_direct_urls_cached():
+    """Should cache the conference URL after conversion to a direct link"""
+    with use_env("use_direct_zoom", "true"):
+        get_conference_urls(EVENT_DICTS[:1])
+        conference_urls, extract_count = get_conference_urls(EVENT_DICTS[:1])
+    assert conference_urls == ["zoommtg://zoom.us/join?action=join&confno=111"]
+    assert extract_count == 0
+
+
+def test_lru_eviction():
+    """Should evict the least recently used entries beyond the entry cap"""
+    with patch.object(ConferenceUrlCache, "max_entries", 2):
+        # Only the two most recently used events (Planning and Lunch) are kept
+        get_conference_urls(EVENT_DICTS)
+        _, extract_count = get_conference_urls(EVENT_DICTS[:1])
+        assert extract_count == 1
+        # Caching Standup again evicted Planning, which was least recently used
+        _, extract_count = get_conference_urls(EVENT_DICTS)
+        assert extract_count == 1
+
+
+def test_long_urls_not_cached():
+    """Should not cache conference URLs beyond the maximum length"""
+    event_dict = {**EVENT_DICTS[0], "location": "https://zoom.us/j/" + "1" * 100}
+    with patch.object(ConferenceUrlCache, "max_url_length", 50):
+        get_conference_urls([event_dict])
+        conference_urls, extract_count = get_conference_urls([event_dict])
+    assert conference_urls == [event_dict["location"]]
+    assert extract_count == 1
+
+
+def test_no_write_when_unchanged():
+    """Should not rewrite the cache when every event was already cached"""
+    get_conference_urls(EVENT_DICTS)
+    with patch("ocu.conference_url_cache.write_json_file_atomically") as write:
+        get_conference_urls(EVENT_DICTS)
+    assert not write.called
+
+
+@pytest.mark.parametrize(
+    "cache_contents",
+    [
+        "{",
+        json.dumps([]),
+        json.dumps({"version": CACHE_VERSION + 1, "entries": {}}),
+        json.dumps({"version": CACHE_VERSION, "prefs_fingerprint": 3, "entries": {}}),
+    ],
+)
+def test_malformed_cache(cache_dir, cache_contents):
+    """Should ignore a malformed or outdated cache file"""
+    with open(get_cache_path(cache_dir), "w") as cache_file:
+        cache_file.write(cache_contents)
+    conference_urls, extract_count = get_conference_urls(EVENT_DICTS)
+    assert extract_count == 3
+    assert conference_urls[0] == "https://zoom.us/j/111"
+
+
+def test_malformed_entries(cache_dir):
+    """Should ignore cache entries which are not strings"""
+    cache = ConferenceUrlCache(prefs.snapshot)
+    event_hash = cache.get_event_hash(EVENT_DICTS[0])
+    with open(get_cache_path(cache_dir), "w") as cache_file:
+        json.dump(
+            {
+                "version": CACHE_VERSION,
+                "prefs_fingerprint": cache.prefs_fingerprint,
+                "entries": {event_hash: None},
+            },
+            cache_file,
+        )
+    _, extract_count = get_conference_urls(EVENT_DICTS[:1])
+    assert extract_count == 1
+
+
+@freeze_time("2022-10-16 08:15:00")
+@use_env("use_conference_url_cache", "true")
+@redirect_stdout
+def test_list_events_populates_cache(out, cache_dir):
+    """Should cache the conference URLs resolved by list_events"""
+    run_list_events(EVENT_DICTS)
+    feedback = json.loads(out.getvalue())
+    assert [item["title"] for item in feedback["items"]] == ["Standup", "Planning"]
+    _, extract_count = get_conference_urls(EVENT_DICTS[:2])
+    assert extract_count == 0
+
+
+@freeze_time("2022-10-16 08:00:00")
+@redirect_stdout
+def test_cache_disabled(out, cache_dir):
+    """Should not cache anything unless enabled"""
+    run_list_events(EVENT_DICTS)
+    assert not os.path.exists(get_cache_path(cache_dir))
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+import os
+import os.path
+import stat
+import subprocess
+import sys
+import threading
+import time
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from ocu import list_events
+from ocu.calendar import get_calendar
+from ocu.calendars.applescript_calendar import AppleScriptCalendar
+from ocu.calendars.async_subprocess import check_output_async
+from ocu.calendars.base_calendar import BaseCalendar
+from ocu.calendars.cached_calendar import CachedCalendar
+from ocu.calendars.concurrent_calendar import ConcurrentCalendar
+from ocu.calendars.deadline_calendar import DeadlineCalendar
+from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+from tests.utils import redirect_stdout, use_env
+
+# The number of seconds each stub calendar takes to respond
+CALENDAR_DELAYS = {"Work": 0.5, "Personal": 0.5, "Team": 0.5, "Hung": 30}
+# A stub osascript which records its process ID before responding for the
+# given calendar name
+OSASCRIPT_STUB = """
+import json, os, sys, time
+calendar_name = sys.argv[5] if len(sys.argv) > 5 else "Hung"
+with open(os.path.join({pid_dir!r}, calendar_name), "w") as pid_file:
+    pid_file.write(str(os.getpid()))
+time.sleep({delays!r}[calendar_name])
+print(json.dumps([{{
+    "title": f"{{calendar_name}} Meeting",
+    "startDate": "{today}T08:00",
+    "endDate": "{today}T09:00",
+    "location": "https://zoom.us/j/123456",
+}}]))
+"""
+
+
+class BlockingCalendar(BaseCalendar):
+    """A calendar backend which blocks (without asyncio support) until it is
+    released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def get_event_dicts(
+        self,
+        start_datetime=None,
+        end_datetime=None,
+        calendar_names=None,
+        include_notes=True,
+    ):
+        self.started.set()
+        self.released.wait()
+        return [{"title": "Blocked Meeting", "startDate": "2022-10-16T08:00"}]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory for each test."""
+    with use_env("alfred_workflow_cache", os.path.join(tmp_path, "cache")):
+        yield
+
+
+@pytest.fixture
+def pid_dir(tmp_path):
+    """Collect the process ID of each stub calendar subprocess."""
+    pid_dir = tmp_path / "pids"
+    pid_dir.mkdir()
+    return pid_dir
+
+
+@pytest.fixture
+def osascript_stub(tmp_path, pid_dir):
+    """Put a stub osascript binary (which may hang) on the PATH."""
+    stub_path = os.path.join(tmp_path, "osascript")
+    with open(stub_path, "w") as stub_file:
+        stub_file.write(
+            f"#!{sys.executable}\n"
+            + OSASCRIPT_STUB.format(
+                pid_dir=str(pid_dir),
+                delays=CALENDAR_DELAYS,
+                today=date.today().isoformat(),
+            )
+        )
+    os.chmod(stub_path, os.stat(stub_path).st_mode | stat.S_IEXEC)
+    with use_env("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}"):
+        yield
+
+
+def wait_for_pid(pid_dir, calendar_name):
+    """Wait for the stub subprocess of the given calendar to start, returning
+    its process ID."""
+    pid_path = pid_dir / calendar_name
+    for _ in range(100):
+        if pid_path.exists() and pid_path.read_text():
+            return int(pid_path.read_text())
+        time.sleep(0.05)
+    raise AssertionError(f"{calendar_name} subprocess never started")
+
+
+def is_process_running(pid):
+    """Return True if a process with the given ID is still running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def get_titles(event_dicts):
+    """Retrieve the titles of the given event dictionaries."""
+    return [event_dict["title"] for event_dict in event_dicts]
+
+
+@use_env("calendar_deadline_secs", "5")
+def test_get_calendar():
+    """Should wrap the calendar with a deadline if the user has set one"""
+    calendar = get_calendar()
+    assert isinstance(calendar, DeadlineCalendar)
+    assert calendar.deadline_secs == 5
+    assert isinstance(calendar.calendar, AppleScriptCalendar)
+
+
+@use_env("calendar_deadline_secs", "5")
+@use_env("event_cache_ttl_secs", "60")
+def test_get_calendar_cached():
+    """Should only apply the deadline to fetches which miss the cache"""
+    calendar = get_calendar()
+    assert isinstance(calendar, CachedCalendar)
+    assert isinstance(calendar.calendar, DeadlineCalendar)
+
+
+def test_get_calendar_no_deadline():
+    """Should not impose a deadline unless the user has set one"""
+    assert isinstance(get_calendar(), AppleScriptCalendar)
+
+
+@use_env("calendar_deadline_secs", "0.5")
+@redirect_stdout
+def test_list_events_deadline(out, osascript_stub, pid_dir):
+    """Should show a timed-out item (and kill the calendar subprocess) rather
+    than waiting on a hung calendar"""
+    start_time = time.perf_counter()
+    list_events.main()
+    assert time.perf_counter() - start_time < 5
+    feedback = json.loads(out.getvalue())
+    assert feedback["items"][-1] == {
+        "title": "Calendar Timed Out",
+        "subtitle": "Events from your calendars could not be loaded in time",
+        "valid": "no",
+    }
+    assert not is_process_running(wait_for_pid(pid_dir, "Hung"))
+
+
+@use_env("calendar_names", "Work")
+@use_env("calendar_deadline_secs", "5")
+def test_deadline_met(osascript_stub):
+    """Should return the events of a calendar which answers in time"""
+    calendar = get_calendar()
+    assert get_titles(calendar.get_event_dicts()) == ["Work Meeting"]
+    assert calendar.get_timed_out_calendar_names() == []
+
+
+@use_env("calendar_names", "Work, Hung, Personal")
+@use_env("calendar_fetch_concurrency", "3")
+@use_env("calendar_deadline_secs", "1.5")
+def test_concurrent_deadline(osascript_stub, pid_dir):
+    """Should report every requested calendar as timed out once the deadline
+    passes, killing every calendar subprocess still running"""
+    calendar = get_calendar()
+    assert isinstance(calendar.calendar, ConcurrentCalendar)
+    start_time = time.perf_counter()
+    assert calendar.get_event_dicts() == []
+    assert time.perf_counter() - start_time < 5
+    assert calendar.get_timed_out_calendar_names() == ["Work", "Hung", "Personal"]
+    assert not is_process_running(wait_for_pid(pid_dir, "Hung"))
+
+
+@use_env("calendar_names", "Work, Hung, Personal")
+@use_env("calendar_fetch_concurrency", "3")
+@use_env("calendar_fetch_timeout_secs", "1.5")
+@use_env("calendar_deadline_secs", "10")
+def test_concurrent_timeout_within_deadline(osascript_stub):
+    """Should still skip the individual calendars which time out, well before
+    the deadline"""
+    calendar = get_calendar()
+    start_time = time.perf_counter()
+    event_dicts = calendar.get_event_dicts()
+    assert time.perf_counter() - start_time < 5
+    assert get_titles(event_dicts) == ["Work Meeting", "Personal Meeting"]
+    assert calendar.get_timed_out_calendar_names() == ["Hung"]
+
+
+@use_env("calendar_names", "Work, Personal, Team")
+def test_concurrent_async(osascript_stub):
+    """Should await every calendar subprocess at once on the event loop"""
+    calendar = ConcurrentCalendar(
+        {
+            calendar_name: AppleScriptCalendar(calendar_names=[calendar_name])
+            for calendar_name in ("Work", "Personal", "Team")
+        },
+        max_workers=3,
+    )
+    start_time = time.perf_counter()
+    event_dicts = asyncio.run(calendar.aget_event_dicts())
+    # Run serially, the three calendars would take at least 1.5 seconds
+    assert time.perf_counter() - start_time < 1.2
+    assert get_titles(event_dicts) == [
+        "Work Meeting",
+        "Personal Meeting",
+        "Team Meeting",
+    ]
+
+
+def test_cancel_kills_subprocess(osascript_stub, pid_dir):
+    """Should kill the calendar subprocess if its fetch is cancelled"""
+
+    async def cancel_fetch():
+        task = asyncio.ensure_future(
+            AppleScriptCalendar(calendar_names=["Hung"]).aget_event_dicts()
+        )
+        pid = await asyncio.to_thread(wait_for_pid, pid_dir, "Hung")
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return pid
+
+    assert not is_process_running(asyncio.run(cancel_fetch()))
+
+
+def test_subprocess_timeout(osascript_stub, pid_dir):
+    """Should kill the calendar subprocess once it exceeds its timeout"""
+    calendar = AppleScriptCalendar(calendar_names=["Hung"], timeout_secs=0.5)
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(calendar.aget_event_dicts())
+    assert not is_process_running(wait_for_pid(pid_dir, "Hung"))
+
+
+def test_subprocess_failure():
+    """Should raise an error if the subprocess fails"""
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(check_output_async([sys.executable, "-c", "raise SystemExit(2)"]))
+
+
+@use_env("use_icalbuddy", "true")
+def test_icalbuddy_async(tmp_path):
+    """Should parse the output of icalBuddy read under asyncio"""
+    stub_path = os.path.join(tmp_path, "icalBuddy")
+    with open(stub_path, "w") as stub_file:
+        stub_file.write(
+            f"#!{sys.executable}\n"
+            + "print('• Work Meeting')\n"
+            + f"print('    {date.today().isoformat()} at 08:00 - 09:00')\n"
+            + "print('    location: https://zoom.us/j/123456')\n"
+        )
+    os.chmod(stub_path, os.stat(stub_path).st_mode | stat.S_IEXEC)
+    calendar = IcalBuddyCalendar()
+    with patch.object(IcalBuddyCalendar, "binary_paths", [stub_path]):
+        event_dicts = asyncio.run(calendar.aget_event_dicts())
+        assert event_dicts == calendar.get_event_dicts()
+    assert get_titles(event_dicts) == ["Work Meeting"]
+
+
+@use_env("calendar_names", "Work")
+def test_blocking_calendar_deadline():
+    """Should give up on a calendar without asyncio support at the deadline,
+    rather than waiting for its worker thread to finish"""
+    blocking_calendar = BlockingCalendar()
+    calendar = DeadlineCalendar(blocking_calendar, deadline_secs=0.1)
+    try:
+        assert calendar.get_event_dicts() == []
+        assert blocking_calendar.started.is_set()
+        assert not blocking_calendar.released.is_set()
+        assert calendar.get_timed_out_calendar_names() == ["Work"]
+    finally:
+        blocking_calendar.released.set()
+
+
+def test_blocking_calendar_async():
+    """Should return the events of a calendar without asyncio support once
+    its worker thread finishes"""
+    blocking_calendar = BlockingCalendar()
+    blocking_calendar.released.set()
+    calendar = DeadlineCalendar(blocking_calendar, deadline_secs=30)
+    assert get_titles(calendar.get_event_dicts()) == ["Blocked Meeting"]
+
+
+def test_blocking_calendar_async_failure():
+    """Should raise the error of a calendar without asyncio support"""
+    calendar = BlockingCalendar()
+    with patch.object(
+        calendar, "get_event_dicts", side_effect=subprocess.CalledProcessError(1, [])
+    ):
+        with pytest.raises(subprocess.CalledProcessError):
+            asyncio.run(calendar.aget_event_dicts())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import random
+import re
+
+import pytest
+
+from ocu.domain_matcher import DomainMatcher, get_domain_matcher
+from ocu.event import Event
+from tests.utils import use_env
+
+DEFAULT_PATTERNS = [
+    "*.zoom.us",
+    "zoom.us",
+    "meet.google.com",
+    "*.microsoft.com",
+    "*.webex.com",
+    "webex.com",
+]
+
+
+def get_reference_score(patterns, hostname):
+    """Score the hostname using one freshly-built regex per pattern."""
+    for i, pattern in enumerate(patterns):
+        domain_patt = re.sub(r"\\\*", r"([a-z0-9\-]+)", re.escape(pattern))
+        if re.match(domain_patt, hostname):
+            return 10 * (len(patterns) - i)
+    return -1
+
+
+@pytest.mark.parametrize(
+    ("hostname", "expected_score"),
+    [
+        ("us02web.zoom.us", 60),
+        ("zoom.us", 50),
+        ("meet.google.com", 40),
+        ("teams.microsoft.com", 30),
+        ("mycompany.webex.com", 20),
+        ("webex.com", 10),
+        ("google.com", -1),
+        ("a.b.zoom.us", -1),
+        ("", -1),
+    ],
+)
+def test_get_score(hostname, expected_score):
+    """Should score hostnames according to the precedence of their pattern"""
+    assert DomainMatcher(DEFAULT_PATTERNS).get_score(hostname) == expected_score
+
+
+def test_prefix_match():
+    """Should match patterns against the start of the hostname"""
+    matcher = DomainMatcher(["zoom.us", "*.zoom"])
+    assert matcher.get_score("zoom.us.example.com") == 20
+    assert matcher.get_score("us02web.zoom.us") == 10
+
+
+def test_wildcard_requires_character():
+    """Should require a wildcard to match at least one character"""
+    matcher = DomainMatcher(["*.zoom.us", "a*"])
+    assert matcher.get_score(".zoom.us") == -1
+    assert matcher.get_score("a") == -1
+    assert matcher.get_score("ab") == 10
+
+
+def test_empty_pattern():
+    """Should match every hostname against an empty pattern"""
+    assert DomainMatcher(["zoom.us", ""]).get_score("example.com") == 10
+
+
+def test_duplicate_patterns():
+    """Should use the first occurrence of a duplicated pattern"""
+    assert DomainMatcher(["zoom.us", "webex.com", "zoom.us"]).get_score("zoom.us") == 30
+
+
+def test_cached_hostnames():
+    """Should remember the result for each hostname"""
+    matcher = DomainMatcher(DEFAULT_PATTERNS)
+    matcher.get_score("us02web.zoom.us")
+    assert matcher.cached_pattern_indices == {"us02web.zoom.us": 0}
+
+
+def test_get_domain_matcher_cached():
+    """Should only compile a matcher once for the same list of patterns"""
+    patterns = tuple(DEFAULT_PATTERNS)
+    assert get_domain_matcher(patterns) is get_domain_matcher(patterns)
+
+
+def test_matches_reference_semantics():
+    """Should score randomly-generated hostnames exactly as regexes would"""
+    rng = random.Random(1234)
+    alphabet = "abz0-.*"
+    for _ in range(500):
+        patterns = [
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 6)))
+            for _ in range(rng.randint(1, 6))
+        ]
+        matcher = DomainMatcher(patterns)
+        for _ in range(20):
+            hostname = "".join(
+                rng.choice(alphabet[:-1]) for _ in range(rng.randint(0, 10))
+            )
+            assert matcher.get_score(hostname) == get_reference_score(
+                patterns, hostname
+            ), (patterns, hostname)
+
+
+@use_env("conference_domains", "zoom.us, *.zoom.us")
+def test_event_uses_matcher():
+    """Should score event URLs via the compiled matcher"""
+    event = Event(
+        {
+            "title": "Meeting",
+            "startDate": "2011-10-16T08:00",
+            "endDate": "2011-10-16T09:00",
+        }
+    )
+    assert event.get_url_score("https://zoom.us/j/123") == 20
+    assert event.get_url_score("https://us02web.zoom.us/j/123") == 10
+    assert event.get_url_score("https:///j/123") == -1
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import random
+import sys
+from datetime import datetime
+
+import pytest
+from freezegun import freeze_time
+
+from ocu import list_events
+from ocu.event import Event
+from ocu.event_batch import EventBatch
+from tests.utils import use_env
+
+EVENT_DICT = {
+    "title": "My Meeting",
+    "startDate": "2022-10-16T08:00",
+    "endDate": "2022-10-16T09:00",
+    "location": "https://zoom.us/j/123456",
+}
+
+
+def generate_events(rng, event_count):
+    """Generate random (lazy) events throughout the day, including some
+    all-day events and events without a conference URL."""
+    events = []
+    for i in range(event_count):
+        if rng.random() < 0.1:
+            start_date, end_date = "2022-10-16T00:00", "2022-10-16T23:59"
+        else:
+            start_min = rng.randrange(6 * 60, 20 * 60)
+            end_min = start_min + rng.choice((15, 30, 60))
+            start_date = f"2022-10-16T{start_min // 60:02}:{start_min % 60:02}"
+            end_date = f"2022-10-16T{end_min // 60:02}:{end_min % 60:02}"
+        events.append(
+            Event(
+                {
+                    "title": f"Meeting {i}",
+                    "startDate": start_date,
+                    "endDate": end_date,
+                    "location": rng.choice(("https://zoom.us/j/123456", "Room 101")),
+                },
+                lazy=True,
+            )
+        )
+    return events
+
+
+def test_event_has_no_dict():
+    """Should store event attributes in slots rather than a __dict__"""
+    event = Event(EVENT_DICT)
+    assert not hasattr(event, "__dict__")
+    with pytest.raises(AttributeError):
+        event.unknown_attribute = True
+
+
+@freeze_time("2022-10-16 08:00:00")
+@pytest.mark.parametrize(
+    ("start_time", "is_upcoming"),
+    [("07:40", True), ("07:39", False), ("08:19", True), ("08:20", False)],
+)
+def test_upcoming_window_boundaries(start_time, is_upcoming):
+    """Should treat the edges of the time window as the per-event functions
+    do"""
+    event = Event({**EVENT_DICT, "startDate": f"2022-10-16T{start_time}"}, lazy=True)
+    classification = EventBatch([event]).classify(datetime.now().timestamp(), 20)
+    assert bool(classification.upcoming_indices) == is_upcoming
+    assert list_events.is_time_upcoming(event.start_datetime, 20) == is_upcoming
+
+
+def test_conference_url_indices_resolved_lazily():
+    """Should only resolve conference URLs as their indices are reached"""
+    events = [
+        Event(EVENT_DICT, lazy=True),
+        Event({**EVENT_DICT, "location": "Room 101"}, lazy=True),
+        Event(EVENT_DICT, lazy=True),
+    ]
+    batch = EventBatch(events)
+    conference_url_indices = batch.iter_conference_url_indices([1, 0, 2])
+    assert next(conference_url_indices) == 0
+    assert events[1].event_dict is None
+    assert events[2].event_dict is not None
+    assert list(conference_url_indices) == [2]
+
+
+def test_empty_batch():
+    """Should handle a batch with no events"""
+    batch = EventBatch([])
+    assert len(batch) == 0
+    classification = batch.classify(0, 20)
+    assert classification.upcoming_indices == []
+    assert classification.past_indices == []
+    assert classification.sort_keys == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_classify_matches_per_event_functions(seed):
+    """Should classify events exactly as the per-event functions do, as of the
+    given time"""
+    rng = random.Random(seed)
+    current_datetime = datetime(2022, 10, 16, rng.randint(5, 21), rng.randint(0, 59))
+    events = [
+        Event(event.event_dict, lazy=True, current_datetime=current_datetime)
+        for event in generate_events(rng, rng.randint(0, 60))
+    ]
+    classification = EventBatch(events).classify(current_datetime.timestamp(), 20)
+    assert [
+        events[index] for index in classification.upcoming_indices
+    ] == list_events.filter_to_upcoming_events(events, current_datetime)
+    past_events = list_events.filter_to_past_events(events, current_datetime)
+    assert [events[index] for index in classification.past_indices] == past_events
+    assert classification.sort_keys == [
+        list_events.get_event_sort_key(current_datetime, event) for event in events
+    ]
+    assert [
+        events[index] for index in classification.iter_nearest_past_indices()
+    ] == list_events.sort_events_by_time(past_events, current_datetime)
+
+
+@pytest.mark.parametrize(
+    ("time_threshold_mins", "is_upcoming"), [("0", False), ("1", True), ("20", True)]
+)
+def test_all_day_events_upcoming(time_threshold_mins, is_upcoming):
+    """Should only classify an all-day event (which starts at the time it was
+    created) as upcoming if the time threshold is nonzero, as the per-event
+    functions do"""
+    current_datetime = datetime(2022, 10, 16, 12, 0)
+    event = Event(
+        {**EVENT_DICT, "startDate": "2022-10-16T00:00", "endDate": "2022-10-16T23:59"},
+        current_datetime=current_datetime,
+    )
+    with use_env("event_time_threshold_mins", time_threshold_mins):
+        classification = EventBatch([event]).classify(
+            current_datetime.timestamp(), int(time_threshold_mins)
+        )
+        assert (
+            list_events.filter_to_upcoming_events([event], current_datetime) == [event]
+        ) == is_upcoming
+    assert bool(classification.upcoming_indices) == is_upcoming
+    assert classification.sort_keys == [sys.maxsize]
+
+
+def test_nearest_past_indices_ties_in_batch_order():
+    """Should order past events with equal sort keys by their position in the
+    batch, as a stable sort would"""
+    current_datetime = datetime(2022, 10, 16, 12, 0)
+    events = [
+        Event({**EVENT_DICT, "title": f"Meeting {i}"}, lazy=True) for i in range(5)
+    ]
+    classification = EventBatch(events).classify(current_datetime.timestamp(), 20)
+    assert list(classification.iter_nearest_past_indices()) == [0, 1, 2, 3, 4]
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+import json
+import os.path
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from ocu.calendar import get_calendar
+from ocu.calendars.applescript_calendar import AppleScriptCalendar
+from ocu.calendars.cached_calendar import CachedCalendar
+from tests.utils import use_env
+
+EVENT_DICTS = [
+    {
+        "title": "My Meeting",
+        "startDate": "2022-10-16T08:00",
+        "endDate": "2022-10-16T09:00",
+        "location": "https://zoom.us/j/123456",
+    }
+]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory for each test."""
+    with use_env("alfred_workflow_cache", str(tmp_path)):
+        yield tmp_path
+
+
+@pytest.fixture
+def check_output():
+    """Mock the calendar subprocess so that calls to it can be counted."""
+    with patch(
+        "subprocess.check_output",
+        return_value=json.dumps(EVENT_DICTS).encode("utf-8"),
+    ) as check_output:
+        yield check_output
+
+
+@use_env("event_cache_ttl_secs", "")
+def test_cache_disabled_by_default():
+    """Should not wrap the calendar with a cache if no TTL is set."""
+    assert not isinstance(get_calendar(), CachedCalendar)
+
+
+@use_env("event_cache_ttl_secs", "60")
+def test_cache_enabled():
+    """Should wrap the calendar with a cache if a TTL is set."""
+    calendar = get_calendar()
+    assert isinstance(calendar, CachedCalendar)
+    assert calendar.ttl_secs == 60
+
+
+@use_env("event_cache_ttl_secs", "60")
+def test_cache_hit(check_output):
+    """Should skip the calendar subprocess if the cache is fresh."""
+    with freeze_time("2022-10-16 07:55:00") as frozen_time:
+        assert get_calendar().get_event_dicts() == EVENT_DICTS
+        frozen_time.tick(59)
+        assert get_calendar().get_event_dicts() == EVENT_DICTS
+    assert check_output.call_count == 1
+
+
+@use_env("event_cache_ttl_secs", "60")
+def test_cache_expired(check_output):
+    """Should re-run the calendar subprocess once the TTL has elapsed."""
+    with freeze_time("2022-10-16 07:55:00") as frozen_time:
+        get_calendar().get_event_dicts()
+        frozen_time.tick(60)
+        get_calendar().get_event_dicts()
+    assert check_output.call_count == 2
+
+
+@use_env("event_cache_ttl_secs", "3600")
+def test_cache_invalidated_at_midnight(check_output):
+    """Should invalidate the cache when the date changes."""
+    with freeze_time("2022-10-16 23:59:50") as frozen_time:
+        get_calendar().get_event_dicts()
+        frozen_time.tick(20)
+        get_calendar().get_event_dicts()
+    assert check_output.call_count == 2
+
+
+@use_env("event_cache_ttl_secs", "60")
+def test_cache_keyed_by_range(check_output):
+    """Should cache the events for each range of time separately."""
+    with freeze_time("2022-10-16 07:55:00"):
+        calendar = get_calendar()
+        calendar.get_event_dicts()
+        calendar.get_event_dicts(datetime(2022, 10, 16), datetime(2022, 10, 17))
+        calendar.get_event_dicts(datetime(2022, 10, 16), datetime(2022, 10, 18))
+        calendar.get_event_dicts(calendar_names=["Work"])
+    assert check_output.call_count == 3
+
+
+@use_env("event_cache_ttl_secs", "60")
+def test_cache_keeps_several_entries(check_output):
+    """Should cache the results of alternating queries side by side."""
+    with freeze_time("2022-10-16 07:55:00"):
+        for _ in range(3):
+            get_calendar().get_event_dicts(include_notes=False)
+            get_calendar().get_event_dicts(
+                datetime(2022, 10, 16, 8), datetime(2022, 10, 16, 9, 1)
+            )
+    assert check_output.call_count == 2
+
+
+@use_env("event_cache_ttl_secs", "60")
+def test_cache_entries_capped(check_output, cache_dir):
+    """Should only keep the most recent entries in the cache."""
+    with freeze_time("2022-10-16 07:55:00"):
+        for hour in range(CachedCalendar.max_entries + 1):
+            get_calendar().get_event_dicts(
+                datetime(2022, 10, 16, hour), datetime(2022, 10, 16, hour + 1)
+            )
+        get_calendar().get_event_dicts(
+            datetime(2022, 10, 16, 0), datetime(2022, 10, 16, 1)
+        )
+    with open(cache_dir / CachedCalendar.cache_file_name) as cache_file:
+        assert len(json.load(cache_file)["entries"]) == CachedCalendar.max_entries
+    assert check_output.call_count == CachedCalendar.max_entries + 2
+
+
+@use_env("event_cache_ttl_secs", "60")
+def test_cache_invalidated_by_prefs(check_output):
+    """Should invalidate the cache when a relevant preference changes."""
+    with freeze_time("2022-10-16 07:55:00"):
+        get_calendar().get_event_dicts()
+        with use_env("calendar_names", "Work"):
+            get_calendar().get_event_dicts()
+        with use_env("conference_domains", "zoom.us"):
+            get_calendar().get_event_dicts()
+        with use_env("use_direct_zoom", "true"):
+            get_calendar().get_event_dicts()
+    assert check_output.call_count == 4
+
+
+@use_env("event_cache_ttl_secs", "60")
+def test_cache_from_future(check_output):
+    """Should treat cache entries created in the future as stale."""
+    with freeze_time("2022-10-16 07:55:00"):
+        get_calendar().get_event_dicts()
+    with freeze_time("2022-10-16 07:54:00"):
+        get_calendar().get_event_dicts()
+    assert check_output.call_count == 2
+
+
+@use_env("event_cache_ttl_secs", "60")
+@pytest.mark.parametrize("contents", ["", "{", "[]", '{"key": null}'])
+def test_cache_corrupted(check_output, cache_dir, contents):
+    """Should ignore a cache file that is missing or malformed."""
+    cache_path = os.path.join(cache_dir, CachedCalendar.cache_file_name)
+    with open(cache_path, "w") as cache_file:
+        cache_file.write(contents)
+    assert get_calendar().get_event_dicts() == EVENT_DICTS
+    assert check_output.call_count == 1
+
+
+@use_env("event_cache_ttl_secs", "60")
+def test_cache_write_atomic(check_output, cache_dir):
+    """Should leave no temporary files behind after writing the cache."""
+    CachedCalendar(AppleScriptCalendar(), ttl_secs=60).get_event_dicts()
+    assert os.listdir(cache_dir) == [CachedCalendar.cache_file_name]
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+import random
+from datetime import datetime
+
+import pytest
+from freezegun import freeze_time
+
+from ocu import list_events
+from ocu.event import Event
+from ocu.event_timeline import EventTimeline
+from tests.utils import use_env
+
+
+def format_mins(mins):
+    """Format the given number of minutes since midnight as an event date."""
+    return f"2022-10-16T{mins // 60:02}:{mins % 60:02}"
+
+
+def generate_events(rng):
+    """Generate a random day of overlapping (lazy) events in random order."""
+    # The sort keys of past events are floats so large that end times less
+    # than ~35 minutes apart compare as equal (leaving their relative order
+    # arbitrary), so end times are spread at least 40 minutes apart
+    end_mins = rng.sample(range(7 * 60, 23 * 60, 40), rng.randint(0, 20))
+    events = [
+        Event(
+            {
+                "title": f"Meeting {i}",
+                "startDate": format_mins(end_min - rng.randint(5, 180)),
+                "endDate": format_mins(end_min),
+                "location": "https://zoom.us/j/123456",
+            },
+            lazy=True,
+        )
+        for i, end_min in enumerate(end_mins)
+    ]
+    if rng.random() < 0.3:
+        events.append(
+            Event(
+                {
+                    "title": "All-Day Meeting",
+                    "startDate": "2022-10-16T00:00",
+                    "endDate": "2022-10-16T23:59",
+                },
+                lazy=True,
+            )
+        )
+    return events
+
+
+def get_random_time(rng):
+    """Choose a random time of day at which to query a random timeline."""
+    return f"2022-10-16 {rng.randint(6, 23):02}:{rng.randint(0, 59):02}"
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_per_event_functions(seed):
+    """Should find the same events as the per-event functions do"""
+    rng = random.Random(seed)
+    with freeze_time(get_random_time(rng)):
+        # The events are created as of the time they are queried, as in
+        # list_events
+        events = generate_events(rng)
+        timeline = EventTimeline(events)
+        current_datetime = datetime.now()
+        current_timestamp = current_datetime.timestamp()
+        upcoming_events = timeline.batch.get_events(
+            timeline.get_upcoming_indices(current_timestamp, 20)
+        )
+        assert upcoming_events == sorted(
+            list_events.filter_to_upcoming_events(events, current_datetime),
+            key=lambda event: event.start_datetime,
+        )
+        past_events = list_events.filter_to_past_events(events, current_datetime)
+        assert timeline.count_past(current_timestamp) == len(past_events)
+        assert set(
+            timeline.batch.get_events(timeline.get_past_indices(current_timestamp))
+        ) == set(past_events)
+        assert timeline.batch.get_events(
+            timeline.iter_nearest_past_indices(current_timestamp, 20)
+        ) == list_events.sort_events_by_time(past_events, current_datetime)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_sort_indices(seed):
+    """Should sort events exactly as their per-event sort keys do"""
+    rng = random.Random(seed)
+    with freeze_time(get_random_time(rng)):
+        events = generate_events(rng)
+        timeline = EventTimeline(events)
+        current_datetime = datetime.now()
+        assert timeline.batch.get_events(
+            timeline.sort_indices(range(len(events)), current_datetime.timestamp(), 20)
+        ) == list_events.sort_events_by_time(events, current_datetime)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_in_progress(seed):
+    """Should find exactly the events which have started but not yet ended"""
+    rng = random.Random(seed)
+    with freeze_time(get_random_time(rng)):
+        events = generate_events(rng)
+        timeline = EventTimeline(events)
+        current_datetime = datetime.now()
+        assert timeline.batch.get_events(
+            timeline.get_in_progress_indices(current_datetime.timestamp())
+        ) == sorted(
+            (
+                event
+                for event in events
+                if event.start_datetime <= current_datetime < event.end_datetime
+            ),
+            key=lambda event: event.start_datetime,
+        )
+
+
+def test_nearest_past_indices_visited_lazily():
+    """Should only visit as many past events as are consumed"""
+    with freeze_time("2022-10-16 12:00:00"):
+        timeline = EventTimeline(
+            [
+                Event(
+                    {
+                        "title": f"Meeting {hour}",
+                        "startDate": format_mins(hour * 60),
+                        "endDate": format_mins(hour * 60 + 30),
+                    },
+                    lazy=True,
+                )
+                for hour in range(6, 12)
+            ]
+        )
+        nearest_past_indices = timeline.iter_nearest_past_indices(
+            datetime.now().timestamp(), 20
+        )
+        # The most recently ended events come first
+        assert next(nearest_past_indices) == 5
+        assert next(nearest_past_indices) == 4
+
+
+@freeze_time("2022-10-16 12:00:00")
+def test_nearest_past_indices_tied():
+    """Should visit past events which ended at the same time in the order
+    they were given, as a stable sort by their sort keys would"""
+    timeline = EventTimeline(
+        [
+            Event(
+                {
+                    "title": f"Meeting {i}",
+                    "startDate": format_mins(start_min),
+                    "endDate": "2022-10-16T11:00",
+                },
+                lazy=True,
+            )
+            for i, start_min in enumerate((10 * 60, 9 * 60, 10 * 60 + 30))
+        ]
+    )
+    assert list(timeline.iter_nearest_past_indices(datetime.now().timestamp(), 20)) == [
+        0,
+        1,
+        2,
+    ]
+
+
+def test_recently_started_past_event_nearest():
+    """Should treat a past event which started within the time threshold as
+    nearer than one which ended more recently, as its sort key does"""
+    with freeze_time("2022-10-16 12:00:00"):
+        current_datetime = datetime.now()
+        events = [
+            Event(
+                {
+                    "title": "Long Meeting",
+                    "startDate": "2022-10-16T11:00",
+                    "endDate": "2022-10-16T11:55",
+                },
+                lazy=True,
+            ),
+            Event(
+                {
+                    "title": "Short Meeting",
+                    "startDate": "2022-10-16T11:45",
+                    "endDate": "2022-10-16T11:50",
+                },
+                lazy=True,
+            ),
+        ]
+        timeline = EventTimeline(events)
+        nearest_past_indices = list(
+            timeline.iter_nearest_past_indices(current_datetime.timestamp(), 20)
+        )
+        assert nearest_past_indices == [1, 0]
+        assert timeline.batch.get_events(
+            nearest_past_indices
+        ) == list_events.sort_events_by_time(events, current_datetime)
+
+
+@freeze_time("2022-10-16 12:00:00")
+@pytest.mark.parametrize("time_threshold_mins", ["0", "1", "20"])
+def test_all_day_upcoming(time_threshold_mins):
+    """Should only treat an all-day event (which starts at the current time)
+    as upcoming if the time threshold is nonzero, as the per-event functions
+    do"""
+    event = Event(
+        {
+            "title": "All-Day Meeting",
+            "startDate": "2022-10-16T00:00",
+            "endDate": "2022-10-16T23:59",
+        },
+        lazy=True,
+    )
+    upcoming_indices = EventTimeline([event]).get_upcoming_indices(
+        datetime.now().timestamp(), int(time_threshold_mins)
+    )
+    with use_env("event_time_threshold_mins", time_threshold_mins):
+        expected_upcoming_events = list_events.filter_to_upcoming_events([event])
+    assert bool(upcoming_indices) == (time_threshold_mins != "0")
+    assert bool(upcoming_indices) == bool(expected_upcoming_events)
+
+
+def test_empty_timeline():
+    """Should handle a timeline with no events"""
+    timeline = EventTimeline([])
+    assert timeline.get_upcoming_indices(0, 20) == []
+    assert timeline.get_past_indices(0) == []
+    assert timeline.count_past(0) == 0
+    assert list(timeline.iter_nearest_past_indices(0, 20)) == []
+    assert timeline.get_in_progress_indices(0) == []
+    assert timeline.sort_indices([], 0, 20) == []
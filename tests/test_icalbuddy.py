@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+import re
+from datetime import datetime
 from unittest.mock import patch
 
 from freezegun import freeze_time
@@ -138,3 +140,48 @@ def test_missing_times():
     assert event_dicts[0].get("location") == "https://zoom.us/j/123456"
     assert event_dicts[0].get("notes") == ""
     assert len(event_dicts) == 2
+
+
+@freeze_time("2022-10-16 09:00:00")
+def test_query_today():
+    """should query today's events with eventsToday+0 by default"""
+    calendar = IcalBuddyCalendar()
+    assert calendar.get_icalbuddy_command()[-1] == "eventsToday+0"
+    assert (
+        calendar.get_icalbuddy_command(datetime(2022, 10, 16), datetime(2022, 10, 17))[
+            -1
+        ]
+        == "eventsToday+0"
+    )
+
+
+@freeze_time("2022-10-16 09:00:00")
+def test_query_days_ahead():
+    """should query several whole days starting today with eventsToday+N"""
+    calendar = IcalBuddyCalendar()
+    command = calendar.get_icalbuddy_command(
+        datetime(2022, 10, 16), datetime(2022, 10, 19)
+    )
+    assert command[-1] == "eventsToday+2"
+
+
+@freeze_time("2022-10-16 09:00:00")
+def test_query_time_range():
+    """should query any other range of time with eventsFrom:to:"""
+    calendar = IcalBuddyCalendar()
+    command = calendar.get_icalbuddy_command(
+        datetime(2022, 10, 16, 9, 0), datetime(2022, 10, 16, 9, 40)
+    )
+    assert re.fullmatch(r"eventsFrom:2022-10-16 09:00:00 [+-]\d{4}", command[-2])
+    assert re.fullmatch(r"to:2022-10-16 09:40:00 [+-]\d{4}", command[-1])
+
+
+@use_env("calendar_names", "General,Work")
+def test_query_calendar_names():
+    """should prefer the given calendar names over the user's preference"""
+    calendar = IcalBuddyCalendar()
+    with patch("subprocess.check_output", return_value=b"") as check_output:
+        calendar.get_event_dicts(calendar_names=["Personal"])
+    command = check_output.call_args.args[0]
+    calendar_names_index = command.index("--includeCals") + 1
+    assert command[calendar_names_index:][:2] == ["Personal", "--dateFormat"]
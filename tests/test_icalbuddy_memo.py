@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import os.path
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+from ocu.calendars.icalbuddy_memo import MEMO_VERSION, IcalBuddyMemo
+from tests.utils import use_env
+
+FIXTURE_NAMES = sorted(
+    os.path.splitext(file_name)[0]
+    for file_name in os.listdir(os.path.join("tests", "icalbuddy_output"))
+)
+RAW_OUTPUT = (
+    "• Standup\n"
+    "    2022-10-16 at 08:00 - 08:15\n"
+    "    location: https://zoom.us/j/111\n"
+    "• Planning\n"
+    "    2022-10-16 at 10:00 - 11:00\n"
+    "    notes: Join at https://zoom.us/j/222\n"
+    "• Reminder\n"
+    "    09:00\n"
+    "    location: https://zoom.us/j/333\n"
+)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory for each test."""
+    with use_env("alfred_workflow_cache", str(tmp_path)):
+        with use_env("use_icalbuddy_memo", "true"):
+            yield tmp_path
+
+
+def read_fixture(fixture_name):
+    """Read the given icalBuddy output fixture."""
+    file_path = os.path.join("tests", "icalbuddy_output", f"{fixture_name}.txt")
+    with open(file_path, "r") as file:
+        return file.read()
+
+
+def get_event_dicts(raw_output, calendar_names=None):
+    """Parse the given icalBuddy output, counting the event strings which
+    actually had to be parsed"""
+    calendar = IcalBuddyCalendar(calendar_names=calendar_names)
+    with patch("subprocess.check_output", return_value=raw_output.encode("utf-8")):
+        with patch.object(
+            calendar,
+            "convert_raw_event_str_to_dict",
+            wraps=calendar.convert_raw_event_str_to_dict,
+        ) as convert_raw_event_str_to_dict:
+            event_dicts = calendar.get_event_dicts()
+    return event_dicts, convert_raw_event_str_to_dict.call_count
+
+
+def get_memo_paths(cache_dir):
+    """Retrieve the paths of every memo file in the cache directory."""
+    return sorted(
+        os.path.join(cache_dir, file_name)
+        for file_name in os.listdir(cache_dir)
+        if file_name.startswith(IcalBuddyMemo.memo_file_prefix)
+    )
+
+
+@freeze_time("2022-10-16 08:00:00")
+@pytest.mark.parametrize("fixture_name", FIXTURE_NAMES)
+def test_memoized_fixtures(fixture_name):
+    """Should produce the same events with and without the memo"""
+    raw_output = read_fixture(fixture_name)
+    with use_env("use_icalbuddy_memo", "false"):
+        expected_event_dicts, _ = get_event_dicts(raw_output)
+    cold_event_dicts, _ = get_event_dicts(raw_output)
+    warm_event_dicts, parse_count = get_event_dicts(raw_output)
+    assert cold_event_dicts == expected_event_dicts
+    assert warm_event_dicts == expected_event_dicts
+    assert parse_count == 0
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_only_changed_events_parsed():
+    """Should only parse the event strings which have changed"""
+    _, cold_parse_count = get_event_dicts(RAW_OUTPUT)
+    assert cold_parse_count == 3
+    event_dicts, parse_count = get_event_dicts(
+        RAW_OUTPUT.replace("Planning", "Sprint Planning")
+    )
+    assert parse_count == 1
+    assert [event_dict["title"] for event_dict in event_dicts] == [
+        "Standup",
+        "Sprint Planning",
+        "Reminder",
+    ]
+
+
+def test_zero_duration_events_tied_to_date():
+    """Should re-parse zero-duration events (which take the current date) on a
+    different day"""
+    with freeze_time("2022-10-16 08:00:00"):
+        get_event_dicts(RAW_OUTPUT)
+    with freeze_time("2022-10-17 08:00:00"):
+        event_dicts, parse_count = get_event_dicts(RAW_OUTPUT)
+    assert parse_count == 1
+    assert event_dicts[2]["startDate"] == "2022-10-17T09:00"
+    # Events with explicit dates are still reused
+    assert event_dicts[0]["startDate"] == "2022-10-16T08:00"
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_date_in_notes_not_mistaken_for_event_date():
+    """Should tie an event to the current date even if its notes mention it"""
+    raw_output = "• Reminder\n    09:00\n    notes: Due 2022-10-16\n"
+    get_event_dicts(raw_output)
+    with freeze_time("2022-10-17 08:00:00"):
+        event_dicts, parse_count = get_event_dicts(raw_output)
+    assert parse_count == 1
+    assert event_dicts[0]["startDate"] == "2022-10-17T09:00"
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_lru_eviction(cache_dir):
+    """Should evict the least recently used entries beyond the entry cap"""
+    with patch.object(IcalBuddyMemo, "max_entries", 2):
+        # Only the two most recently used event strings (Planning and
+        # Reminder) are kept
+        get_event_dicts(RAW_OUTPUT)
+        _, parse_count = get_event_dicts(RAW_OUTPUT.split("\n• Planning")[0])
+        assert parse_count == 1
+        # Memoizing Standup again evicted Planning, which was least recently
+        # used
+        _, parse_count = get_event_dicts(RAW_OUTPUT)
+        assert parse_count == 1
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_size_cap(cache_dir):
+    """Should keep the memo within its size cap, skipping oversized events"""
+    raw_output = RAW_OUTPUT.replace("Join at", "x" * 5000)
+    with patch.object(IcalBuddyMemo, "max_total_size", 1000):
+        get_event_dicts(raw_output)
+        _, parse_count = get_event_dicts(raw_output)
+    assert parse_count == 1
+    assert os.path.getsize(get_memo_paths(cache_dir)[0]) < 2000
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_no_write_when_unchanged(cache_dir):
+    """Should not rewrite the memo when every event was already memoized"""
+    get_event_dicts(RAW_OUTPUT)
+    with patch("ocu.calendars.icalbuddy_memo.write_json_file_atomically") as write:
+        get_event_dicts(RAW_OUTPUT)
+    assert not write.called
+
+
+@freeze_time("2022-10-16 08:00:00")
+@pytest.mark.parametrize(
+    "memo_contents",
+    [
+        "{",
+        json.dumps([]),
+        json.dumps({"version": MEMO_VERSION + 1, "entries": {}}),
+        json.dumps({"version": MEMO_VERSION, "entries": {"abc": "not a list"}}),
+    ],
+)
+def test_malformed_memo(cache_dir, memo_contents):
+    """Should ignore a malformed or outdated memo file"""
+    with open(os.path.join(cache_dir, "icalbuddy-memo.json"), "w") as memo_file:
+        memo_file.write(memo_contents)
+    event_dicts, parse_count = get_event_dicts(RAW_OUTPUT)
+    assert parse_count == 3
+    assert len(event_dicts) == 3
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_memo_per_calendar_names(cache_dir):
+    """Should keep a separate memo for each set of calendar names"""
+    get_event_dicts(RAW_OUTPUT, calendar_names=["Work"])
+    get_event_dicts(RAW_OUTPUT, calendar_names=["Personal"])
+    assert len(get_memo_paths(cache_dir)) == 2
+    _, parse_count = get_event_dicts(RAW_OUTPUT, calendar_names=["Work"])
+    assert parse_count == 0
+
+
+@freeze_time("2022-10-16 08:00:00")
+@use_env("use_icalbuddy_memo", "false")
+def test_memo_disabled(cache_dir):
+    """Should not memoize anything unless enabled"""
+    get_event_dicts(RAW_OUTPUT)
+    _, parse_count = get_event_dicts(RAW_OUTPUT)
+    assert parse_count == 3
+    assert get_memo_paths(cache_dir) == []
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import os.path
+import random
+import re
+import stat
+import subprocess
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from ocu.calendars.icalbuddy_calendar import IcalBuddyCalendar
+from tests.utils import use_env
+
+FIXTURE_NAMES = sorted(
+    os.path.splitext(file_name)[0]
+    for file_name in os.listdir(os.path.join("tests", "icalbuddy_output"))
+)
+CHUNK_SIZES = (1, 2, 3, 7, 64, 65536)
+
+
+def read_fixture(fixture_name):
+    """Read the raw bytes of the given icalBuddy output fixture."""
+    file_path = os.path.join("tests", "icalbuddy_output", f"{fixture_name}.txt")
+    with open(file_path, "rb") as file:
+        return file.read()
+
+
+def split_bytes(raw_bytes, chunk_size):
+    """Split the given bytes into chunks of the given size."""
+    return [raw_bytes[i : i + chunk_size] for i in range(0, len(raw_bytes), chunk_size)]
+
+
+def get_batch_event_dicts(raw_bytes):
+    """Parse the given icalBuddy output all at once (i.e. without streaming)."""
+    with patch("subprocess.check_output", return_value=raw_bytes):
+        return IcalBuddyCalendar().get_event_dicts()
+
+
+def get_streamed_event_dicts(raw_bytes, chunk_size):
+    """Parse the given icalBuddy output as a stream of byte chunks."""
+    calendar = IcalBuddyCalendar()
+    return list(
+        calendar.iter_event_dicts(
+            calendar.iter_raw_event_strs(
+                calendar.iter_decoded_chunks(split_bytes(raw_bytes, chunk_size))
+            )
+        )
+    )
+
+
+def generate_icalbuddy_output(rng, event_count, notes_size):
+    """Generate synthetic icalBuddy output with the given event count."""
+    lines = []
+    for i in range(event_count):
+        lines.append(f"• Synthetic Meeting {i} ✨")
+        lines.append(f"    2022-10-16 at {8 + i % 10:02}:00 - {9 + i % 10:02}:00")
+        if rng.random() < 0.5:
+            lines.append(f"    location: https://zoom.us/j/{i}")
+        notes = "".join(rng.choices("abc •\n—é", k=notes_size))
+        lines.append(f"    notes: {notes}")
+    return "\n".join(lines).encode("utf-8")
+
+
+def create_stub_icalbuddy(tmp_path, script):
+    """Create an executable stub in place of the icalBuddy binary."""
+    stub_path = os.path.join(tmp_path, "icalBuddy")
+    with open(stub_path, "w") as stub_file:
+        stub_file.write(f"#!{sys.executable}\n{script}")
+    os.chmod(stub_path, os.stat(stub_path).st_mode | stat.S_IEXEC)
+    return stub_path
+
+
+@freeze_time("2022-10-16 08:00:00")
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("fixture_name", FIXTURE_NAMES)
+def test_streamed_fixtures(fixture_name, chunk_size):
+    """Should parse each fixture identically whether or not it is streamed"""
+    raw_bytes = read_fixture(fixture_name)
+    assert get_streamed_event_dicts(raw_bytes, chunk_size) == get_batch_event_dicts(
+        raw_bytes
+    )
+
+
+@pytest.mark.parametrize("chunk_size", (4093, 65536))
+def test_streamed_multi_megabyte_output(chunk_size):
+    """Should parse multi-megabyte output identically when streamed"""
+    raw_bytes = generate_icalbuddy_output(random.Random(42), 1000, 3000)
+    assert len(raw_bytes) > 3 * 1024 * 1024
+    assert get_streamed_event_dicts(raw_bytes, chunk_size) == get_batch_event_dicts(
+        raw_bytes
+    )
+
+
+@pytest.mark.parametrize(
+    "raw_text",
+    ["", "no events", "preamble\n• Meeting", "• \n• Meeting", "\n• Meeting\n•  x"],
+)
+def test_streamed_edge_cases(raw_text):
+    """Should split edge-case output exactly like the batch parser"""
+    calendar = IcalBuddyCalendar()
+    expected_strs = re.split(r"(?:^|\n)• ", raw_text)[1:]
+    for chunk_size in (1, 2, 100):
+        assert (
+            list(
+                calendar.iter_raw_event_strs(
+                    raw_text[i : i + chunk_size]
+                    for i in range(0, len(raw_text), chunk_size)
+                )
+            )
+            == expected_strs
+        )
+
+
+@use_env("use_icalbuddy_streaming", "true")
+def test_streaming_subprocess(tmp_path):
+    """Should stream events from the icalBuddy subprocess when enabled"""
+    raw_bytes = generate_icalbuddy_output(random.Random(7), 200, 5000)
+    output_path = os.path.join(tmp_path, "output.txt")
+    with open(output_path, "wb") as output_file:
+        output_file.write(raw_bytes)
+    stub_path = create_stub_icalbuddy(
+        tmp_path,
+        f"import shutil, sys\n"
+        f"shutil.copyfileobj(open({output_path!r}, 'rb'), sys.stdout.buffer)\n",
+    )
+    with patch.object(IcalBuddyCalendar, "get_binary_path", return_value=stub_path):
+        assert IcalBuddyCalendar().get_event_dicts() == get_batch_event_dicts(raw_bytes)
+
+
+def test_streaming_overlaps_subprocess(tmp_path):
+    """Should yield events before the subprocess has finished writing"""
+    stub_path = create_stub_icalbuddy(
+        tmp_path,
+        "import sys, time\n"
+        "print('• First Meeting\\n    2022-10-16 at 08:00 - 09:00', flush=True)\n"
+        "print('• Second Meeting', flush=True)\n"
+        "time.sleep(1)\n"
+        "print('    2022-10-16 at 10:00 - 11:00', flush=True)\n",
+    )
+    with patch.object(IcalBuddyCalendar, "get_binary_path", return_value=stub_path):
+        event_dicts = IcalBuddyCalendar().iter_streamed_event_dicts()
+        start_time = time.perf_counter()
+        first_event_dict = next(event_dicts)
+        first_event_secs = time.perf_counter() - start_time
+        remaining_event_dicts = list(event_dicts)
+    assert first_event_dict["title"] == "First Meeting"
+    assert [event_dict["title"] for event_dict in remaining_event_dicts] == [
+        "Second Meeting"
+    ]
+    # The first event can be parsed as soon as the second event begins, long
+    # before the subprocess exits
+    assert first_event_secs < 0.8
+
+
+def test_streaming_subprocess_failure(tmp_path):
+    """Should raise an error if icalBuddy exits unsuccessfully"""
+    stub_path = create_stub_icalbuddy(tmp_path, "import sys\nsys.exit(3)\n")
+    with patch.object(IcalBuddyCalendar, "get_binary_path", return_value=stub_path):
+        with pytest.raises(subprocess.CalledProcessError):
+            list(IcalBuddyCalendar().iter_streamed_event_dicts())
+
+
+@use_env("use_icalbuddy_streaming", "true")
+@pytest.mark.parametrize("chunk_size", (7, 65536))
+def test_async_streaming_subprocess(tmp_path, chunk_size):
+    """Should stream events from the icalBuddy subprocess under asyncio when
+    enabled"""
+    raw_bytes = generate_icalbuddy_output(random.Random(7), 200, 500)
+    output_path = os.path.join(tmp_path, "output.txt")
+    with open(output_path, "wb") as output_file:
+        output_file.write(raw_bytes)
+    stub_path = create_stub_icalbuddy(
+        tmp_path,
+        f"import shutil, sys\n"
+        f"shutil.copyfileobj(open({output_path!r}, 'rb'), sys.stdout.buffer)\n",
+    )
+    with patch.object(IcalBuddyCalendar, "get_binary_path", return_value=stub_path):
+        with patch.object(IcalBuddyCalendar, "stream_chunk_size", chunk_size):
+            event_dicts = asyncio.run(IcalBuddyCalendar().aget_event_dicts())
+        assert event_dicts == get_batch_event_dicts(raw_bytes)
+
+
+@use_env("use_icalbuddy_streaming", "true")
+def test_async_streaming_subprocess_failure(tmp_path):
+    """Should raise an error if icalBuddy exits unsuccessfully under asyncio"""
+    stub_path = create_stub_icalbuddy(tmp_path, "import sys\nsys.exit(3)\n")
+    with patch.object(IcalBuddyCalendar, "get_binary_path", return_value=stub_path):
+        with pytest.raises(subprocess.CalledProcessError):
+            asyncio.run(IcalBuddyCalendar().aget_event_dicts())
+
+
+@use_env("use_icalbuddy_streaming", "true")
+def test_async_streaming_subprocess_timeout(tmp_path):
+    """Should kill icalBuddy once it exceeds its timeout under asyncio"""
+    stub_path = create_stub_icalbuddy(
+        tmp_path, "import sys, time\nprint('• Meeting', flush=True)\ntime.sleep(30)\n"
+    )
+    calendar = IcalBuddyCalendar(timeout_secs=0.5)
+    with patch.object(IcalBuddyCalendar, "get_binary_path", return_value=stub_path):
+        with pytest.raises(subprocess.TimeoutExpired):
+            asyncio.run(calendar.aget_event_dicts())
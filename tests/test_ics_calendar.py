@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import os.path
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from ocu import list_events
+from ocu.calendar import get_calendar
+from ocu.calendars import ics_calendar
+from ocu.calendars.ics_calendar import IcsCalendar
+from tests.utils import redirect_stdout, use_env
+
+ICS_TEXT = "\r\n".join(
+    [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "X-WR-CALNAME:Work",
+        "BEGIN:VTIMEZONE",
+        "TZID:America/New_York",
+        "BEGIN:STANDARD",
+        "DTSTART:19701101T020000",
+        "END:STANDARD",
+        "END:VTIMEZONE",
+        "BEGIN:VEVENT",
+        "SUMMARY:Yesterday's Meeting",
+        "DTSTART:20221015T080000",
+        "DTEND:20221015T090000",
+        "LOCATION:https://zoom.us/j/111111",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "SUMMARY:Weekly Sync\\, Team A",
+        "DTSTART:20221016T093000",
+        "DTEND:20221016T100000",
+        "DESCRIPTION:Join here:\\nhttps://zoom.us/j/12345",
+        " 6789\\nThanks",
+        "BEGIN:VALARM",
+        "DESCRIPTION:Reminder",
+        "TRIGGER:-PT10M",
+        "END:VALARM",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "SUMMARY:Standup",
+        "DTSTART:20221016T083000",
+        "DURATION:PT15M",
+        "URL:https://meet.google.com/abc-defg-hij",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "SUMMARY:Offsite",
+        "DTSTART;VALUE=DATE:20221015",
+        "DTEND;VALUE=DATE:20221018",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "DTSTART:20221016T110000",
+        "DTEND:20221016T120000",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "SUMMARY:Tomorrow's Meeting",
+        "DTSTART:20221017T080000",
+        "DTEND:20221017T090000",
+        "END:VEVENT",
+        "END:VCALENDAR",
+        "",
+    ]
+)
+EXPECTED_EVENT_DICTS = [
+    {
+        "title": "Offsite",
+        "startDate": "2022-10-15T00:00",
+        "endDate": "2022-10-17T23:59",
+        "isAllDay": "true",
+        "location": "",
+        "notes": "",
+    },
+    {
+        "title": "Standup",
+        "startDate": "2022-10-16T08:30",
+        "endDate": "2022-10-16T08:45",
+        "isAllDay": "false",
+        "location": "",
+        "notes": "https://meet.google.com/abc-defg-hij",
+    },
+    {
+        "title": "Weekly Sync, Team A",
+        "startDate": "2022-10-16T09:30",
+        "endDate": "2022-10-16T10:00",
+        "isAllDay": "false",
+        "location": "",
+        "notes": "Join here:\nhttps://zoom.us/j/123456789\nThanks",
+    },
+]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory for each test."""
+    cache_dir = os.path.join(tmp_path, "cache")
+    with use_env("alfred_workflow_cache", cache_dir):
+        yield cache_dir
+
+
+@pytest.fixture
+def ics_path(tmp_path):
+    """Write the test calendar to an .ics file."""
+    ics_path = os.path.join(tmp_path, "work.ics")
+    with open(ics_path, "w", newline="") as ics_file:
+        ics_file.write(ICS_TEXT)
+    return ics_path
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_todays_events(ics_path):
+    """Should read only today's events from the .ics file"""
+    assert IcsCalendar([ics_path]).get_event_dicts() == EXPECTED_EVENT_DICTS
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_index_persisted(ics_path):
+    """Should only build the index once for an unchanged file"""
+    with patch.object(
+        IcsCalendar, "build_index", autospec=True, side_effect=IcsCalendar.build_index
+    ) as build_index:
+        IcsCalendar([ics_path]).get_event_dicts()
+        assert IcsCalendar([ics_path]).get_event_dicts() == EXPECTED_EVENT_DICTS
+    assert build_index.call_count == 1
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_only_todays_vevents_parsed(ics_path):
+    """Should only parse the VEVENT blocks indexed under today's date"""
+    IcsCalendar([ics_path]).get_event_dicts()
+    with patch.object(
+        ics_calendar, "parse_vevent_props", wraps=ics_calendar.parse_vevent_props
+    ) as parse_vevent_props:
+        IcsCalendar([ics_path]).get_event_dicts()
+    # The untitled event is indexed (since it has a valid start), but the
+    # events from yesterday and tomorrow are never read
+    assert parse_vevent_props.call_count == 4
+
+
+def test_multi_day_range(ics_path):
+    """Should read the events within a range of several days, listing each
+    multi-day event only once"""
+    event_dicts = IcsCalendar([ics_path]).get_event_dicts(
+        datetime(2022, 10, 15), datetime(2022, 10, 18)
+    )
+    assert [event_dict["title"] for event_dict in event_dicts] == [
+        "Offsite",
+        "Yesterday's Meeting",
+        "Standup",
+        "Weekly Sync, Team A",
+        "Tomorrow's Meeting",
+    ]
+
+
+def test_partial_day_range(ics_path):
+    """Should only read the events which overlap a range within a day"""
+    event_dicts = IcsCalendar([ics_path]).get_event_dicts(
+        datetime(2022, 10, 16, 8, 45), datetime(2022, 10, 16, 9, 30)
+    )
+    # The standup ends (and the sync starts) exactly at the bounds of the
+    # range, so neither overlaps it
+    assert [event_dict["title"] for event_dict in event_dicts] == ["Offsite"]
+
+
+def test_range_calendar_names(ics_path):
+    """Should prefer the given calendar names over the user's preference"""
+    with use_env("calendar_names", "Personal"):
+        event_dicts = IcsCalendar([ics_path]).get_event_dicts(
+            datetime(2022, 10, 16), datetime(2022, 10, 17), calendar_names=["Work"]
+        )
+    assert event_dicts == EXPECTED_EVENT_DICTS
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_index_rebuilt_when_file_changes(ics_path):
+    """Should rebuild the index when the file's size or mtime changes"""
+    IcsCalendar([ics_path]).get_event_dicts()
+    with open(ics_path, "w", newline="") as ics_file:
+        ics_file.write(
+            ICS_TEXT.replace("SUMMARY:Standup", "SUMMARY:Daily Standup (Moved)")
+        )
+    event_dicts = IcsCalendar([ics_path]).get_event_dicts()
+    assert [event_dict["title"] for event_dict in event_dicts] == [
+        "Offsite",
+        "Daily Standup (Moved)",
+        "Weekly Sync, Team A",
+    ]
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_stale_index_with_same_size(ics_path):
+    """Should rebuild the index when only the mtime changes"""
+    IcsCalendar([ics_path]).get_event_dicts()
+    with open(ics_path, "w", newline="") as ics_file:
+        ics_file.write(ICS_TEXT.replace("20221016T083000", "20221017T083000"))
+    stat = os.stat(ics_path)
+    os.utime(ics_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    event_dicts = IcsCalendar([ics_path]).get_event_dicts()
+    assert "Standup" not in [event_dict["title"] for event_dict in event_dicts]
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_utc_and_tzid_times(tmp_path):
+    """Should convert UTC and zoned times to the system's local time"""
+    ics_path = os.path.join(tmp_path, "zoned.ics")
+    with open(ics_path, "w") as ics_file:
+        ics_file.write(
+            "BEGIN:VCALENDAR\n"
+            "BEGIN:VEVENT\n"
+            "SUMMARY:UTC Meeting\n"
+            "DTSTART:20221016T120000Z\n"
+            "DTEND:20221016T130000Z\n"
+            "END:VEVENT\n"
+            "BEGIN:VEVENT\n"
+            "SUMMARY:Unknown Zone Meeting\n"
+            'DTSTART;TZID="Eastern Standard Time":20221016T140000\n'
+            'DTEND;TZID="Eastern Standard Time":20221016T150000\n'
+            "END:VEVENT\n"
+            "END:VCALENDAR\n"
+        )
+    local_start = datetime(2022, 10, 16, 12, tzinfo=timezone.utc).astimezone()
+    event_dicts = {
+        event_dict["title"]: event_dict
+        for event_dict in IcsCalendar([ics_path]).get_event_dicts()
+    }
+    if local_start.date().isoformat() == "2022-10-16":
+        assert event_dicts["UTC Meeting"]["startDate"] == local_start.strftime(
+            "%Y-%m-%dT%H:%M"
+        )
+    # Unknown time zones are treated as local time
+    assert event_dicts["Unknown Zone Meeting"]["startDate"] == "2022-10-16T14:00"
+
+
+def test_get_time_zone():
+    """Should resolve IANA time zones, and ignore unknown ones"""
+    assert ics_calendar.get_time_zone("America/New_York") is not None
+    assert ics_calendar.get_time_zone("Eastern Standard Time") is None
+
+
+@pytest.mark.parametrize(
+    ("duration", "expected_minutes"),
+    [("PT1H30M", 90), ("P1D", 1440), ("P1W", 10080), ("-PT5M", -5), ("bad", None)],
+)
+def test_parse_ics_duration(duration, expected_minutes):
+    """Should parse RFC 5545 durations"""
+    parsed_duration = ics_calendar.parse_ics_duration(duration)
+    if expected_minutes is None:
+        assert parsed_duration is None
+    else:
+        assert parsed_duration is not None
+        assert parsed_duration.total_seconds() == expected_minutes * 60
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_calendar_names(ics_path):
+    """Should only read .ics files whose calendar name is included"""
+    with use_env("calendar_names", "Personal"):
+        assert IcsCalendar([ics_path]).get_event_dicts() == []
+    with use_env("calendar_names", "Personal, Work"):
+        assert IcsCalendar([ics_path]).get_event_dicts() == EXPECTED_EVENT_DICTS
+
+
+@freeze_time("2022-10-16 08:00:00")
+def test_missing_and_empty_files(ics_path, tmp_path, capsys):
+    """Should skip missing and empty .ics files"""
+    empty_path = os.path.join(tmp_path, "empty.ics")
+    open(empty_path, "w").close()
+    missing_path = os.path.join(tmp_path, "missing.ics")
+    event_dicts = IcsCalendar([missing_path, empty_path, ics_path]).get_event_dicts()
+    assert event_dicts == EXPECTED_EVENT_DICTS
+    assert "missing.ics" in capsys.readouterr().err
+
+
+def test_get_calendar(ics_path):
+    """Should use the .ics backend when .ics file paths are provided"""
+    with use_env("ics_file_paths", ics_path):
+        calendar = get_calendar()
+    assert isinstance(calendar, IcsCalendar)
+    assert calendar.ics_file_paths == (ics_path,)
+
+
+@freeze_time("2022-10-16 09:20:00")
+@redirect_stdout
+def test_list_events(out, ics_path):
+    """Should list today's conference events from the .ics file"""
+    with use_env("ics_file_paths", ics_path):
+        with patch("subprocess.check_output") as check_output:
+            list_events.main()
+    assert not check_output.called
+    feedback = json.loads(out.getvalue())
+    assert [item["title"] for item in feedback["items"]] == [
+        "Weekly Sync, Team A",
+        "Standup",
+    ]
+    assert (
+        feedback["items"][0]["variables"]["event_conference_url"]
+        == "https://zoom.us/j/123456789"
+    )
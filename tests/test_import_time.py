@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from benchmarks.utils import measure_import, run_python
+
+# The maximum number of modules each entry point may import; when an entry
+# point legitimately needs to import more, raise its budget here (and say why
+# in the commit); the time taken to import each entry point varies too much
+# with the load on the machine to be tested here, so it is instead measured by
+# the bench_import_time benchmark
+MAX_MODULE_COUNTS = {
+    "ocu.list_events": 65,
+    "ocu.open_event": 50,
+}
+
+
+def get_imported_ocu_modules(code):
+    """Run the given code in a fresh interpreter, and retrieve the ocu modules
+    which were imported as a result"""
+    return set(
+        run_python(
+            f"import sys\n{code}\n"
+            "print('\\n'.join(name for name in sys.modules if name.startswith('ocu')))"
+        ).stdout.split()
+    )
+
+
+@pytest.mark.parametrize("module_name", sorted(MAX_MODULE_COUNTS))
+def test_import_budget(module_name):
+    """Should import no more modules than each entry point's recorded budget"""
+    module_names = measure_import(module_name).module_names
+    assert len(module_names) <= MAX_MODULE_COUNTS[module_name], module_names
+
+
+def test_list_events_imports_no_backends():
+    """Should not import any calendar backend until one is selected"""
+    assert get_imported_ocu_modules("import ocu.list_events") == {
+        "ocu",
+        "ocu.list_events",
+        "ocu.prefs",
+        "ocu.profiling",
+    }
+
+
+def test_open_event_imports_no_prefs():
+    """Should not import the preferences just to open a URL"""
+    assert "ocu.prefs" not in get_imported_ocu_modules("import ocu.open_event")
+
+
+@pytest.mark.parametrize(
+    ("env", "expected_backend"),
+    [
+        ({}, "ocu.calendars.applescript_calendar"),
+        ({"ics_file_paths": "work.ics"}, "ocu.calendars.ics_calendar"),
+    ],
+)
+def test_only_selected_backend_imported(env, expected_backend):
+    """Should only import the calendar backend which is actually used"""
+    code = (
+        "import os\n"
+        f"os.environ.update({env!r})\n"
+        "from ocu.calendar import get_calendar\n"
+        "get_calendar()"
+    )
+    backend_modules = {
+        module_name
+        for module_name in get_imported_ocu_modules(code)
+        if module_name.startswith("ocu.calendars.")
+    }
+    assert backend_modules == {"ocu.calendars.base_calendar", expected_backend}
+
+
+def test_measure_import_output():
+    """Should only count the modules imported by the entry point itself"""
+    measurement = measure_import("ocu.open_event")
+    assert measurement.module_names[-1] == "ocu.open_event"
+    # The site module is imported during interpreter startup
+    assert "site" not in measurement.module_names
+    assert measurement.cumulative_ms > 0
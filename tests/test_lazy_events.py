@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import itertools
+import json
+import random
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from ocu import list_events
+from ocu.event import Event
+from tests.utils import redirect_stdout, use_env, use_event_dicts
+
+EVENT_DICT = {
+    "title": "My Meeting",
+    "startDate": "2022-10-16T08:00",
+    "endDate": "2022-10-16T09:00",
+    "location": "https://zoom.us/j/123456",
+}
+
+
+def get_reference_feedback(all_events):
+    """Compute feedback exactly as list_events did before events were lazy."""
+    upcoming_events = list_events.filter_to_upcoming_events(all_events)
+    past_events = list_events.filter_to_past_events(all_events)
+    if upcoming_events and len(past_events) > 1:
+        past_events[:] = [
+            min(
+                past_events,
+                key=list_events.get_event_sort_key_fn_for_current_datetime(),
+            )
+        ]
+    events_to_display = list_events.sort_events_by_time(
+        set(itertools.chain(past_events, upcoming_events))
+    )
+    feedback = {"items": []}
+    if not all_events:
+        feedback["items"].append(
+            {"title": "No Results", "subtitle": "No meetings for today", "valid": "no"}
+        )
+    elif not upcoming_events and past_events:
+        feedback["items"].append(
+            {
+                "title": "No Upcoming Meetings",
+                "subtitle": "Showing events from earlier today",
+                "valid": "no",
+            }
+        )
+        feedback["items"].extend(
+            list_events.get_event_feedback_item(event) for event in events_to_display
+        )
+    elif not upcoming_events and not past_events:
+        feedback["items"].append(
+            {
+                "title": "No Upcoming Meetings",
+                "subtitle": "Showing all events for today",
+                "valid": "no",
+            }
+        )
+        feedback["items"].extend(
+            list_events.get_event_feedback_item(event) for event in all_events
+        )
+    else:
+        feedback["items"].extend(
+            list_events.get_event_feedback_item(event) for event in events_to_display
+        )
+    return feedback
+
+
+def generate_event_dicts(rng):
+    """Generate a random day of events with well-separated end times."""
+    # The sort keys of past events are floats so large that end times less
+    # than ~35 minutes apart compare as equal (leaving their relative order
+    # arbitrary), so end times are spread at least an hour apart
+    start_mins = rng.sample(range(6 * 60, 20 * 60, 70), rng.randint(0, 12))
+    event_dicts = []
+    for i, start_min in enumerate(start_mins):
+        end_min = start_min + rng.choice((5, 10, 15, 20, 25, 30)) + (i % 5)
+        event_dicts.append(
+            {
+                "title": f"Meeting {i}",
+                "startDate": f"2022-10-16T{start_min // 60:02}:{start_min % 60:02}",
+                "endDate": f"2022-10-16T{end_min // 60:02}:{end_min % 60:02}",
+                "location": rng.choice(
+                    ("https://zoom.us/j/123456", "https://github.com", "Room 101")
+                ),
+            }
+        )
+    # At most one all-day event is generated, since the relative order of
+    # multiple all-day events is arbitrary
+    if rng.random() < 0.3:
+        event_dicts.append(
+            {
+                "title": "All-Day Meeting",
+                "startDate": "2022-10-16T00:00",
+                "endDate": "2022-10-16T23:59",
+                "location": rng.choice(("https://zoom.us/j/789012", "")),
+            }
+        )
+    return event_dicts
+
+
+def test_lazy_event_resolved_on_access():
+    """Should only resolve the conference URL of a lazy event when accessed"""
+    with patch.object(
+        Event, "parse_conference_url", autospec=True, return_value=None
+    ) as parse_conference_url:
+        event = Event(EVENT_DICT, lazy=True)
+        assert parse_conference_url.call_count == 0
+        event.conference_url
+        event.conference_url
+    assert parse_conference_url.call_count == 1
+
+
+def test_lazy_event_releases_event_dict():
+    """Should release the raw event properties once the URL is resolved"""
+    event = Event(EVENT_DICT, lazy=True)
+    assert event.conference_url == EVENT_DICT["location"]
+    assert event.event_dict is None
+
+
+def test_eager_event():
+    """Should resolve the conference URL of a non-lazy event immediately"""
+    event = Event(EVENT_DICT)
+    assert event.event_dict is None
+    assert event.resolved_conference_url == EVENT_DICT["location"]
+
+
+def test_set_conference_url():
+    """Should allow the conference URL to be overridden"""
+    event = Event(EVENT_DICT, lazy=True)
+    event.conference_url = "https://meet.google.com/abc-defg-hij"
+    assert event.conference_url == "https://meet.google.com/abc-defg-hij"
+
+
+@pytest.mark.parametrize("time_threshold_mins", ["0", "20"])
+def test_feedback_matches_reference(time_threshold_mins):
+    """Should produce the same feedback as resolving every URL upfront"""
+    rng = random.Random(1234)
+    with (
+        use_env("event_time_threshold_mins", time_threshold_mins),
+        freeze_time("2022-10-16 00:00:00") as frozen_time,
+    ):
+        for _ in range(300):
+            event_dicts = generate_event_dicts(rng)
+            frozen_time.move_to(
+                f"2022-10-16 {rng.randint(5, 21):02}:{rng.randint(0, 59):02}"
+            )
+            expected_feedback = get_reference_feedback(
+                [
+                    event
+                    for event in (Event(event_dict) for event_dict in event_dicts)
+                    if event.conference_url
+                ]
+            )
+            feedback = list_events.get_feedback(
+                [Event(event_dict, lazy=True) for event_dict in event_dicts]
+            )
+            assert json.dumps(feedback, indent=2) == json.dumps(
+                expected_feedback, indent=2
+            ), event_dicts
+
+
+@use_event_dicts(
+    [
+        {
+            "title": f"Meeting {hour}",
+            "startDate": f"2022-10-16T{hour:02}:00",
+            "endDate": f"2022-10-16T{hour:02}:30",
+            "location": "https://zoom.us/j/123456",
+        }
+        for hour in range(6, 20)
+    ]
+)
+@freeze_time("2022-10-16 12:55:00")
+@redirect_stdout
+def test_only_displayable_urls_resolved(out, event_dicts):
+    """Should only resolve URLs for events which may be displayed"""
+    with patch.object(
+        Event, "parse_conference_url", autospec=True, return_value="https://zoom.us"
+    ) as parse_conference_url:
+        list_events.main()
+    feedback = json.loads(out.getvalue())
+    assert [item["title"] for item in feedback["items"]] == [
+        "Meeting 13",
+        "Meeting 12",
+    ]
+    assert parse_conference_url.call_count == 2
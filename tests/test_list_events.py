@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 
 import json
+from datetime import datetime
+from unittest.mock import Mock, patch
 
 from freezegun import freeze_time
 
 from ocu import list_events
+from ocu.calendars.base_calendar import BaseCalendar
+from ocu.event import Event
+from ocu.event_timeline import EventTimeline
 from tests.utils import redirect_stdout, use_env, use_event_dicts
 
 
@@ -446,3 +451,80 @@ def test_24_hour(out, event_dicts):
     assert feedback["items"][0]["text"]["copy"] == event_dicts[0]["location"]
     assert feedback["items"][0]["text"]["largetype"] == event_dicts[0]["location"]
     assert len(feedback["items"]) == 1
+
+
+CLOCK_EVENT_DICTS = [
+    {
+        "title": "Earlier Meeting",
+        "startDate": "2022-10-16T11:00",
+        "endDate": "2022-10-16T11:30",
+        "location": "https://zoom.us/j/111",
+    },
+    {
+        "title": "My Meeting",
+        "startDate": "2022-10-16T13:00",
+        "endDate": "2022-10-16T14:00",
+        "location": "https://zoom.us/j/123456",
+    },
+    {
+        "title": "All-Day Meeting",
+        "startDate": "2022-10-16T00:00",
+        "endDate": "2022-10-16T23:59",
+        "location": "https://zoom.us/j/789012",
+    },
+]
+
+
+def test_injected_clock():
+    """Should list events as of the given time rather than the system's"""
+    current_datetime = datetime(2022, 10, 16, 12, 55)
+    events = [
+        Event(event_dict, lazy=True, current_datetime=current_datetime)
+        for event_dict in CLOCK_EVENT_DICTS
+    ]
+    feedback = list_events.get_feedback(events, current_datetime=current_datetime)
+    assert [item["title"] for item in feedback["items"]] == [
+        "My Meeting",
+        "Earlier Meeting",
+        "All-Day Meeting",
+    ]
+    with freeze_time(current_datetime):
+        assert (
+            list_events.get_feedback(
+                [Event(event_dict, lazy=True) for event_dict in CLOCK_EVENT_DICTS]
+            )
+            == feedback
+        )
+
+
+def test_fetches_day_of_injected_clock():
+    """Should only request the events within the day of the given time"""
+    calendar = Mock(spec=BaseCalendar)
+    calendar.get_event_dicts.return_value = CLOCK_EVENT_DICTS
+    with freeze_time("2022-10-20 08:00:00"):
+        events = list_events.get_events_today(
+            lazy=True,
+            calendar=calendar,
+            current_datetime=datetime(2022, 10, 16, 12, 55),
+        )
+    calendar.get_event_dicts.assert_called_once_with(
+        datetime(2022, 10, 16), datetime(2022, 10, 17), include_notes=True
+    )
+    assert len(events) == len(CLOCK_EVENT_DICTS)
+
+
+@use_event_dicts(CLOCK_EVENT_DICTS)
+@freeze_time("2022-10-16 12:55:00")
+@redirect_stdout
+def test_events_indexed_once(out, event_dicts):
+    """Should index every event by time exactly once, without falling back to
+    the per-event time functions"""
+    with patch(
+        "ocu.event_timeline.EventTimeline", wraps=EventTimeline
+    ) as event_timeline_class:
+        with patch("ocu.list_events.is_time_upcoming", side_effect=AssertionError):
+            with patch("ocu.list_events.is_time_in_past", side_effect=AssertionError):
+                list_events.main()
+    assert event_timeline_class.call_count == 1
+    feedback = json.loads(out.getvalue())
+    assert len(feedback["items"]) == 3
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.corpus import MEGABYTE, PATHOLOGICAL_NOTES, build_notes_event
+from ocu.event import Event
+
+# The size (in characters) of the smaller of the two notes scanned for each kind
+# of pathological notes; the larger notes are twice this size
+BASE_NOTES_SIZE = 64 * 1024
+
+
+def get_scan_work(notes):
+    """Scan the given notes for a conference URL, returning the number of
+    candidate URLs scored and their total length."""
+    get_url_score = Event.get_url_score
+    scored_urls = []
+
+    def score_url(event, url):
+        scored_urls.append(url)
+        return get_url_score(event, url)
+
+    with patch.object(Event, "get_url_score", autospec=True, side_effect=score_url):
+        assert build_notes_event(notes).conference_url is None
+    return len(scored_urls), sum(len(url) for url in scored_urls)
+
+
+@pytest.mark.parametrize("notes_name", PATHOLOGICAL_NOTES)
+def test_scan_work_linear(notes_name):
+    """Should do work linear to the size of pathological notes"""
+    generate_notes = PATHOLOGICAL_NOTES[notes_name]
+    url_count, _ = get_scan_work(generate_notes(BASE_NOTES_SIZE))
+    doubled_notes = generate_notes(2 * BASE_NOTES_SIZE)
+    doubled_url_count, doubled_url_chars = get_scan_work(doubled_notes)
+    # Every character of the notes belongs to at most one scored candidate
+    assert doubled_url_chars <= len(doubled_notes)
+    # Doubling the notes may at most double the number of candidates scored
+    assert doubled_url_count <= 2 * url_count + 1
+
+
+def test_conference_url_found_after_pathological_notes():
+    """Should still find a conference URL buried after pathological notes"""
+    notes = PATHOLOGICAL_NOTES["html_links"](MEGABYTE)
+    event = build_notes_event(notes + "\nhttps://zoom.us/j/123456")
+    assert event.conference_url == "https://zoom.us/j/123456"
+
+
+def test_early_exit_on_highest_priority_url():
+    """Should stop scanning once a URL for the first domain is found"""
+    notes = PATHOLOGICAL_NOTES["unique_candidates"](MEGABYTE)
+    with patch.object(Event, "get_url_score", autospec=True, return_value=120) as (
+        get_url_score
+    ):
+        event = build_notes_event(notes, location="https://us02web.zoom.us/j/123456")
+    assert event.conference_url == "https://us02web.zoom.us/j/123456"
+    assert get_url_score.call_count == 1
+
+
+def test_no_early_exit_on_lower_priority_url():
+    """Should keep scanning if a lower-priority URL is found first"""
+    event = build_notes_event(
+        "https://meet.google.com/abc-defg-hij https://us02web.zoom.us/j/123456"
+    )
+    assert event.conference_url == "https://us02web.zoom.us/j/123456"
+
+
+def test_repeated_urls_scored_once():
+    """Should only score each distinct candidate URL once"""
+    with patch.object(Event, "get_url_score", autospec=True, return_value=-1) as (
+        get_url_score
+    ):
+        build_notes_event(PATHOLOGICAL_NOTES["repeated_candidates"](MEGABYTE))
+    assert get_url_score.call_count == 1
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import json
+import random
+from datetime import datetime
+
+import pytest
+from freezegun import freeze_time
+
+from ocu import list_events
+from ocu.calendars.base_calendar import BaseCalendar, get_time_range
+from ocu.event import Event
+from tests.utils import redirect_stdout, use_env, use_event_dicts
+
+# A URL for the highest-priority conference domain (*.zoom.us)
+TOP_URL = "https://us02web.zoom.us/j/123456"
+# A URL for a lower-priority conference domain
+OTHER_URL = "https://meet.google.com/abc-defg-hij"
+CURRENT_DATETIME = datetime(2022, 10, 16, 12, 0)
+
+
+class StubCalendar(BaseCalendar):
+    """A calendar which records each query made of it."""
+
+    def __init__(self, event_dicts):
+        self.event_dicts = event_dicts
+        self.queries = []
+
+    def get_event_dicts(
+        self,
+        start_datetime=None,
+        end_datetime=None,
+        calendar_names=None,
+        include_notes=True,
+    ):
+        start_datetime, end_datetime = get_time_range(start_datetime, end_datetime)
+        self.queries.append((start_datetime, end_datetime, include_notes))
+        start_date_str = start_datetime.strftime("%Y-%m-%dT%H:%M")
+        end_date_str = end_datetime.strftime("%Y-%m-%dT%H:%M")
+        return [
+            event_dict
+            if include_notes
+            else {key: value for key, value in event_dict.items() if key != "notes"}
+            for event_dict in self.event_dicts
+            if event_dict["startDate"] < end_date_str
+            and (
+                event_dict["endDate"] > start_date_str
+                or event_dict["startDate"] >= start_date_str
+            )
+        ]
+
+    def get_notes_queries(self):
+        """Retrieve the queries made for the notes of events."""
+        return [query for query in self.queries if query[2]]
+
+
+def get_event_dict(title, start_time, end_time, location="", notes=""):
+    """Build the raw properties of an event taking place today."""
+    return {
+        "title": title,
+        "startDate": f"2022-10-16T{start_time}",
+        "endDate": f"2022-10-16T{end_time}",
+        "location": location,
+        "notes": notes,
+    }
+
+
+def get_feedback(calendar, current_datetime=CURRENT_DATETIME):
+    """Build the feedback for the events of the given calendar."""
+    return list_events.get_feedback(
+        list_events.get_events_today(
+            lazy=True, calendar=calendar, current_datetime=current_datetime
+        ),
+        current_datetime=current_datetime,
+    )
+
+
+@pytest.fixture(autouse=True)
+def defer_notes():
+    """Fetch the notes of each event only once they are needed."""
+    with use_env("use_deferred_notes", "true"):
+        yield
+
+
+def test_notes_not_fetched_for_top_priority_urls():
+    """Should never fetch notes if every displayed event already has a URL for
+    the highest-priority conference domain"""
+    calendar = StubCalendar(
+        [
+            get_event_dict("Standup", "11:00", "11:15", location=TOP_URL),
+            get_event_dict("Planning", "12:05", "13:00", location=TOP_URL),
+            get_event_dict("Later", "16:00", "17:00", notes=OTHER_URL),
+        ]
+    )
+    feedback = get_feedback(calendar)
+    assert [item["title"] for item in feedback["items"]] == ["Planning", "Standup"]
+    assert calendar.queries == [(datetime(2022, 10, 16), datetime(2022, 10, 17), False)]
+
+
+def test_notes_fetched_once_for_display_window():
+    """Should fetch the notes of every displayed event lacking a
+    highest-priority URL in one query spanning only those events"""
+    calendar = StubCalendar(
+        [
+            get_event_dict("Standup", "11:00", "11:15", notes=OTHER_URL),
+            get_event_dict("Planning", "12:05", "13:00", location=TOP_URL),
+            get_event_dict("Review", "12:10", "12:30", notes=TOP_URL),
+            get_event_dict("Later", "16:00", "17:00", notes=OTHER_URL),
+        ]
+    )
+    feedback = get_feedback(calendar)
+    assert [item["title"] for item in feedback["items"]] == [
+        "Planning",
+        "Review",
+        "Standup",
+    ]
+    assert feedback["items"][1]["variables"]["event_conference_url"] == TOP_URL
+    assert calendar.get_notes_queries() == [
+        (datetime(2022, 10, 16, 11, 0), datetime(2022, 10, 16, 12, 31), True)
+    ]
+
+
+def test_later_notes_fetched_on_demand():
+    """Should only fetch the notes of events beyond the display window if
+    those events are displayed after all"""
+    calendar = StubCalendar(
+        [
+            get_event_dict("Standup", "11:00", "11:15", notes="No link"),
+            get_event_dict("Later", "16:00", "17:00", notes=OTHER_URL),
+        ]
+    )
+    feedback = get_feedback(calendar)
+    assert [item["title"] for item in feedback["items"]] == [
+        "No Upcoming Meetings",
+        "Later",
+    ]
+    assert calendar.get_notes_queries() == [
+        (datetime(2022, 10, 16, 11, 0), datetime(2022, 10, 16, 11, 16), True),
+        (datetime(2022, 10, 16, 16, 0), datetime(2022, 10, 16, 17, 1), True),
+    ]
+
+
+def test_zero_duration_event():
+    """Should fetch the notes of a zero-duration event"""
+    calendar = StubCalendar(
+        [get_event_dict("Reminder", "12:05", "12:05", notes=OTHER_URL)]
+    )
+    feedback = get_feedback(calendar)
+    assert feedback["items"][0]["variables"]["event_conference_url"] == OTHER_URL
+
+
+def test_disabled_for_eager_events():
+    """Should fetch every event's notes up front if every conference URL is
+    resolved anyway"""
+    calendar = StubCalendar(
+        [get_event_dict("Planning", "12:05", "13:00", notes=OTHER_URL)]
+    )
+    with freeze_time(CURRENT_DATETIME):
+        events = list_events.get_events_today(calendar=calendar)
+    assert events[0].conference_url == OTHER_URL
+    assert calendar.queries == [(datetime(2022, 10, 16), datetime(2022, 10, 17), True)]
+
+
+def test_has_top_priority_conference_url():
+    """Should only recognize URLs for the highest-priority conference domain"""
+    event = Event(get_event_dict("Planning", "12:05", "13:00"), lazy=True)
+    assert event.has_top_priority_conference_url({"location": TOP_URL})
+    assert not event.has_top_priority_conference_url({"location": OTHER_URL})
+    assert not event.has_top_priority_conference_url({"location": ""})
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_matches_full_fetch(seed):
+    """Should list exactly the same events (with the same conference URLs) as
+    fetching every event's notes up front"""
+    rng = random.Random(seed)
+    event_dicts = []
+    for i in range(rng.randint(0, 8)):
+        start_min = rng.randrange(6 * 60, 22 * 60)
+        end_min = start_min + rng.choice((0, 15, 30, 60))
+        event_dicts.append(
+            get_event_dict(
+                f"Meeting {i}",
+                f"{start_min // 60:02}:{start_min % 60:02}",
+                f"{end_min // 60:02}:{end_min % 60:02}",
+                location=rng.choice(("", "Room 1", TOP_URL, OTHER_URL)),
+                notes=rng.choice(("", "No link", TOP_URL, OTHER_URL)),
+            )
+        )
+    current_datetime = datetime(2022, 10, 16, rng.randint(5, 22), rng.randint(0, 59))
+    deferred_feedback = get_feedback(StubCalendar(event_dicts), current_datetime)
+    with use_env("use_deferred_notes", "false"):
+        full_feedback = get_feedback(StubCalendar(event_dicts), current_datetime)
+    assert deferred_feedback == full_feedback
+
+
+@use_event_dicts(
+    [get_event_dict("Planning", "12:05", "13:00", location=TOP_URL, notes="Agenda")]
+)
+@freeze_time(CURRENT_DATETIME)
+@redirect_stdout
+def test_osascript_without_notes(out, event_dicts):
+    """Should ask the AppleScript to leave out the notes of each event"""
+    from subprocess import check_output
+
+    list_events.main()
+    feedback = json.loads(out.getvalue())
+    assert feedback["items"][0]["title"] == "Planning"
+    command = check_output.call_args.args[0]
+    assert command[4] == "false"
+    assert check_output.call_count == 1
+
+
+def test_all_day_event_notes_range_stable():
+    """Should fetch the notes of an all-day event over the same range of time
+    (so that the query can be cached) whenever the events are listed"""
+    calendar = StubCalendar(
+        [
+            get_event_dict("Offsite", "00:00", "23:59", notes=OTHER_URL),
+            get_event_dict("Planning", "12:05", "13:00", notes=OTHER_URL),
+        ]
+    )
+    get_feedback(calendar, datetime(2022, 10, 16, 12, 0))
+    get_feedback(calendar, datetime(2022, 10, 16, 12, 3))
+    assert (
+        calendar.get_notes_queries()
+        == [(datetime(2022, 10, 16, 0, 0), datetime(2022, 10, 17, 0, 0), True)] * 2
+    )
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import json
 import os
+import stat
+import subprocess
 import sys
+import time
 from io import StringIO
 from unittest.mock import patch
 
@@ -26,6 +30,13 @@
 ]
 
 
+@pytest.fixture
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory."""
+    with use_env("alfred_workflow_cache", str(tmp_path)):
+        yield tmp_path
+
+
 def teardown_function(_function):
     """Ensure stderr is restored after each test."""
     sys.stderr = ORIGINAL_STDERR
@@ -90,28 +101,35 @@ def test_should_open_google_meet_app_with_missing_pref_key():
         assert not result
 
 
-@patch("subprocess.run")
-def test_open_url_with_native_app_success(mock_run):
-    """open_url_with_native_app should successfully open URL with native app."""
-    mock_run.return_value = None
+def get_spawned_args(mock_popen):
+    """Retrieve the arguments passed to the script spawned by the given mock."""
+    command = mock_popen.call_args.args[0]
+    assert command[:2] == ["/bin/sh", "-c"]
+    assert mock_popen.call_args.kwargs["start_new_session"]
+    return command[2], command[4:]
+
 
+@patch("subprocess.Popen")
+def test_open_url_with_native_app_success(mock_popen, cache_dir):
+    """open_url_with_native_app should open URL with native app, detached."""
     open_event.open_url_with_native_app(
         "https://meet.google.com/abc-def-ghi", "Google Meet"
     )
 
-    mock_run.assert_called_once_with(
-        ["open", "-a", "Google Meet", "https://meet.google.com/abc-def-ghi"],
-        check=True,
-    )
+    script, args = get_spawned_args(mock_popen)
+    assert script == open_event.OPEN_URL_WITH_APP_SCRIPT
+    assert args == [
+        "Google Meet",
+        "https://meet.google.com/abc-def-ghi",
+        open_event.get_app_unavailable_marker_path("Google Meet"),
+    ]
 
 
-@patch("subprocess.run")
+@patch("subprocess.Popen")
 @patch("ocu.open_event.open_url_no_app")
-def test_open_url_with_native_app_subprocess_error(mock_open_no_app, mock_run):
-    """open_url_with_native_app should fallback to browser on subprocess error."""
-    from subprocess import CalledProcessError
-
-    mock_run.side_effect = CalledProcessError(1, ["open"])
+def test_open_url_with_native_app_spawn_error(mock_open_no_app, mock_popen, cache_dir):
+    """open_url_with_native_app should fallback to browser if it cannot spawn."""
+    mock_popen.side_effect = OSError("No such file or directory")
     stderr_capture = capture_stderr()
 
     open_event.open_url_with_native_app(
@@ -123,11 +141,13 @@ def test_open_url_with_native_app_subprocess_error(mock_open_no_app, mock_run):
     mock_open_no_app.assert_called_once_with("https://meet.google.com/abc-def-ghi")
 
 
-@patch("subprocess.run")
+@patch("subprocess.Popen")
 @patch("ocu.open_event.open_url_no_app")
-def test_open_url_with_native_app_file_not_found(mock_open_no_app, mock_run):
-    """open_url_with_native_app should fallback when app missing."""
-    mock_run.side_effect = FileNotFoundError("Application not found")
+def test_open_url_with_native_app_known_missing(
+    mock_open_no_app, mock_popen, cache_dir
+):
+    """open_url_with_native_app should not retry an app known to be missing."""
+    open(open_event.get_app_unavailable_marker_path("Google Meet"), "w").close()
     stderr_capture = capture_stderr()
 
     open_event.open_url_with_native_app(
@@ -138,25 +158,41 @@ def test_open_url_with_native_app_file_not_found(mock_open_no_app, mock_run):
     assert "Application Google Meet not found" in stderr_output
     assert "opening with default browser" in stderr_output
     mock_open_no_app.assert_called_once_with("https://meet.google.com/abc-def-ghi")
+    assert mock_popen.call_count == 0
+
+
+@patch("subprocess.Popen")
+def test_open_url_with_native_app_missing_expired(mock_popen, cache_dir):
+    """open_url_with_native_app should retry a missing app after a while."""
+    marker_path = open_event.get_app_unavailable_marker_path("Google Meet")
+    open(marker_path, "w").close()
+    marker_time = time.time() - open_event.APP_UNAVAILABLE_TTL_SECS - 1
+    os.utime(marker_path, (marker_time, marker_time))
+
+    open_event.open_url_with_native_app(
+        "https://meet.google.com/abc-def-ghi", "Google Meet"
+    )
 
+    script, _ = get_spawned_args(mock_popen)
+    assert script == open_event.OPEN_URL_WITH_APP_SCRIPT
 
-@patch("subprocess.run")
-def test_open_url_no_app_success(mock_run):
-    """open_url_no_app should successfully open URL with default browser."""
-    mock_run.return_value = None
 
+@patch("subprocess.Popen")
+def test_open_url_no_app_success(mock_popen):
+    """open_url_no_app should open URL with default browser, detached."""
     open_event.open_url_no_app("https://example.com")
 
-    mock_run.assert_called_once_with(["open", "https://example.com"], check=True)
+    assert get_spawned_args(mock_popen) == (
+        open_event.OPEN_URL_SCRIPT,
+        ["https://example.com"],
+    )
 
 
-@patch("subprocess.run")
+@patch("subprocess.Popen")
 @patch("sys.exit")
-def test_open_url_no_app_failure(mock_exit, mock_run):
-    """open_url_no_app should exit with error code on failure."""
-    from subprocess import CalledProcessError
-
-    mock_run.side_effect = CalledProcessError(1, ["open"])
+def test_open_url_no_app_failure(mock_exit, mock_popen):
+    """open_url_no_app should exit with error code if it cannot spawn."""
+    mock_popen.side_effect = OSError("No such file or directory")
     stderr_capture = capture_stderr()
 
     open_event.open_url_no_app("https://example.com")
@@ -313,3 +349,88 @@ def test_main_teams_native_protocol(mock_open_no_app):
     mock_open_no_app.assert_called_once_with(
         "msteams://teams.microsoft.com/l/meetup-join/123"
     )
+
+
+# A stub open command which blocks until the test releases it (by writing to
+# the release FIFO), and then reports its arguments via the log FIFO; it fails
+# to open any application named "Missing App"
+OPEN_STUB = """
+import json, sys
+with open({release_path!r}) as release_fifo:
+    release_fifo.read()
+with open({log_path!r}, "w") as log_fifo:
+    log_fifo.write(json.dumps(sys.argv[1:]))
+if sys.argv[1:3] == ["-a", "Missing App"]:
+    sys.exit(1)
+"""
+# The number of seconds after which a test which would otherwise hang (because
+# open_event waits for the blocked stub open command) fails instead
+HANG_TIMEOUT_SECS = 30
+
+
+class OpenStub(object):
+    """A stub open command on the PATH, which the test drives one invocation
+    at a time."""
+
+    def __init__(self, tmp_path):
+        self.release_path = os.path.join(tmp_path, "release.fifo")
+        self.log_path = os.path.join(tmp_path, "log.fifo")
+        os.mkfifo(self.release_path)
+        os.mkfifo(self.log_path)
+        self.stub_path = os.path.join(tmp_path, "open")
+        with open(self.stub_path, "w") as stub_file:
+            stub_file.write(
+                f"#!{sys.executable}\n"
+                + OPEN_STUB.format(
+                    release_path=self.release_path, log_path=self.log_path
+                )
+            )
+        os.chmod(self.stub_path, os.stat(self.stub_path).st_mode | stat.S_IEXEC)
+
+    def release(self):
+        """Let the next invocation of the stub open command finish, returning
+        the arguments it was invoked with."""
+        # Opening either FIFO blocks until the stub has opened the other end
+        with open(self.release_path, "w"):
+            pass
+        with open(self.log_path) as log_fifo:
+            return json.loads(log_fifo.read())
+
+
+@pytest.fixture
+def open_stub(tmp_path, cache_dir):
+    """Put a stub open command (which blocks until released) on the PATH."""
+    open_stub = OpenStub(tmp_path)
+    with use_env("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}"):
+        yield open_stub
+
+
+def run_open_event(url):
+    """Run open_event for the given URL in a fresh interpreter; because the
+    stub open command cannot finish until it is released, open_event only
+    returns if it does not wait for the URL to open."""
+    subprocess.run(
+        [sys.executable, "-m", "ocu.open_event", url],
+        check=True,
+        capture_output=True,
+        timeout=HANG_TIMEOUT_SECS,
+    )
+
+
+def test_open_detached(open_stub):
+    """Should return without waiting for the URL to open"""
+    run_open_event("https://zoom.us/j/123456789")
+    assert open_stub.release() == ["https://zoom.us/j/123456789"]
+
+
+@use_env("use_direct_gmeet", "true")
+@use_env("gmeet_app_name", "Missing App")
+def test_open_missing_app_detached(open_stub):
+    """Should fall back to the default handler in the background if the app
+    is missing, and never try the missing app again"""
+    url = "https://meet.google.com/abc-def-ghi"
+    run_open_event(url)
+    assert open_stub.release() == ["-a", "Missing App", url]
+    assert open_stub.release() == [url]
+    run_open_event(url)
+    assert open_stub.release() == [url]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import dataclasses
+import os
+
+import pytest
+
+from ocu.prefs import Prefs, prefs
+from tests.utils import use_env
+
+
+@use_env("conference_domains", "*.zoom.us, zoom.us\nmeet.google.com")
+@use_env("event_time_threshold_mins", "15")
+@use_env("use_direct_zoom", "yes")
+def test_snapshot_parsed():
+    """Should parse every preference into its proper type"""
+    snapshot = prefs.snapshot
+    assert snapshot.conference_domains == ("*.zoom.us", "zoom.us", "meet.google.com")
+    assert snapshot.calendar_names == ()
+    assert snapshot.event_time_threshold_mins == 15
+    assert snapshot.use_direct_zoom is True
+    assert snapshot.use_direct_msteams is False
+    assert snapshot.time_system == "12-hour"
+    assert snapshot.event_cache_ttl_secs == 0
+
+
+def test_snapshot_immutable():
+    """Should not allow the snapshot to be modified"""
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        prefs.snapshot.time_system = "24-hour"
+
+
+def test_snapshot_reused():
+    """Should only parse the environment once until refreshed"""
+    local_prefs = Prefs()
+    snapshot = local_prefs.snapshot
+    with use_env("time_system", "24-hour"):
+        assert local_prefs.snapshot is snapshot
+        local_prefs.refresh()
+        assert local_prefs.snapshot.time_system == "24-hour"
+
+
+def test_snapshot_hashable():
+    """Should be usable as a dictionary key"""
+    assert {prefs.snapshot: True}[Prefs().snapshot]
+
+
+def test_snapshot_fingerprint():
+    """Should fingerprint the snapshot by its raw preference values"""
+    fingerprint = prefs.snapshot.fingerprint
+    assert Prefs().snapshot.fingerprint == fingerprint
+    with use_env("calendar_names", "Work"):
+        assert prefs.snapshot.fingerprint != fingerprint
+    assert prefs.snapshot.fingerprint == fingerprint
+
+
+def test_getitem_reads_environment():
+    """Should read the environment on every subscript for compatibility"""
+    os.environ["time_system"] = "24-hour"
+    try:
+        assert prefs["time_system"] == "24-hour"
+    finally:
+        os.environ["time_system"] = "12-hour"
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"), [("", 0), (" ", 0), (" 42 ", 42), ("5m", 0), ("1.5", 0)]
+)
+def test_convert_str_to_int(value, expected):
+    """Should treat blank or malformed integer preferences as zero"""
+    assert Prefs().convert_str_to_int(value) == expected
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"), [("", 0), (" ", 0), (" 1.5 ", 1.5), ("2s", 0)]
+)
+def test_convert_str_to_float(value, expected):
+    """Should treat blank or malformed float preferences as zero"""
+    assert Prefs().convert_str_to_float(value) == expected
+
+
+@use_env("event_cache_ttl_secs", "5m")
+def test_malformed_numeric_pref():
+    """Should disable a numeric preference with a malformed value rather than
+    failing to parse the preferences"""
+    assert prefs.snapshot.event_cache_ttl_secs == 0
+
+
+@use_env("calendar_fetch_timeout_secs", "2s")
+def test_malformed_float_pref():
+    """Should disable a float preference with a malformed value rather than
+    failing to parse the preferences"""
+    assert prefs.snapshot.calendar_fetch_timeout_secs == 0
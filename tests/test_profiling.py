@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import os.path
+import pstats
+import sys
+from unittest.mock import patch
+
+from freezegun import freeze_time
+
+from ocu import list_events, open_event, profiling
+from tests.utils import redirect_stdout, use_env
+
+EVENT_DICTS = [
+    {
+        "title": "Weekly Sync",
+        "startDate": "2022-10-16T09:00",
+        "endDate": "2022-10-16T09:30",
+        "location": "https://zoom.us/j/123456",
+    },
+    {
+        "title": "Design Review",
+        "startDate": "2022-10-16T07:00",
+        "endDate": "2022-10-16T08:00",
+        "notes": "https://meet.google.com/abc-defg-hij",
+    },
+]
+
+
+def run_list_events():
+    """Run list_events with the test events, returning the feedback."""
+    with patch(
+        "subprocess.check_output",
+        return_value=json.dumps(EVENT_DICTS).encode("utf-8"),
+    ):
+        list_events.main()
+
+
+def read_report(report_path):
+    """Read the JSON timing report at the given path."""
+    with open(report_path) as report_file:
+        return json.load(report_file)
+
+
+@freeze_time("2022-10-16 08:55:00")
+@redirect_stdout
+def test_list_events_report_to_file(out, tmp_path):
+    """Should write a timing report of each list_events stage to a file"""
+    report_path = os.path.join(tmp_path, "report.json")
+    with use_env("ocu_profile", report_path):
+        run_list_events()
+    report = read_report(report_path)
+    assert report["entry_point"] == "list_events"
+    assert set(report["stages"]) >= {
+        "fetch_event_dicts",
+        "parse_events",
+        "build_feedback",
+        "filter_events",
+        "resolve_conference_urls",
+        "sort_events",
+        "serialize_json",
+        "write_output",
+    }
+    assert report["stages"]["resolve_conference_urls"]["calls"] == 2
+    assert all(
+        stage_timing["total_ms"] <= report["total_ms"]
+        for stage_timing in report["stages"].values()
+    )
+    # The feedback itself must be unaffected by profiling
+    feedback = json.loads(out.getvalue())
+    assert [item["title"] for item in feedback["items"]] == [
+        "Weekly Sync",
+        "Design Review",
+    ]
+
+
+@freeze_time("2022-10-16 08:55:00")
+@redirect_stdout
+def test_list_events_report_to_stderr(out, capsys):
+    """Should write the timing report to stderr when requested"""
+    with use_env("ocu_profile", "true"):
+        run_list_events()
+    report = json.loads(capsys.readouterr().err)
+    assert report["entry_point"] == "list_events"
+    assert "fetch_event_dicts" in report["stages"]
+    assert json.loads(out.getvalue())["items"]
+
+
+@freeze_time("2022-10-16 08:55:00")
+@redirect_stdout
+def test_list_events_pstats(out, tmp_path):
+    """Should dump cProfile statistics when a .pstats path is given"""
+    pstats_path = os.path.join(tmp_path, "list_events.pstats")
+    with use_env("ocu_profile_pstats", pstats_path):
+        run_list_events()
+    stats = pstats.Stats(pstats_path)
+    assert any(
+        function_name == "get_feedback"
+        for (_, _, function_name) in stats.stats  # type: ignore
+    )
+
+
+@freeze_time("2022-10-16 08:55:00")
+@redirect_stdout
+def test_profiling_disabled(out, capsys):
+    """Should not profile or write any report when disabled"""
+    with patch.object(profiling, "Profile") as profile_class:
+        run_list_events()
+    assert not profile_class.called
+    assert capsys.readouterr().err == ""
+    assert profiling.active_profile is None
+
+
+@redirect_stdout
+def test_unwritable_report_path(out, capsys, tmp_path):
+    """Should still output feedback if the report cannot be written"""
+    report_path = os.path.join(tmp_path, "missing", "report.json")
+    with use_env("ocu_profile", report_path):
+        run_list_events()
+    assert "Failed to write profile report" in capsys.readouterr().err
+    assert json.loads(out.getvalue())["items"]
+
+
+def test_open_event_report(tmp_path):
+    """Should write a timing report of each open_event stage"""
+    report_path = os.path.join(tmp_path, "report.json")
+    with use_env("ocu_profile", report_path):
+        with patch.object(sys, "argv", ["open_event.py", "https://zoom.us/j/1"]):
+            with patch("subprocess.Popen") as popen:
+                open_event.main()
+    assert popen.call_args.args[0][-1] == "https://zoom.us/j/1"
+    report = read_report(report_path)
+    assert report["entry_point"] == "open_event"
+    assert set(report["stages"]) == {"check_google_meet", "open_url"}
+
+
+def test_open_event_report_on_exit(tmp_path):
+    """Should still write the timing report if open_event exits early"""
+    report_path = os.path.join(tmp_path, "report.json")
+    with use_env("ocu_profile", report_path):
+        with patch.object(sys, "argv", ["open_event.py"]):
+            try:
+                open_event.main()
+            except SystemExit:
+                pass
+    assert read_report(report_path)["entry_point"] == "open_event"
+    assert profiling.active_profile is None
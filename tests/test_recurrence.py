@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+
+import os
+import os.path
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from dateutil.rrule import rrulestr
+from freezegun import freeze_time
+
+from ocu import recurrence
+from ocu.calendars.ics_calendar import IcsCalendar
+from ocu.recurrence import (
+    RecurrenceIndex,
+    RecurrenceMaster,
+    RecurrenceRule,
+    get_time_zone,
+)
+from tests.utils import use_env
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory for each test."""
+    cache_dir = os.path.join(tmp_path, "cache")
+    with use_env("alfred_workflow_cache", cache_dir):
+        yield cache_dir
+
+
+def get_occurrence_dates(rrule, start_date, days):
+    """Expand the given rule into its occurrence dates over the given days."""
+    master = RecurrenceMaster(
+        rule=RecurrenceRule.parse(rrule),
+        start=datetime.combine(start_date, time(9)),
+        duration=timedelta(minutes=30),
+    )
+    return [
+        start_date + timedelta(days=i)
+        for i in range(days)
+        if master.get_occurrence_starts(start_date + timedelta(days=i))
+    ]
+
+
+def generate_random_rrule(rng):
+    """Generate a random (supported) RRULE."""
+    freq = rng.choice(("DAILY", "WEEKLY", "MONTHLY", "YEARLY"))
+    rule_parts = [f"FREQ={freq}", f"INTERVAL={rng.randint(1, 3)}"]
+    weekday_codes = rng.sample(recurrence.WEEKDAY_CODES, rng.randint(1, 3))
+    if freq == "DAILY" and rng.random() < 0.5:
+        rule_parts.append(f"BYDAY={','.join(weekday_codes)}")
+    elif freq == "WEEKLY":
+        rule_parts.append(f"BYDAY={','.join(weekday_codes)}")
+        if rng.random() < 0.3:
+            rule_parts.append("WKST=SU")
+    elif freq == "MONTHLY" and rng.random() < 0.5:
+        rule_parts.append(
+            "BYDAY="
+            + ",".join(
+                f"{rng.choice((-1, 1, 2, 3, 4))}{code}" for code in weekday_codes
+            )
+        )
+    elif freq == "MONTHLY":
+        rule_parts.append(f"BYMONTHDAY={rng.choice((1, 15, 29, 30, 31, -1, -2))}")
+    elif freq == "YEARLY" and rng.random() < 0.5:
+        rule_parts.append(f"BYMONTH={rng.randint(1, 12)},{rng.randint(1, 12)}")
+        if rng.random() < 0.5:
+            rule_parts.append(f"BYDAY={rng.choice((1, 2, -1))}{weekday_codes[0]}")
+    if rng.random() < 0.3:
+        rule_parts.append(f"COUNT={rng.randint(1, 40)}")
+    elif rng.random() < 0.3:
+        rule_parts.append(f"UNTIL=2024{rng.randint(1, 12):02}15T235959")
+    return ";".join(rule_parts)
+
+
+@pytest.mark.parametrize(
+    ("rrule", "start_date", "expected_dates"),
+    [
+        (
+            "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE",
+            date(2022, 10, 3),
+            [
+                date(2022, 10, 3),
+                date(2022, 10, 5),
+                date(2022, 10, 17),
+                date(2022, 10, 19),
+                date(2022, 10, 31),
+                date(2022, 11, 2),
+                date(2022, 11, 14),
+                date(2022, 11, 16),
+                date(2022, 11, 28),
+                date(2022, 11, 30),
+                date(2022, 12, 12),
+                date(2022, 12, 14),
+                date(2022, 12, 26),
+                date(2022, 12, 28),
+            ],
+        ),
+        (
+            "FREQ=MONTHLY;BYDAY=2TU",
+            date(2022, 10, 11),
+            [date(2022, 10, 11), date(2022, 11, 8), date(2022, 12, 13)],
+        ),
+        (
+            "FREQ=MONTHLY;BYDAY=-1FR",
+            date(2022, 10, 28),
+            [date(2022, 10, 28), date(2022, 11, 25), date(2022, 12, 30)],
+        ),
+        (
+            "FREQ=MONTHLY;BYMONTHDAY=31",
+            date(2022, 10, 31),
+            [date(2022, 10, 31), date(2022, 12, 31)],
+        ),
+        (
+            "FREQ=DAILY;COUNT=3",
+            date(2022, 10, 16),
+            [date(2022, 10, 16), date(2022, 10, 17), date(2022, 10, 18)],
+        ),
+        (
+            "FREQ=DAILY;UNTIL=20221018",
+            date(2022, 10, 16),
+            [date(2022, 10, 16), date(2022, 10, 17), date(2022, 10, 18)],
+        ),
+        ("FREQ=YEARLY", date(2022, 10, 16), [date(2022, 10, 16)]),
+    ],
+)
+def test_rule_expansion(rrule, start_date, expected_dates):
+    """Should expand common recurrence rules"""
+    assert get_occurrence_dates(rrule, start_date, 90) == expected_dates
+
+
+def test_rule_expansion_matches_dateutil():
+    """Should expand random rules identically to dateutil"""
+    rng = random.Random(42)
+    for _ in range(400):
+        rrule = generate_random_rrule(rng)
+        start_datetime = datetime(2022, rng.randint(1, 12), rng.randint(1, 28), 9)
+        expected_datetimes = list(
+            rrulestr(f"RRULE:{rrule}", dtstart=start_datetime).between(
+                start_datetime, start_datetime + timedelta(days=800), inc=True
+            )
+        )
+        # The start of a recurrence is always its first occurrence, whereas
+        # dateutil omits a start which does not match the rule
+        if not expected_datetimes or expected_datetimes[0] != start_datetime:
+            continue
+        occurrence_dates = get_occurrence_dates(rrule, start_datetime.date(), 801)
+        assert occurrence_dates == [
+            expected_datetime.date() for expected_datetime in expected_datetimes
+        ], rrule
+
+
+@pytest.mark.parametrize(
+    "rrule",
+    ["FREQ=HOURLY", "FREQ=MONTHLY;BYSETPOS=-1;BYDAY=MO,TU", "FREQ=WEEKLY;BYHOUR=9"],
+)
+def test_unsupported_rules(rrule):
+    """Should reject rules which cannot be expanded correctly"""
+    with pytest.raises(ValueError):
+        RecurrenceRule.parse(rrule)
+
+
+def test_expansion_does_not_walk_series():
+    """Should expand a day without walking a long series from its start"""
+    rule = RecurrenceRule.parse("FREQ=WEEKLY;BYDAY=MO,TH")
+    with patch.object(
+        RecurrenceRule,
+        "get_dates_in_period",
+        autospec=True,
+        side_effect=RecurrenceRule.get_dates_in_period,
+    ) as get_dates_in_period:
+        master = RecurrenceMaster(
+            rule=rule, start=datetime(1972, 1, 3, 9), duration=timedelta(minutes=30)
+        )
+        assert master.get_occurrence_starts(date(2022, 10, 17)) == [
+            datetime(2022, 10, 17, 9)
+        ]
+    assert get_dates_in_period.call_count <= 2
+
+
+def test_expansion_memoized():
+    """Should memoize expansions by rule, start, time zone, and date"""
+    master = RecurrenceMaster(
+        rule=RecurrenceRule.parse("FREQ=DAILY;INTERVAL=3"),
+        start=datetime(2021, 10, 16, 9),
+        duration=timedelta(minutes=30),
+        tz_id="America/New_York",
+    )
+    master.get_occurrence_starts(date(2022, 10, 16))
+    cache_info = recurrence.expand_rule_on_date.cache_info()
+    master.get_occurrence_starts(date(2022, 10, 16))
+    assert recurrence.expand_rule_on_date.cache_info().hits == cache_info.hits + 1
+
+
+def test_excluded_and_extra_starts():
+    """Should omit excluded occurrences and include extra occurrences"""
+    master = RecurrenceMaster(
+        rule=RecurrenceRule.parse("FREQ=DAILY"),
+        start=datetime(2022, 10, 1, 9),
+        duration=timedelta(minutes=30),
+        excluded_starts=frozenset({datetime(2022, 10, 16, 9)}),
+        extra_starts=(datetime(2022, 10, 16, 15),),
+    )
+    assert master.get_occurrence_starts(date(2022, 10, 16)) == [
+        datetime(2022, 10, 16, 15)
+    ]
+    assert master.get_occurrence_starts(date(2022, 10, 17)) == [
+        datetime(2022, 10, 17, 9)
+    ]
+
+
+def test_time_zone_conversion_across_dst():
+    """Should keep the wall time of zoned occurrences across DST changes"""
+    new_york = get_time_zone("America/New_York")
+    master = RecurrenceMaster(
+        rule=RecurrenceRule.parse("FREQ=WEEKLY"),
+        start=datetime(2022, 10, 31, 9),
+        duration=timedelta(hours=1),
+        tz_id="America/New_York",
+    )
+    for wall_start in (datetime(2022, 10, 31, 9), datetime(2022, 11, 7, 9)):
+        local_start = (
+            wall_start.replace(tzinfo=new_york).astimezone().replace(tzinfo=None)
+        )
+        assert local_start in master.get_occurrence_starts(local_start.date())
+
+
+def test_utc_until():
+    """Should compare a UTC UNTIL against the local occurrence times"""
+    master = RecurrenceMaster(
+        rule=RecurrenceRule.parse("FREQ=DAILY;UNTIL=20221016T090000Z"),
+        start=datetime(2022, 10, 14, 9),
+        duration=timedelta(hours=1),
+        tz_id="UTC",
+    )
+    local_start = (
+        datetime(2022, 10, 16, 9, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    )
+    assert master.get_occurrence_starts(local_start.date()) == [local_start]
+    assert master.get_occurrence_starts(local_start.date() + timedelta(days=1)) == []
+
+
+def test_multi_day_occurrences():
+    """Should include occurrences which started on an earlier day"""
+    master = RecurrenceMaster(
+        rule=RecurrenceRule.parse("FREQ=WEEKLY"),
+        start=datetime(2022, 10, 14),
+        duration=timedelta(days=3),
+    )
+    for day in (date(2022, 10, 14), date(2022, 10, 16)):
+        assert master.get_occurrence_starts(day) == [datetime(2022, 10, 14)]
+    assert master.get_occurrence_starts(date(2022, 10, 17)) == []
+
+
+def test_index_skips_rules_which_cannot_occur():
+    """Should skip every master of a rule which cannot occur on the day"""
+    index = RecurrenceIndex(
+        (
+            RecurrenceMaster(
+                rule=RecurrenceRule.parse("FREQ=WEEKLY;BYDAY=MO"),
+                start=datetime(2022, 1, 3, 9 + i % 8),
+                duration=timedelta(minutes=30),
+            ),
+            i,
+        )
+        for i in range(100)
+    )
+    with patch.object(
+        RecurrenceMaster, "get_occurrence_starts", autospec=True
+    ) as get_occurrence_starts:
+        # Thursday, October 13, 2022 is more than a day from any Monday
+        assert list(index.iter_occurrences(date(2022, 10, 13))) == []
+    assert get_occurrence_starts.call_count == 0
+
+
+RECURRING_ICS_TEXT = "\n".join(
+    [
+        "BEGIN:VCALENDAR",
+        "BEGIN:VEVENT",
+        "UID:standup",
+        "SUMMARY:Standup",
+        "DTSTART:20220103T093000",
+        "DTEND:20220103T094500",
+        "RRULE:FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR",
+        "EXDATE:20221014T093000,20221017T093000",
+        "LOCATION:https://zoom.us/j/111",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "UID:sync",
+        "SUMMARY:Weekly Sync",
+        "DTSTART:20220106T140000",
+        "DTEND:20220106T150000",
+        "RRULE:FREQ=WEEKLY;BYDAY=TH",
+        "LOCATION:https://zoom.us/j/222",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "UID:sync",
+        "RECURRENCE-ID:20221013T140000",
+        "SUMMARY:Weekly Sync (Moved)",
+        "DTSTART:20221013T160000",
+        "DTEND:20221013T170000",
+        "LOCATION:https://zoom.us/j/222",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "UID:retro",
+        "SUMMARY:Retro",
+        "DTSTART:20221013T110000",
+        "DTEND:20221013T120000",
+        "RRULE:FREQ=MONTHLY;BYSETPOS=-1;BYDAY=TH",
+        "END:VEVENT",
+        "END:VCALENDAR",
+        "",
+    ]
+)
+
+
+@pytest.fixture
+def ics_path(tmp_path):
+    """Write the test calendar of recurring events to an .ics file."""
+    ics_path = os.path.join(tmp_path, "recurring.ics")
+    with open(ics_path, "w") as ics_file:
+        ics_file.write(RECURRING_ICS_TEXT)
+    return ics_path
+
+
+def get_titles_and_times(ics_path):
+    """Read today's events from the given .ics file, as (title, time) pairs."""
+    return [
+        (event_dict["title"], event_dict["startDate"])
+        for event_dict in IcsCalendar([ics_path]).get_event_dicts()
+    ]
+
+
+@freeze_time("2022-10-13 08:00:00")
+def test_ics_overridden_occurrence(ics_path):
+    """Should replace an overridden occurrence with its RECURRENCE-ID event"""
+    assert get_titles_and_times(ics_path) == [
+        ("Standup", "2022-10-13T09:30"),
+        # Unsupported rules fall back to showing only the first occurrence
+        ("Retro", "2022-10-13T11:00"),
+        ("Weekly Sync (Moved)", "2022-10-13T16:00"),
+    ]
+
+
+@freeze_time("2022-10-14 08:00:00")
+def test_ics_excluded_occurrence(ics_path):
+    """Should omit occurrences listed by EXDATE"""
+    assert get_titles_and_times(ics_path) == []
+
+
+@freeze_time("2022-10-20 08:00:00")
+def test_ics_regular_occurrences(ics_path):
+    """Should expand recurring events into today's occurrences"""
+    assert get_titles_and_times(ics_path) == [
+        ("Standup", "2022-10-20T09:30"),
+        ("Weekly Sync", "2022-10-20T14:00"),
+    ]
+    event_dicts = IcsCalendar([ics_path]).get_event_dicts()
+    assert event_dicts[0]["endDate"] == "2022-10-20T09:45"
+    assert event_dicts[0]["location"] == "https://zoom.us/j/111"
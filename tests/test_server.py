@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import json
+import os.path
+import socket
+import threading
+from unittest.mock import patch
+
+import pytest
+from freezegun import freeze_time
+
+from ocu import list_events, server
+from ocu.server_client import request_feedback_from_server
+from tests.utils import redirect_stdout, use_env
+
+EVENT_DICTS = [
+    {
+        "title": "My Meeting",
+        "startDate": "2022-10-16T13:00",
+        "endDate": "2022-10-16T14:00",
+        "location": "https://zoom.us/j/123456",
+    },
+    {
+        "title": "My All-Day Meeting",
+        "startDate": "2022-10-16T00:00",
+        "endDate": "2022-10-16T23:59",
+        "location": "https://zoom.us/j/789012",
+    },
+]
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    """Point both the server and its clients at a temporary socket path."""
+    socket_path = os.path.join(tmp_path, "ocu.sock")
+    with patch("ocu.server_client.get_server_socket_path", return_value=socket_path):
+        yield socket_path
+
+
+@pytest.fixture(autouse=True)
+def check_output():
+    """Mock the calendar subprocess to return today's events."""
+    with patch(
+        "subprocess.check_output",
+        return_value=json.dumps(EVENT_DICTS).encode("utf-8"),
+    ) as check_output:
+        yield check_output
+
+
+@pytest.fixture
+def ocu_server(socket_path):
+    """Run a resident ocu server in a background thread."""
+    event_store = server.EventStore()
+    with server.OcuServer(socket_path, event_store) as ocu_server:
+        server_thread = threading.Thread(
+            target=ocu_server.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        server_thread.start()
+        try:
+            yield ocu_server
+        finally:
+            ocu_server.shutdown()
+            server_thread.join()
+
+
+@use_env("use_server", "true")
+@freeze_time("2022-10-16 12:55:00")
+@redirect_stdout
+def test_fallback_without_server(out, socket_path):
+    """Should fetch events in-process if the server is not running"""
+    list_events.main()
+    feedback = json.loads(out.getvalue())
+    assert feedback["items"][0]["title"] == "My Meeting"
+    assert len(feedback["items"]) == 2
+
+
+@use_env("use_server", "true")
+@freeze_time("2022-10-16 12:55:00")
+@redirect_stdout
+def test_server_round_trip(out, ocu_server):
+    """Should print the same feedback whether or not the server is used"""
+    list_events.main()
+    server_output = out.getvalue()
+    assert (
+        server_output
+        == json.dumps(
+            list_events.get_feedback(
+                list_events.get_events_today_with_conference_urls()
+            ),
+            indent=2,
+        )
+        + "\n"
+    )
+
+
+@use_env("use_server", "true")
+@freeze_time("2022-10-16 12:55:00")
+def test_server_keeps_events_warm(ocu_server, check_output):
+    """Should only fetch events once for repeated requests"""
+    request_feedback_from_server()
+    feedback = request_feedback_from_server()
+    assert feedback["items"][0]["title"] == "My Meeting"
+    assert check_output.call_count == 1
+
+
+@use_env("use_server", "true")
+@freeze_time("2022-10-16 12:55:00")
+def test_server_reloads_prefs(ocu_server):
+    """Should reload prefs and events if the client's environment changes"""
+    feedback = request_feedback_from_server()
+    assert feedback["items"][0]["subtitle"] == "1:00pm"
+    with use_env("time_system", "24-hour"):
+        feedback = request_feedback_from_server()
+    assert feedback["items"][0]["subtitle"] == "13:00"
+
+
+@use_env("use_server", "true")
+def test_server_refreshes_all_day_events(ocu_server):
+    """Should keep all-day events current with the time of each request"""
+    with freeze_time("2022-10-16 08:00:00"):
+        request_feedback_from_server()
+    with freeze_time("2022-10-16 12:55:00"):
+        feedback = request_feedback_from_server()
+    assert feedback["items"][1]["title"] == "My All-Day Meeting"
+
+
+@use_env("use_server", "true")
+@freeze_time("2022-10-16 12:55:00")
+def test_server_refresh(ocu_server):
+    """Should re-fetch events on each scheduled refresh"""
+    request_feedback_from_server()
+    with patch("subprocess.check_output", return_value=b"[]"):
+        ocu_server.event_store.refresh()
+        feedback = request_feedback_from_server()
+    assert feedback["items"][0]["title"] == "No Results"
+
+
+@use_env("use_server", "true")
+@freeze_time("2022-10-16 12:55:00")
+def test_server_error(ocu_server):
+    """Should return None if the server cannot fetch events"""
+    with patch("subprocess.check_output", side_effect=OSError("osascript failed")):
+        assert request_feedback_from_server() is None
+
+
+def test_remove_stale_socket(tmp_path):
+    """Should remove a socket file left behind by a server that has exited"""
+    socket_path = os.path.join(tmp_path, "ocu.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale_server:
+        stale_server.bind(socket_path)
+    server.remove_stale_socket(socket_path)
+    assert not os.path.exists(socket_path)
+
+
+def test_remove_live_socket(ocu_server, socket_path):
+    """Should refuse to start if another server is already listening"""
+    with pytest.raises(RuntimeError):
+        server.remove_stale_socket(socket_path)
+    assert os.path.exists(socket_path)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import os.path
+import stat
+import sys
+import time
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from ocu import list_events
+from ocu.calendar import get_calendar
+from ocu.calendars.base_calendar import BaseCalendar, get_day_range
+from ocu.calendars.cached_calendar import CachedCalendar
+from ocu.event import Event
+from tests.utils import redirect_stdout, use_env
+
+# The number of seconds the stub osascript takes to respond
+OSASCRIPT_DELAY_SECS = 3
+# A stub osascript which slowly responds with a single all-day meeting
+OSASCRIPT_STUB = """
+import json, time
+time.sleep({delay_secs!r})
+print(json.dumps([{{
+    "title": "Fresh Meeting",
+    "startDate": "{today}T00:00",
+    "endDate": "{today}T23:59",
+    "location": "https://zoom.us/j/123456",
+}}]))
+"""
+STALE_EVENT_DICTS = [
+    {
+        "title": "Stale Meeting",
+        "startDate": "2022-10-16T08:00",
+        "endDate": "2022-10-16T09:00",
+        "location": "https://zoom.us/j/123456",
+    }
+]
+FRESH_EVENT_DICTS = [{**STALE_EVENT_DICTS[0], "title": "Fresh Meeting"}]
+
+
+class StubCalendar(BaseCalendar):
+    """A calendar which counts the number of times it is fetched."""
+
+    def __init__(self):
+        self.call_count = 0
+
+    def get_event_dicts(
+        self,
+        start_datetime=None,
+        end_datetime=None,
+        calendar_names=None,
+        include_notes=True,
+    ):
+        self.call_count += 1
+        return FRESH_EVENT_DICTS
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    """Store all cached data in a temporary directory for each test."""
+    cache_dir = tmp_path / "cache"
+    with use_env("alfred_workflow_cache", str(cache_dir)):
+        yield cache_dir
+
+
+@pytest.fixture
+def popen():
+    """Mock the spawning of the background refresh process."""
+    with patch("subprocess.Popen") as popen:
+        yield popen
+
+
+def write_cache(calendar, event_dicts, age_secs):
+    """Cache the given events for today as if they were fetched the given
+    number of seconds ago."""
+    calendar.write_event_dicts([], calendar.get_cache_key(), event_dicts)
+    with open(calendar.get_cache_path()) as cache_file:
+        cache_data = json.load(cache_file)
+    cache_data["entries"][0]["created_time"] = time.time() - age_secs
+    with open(calendar.get_cache_path(), "w") as cache_file:
+        json.dump(cache_data, cache_file)
+
+
+def get_calendar_with_cache(age_secs):
+    """Build a stale-while-revalidate calendar whose cached events for today
+    were fetched the given number of seconds ago."""
+    calendar = CachedCalendar(StubCalendar(), ttl_secs=60, stale_while_revalidate=True)
+    write_cache(calendar, STALE_EVENT_DICTS, age_secs)
+    return calendar
+
+
+def get_titles(items):
+    """Retrieve the titles of the given event dictionaries or feedback
+    items."""
+    return [item["title"] for item in items]
+
+
+def test_stale_served_and_refreshed(popen):
+    """Should serve stale events right away while refreshing them in a
+    detached process"""
+    calendar = get_calendar_with_cache(age_secs=3600)
+    assert calendar.get_event_dicts() == STALE_EVENT_DICTS
+    assert calendar.calendar.call_count == 0
+    assert calendar.is_refreshing()
+    command = popen.call_args.args[0]
+    assert command[:3] == [sys.executable, "-m", "ocu.refresh_events"]
+    start_datetime, end_datetime = get_day_range()
+    assert json.loads(command[3]) == {
+        "start": start_datetime.isoformat(),
+        "end": end_datetime.isoformat(),
+        "calendar_names": None,
+        "include_notes": True,
+    }
+    assert popen.call_args.kwargs["start_new_session"]
+
+
+def test_fresh_not_refreshed(popen):
+    """Should not refresh events which are still fresh"""
+    calendar = get_calendar_with_cache(age_secs=30)
+    assert calendar.get_event_dicts() == STALE_EVENT_DICTS
+    assert not calendar.is_refreshing()
+    assert popen.call_count == 0
+
+
+def test_single_refresh_at_once(popen):
+    """Should not start another refresh while one is already running"""
+    calendar = get_calendar_with_cache(age_secs=3600)
+    calendar.get_event_dicts()
+    calendar.get_event_dicts()
+    assert calendar.is_refreshing()
+    assert popen.call_count == 1
+
+
+def test_abandoned_refresh(popen):
+    """Should start another refresh if the last one never finished"""
+    calendar = get_calendar_with_cache(age_secs=3600)
+    calendar.get_event_dicts()
+    lock_time = time.time() - CachedCalendar.refresh_lock_timeout_secs - 1
+    os.utime(calendar.get_refresh_lock_path(calendar.get_cache_key()), (0, lock_time))
+    calendar.get_event_dicts()
+    assert popen.call_count == 2
+
+
+def test_refresh_spawn_failure(popen):
+    """Should still serve stale events if the refresh could not be started"""
+    popen.side_effect = OSError
+    calendar = get_calendar_with_cache(age_secs=3600)
+    assert calendar.get_event_dicts() == STALE_EVENT_DICTS
+    assert not calendar.is_refreshing()
+    assert not os.path.exists(calendar.get_refresh_lock_path(calendar.get_cache_key()))
+
+
+def test_nothing_cached(popen):
+    """Should wait on the calendar if nothing has been cached yet"""
+    calendar = CachedCalendar(StubCalendar(), ttl_secs=60, stale_while_revalidate=True)
+    assert calendar.get_event_dicts() == FRESH_EVENT_DICTS
+    assert not calendar.is_refreshing()
+    assert popen.call_count == 0
+
+
+def test_refresh_event_dicts(popen):
+    """Should rewrite the cached events and release the refresh lock"""
+    calendar = get_calendar_with_cache(age_secs=3600)
+    calendar.get_event_dicts()
+    calendar.refresh_event_dicts(*get_day_range())
+    assert not os.path.exists(calendar.get_refresh_lock_path(calendar.get_cache_key()))
+    assert calendar.get_event_dicts() == FRESH_EVENT_DICTS
+    assert not calendar.is_refreshing()
+    assert popen.call_count == 1
+
+
+def test_stale_entries_retained(popen):
+    """Should keep stale entries for other queries, since they may still be
+    served"""
+    calendar = get_calendar_with_cache(age_secs=3600)
+    tomorrow_range = get_day_range(datetime.now() + timedelta(days=1))
+    calendar.get_event_dicts(*tomorrow_range)
+    assert calendar.get_event_dicts() == STALE_EVENT_DICTS
+    assert len(calendar.read_cache_entries()) == 2
+
+
+@use_env("event_cache_ttl_secs", "60")
+@use_env("use_stale_while_revalidate", "true")
+def test_get_calendar():
+    """Should enable stale-while-revalidate mode via the user's preferences"""
+    calendar = get_calendar()
+    assert isinstance(calendar, CachedCalendar)
+    assert calendar.stale_while_revalidate
+
+
+def test_feedback_rerun():
+    """Should ask Alfred to re-run (rather than cache) stale results"""
+    with use_env("alfred_cache_max_secs", "86400"):
+        feedback = list_events.get_feedback(
+            [Event(STALE_EVENT_DICTS[0], lazy=True)],
+            current_datetime=datetime(2022, 10, 16, 7, 55),
+            is_refreshing=True,
+        )
+    assert feedback["rerun"] == list_events.STALE_RERUN_SECS
+    assert "cache" not in feedback
+
+
+@use_env("event_cache_ttl_secs", "60")
+@use_env("use_stale_while_revalidate", "true")
+def test_list_events_never_waits(tmp_path, cache_dir):
+    """Should list stale events without waiting on a slow calendar, and pick
+    up the refreshed events once the detached refresh has finished"""
+    stub_path = os.path.join(tmp_path, "osascript")
+    with open(stub_path, "w") as stub_file:
+        stub_file.write(
+            f"#!{sys.executable}\n"
+            + OSASCRIPT_STUB.format(
+                delay_secs=OSASCRIPT_DELAY_SECS, today=date.today().isoformat()
+            )
+        )
+    os.chmod(stub_path, os.stat(stub_path).st_mode | stat.S_IEXEC)
+    with use_env("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}"):
+        calendar = get_calendar()
+        write_cache(
+            calendar,
+            [
+                {
+                    **STALE_EVENT_DICTS[0],
+                    "startDate": f"{date.today().isoformat()}T00:00",
+                    "endDate": f"{date.today().isoformat()}T23:59",
+                }
+            ],
+            age_secs=3600,
+        )
+
+        @redirect_stdout
+        def run_list_events(out):
+            start_time = time.perf_counter()
+            list_events.main()
+            return json.loads(out.getvalue()), time.perf_counter() - start_time
+
+        feedback, elapsed_secs = run_list_events()
+        assert elapsed_secs < OSASCRIPT_DELAY_SECS / 2
+        assert "Stale Meeting" in get_titles(feedback["items"])
+        assert feedback["rerun"] == list_events.STALE_RERUN_SECS
+        lock_path = calendar.get_refresh_lock_path(calendar.get_cache_key())
+        for _ in range(200):
+            if not os.path.exists(lock_path):
+                break
+            time.sleep(0.1)
+        feedback, _ = run_list_events()
+    assert "Fresh Meeting" in get_titles(feedback["items"])
+    assert "rerun" not in feedback
@@ -12,6 +12,7 @@
 from unittest.mock import patch
 
 from ocu.event_dict import EventDict
+from ocu.prefs import prefs
 
 
 def redirect_stdout(func):
@@ -54,9 +55,11 @@ def __init__(self, key, value):
     def __enter__(self):
         self.orig_value = os.environ.get(self.key, "")
         os.environ[self.key] = self.value
+        prefs.refresh()
 
     def __exit__(self, type, value, traceback):
         os.environ[self.key] = self.orig_value
+        prefs.refresh()
 
     # Derived from: <https://gist.github.com/LeoHuckvale/8f50f8f2a6235512827b>
     # and